@@ -8,8 +8,9 @@ a supervisor agent.
 
 import logging
 import inspect
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Callable, Type, Union
+from typing import List, Dict, Any, Optional, Callable, Type, Union, AsyncIterator
 
 from langchain_core.language_models import LanguageModelLike
 from langchain_core.tools import BaseTool
@@ -65,6 +66,9 @@ class BaseAgent(ABC):
         self.icon = icon
         self.agent = None
         
+        # Guards create, which the warm-up and the first request may call concurrently
+        self._create_lock = threading.Lock()
+        
         logger.info(f"Initialized {self.name} agent with {len(self.tools)} tools")
     
     @abstractmethod
@@ -97,22 +101,26 @@ class BaseAgent(ABC):
         Returns:
             A Pregel object representing the agent
         """
-        if self.agent is None:
-            logger.info(f"Creating {self.name} agent with {len(self.tools)} tools")
-            
-            # Bind tools to the model if supported
-            model = self.model
-            if hasattr(model, "bind_tools") and "parallel_tool_calls" in inspect.signature(model.bind_tools).parameters:
-                model = model.bind_tools(self.tools, parallel_tool_calls=False)
-            
-            self.agent = create_react_agent(
-                model=model,
-                tools=self.tools,
-                name=self.name,
-                prompt=self.prompt
-            )
-            
-            logger.info(f"Successfully created {self.name} agent")
+        if self.agent is not None:
+            return self.agent
+        
+        with self._create_lock:
+            if self.agent is None:
+                logger.info(f"Creating {self.name} agent with {len(self.tools)} tools")
+                
+                # Bind tools to the model if supported
+                model = self.model
+                if hasattr(model, "bind_tools") and "parallel_tool_calls" in inspect.signature(model.bind_tools).parameters:
+                    model = model.bind_tools(self.tools, parallel_tool_calls=False)
+                
+                self.agent = create_react_agent(
+                    model=model,
+                    tools=self.tools,
+                    name=self.name,
+                    prompt=self.prompt
+                )
+                
+                logger.info(f"Successfully created {self.name} agent")
         
         return self.agent
     
@@ -153,6 +161,30 @@ class BaseAgent(ABC):
         logger.info(f"{self.name} agent completed async processing")
         
         return result
+    
+    async def astream_events(self, state: Dict[str, Any], **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream LangGraph run events for the agent with the given state.
+        
+        This mirrors the astream_events API of compiled graphs, so regular agents
+        and supervisors can be streamed the same way.
+        
+        Args:
+            state: The current state of the conversation
+            **kwargs: Additional arguments for astream_events (e.g. version)
+            
+        Yields:
+            LangGraph run events (token chunks, tool starts/ends, chain ends, ...)
+        """
+        if self.agent is None:
+            self.create()
+        
+        kwargs.setdefault("version", "v2")
+        
+        logger.info(f"Streaming {self.name} agent")
+        async for event in self.agent.astream_events(state, **kwargs):
+            yield event
+        logger.info(f"{self.name} agent completed streaming")
 
 
 class AgentRegistry:
@@ -171,6 +203,7 @@ class AgentRegistry:
             cls._instance.agents = {}
             cls._instance.logger = logging.getLogger("mosaic.agent_registry")
             cls._instance.agent_relationships = {}  # Store agent relationships
+            cls._instance.version = 0  # Incremented whenever agents are added or removed
         return cls._instance
     
     def register(self, agent: BaseAgent) -> None:
@@ -184,8 +217,25 @@ class AgentRegistry:
             self.logger.warning(f"Agent '{agent.name}' already registered. Overwriting.")
         
         self.agents[agent.name] = agent
+        self.version += 1
         self.logger.debug(f"Registered agent '{agent.name}'")
     
+    def unregister(self, name: str) -> Optional[BaseAgent]:
+        """
+        Remove an agent from the registry.
+        
+        Args:
+            name: The name of the agent to remove
+            
+        Returns:
+            The removed agent if found, None otherwise
+        """
+        agent = self.agents.pop(name, None)
+        if agent is not None:
+            self.version += 1
+            self.logger.debug(f"Unregistered agent '{name}'")
+        return agent
+    
     def get(self, name: str) -> Optional[BaseAgent]:
         """
         Get an agent by name.
@@ -137,7 +137,7 @@ def process_excel_file_tool(file_data_base64: str, file_name: str) -> str:
                             logger.info(f"Extracted attachment ID from file name: {attachment_id}")
                             
                             # Get the attachment from the database
-                            attachment = AttachmentService.get_attachment(attachment_id)
+                            attachment = AttachmentService.get_attachment(attachment_id, include_data=True)
                             if attachment and attachment.get("data"):
                                 file_data = base64.b64decode(attachment["data"])
                                 logger.info(f"Successfully retrieved attachment data from database, length: {len(file_data)}")
@@ -360,7 +360,7 @@ def analyze_excel_data_tool(file_data_base64: str, file_name: str, analysis_type
                             logger.info(f"Extracted attachment ID from file name: {attachment_id}")
                             
                             # Get the attachment from the database
-                            attachment = AttachmentService.get_attachment(attachment_id)
+                            attachment = AttachmentService.get_attachment(attachment_id, include_data=True)
                             if attachment and attachment.get("data"):
                                 file_data = base64.b64decode(attachment["data"])
                                 logger.info(f"Successfully retrieved attachment data from database, length: {len(file_data)}")
@@ -11,7 +11,7 @@ import uuid
 import asyncio
 from typing import List, Dict, Any, Optional, Type, Callable
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
 # Configure logging
@@ -48,6 +48,14 @@ except ImportError:
     # Fall back to relative import (for Docker environment)
     from backend.app.agent_runner import get_initialized_agents
 
+# Import the agent catalog
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.agent_catalog import AgentCatalog
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.agent_catalog import AgentCatalog
+
 # Models for agents and messages
 class Agent(BaseModel):
     id: str
@@ -133,6 +141,9 @@ class AgentAPI:
         self.agent_routers = {}
         self.message_store = MESSAGE_STORE
         
+        # Serialized agent metadata, rebuilt when the agents change
+        self.catalog = AgentCatalog(self._extract_agent_metadata, get_initialized_agents)
+        
         # Set up the base routes
         self._setup_base_routes()
     
@@ -140,34 +151,19 @@ class AgentAPI:
         """Set up the base routes for the agent API."""
         
         @self.router.get("")
-        async def get_agents():
-            """Get a list of all available agents."""
-            try:
-                initialized_agents = get_initialized_agents()
-                agents = []
-                
-                for agent_id, agent in initialized_agents.items():
-                    # Extract agent metadata
-                    metadata = self._extract_agent_metadata(agent_id, agent)
-                    agents.append(metadata)
-                
-                return agents
-            except Exception as e:
-                logger.error(f"Error getting agents: {str(e)}")
-                return []
+        async def get_agents(request: Request):
+            """Get a list of all available agents (supports If-None-Match)."""
+            return await self.catalog.list_response(request)
         
         @self.router.get("/{agent_id}")
-        async def get_agent(agent_id: str):
-            """Get information about a specific agent."""
-            initialized_agents = get_initialized_agents()
-            agent = initialized_agents.get(agent_id)
+        async def get_agent(agent_id: str, request: Request):
+            """Get information about a specific agent (supports If-None-Match)."""
+            response = await self.catalog.agent_response(request, agent_id)
             
-            if not agent:
+            if response is None:
                 raise HTTPException(status_code=404, detail="Agent not found")
             
-            # Extract agent metadata
-            metadata = self._extract_agent_metadata(agent_id, agent)
-            return metadata
+            return response
         
         @self.router.get("/{agent_id}/capabilities")
         async def get_agent_capabilities(agent_id: str):
@@ -0,0 +1,213 @@
+"""
+Agent Catalog Module for MOSAIC
+
+This module serves the agent metadata returned by GET /api/agents and
+GET /api/agents/{agent_id}. Extracting the metadata of an agent walks its
+tools and attributes, so the catalog extracts it once, serializes the
+responses to bytes and tags each of them with a strong ETag.
+
+The catalog is rebuilt when the set of agents changes: when the initialized
+agents are replaced, when their number changes, or when an agent is added to
+or removed from the agent registry. Building looks up every agent, which
+imports lazily discovered agents and builds their graphs, so it runs in a
+worker thread and never blocks the event loop. Requests that send a
+matching If-None-Match header get a 304 response without a body.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+# Configure logging
+logger = logging.getLogger("mosaic.agent_catalog")
+
+# Import the agent registry
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.agents.base import agent_registry
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.agents.base import agent_registry
+
+# Clients may reuse a cached response but must revalidate it with the ETag
+CACHE_CONTROL = "no-cache"
+
+
+def _serialize(content: Any) -> Tuple[bytes, str]:
+    """
+    Serialize a response body and compute its strong ETag.
+
+    Args:
+        content: The JSON-compatible content
+
+    Returns:
+        A tuple of (body, etag)
+    """
+    # Same encoding as FastAPI's JSONResponse
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+
+    Args:
+        if_none_match: The value of the If-None-Match header
+        etag: The current ETag
+
+    Returns:
+        True if the client's cached copy is current
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+class AgentCatalog:
+    """
+    Precomputed, serialized agent metadata.
+
+    The catalog holds the serialized agent list and the serialized metadata of
+    each agent, together with their ETags, until the set of agents changes.
+    """
+
+    def __init__(
+        self,
+        extract_metadata: Callable[[str, Any], Dict[str, Any]],
+        get_agents: Callable[[], Mapping[str, Any]]
+    ):
+        """
+        Initialize the agent catalog.
+
+        Args:
+            extract_metadata: Function that extracts the metadata of an agent
+                from its ID and agent object
+            get_agents: Function that returns the initialized agents
+        """
+        self.extract_metadata = extract_metadata
+        self.get_agents = get_agents
+
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[int, int, int]] = None
+        self._list: Optional[Tuple[bytes, str]] = None
+        self._agents: Dict[str, Tuple[bytes, str]] = {}
+
+        # Counters for reporting
+        self._builds = 0
+
+    def _current_key(self, agents: Mapping[str, Any]) -> Tuple[int, int, int]:
+        """Get the key that identifies the current set of agents."""
+        return (id(agents), len(agents), agent_registry.version)
+
+    def invalidate(self) -> None:
+        """Discard the catalog so it is rebuilt on the next request."""
+        with self._lock:
+            self._key = None
+
+    def _ensure_built(self) -> None:
+        """Rebuild the catalog if the set of agents changed."""
+        agents = self.get_agents()
+        if self._key == self._current_key(agents):
+            return
+
+        with self._lock:
+            if self._key == self._current_key(agents):
+                return
+
+            metadata_list = []
+            by_agent = {}
+
+            # Looking up lazily discovered agents registers them, which can
+            # change the registry version, so the key is taken afterwards
+            for agent_id in list(agents.keys()):
+                agent = agents.get(agent_id)
+                if agent is None:
+                    continue
+
+                try:
+                    metadata = self.extract_metadata(agent_id, agent)
+                except Exception as e:
+                    logger.error(f"Error extracting metadata for agent {agent_id}: {str(e)}")
+                    continue
+
+                metadata_list.append(metadata)
+                by_agent[agent_id] = _serialize(metadata)
+
+            self._list = _serialize(metadata_list)
+            self._agents = by_agent
+            self._key = self._current_key(agents)
+            self._builds += 1
+
+            logger.info(f"Built agent catalog with {len(by_agent)} agents")
+
+    async def _build_if_changed(self) -> None:
+        """Rebuild the catalog in a worker thread if the set of agents changed."""
+        if self._key != self._current_key(self.get_agents()):
+            await run_in_threadpool(self._ensure_built)
+
+    def _respond(self, request: Request, entry: Tuple[bytes, str]) -> Response:
+        """Build a 200 response, or a 304 response if the client's copy is current."""
+        body, etag = entry
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def list_response(self, request: Request) -> Response:
+        """
+        Get the response for the list of all agents.
+
+        Args:
+            request: The incoming request
+
+        Returns:
+            The serialized agent list, or a 304 response
+        """
+        await self._build_if_changed()
+        return self._respond(request, self._list)
+
+    async def agent_response(self, request: Request, agent_id: str) -> Optional[Response]:
+        """
+        Get the response for the metadata of one agent.
+
+        Args:
+            request: The incoming request
+            agent_id: The ID of the agent
+
+        Returns:
+            The serialized agent metadata, a 304 response, or None if the
+            agent does not exist
+        """
+        await self._build_if_changed()
+        entry = self._agents.get(agent_id)
+        if entry is None:
+            return None
+        return self._respond(request, entry)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get agent catalog statistics.
+
+        Returns:
+            A dictionary containing agent catalog statistics
+        """
+        return {
+            "agents": len(self._agents),
+            "builds": self._builds,
+            "etag": self._list[1] if self._list else None
+        }
@@ -4,14 +4,25 @@ Agent Discovery Module for MOSAIC
 This module provides functionality for dynamically discovering and registering agents.
 It scans the agents directory for Python files, extracts agent registration functions,
 and calls them automatically during startup.
+
+In lazy mode the agent modules are not imported at startup. Instead, a
+manifest of agent names, metadata and registration entry points is built from
+a static AST scan of the agent modules (cached and invalidated by file mtime
+and hash), and each agent module is imported and registered on first use.
 """
 
 import os
+import ast
+import json
+import hashlib
+import threading
 import importlib
+import importlib.util
 import inspect
 import logging
 import pkgutil
-from typing import Dict, List, Any, Callable, Optional, Type
+from collections.abc import MutableMapping
+from typing import Dict, List, Any, Callable, Iterator, Optional, Type
 import sys
 
 # Configure logging
@@ -479,3 +490,440 @@ def discover_and_register_agents(model) -> Dict[str, Any]:
     registered_agents.update(registered_supervisors)
     
     return registered_agents
+
+
+# Version of the cached manifest format
+MANIFEST_VERSION = 1
+
+
+def _literal(node: ast.AST) -> Any:
+    """Evaluate a literal AST node, returning None if it is not a literal."""
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def _has_model_parameter(function: ast.FunctionDef) -> bool:
+    """Check whether a function definition has a model parameter."""
+    arguments = function.args.posonlyargs + function.args.args + function.args.kwonlyargs
+    return any(argument.arg == "model" for argument in arguments)
+
+
+def _get_string_constants(node: ast.AST) -> List[str]:
+    """Get all string constants inside an AST node."""
+    return [
+        child.value for child in ast.walk(node)
+        if isinstance(child, ast.Constant) and isinstance(child.value, str)
+    ]
+
+
+def _scan_agent_class(node: ast.ClassDef) -> Dict[str, Any]:
+    """
+    Extract static metadata from an agent class definition.
+    
+    Args:
+        node: The class definition
+        
+    Returns:
+        A dictionary with the default name, description, icon, type and capabilities
+    """
+    info = {
+        "class": node.name,
+        "name": None,
+        "description": ast.get_docstring(node),
+        "icon": None,
+        "type": None,
+        "capabilities": None
+    }
+    
+    for item in node.body:
+        # Class-level attributes such as icon = "..."
+        if isinstance(item, ast.Assign):
+            for target in item.targets:
+                if isinstance(target, ast.Name) and target.id in ("icon", "type", "capabilities"):
+                    info[target.id] = _literal(item.value)
+        
+        # Default values of the __init__ parameters (name, icon)
+        if isinstance(item, ast.FunctionDef) and item.name == "__init__":
+            arguments = item.args.args[len(item.args.args) - len(item.args.defaults):]
+            for argument, default in zip(arguments, item.args.defaults):
+                if argument.arg in ("name", "icon"):
+                    value = _literal(default)
+                    if isinstance(value, str):
+                        info[argument.arg] = value
+    
+    return info
+
+
+def scan_agent_module(source: str) -> Dict[str, Any]:
+    """
+    Build the manifest entry of an agent module from its source, without executing it.
+    
+    Args:
+        source: The source code of the module
+        
+    Returns:
+        A dictionary with the module description, the agents registered by its
+        register_* functions and the supervisors created by its create_* functions
+    """
+    tree = ast.parse(source)
+    
+    classes = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            bases = [base.id if isinstance(base, ast.Name) else getattr(base, "attr", None) for base in node.bases]
+            if "BaseAgent" in bases:
+                classes[node.name] = _scan_agent_class(node)
+    
+    agents = []
+    supervisors = []
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef) or not _has_model_parameter(node):
+            continue
+        
+        if node.name.startswith("register_"):
+            # Find the class the function instantiates (or returns)
+            agent_class = None
+            if isinstance(node.returns, ast.Name) and node.returns.id in classes:
+                agent_class = classes[node.returns.id]
+            
+            name = None
+            for child in ast.walk(node):
+                if isinstance(child, ast.Call) and isinstance(child.func, ast.Name) and child.func.id in classes:
+                    agent_class = agent_class or classes[child.func.id]
+                    
+                    # An explicit name passed to the constructor wins
+                    for keyword in child.keywords:
+                        if keyword.arg == "name" and isinstance(_literal(keyword.value), str):
+                            name = _literal(keyword.value)
+            
+            if name is None and agent_class:
+                name = agent_class["name"]
+            if name is None:
+                name = node.name[len("register_"):]
+                if name.endswith("_agent"):
+                    name = name[:-len("_agent")]
+            
+            agents.append({
+                "name": name,
+                "function": node.name,
+                "class": agent_class["class"] if agent_class else None,
+                "description": (agent_class or {}).get("description"),
+                "icon": (agent_class or {}).get("icon"),
+                "type": (agent_class or {}).get("type"),
+                "capabilities": (agent_class or {}).get("capabilities")
+            })
+        
+        elif node.name.startswith("create_"):
+            supervisors.append({
+                "name": node.name.replace("create_", ""),
+                "function": node.name,
+                "description": ast.get_docstring(node),
+                # Agent names mentioned by the function are loaded before it runs
+                "references": sorted(set(_get_string_constants(node)))
+            })
+    
+    return {
+        "description": ast.get_docstring(tree),
+        "agents": agents,
+        "supervisors": supervisors
+    }
+
+
+class AgentManifest:
+    """
+    Lightweight index of the agents in the agents package.
+    
+    The manifest is built from a static scan of the agent modules and cached
+    on disk. A cached module entry is reused while the file's mtime and size
+    are unchanged, or when the file's SHA-256 hash still matches.
+    """
+    
+    def __init__(self, agents_package: str = "backend.agents", cache_path: Optional[str] = None):
+        """
+        Initialize the agent manifest.
+        
+        Args:
+            agents_package: The package path where agents are located
+            cache_path: Optional path of the cache file (defaults to the
+                agents package's __pycache__ directory)
+        """
+        self.agents_package = agents_package
+        
+        # Locate the package without importing it
+        spec = importlib.util.find_spec(agents_package)
+        self.agents_path = os.path.dirname(spec.origin) if spec and spec.origin else None
+        
+        if cache_path is None and self.agents_path:
+            cache_path = os.path.join(self.agents_path, "__pycache__", "agent_manifest.json")
+        self.cache_path = cache_path
+        
+        # Statistics of the last build
+        self.scanned = 0
+        self.reused = 0
+    
+    def _iter_module_files(self) -> Iterator[tuple]:
+        """
+        Iterate over the agent module files, in the same order as eager discovery.
+        
+        Yields:
+            Tuples of (module name, file path)
+        """
+        directories = [
+            (os.path.join(self.agents_path, "regular"), f"{self.agents_package}.regular", []),
+            (os.path.join(self.agents_path, "supervisors"), f"{self.agents_package}.supervisors", []),
+            (self.agents_path, self.agents_package, ["regular", "supervisors", "sandbox"])
+        ]
+        
+        for directory, package_prefix, skip_dirs in directories:
+            if not os.path.isdir(directory):
+                continue
+            
+            for _, name, is_pkg in pkgutil.iter_modules([directory]):
+                if name.startswith("__") or (is_pkg and name in skip_dirs) or name == "base":
+                    continue
+                
+                if is_pkg:
+                    path = os.path.join(directory, name, "__init__.py")
+                else:
+                    path = os.path.join(directory, f"{name}.py")
+                
+                if os.path.exists(path):
+                    yield f"{package_prefix}.{name}", path
+    
+    def _load_cache(self) -> Dict[str, Any]:
+        """Load the cached module entries, or an empty cache."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable agent manifest cache: {str(e)}")
+            return {}
+        
+        if cache.get("version") != MANIFEST_VERSION or cache.get("package") != self.agents_package:
+            return {}
+        
+        return cache.get("files", {})
+    
+    def _save_cache(self, files: Dict[str, Any]) -> None:
+        """Write the module entries to the cache file atomically."""
+        if not self.cache_path:
+            return
+        
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "package": self.agents_package, "files": files}, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write agent manifest cache: {str(e)}")
+    
+    def build(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Build the manifest, reusing cached entries for unchanged files.
+        
+        Returns:
+            A dictionary mapping agent and supervisor names to their entries
+        """
+        if not self.agents_path:
+            logger.error(f"Could not locate agents package: {self.agents_package}")
+            return {}
+        
+        cached_files = self._load_cache()
+        files = {}
+        self.scanned = 0
+        self.reused = 0
+        
+        for module_name, path in self._iter_module_files():
+            stat = os.stat(path)
+            cached = cached_files.get(path)
+            
+            if cached and cached["mtime"] == stat.st_mtime and cached["size"] == stat.st_size:
+                files[path] = cached
+                self.reused += 1
+                continue
+            
+            with open(path, "rb") as f:
+                content = f.read()
+            digest = hashlib.sha256(content).hexdigest()
+            
+            if cached and cached["sha256"] == digest:
+                # Touched but unchanged
+                files[path] = dict(cached, mtime=stat.st_mtime, size=stat.st_size)
+                self.reused += 1
+                continue
+            
+            try:
+                entry = scan_agent_module(content.decode("utf-8"))
+            except (SyntaxError, UnicodeDecodeError) as e:
+                logger.error(f"Error scanning module {module_name}: {str(e)}")
+                continue
+            
+            entry["module"] = module_name
+            files[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest, "entry": entry}
+            self.scanned += 1
+        
+        if files != cached_files:
+            self._save_cache(files)
+        
+        # Index the agents and supervisors by name
+        manifest: Dict[str, Dict[str, Any]] = {}
+        for cached in files.values():
+            entry = cached["entry"]
+            for agent in entry["agents"]:
+                manifest[agent["name"]] = dict(agent, kind="agent", module=entry["module"])
+        for cached in files.values():
+            entry = cached["entry"]
+            for supervisor in entry["supervisors"]:
+                # Keep only the references that name known agents
+                dependencies = [
+                    reference for reference in supervisor["references"]
+                    if manifest.get(reference, {}).get("kind") == "agent"
+                ]
+                manifest[supervisor["name"]] = dict(
+                    {key: value for key, value in supervisor.items() if key != "references"},
+                    kind="supervisor",
+                    module=entry["module"],
+                    dependencies=dependencies
+                )
+        
+        logger.info(f"Built agent manifest with {len(manifest)} entries ({self.scanned} modules scanned, {self.reused} cached)")
+        return manifest
+
+
+class LazyAgentMap(MutableMapping):
+    """
+    Mapping of agent names to agents that registers each agent on first use.
+    
+    Iterating over the names (keys, len, in) uses only the manifest. Looking
+    up an agent imports its module and calls its registration function;
+    supervisors first load the agents they depend on. Agents that fail to
+    register are left out, as in eager discovery.
+    """
+    
+    def __init__(self, manifest: Dict[str, Dict[str, Any]], model):
+        """
+        Initialize the lazy agent map.
+        
+        Args:
+            manifest: The agent manifest, as built by AgentManifest
+            model: The language model to pass to the registration functions
+        """
+        self.manifest = manifest
+        self.model = model
+        self._loaded: Dict[str, Any] = {}
+        self._failed: set = set()
+        
+        # One lock per agent, so different agents can be loaded concurrently
+        self._lock = threading.Lock()
+        self._agent_locks: Dict[str, threading.RLock] = {}
+    
+    def _import_module(self, module_name: str):
+        """Import an agent module, preferring the full package path."""
+        try:
+            # Try importing with the full package path (for local development)
+            return importlib.import_module(f"mosaic.{module_name}")
+        except ImportError:
+            # Fall back to the path as given (for Docker environment)
+            return importlib.import_module(module_name)
+    
+    def _load(self, name: str) -> Any:
+        """
+        Import and register an agent or supervisor.
+        
+        Args:
+            name: The name of the agent or supervisor
+            
+        Returns:
+            The agent or supervisor instance
+            
+        Raises:
+            KeyError: If the agent could not be registered
+        """
+        with self._lock:
+            agent_lock = self._agent_locks.setdefault(name, threading.RLock())
+        
+        with agent_lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            if name in self._failed:
+                raise KeyError(name)
+            
+            entry = self.manifest[name]
+            
+            # Supervisors need the agents they reference to be registered first
+            for dependency in entry.get("dependencies", []):
+                self.get(dependency)
+            
+            try:
+                # Reuse an agent that something else already registered
+                agent = agent_registry.get(name) if entry["kind"] == "agent" else None
+                
+                if agent is None:
+                    logger.info(f"Loading {entry['kind']} {name} from {entry['module']}")
+                    module = self._import_module(entry["module"])
+                    agent = getattr(module, entry["function"])(self.model)
+            except Exception as e:
+                logger.error(f"Error registering {entry['kind']} {name} with function {entry['function']}: {str(e)}")
+                agent = None
+            
+            if agent is None:
+                self._failed.add(name)
+                raise KeyError(name)
+            
+            self._loaded[name] = agent
+            return agent
+    
+    def is_loaded(self, name: str) -> bool:
+        """Check whether an agent has been registered already."""
+        return name in self._loaded
+    
+    def __getitem__(self, name: str) -> Any:
+        if name in self._loaded:
+            return self._loaded[name]
+        if name not in self.manifest:
+            raise KeyError(name)
+        return self._load(name)
+    
+    def __setitem__(self, name: str, agent: Any) -> None:
+        with self._lock:
+            self._loaded[name] = agent
+            self._failed.discard(name)
+    
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            if name not in self:
+                raise KeyError(name)
+            self._loaded.pop(name, None)
+            self.manifest.pop(name, None)
+    
+    def __contains__(self, name: object) -> bool:
+        return name in self._loaded or (name in self.manifest and name not in self._failed)
+    
+    def __iter__(self) -> Iterator[str]:
+        names = [name for name in self.manifest if name not in self._failed]
+        names += [name for name in self._loaded if name not in self.manifest]
+        return iter(names)
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def discover_agents_lazily(model, agents_package: str = "backend.agents") -> LazyAgentMap:
+    """
+    Build the agent manifest and return a map that registers agents on first use.
+    
+    Args:
+        model: The language model to use for the agents and supervisors
+        agents_package: The package path where agents are located
+        
+    Returns:
+        A lazy mapping of agent and supervisor names to their instances
+    """
+    manifest = AgentManifest(agents_package).build()
+    return LazyAgentMap(manifest, model)
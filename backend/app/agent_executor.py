@@ -0,0 +1,410 @@
+"""
+Agent Executor Module for MOSAIC
+
+This module provides the agent execution subsystem for the API server.
+Agent invocations are synchronous LangGraph runs that can take a long time,
+so they are dispatched to a bounded worker pool instead of running on the
+event loop. The executor enforces a global concurrency limit (the size of the
+worker pool) and per-agent concurrency limits, and it records queued/started/
+finished timing for every job so queue depth can be reported.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Configure logging
+logger = logging.getLogger("mosaic.agent_executor")
+
+# Import the settings from the config
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+
+
+class AgentExecutorFullError(Exception):
+    """Raised when an agent job is rejected because the executor queue is full."""
+
+
+def parse_agent_limits(limits: str) -> Dict[str, int]:
+    """
+    Parse per-agent concurrency limits from a settings string.
+
+    Args:
+        limits: A comma-separated list of agent_id=limit pairs
+            (e.g. "research_supervisor=2,calculator=8")
+
+    Returns:
+        A dictionary mapping agent IDs to their concurrency limits
+    """
+    parsed = {}
+
+    for item in (limits or "").split(","):
+        if "=" not in item:
+            continue
+
+        agent_id, limit = item.split("=", 1)
+        try:
+            parsed[agent_id.strip()] = max(1, int(limit.strip()))
+        except ValueError:
+            logger.warning(f"Ignoring invalid agent concurrency limit: {item}")
+
+    return parsed
+
+
+class AgentExecutor:
+    """
+    Bounded executor for agent invocations.
+
+    Jobs wait on a per-agent semaphore on the event loop and then run in a
+    shared thread pool whose size is the global concurrency limit. A job is
+    "queued" from submission until its callable starts running in a worker
+    thread, so queue depth covers both per-agent and global waiting.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_agent_limit: int = 4,
+        agent_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = 0,
+        history_size: int = 100
+    ):
+        """
+        Initialize the agent executor.
+
+        Args:
+            max_workers: The global concurrency limit (worker pool size)
+            per_agent_limit: The default concurrency limit for each agent
+            agent_limits: Optional per-agent overrides of the concurrency limit
+            max_queue: The maximum number of queued jobs (0 for unbounded)
+            history_size: The number of finished jobs to keep for reporting
+        """
+        self.max_workers = max(1, max_workers)
+        self.per_agent_limit = max(1, per_agent_limit)
+        self.agent_limits = agent_limits or {}
+        self.max_queue = max_queue
+
+        # The worker pool is created lazily so importing this module is cheap
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        # Per-agent semaphores, bound to the event loop that created them
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Track active (queued or running) jobs by job ID
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+        # Keep a bounded history of finished jobs
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+
+        # Job bookkeeping is touched from worker threads
+        self._lock = threading.Lock()
+
+        # Optional pool of agent worker processes; when set, agent runs are
+        # sent to the pool instead of the in-process thread pool
+        self.worker_pool = None
+
+        logger.info(f"Initialized agent executor with {self.max_workers} workers and per-agent limit {self.per_agent_limit}")
+
+    def get_agent_limit(self, agent_id: str) -> int:
+        """
+        Get the concurrency limit for an agent.
+
+        Args:
+            agent_id: The ID of the agent
+
+        Returns:
+            The maximum number of concurrent jobs for the agent
+        """
+        return self.agent_limits.get(agent_id, self.per_agent_limit)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Get the worker pool, creating it if needed."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mosaic-agent")
+        return self._pool
+
+    def _get_semaphore(self, agent_id: str) -> asyncio.Semaphore:
+        """
+        Get the semaphore that enforces the per-agent limit.
+
+        Semaphores are recreated if the executor is used from a different event
+        loop (for example when tests call asyncio.run repeatedly).
+
+        Args:
+            agent_id: The ID of the agent
+
+        Returns:
+            The semaphore for the agent
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphores = {}
+            self._semaphore_loop = loop
+
+        if agent_id not in self._semaphores:
+            self._semaphores[agent_id] = asyncio.Semaphore(self.get_agent_limit(agent_id))
+
+        return self._semaphores[agent_id]
+
+    def _create_job(self, agent_id: str) -> Dict[str, Any]:
+        """
+        Create and register a queued job.
+
+        Args:
+            agent_id: The ID of the agent
+
+        Returns:
+            The job record
+
+        Raises:
+            AgentExecutorFullError: If the queue is full
+        """
+        with self._lock:
+            if self.max_queue and self._count_jobs("queued") >= self.max_queue:
+                raise AgentExecutorFullError(f"Agent executor queue is full ({self.max_queue} jobs waiting)")
+
+            job = {
+                "job_id": str(uuid.uuid4()),
+                "agent_id": agent_id,
+                "status": "queued",
+                "queued_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None
+            }
+            self._jobs[job["job_id"]] = job
+
+            return job
+
+    def _mark_started(self, job: Dict[str, Any]) -> None:
+        """Mark a job as running."""
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = time.time()
+
+    def _mark_finished(self, job: Dict[str, Any], error: Optional[BaseException] = None) -> None:
+        """Mark a job as finished and move it to the history."""
+        with self._lock:
+            job["finished_at"] = time.time()
+            job["status"] = "error" if error else "completed"
+            if error:
+                job["error"] = str(error)
+
+            # Compute the timing breakdown
+            started_at = job["started_at"] or job["finished_at"]
+            job["queue_time"] = started_at - job["queued_at"]
+            job["run_time"] = job["finished_at"] - started_at
+
+            self._jobs.pop(job["job_id"], None)
+            self._history.append(job)
+
+        logger.info(f"Agent job {job['job_id']} for {job['agent_id']} {job['status']} (queued {job['queue_time']:.3f}s, ran {job['run_time']:.3f}s)")
+
+    def _count_jobs(self, status: str, agent_id: Optional[str] = None) -> int:
+        """Count active jobs with the given status (caller holds the lock)."""
+        return sum(
+            1 for job in self._jobs.values()
+            if job["status"] == status and (agent_id is None or job["agent_id"] == agent_id)
+        )
+
+    async def run(self, agent_id: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable for an agent in the worker pool.
+
+        The callable runs with a copy of the caller's context variables, so
+        request-scoped state follows the job into the worker thread.
+        
+        If the caller is cancelled (a client disconnect or a timeout) while
+        the callable is running, the worker thread keeps running it; the
+        agent's slot is held and the job stays running until it returns.
+
+        Args:
+            agent_id: The ID of the agent the job belongs to
+            func: The blocking callable to run
+            *args: Positional arguments for the callable
+            **kwargs: Keyword arguments for the callable
+
+        Returns:
+            The return value of the callable
+
+        Raises:
+            AgentExecutorFullError: If the queue is full
+        """
+        job = self._create_job(agent_id)
+        semaphore = self._get_semaphore(agent_id)
+
+        try:
+            await semaphore.acquire()
+        except BaseException as e:
+            self._mark_finished(job, e)
+            raise
+
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+
+        def _run_job():
+            self._mark_started(job)
+            return context.run(func, *args, **kwargs)
+
+        def _job_done(future):
+            # Runs when the callable returns (in the worker thread), or when
+            # the job is cancelled before it started
+            error = asyncio.CancelledError() if future.cancelled() else future.exception()
+            self._mark_finished(job, error)
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # The event loop is closed, and the semaphore with it
+                pass
+
+        try:
+            future = self._get_pool().submit(_run_job)
+        except BaseException as e:
+            semaphore.release()
+            self._mark_finished(job, e)
+            raise
+
+        future.add_done_callback(_job_done)
+
+        # Cancelling the wait only cancels the job if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    async def invoke(self, agent_id: str, agent: Any, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Invoke an agent with the given state in the worker pool.
+
+        If an agent worker process pool is attached, the run happens in one of
+        its processes while holding a slot for the agent.
+
+        Args:
+            agent_id: The ID of the agent
+            agent: The agent object (a BaseAgent or a compiled supervisor graph)
+            state: The conversation state to pass to the agent
+
+        Returns:
+            The updated state returned by the agent
+        """
+        if self.worker_pool is not None:
+            async with self.slot(agent_id):
+                return await self.worker_pool.invoke(agent_id, state)
+
+        return await self.run(agent_id, agent.invoke, state)
+
+    @asynccontextmanager
+    async def slot(self, agent_id: str):
+        """
+        Hold a concurrency slot for an agent without using the worker pool.
+
+        This is used for work that runs natively on the event loop (such as
+        async streaming) but should still count against the agent's limit
+        and show up in the executor statistics.
+
+        Args:
+            agent_id: The ID of the agent
+
+        Yields:
+            The job record
+        """
+        job = self._create_job(agent_id)
+        semaphore = self._get_semaphore(agent_id)
+        error = None
+
+        try:
+            async with semaphore:
+                self._mark_started(job)
+                yield job
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._mark_finished(job, error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get executor statistics, including queue depth per agent.
+
+        Returns:
+            A dictionary containing executor statistics
+        """
+        with self._lock:
+            agents: Dict[str, Dict[str, Any]] = {}
+            for job in self._jobs.values():
+                agent_stats = agents.setdefault(job["agent_id"], {
+                    "queued": 0,
+                    "running": 0,
+                    "limit": self.get_agent_limit(job["agent_id"])
+                })
+                agent_stats[job["status"]] += 1
+
+            history = list(self._history)
+            queued = self._count_jobs("queued")
+            running = self._count_jobs("running")
+
+        # Summarize the timing of recently finished jobs
+        recent = {}
+        if history:
+            recent = {
+                "count": len(history),
+                "avg_queue_time": sum(job["queue_time"] for job in history) / len(history),
+                "max_queue_time": max(job["queue_time"] for job in history),
+                "avg_run_time": sum(job["run_time"] for job in history) / len(history),
+                "max_run_time": max(job["run_time"] for job in history)
+            }
+
+        return {
+            "worker_pool": self.worker_pool.get_stats() if self.worker_pool is not None else None,
+            "max_workers": self.max_workers,
+            "per_agent_limit": self.per_agent_limit,
+            "max_queue": self.max_queue,
+            "queued": queued,
+            "running": running,
+            "agents": agents,
+            "recent": recent
+        }
+
+    def get_recent_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the most recently finished jobs.
+
+        Args:
+            limit: The maximum number of jobs to return
+
+        Returns:
+            A list of job records, newest first
+        """
+        with self._lock:
+            return list(reversed(self._history))[:limit]
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Shut down the worker pool.
+
+        Args:
+            wait: Whether to wait for running jobs to finish
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+        logger.info("Shut down agent executor")
+
+
+# Create a global agent executor
+agent_executor = AgentExecutor(
+    max_workers=settings.AGENT_EXECUTOR_MAX_WORKERS,
+    per_agent_limit=settings.AGENT_EXECUTOR_PER_AGENT_LIMIT,
+    agent_limits=parse_agent_limits(settings.AGENT_EXECUTOR_AGENT_LIMITS),
+    max_queue=settings.AGENT_EXECUTOR_MAX_QUEUE
+)
@@ -3,6 +3,9 @@ Agent Runner Module for MOSAIC
 
 This module runs the agent system in a separate process from the main API server.
 It initializes the agents and makes them available to the API server.
+
+initialize_agents is also the entry point each agent worker process calls to
+discover its agents when AGENT_WORKER_PROCESSES is set (see agent_worker_pool).
 """
 
 import os
@@ -24,10 +27,12 @@ logger = logging.getLogger("mosaic.agent_runner")
 # Import the agent discovery module
 try:
     # Try importing with the full package path (for local development)
-    from mosaic.backend.app.agent_discovery import discover_and_register_agents
+    from mosaic.backend.app.agent_discovery import discover_and_register_agents, discover_agents_lazily
+    from mosaic.backend.app.config import settings
 except ImportError:
     # Fall back to relative import (for Docker environment)
-    from backend.app.agent_discovery import discover_and_register_agents
+    from backend.app.agent_discovery import discover_and_register_agents, discover_agents_lazily
+    from backend.app.config import settings
 
 # No need to import specific agents anymore, they will be discovered automatically
 
@@ -59,10 +64,19 @@ def initialize_agents():
     # Create a structured output version of the model for the weather agent only
     logger.info("Creating structured output model for weather agent")
     
-    # Discover and register all agents and supervisors
-    logger.info("Discovering and registering agents and supervisors")
-    discovered_agents = discover_and_register_agents(model)
-    initialized_agents.update(discovered_agents)
+    start_time = time.perf_counter()
+    
+    if settings.AGENT_DISCOVERY_MODE == "lazy":
+        # Index the agents now and import each one on first use
+        logger.info("Discovering agents from the agent manifest")
+        initialized_agents = discover_agents_lazily(model)
+    else:
+        # Discover and register all agents and supervisors
+        logger.info("Discovering and registering agents and supervisors")
+        discovered_agents = discover_and_register_agents(model)
+        initialized_agents.update(discovered_agents)
+    
+    logger.info(f"Discovered {len(initialized_agents)} agents in {time.perf_counter() - start_time:.2f}s ({settings.AGENT_DISCOVERY_MODE} mode)")
     
     logger.debug(f"Initialized {len(initialized_agents)} agents: {', '.join(initialized_agents.keys())}")
     
@@ -0,0 +1,249 @@
+"""
+Agent Streaming Module for MOSAIC
+
+This module streams agent runs to clients as they happen. It consumes
+LangGraph's astream_events API (available on BaseAgent and on compiled
+supervisor graphs) and translates the raw run events into WebSocket frames:
+
+- stream_start: the agent has started working on the response
+- token: an incremental token delta from the agent that is currently speaking
+- tool_start / tool_end: a tool call started or finished
+- message: the final commit frame, carrying the persisted assistant message
+
+Every frame carries the messageId of the assistant message, so clients can
+build the response incrementally and replace it with the committed message.
+"""
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Configure logging
+logger = logging.getLogger("mosaic.agent_streaming")
+
+# Import the agent executor
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.agent_executor import agent_executor
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.agent_executor import agent_executor
+
+# Maximum length of tool inputs/outputs included in tool frames
+MAX_TOOL_PAYLOAD_LENGTH = 2000
+
+
+def get_event_speaker(event: Dict[str, Any], default: str) -> str:
+    """
+    Determine which agent produced a run event.
+
+    Supervisors run their sub-agents as nested subgraphs, so events from a
+    sub-agent carry a checkpoint namespace such as "web_search:<id>|agent:<id>".
+    The first segment of a nested namespace names the sub-agent that is speaking.
+
+    Args:
+        event: The LangGraph run event
+        default: The agent ID to use for top-level events
+
+    Returns:
+        The name of the agent that produced the event
+    """
+    metadata = event.get("metadata") or {}
+
+    # Prefer the explicit agent name if LangGraph provides it
+    if metadata.get("lc_agent_name"):
+        return metadata["lc_agent_name"]
+
+    # Events from nested subgraphs carry the sub-agent in their namespace
+    namespace = metadata.get("langgraph_checkpoint_ns") or ""
+    if "|" in namespace:
+        return namespace.split("|")[0].split(":")[0]
+
+    return default
+
+
+def get_chunk_text(chunk: Any) -> str:
+    """
+    Extract the text delta from a streamed chat model chunk.
+
+    Args:
+        chunk: The message chunk from an on_chat_model_stream event
+
+    Returns:
+        The text content of the chunk (empty for tool-call chunks)
+    """
+    content = getattr(chunk, "content", chunk)
+
+    if isinstance(content, str):
+        return content
+
+    # Content blocks (e.g. [{"type": "text", "text": "..."}])
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+
+    return ""
+
+
+def _truncate_payload(payload: Any) -> str:
+    """Convert a tool input/output to a bounded string for a tool frame."""
+    # Tool outputs are usually ToolMessages
+    payload = getattr(payload, "content", payload)
+    text = payload if isinstance(payload, str) else str(payload)
+
+    if len(text) > MAX_TOOL_PAYLOAD_LENGTH:
+        text = text[:MAX_TOOL_PAYLOAD_LENGTH] + "..."
+
+    return text
+
+
+def extract_agent_response(messages: List[Any]) -> str:
+    """
+    Extract the final agent response from the messages of a run result.
+
+    Args:
+        messages: The messages from the final agent state
+
+    Returns:
+        The content of the last AI/assistant message
+    """
+    for message_item in reversed(messages):
+        # Check if the message is a dictionary
+        if isinstance(message_item, dict):
+            if message_item.get("role") == "assistant":
+                return message_item.get("content", "")
+        # Check if it's a LangChain message object
+        elif hasattr(message_item, "content"):
+            msg_type = getattr(message_item, "type", None)
+            msg_role = getattr(message_item, "role", None)
+
+            if msg_type in ("ai", "assistant") or msg_role in ("ai", "assistant"):
+                return message_item.content
+
+    return "No response from agent"
+
+
+def event_to_frame(event: Dict[str, Any], agent_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Translate a LangGraph run event into a stream frame.
+
+    The frame does not carry a messageId yet; the caller adds it.
+
+    Args:
+        event: The LangGraph run event
+        agent_id: The ID of the agent being run
+
+    Returns:
+        The frame, or None if the event is not sent to clients
+    """
+    kind = event.get("event")
+
+    if kind == "on_chat_model_stream":
+        delta = get_chunk_text(event.get("data", {}).get("chunk"))
+        if not delta:
+            return None
+
+        return {
+            "type": "token",
+            "agent": get_event_speaker(event, agent_id),
+            "delta": delta
+        }
+
+    if kind in ("on_tool_start", "on_tool_end"):
+        payload_key = "input" if kind == "on_tool_start" else "output"
+        return {
+            "type": "tool_start" if kind == "on_tool_start" else "tool_end",
+            "agent": get_event_speaker(event, agent_id),
+            "tool": event.get("name"),
+            "runId": event.get("run_id"),
+            payload_key: _truncate_payload(event.get("data", {}).get(payload_key))
+        }
+
+    return None
+
+
+def get_run_output(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Get the final state from the event that ends the root run.
+
+    Args:
+        event: The LangGraph run event
+
+    Returns:
+        The final state, or None if the event does not end the root run
+    """
+    if event.get("event") == "on_chain_end" and not event.get("parent_ids"):
+        output = event.get("data", {}).get("output")
+        if isinstance(output, dict):
+            return output
+
+    return None
+
+
+async def stream_agent_run(
+    agent_id: str,
+    agent: Any,
+    state: Dict[str, Any],
+    message_id: str,
+    send: Callable[[Dict[str, Any]], Awaitable[None]]
+) -> Dict[str, Any]:
+    """
+    Run an agent with streaming and push incremental frames to the client.
+
+    The run holds a slot in the agent executor, so it counts against the same
+    per-agent and global concurrency limits as non-streaming invocations.
+    The caller is responsible for persisting the final message and sending
+    the commit frame.
+
+    Args:
+        agent_id: The ID of the agent
+        agent: The agent object (a BaseAgent or a compiled supervisor graph)
+        state: The conversation state to pass to the agent
+        message_id: The ID of the assistant message being generated
+        send: Coroutine used to send a frame to the client
+
+    Returns:
+        The final state of the run
+    """
+    result: Dict[str, Any] = {}
+    first_token_at: Optional[float] = None
+
+    async with agent_executor.slot(agent_id):
+        started_at = time.monotonic()
+
+        await send({
+            "type": "stream_start",
+            "messageId": message_id,
+            "agent": agent_id
+        })
+
+        async def send_frame(frame: Dict[str, Any]) -> None:
+            nonlocal first_token_at
+            if frame["type"] == "token" and first_token_at is None:
+                first_token_at = time.monotonic()
+                logger.info(f"First token from {agent_id} after {first_token_at - started_at:.3f}s")
+
+            await send({**frame, "messageId": message_id})
+
+        if agent_executor.worker_pool is not None:
+            # The run happens in a worker process, which forwards the frames
+            result = await agent_executor.worker_pool.stream(agent_id, state, send_frame)
+        else:
+            async for event in agent.astream_events(state, version="v2"):
+                frame = event_to_frame(event, agent_id)
+                if frame:
+                    await send_frame(frame)
+
+                # The root run has finished; its output is the final state
+                output = get_run_output(event)
+                if output is not None:
+                    result = output
+
+        logger.info(f"Streamed {agent_id} run in {time.monotonic() - started_at:.3f}s")
+
+    return result
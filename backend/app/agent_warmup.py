@@ -0,0 +1,183 @@
+"""
+Agent Warm-up Module for MOSAIC
+
+This module prepares the agents before they take traffic. After startup a
+background thread loads every agent (importing its module when discovery is
+lazy) and compiles its LangGraph graph, several agents at a time, so the first
+user of an agent does not pay for module imports, client initialization and
+graph compilation.
+
+The warm-up records how long each agent took and whether it is ready. The
+/api/health/ready endpoint reports this status so a load balancer can keep
+traffic away from instances that are still cold.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional
+
+# Configure logging
+logger = logging.getLogger("mosaic.agent_warmup")
+
+# Import the base agent and the settings
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.agents.base import BaseAgent
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.agents.base import BaseAgent
+    from backend.app.config import settings
+
+
+class AgentWarmup:
+    """
+    Loads and compiles agents concurrently and tracks their readiness.
+
+    Each agent moves from "pending" to "warming" to "ready", or to "failed"
+    if it could not be loaded or compiled.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        """
+        Initialize the agent warm-up.
+
+        Args:
+            max_concurrency: The maximum number of agents warmed up at once
+        """
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def _set_status(self, name: str, **values: Any) -> None:
+        """Update the warm-up status of an agent."""
+        with self._lock:
+            self._agents.setdefault(name, {}).update(values)
+
+    def warm_agent(self, agents: Mapping[str, Any], name: str) -> bool:
+        """
+        Load an agent and compile its graph.
+
+        Args:
+            agents: The mapping of agent names to agents
+            name: The name of the agent
+
+        Returns:
+            True if the agent is ready, False otherwise
+        """
+        self._set_status(name, status="warming")
+        start_time = time.perf_counter()
+
+        try:
+            # Looking the agent up imports and registers it if it is lazy
+            agent = agents.get(name)
+            if agent is None:
+                raise RuntimeError("Agent could not be loaded")
+
+            # Supervisors are compiled when they are created; regular agents
+            # compile their react graph on the first create call
+            if isinstance(agent, BaseAgent):
+                agent.create()
+        except Exception as e:
+            seconds = time.perf_counter() - start_time
+            self._set_status(name, status="failed", seconds=round(seconds, 3), error=str(e))
+            logger.error(f"Error warming up agent {name}: {str(e)}")
+            return False
+
+        seconds = time.perf_counter() - start_time
+        self._set_status(name, status="ready", seconds=round(seconds, 3), error=None)
+        logger.info(f"Warmed up agent {name} in {seconds:.2f}s")
+        return True
+
+    def run(self, agents: Mapping[str, Any], names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Warm up agents and block until all of them are done.
+
+        Args:
+            agents: The mapping of agent names to agents
+            names: Optional names of the agents to warm up (defaults to all)
+
+        Returns:
+            The warm-up status
+        """
+        names = list(agents.keys()) if names is None else names
+
+        with self._lock:
+            self._started_at = time.time()
+            self._finished_at = None
+            for name in names:
+                self._agents[name] = {"status": "pending", "seconds": None, "error": None}
+
+        logger.info(f"Warming up {len(names)} agents with concurrency {self.max_concurrency}")
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="mosaic-agent-warmup") as pool:
+            list(pool.map(lambda name: self.warm_agent(agents, name), names))
+
+        with self._lock:
+            self._finished_at = time.time()
+            duration = self._finished_at - self._started_at
+
+        logger.info(f"Agent warm-up finished in {duration:.2f}s")
+        return self.get_status()
+
+    def start(self, agents: Mapping[str, Any], names: Optional[List[str]] = None) -> threading.Thread:
+        """
+        Warm up agents in a background thread.
+
+        Args:
+            agents: The mapping of agent names to agents
+            names: Optional names of the agents to warm up (defaults to all)
+
+        Returns:
+            The background thread
+        """
+        # Mark the warm-up as started before returning, so readiness checks
+        # made right after startup report not ready
+        with self._lock:
+            self._started_at = time.time()
+            self._finished_at = None
+
+        self._thread = threading.Thread(
+            target=self.run,
+            args=(agents, names),
+            name="mosaic-agent-warmup",
+            daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def is_ready(self) -> bool:
+        """Check whether the warm-up has finished."""
+        with self._lock:
+            return self._finished_at is not None
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the warm-up status.
+
+        Returns:
+            A dictionary with the overall readiness, the warm-up duration and
+            the status and warm-up time of each agent
+        """
+        with self._lock:
+            finished = self._finished_at is not None
+            duration = None
+            if self._started_at is not None:
+                duration = round((self._finished_at or time.time()) - self._started_at, 3)
+
+            return {
+                "ready": finished,
+                "started": self._started_at is not None,
+                "seconds": duration,
+                "agents": {name: dict(status) for name, status in self._agents.items()}
+            }
+
+
+# Create a global agent warm-up
+agent_warmup = AgentWarmup(max_concurrency=settings.AGENT_WARMUP_CONCURRENCY)
@@ -0,0 +1,733 @@
+"""
+Agent Worker Pool Module for MOSAIC
+
+This module runs agents in a pool of separate worker processes, so CPU-heavy
+agent work (pandas in file processing, indicators in financial analysis)
+does not compete with the API server's event loop for the GIL and agent
+throughput scales with the number of cores.
+
+Every worker process discovers and registers the agents on its own and then
+serves jobs one at a time. The API process talks to the workers over
+multiprocessing queues:
+
+- API -> worker (one job queue per worker): job requests, or None to stop
+- worker -> API (one shared result queue): ready, heartbeat, log, event,
+  result and error messages, each tagged with the worker and job IDs
+
+A dispatcher thread in the API process assigns queued jobs to idle workers,
+resolves job results on the event loop that submitted them, forwards worker
+logs to the log pipeline, and replaces workers that crash, stop sending
+heartbeats, or have served their maximum number of jobs.
+"""
+
+import asyncio
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+# Configure logging
+logger = logging.getLogger("mosaic.agent_worker_pool")
+
+# The function each worker calls to discover and register its agents
+DEFAULT_AGENT_FACTORY = "backend.app.agent_runner:initialize_agents"
+
+
+class AgentWorkerError(Exception):
+    """Raised when an agent job fails in (or is lost with) a worker process."""
+
+
+def serialize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an agent state into a form that can be sent between processes.
+
+    LangChain message objects are converted to dictionaries; plain
+    role/content dictionaries are passed through as they are.
+
+    Args:
+        state: The agent state
+
+    Returns:
+        The serialized state
+    """
+    serialized = dict(state)
+
+    messages = []
+    for message in state.get("messages", []):
+        if isinstance(message, BaseMessage):
+            messages.append({"lc_message": messages_to_dict([message])[0]})
+        else:
+            messages.append({"raw_message": message})
+    serialized["messages"] = messages
+
+    return serialized
+
+
+def deserialize_state(serialized: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Restore an agent state converted with serialize_state.
+
+    Args:
+        serialized: The serialized state
+
+    Returns:
+        The agent state
+    """
+    state = dict(serialized)
+
+    messages = []
+    for message in serialized.get("messages", []):
+        if "lc_message" in message:
+            messages.append(messages_from_dict([message["lc_message"]])[0])
+        else:
+            messages.append(message["raw_message"])
+    state["messages"] = messages
+
+    return state
+
+
+def _import_callable(path: str) -> Callable:
+    """
+    Import a callable from a "module:attribute" path.
+
+    Args:
+        path: The import path of the callable
+
+    Returns:
+        The callable
+    """
+    module_name, attribute = path.split(":", 1)
+
+    try:
+        # Try importing with the full package path (for local development)
+        module = importlib.import_module(f"mosaic.{module_name}")
+    except ImportError:
+        # Fall back to the path as given (for Docker environment)
+        module = importlib.import_module(module_name)
+
+    return getattr(module, attribute)
+
+
+class _WorkerLogForwarder(logging.Handler):
+    """Log handler that forwards agent logs of the current job to the API process."""
+
+    def __init__(self, result_queue, worker_id: int):
+        super().__init__(logging.INFO)
+        self.result_queue = result_queue
+        self.worker_id = worker_id
+        self.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', '%H:%M:%S'))
+
+        # Workers run one job at a time, so the job ID is shared by all threads
+        self.job_id: Optional[str] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        job_id = self.job_id
+        if job_id is None:
+            return
+
+        try:
+            self.result_queue.put({
+                "type": "log",
+                "worker_id": self.worker_id,
+                "job_id": job_id,
+                "entry": self.format(record)
+            })
+        except Exception:
+            self.handleError(record)
+
+
+async def _stream_job(agent_id: str, agent: Any, state: Dict[str, Any], job_id: str, worker_id: int, result_queue) -> Dict[str, Any]:
+    """
+    Run an agent with streaming in a worker and forward the stream frames.
+
+    Args:
+        agent_id: The ID of the agent
+        agent: The agent object
+        state: The agent state
+        job_id: The ID of the job
+        worker_id: The ID of the worker
+        result_queue: The queue to send messages to the API process
+
+    Returns:
+        The final state of the run
+    """
+    # Import here so the API process does not need the streaming module to start workers
+    try:
+        # Try importing with the full package path (for local development)
+        from mosaic.backend.app.agent_streaming import event_to_frame, get_run_output
+    except ImportError:
+        # Fall back to relative import (for Docker environment)
+        from backend.app.agent_streaming import event_to_frame, get_run_output
+
+    result: Dict[str, Any] = {}
+
+    async for event in agent.astream_events(state, version="v2"):
+        frame = event_to_frame(event, agent_id)
+        if frame:
+            result_queue.put({"type": "event", "worker_id": worker_id, "job_id": job_id, "frame": frame})
+
+        output = get_run_output(event)
+        if output is not None:
+            result = output
+
+    return result
+
+
+def worker_main(
+    worker_id: int,
+    agent_factory: str,
+    job_queue,
+    result_queue,
+    heartbeat_interval: float,
+    warm_up: bool = False
+) -> None:
+    """
+    Main function of an agent worker process.
+
+    Args:
+        worker_id: The ID of the worker
+        agent_factory: Import path of the function that returns the agents
+        job_queue: The queue the worker receives jobs from
+        result_queue: The queue the worker sends messages to
+        heartbeat_interval: Seconds between heartbeats
+        warm_up: Whether to load and compile every agent before reporting ready
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%H:%M:%S",
+    )
+    worker_logger = logging.getLogger(f"mosaic.agent_worker.{worker_id}")
+
+    # Send heartbeats from a separate thread, so they keep flowing while
+    # agents are being initialized or a long job is running
+    stop_event = threading.Event()
+
+    def send_heartbeats():
+        while not stop_event.wait(heartbeat_interval):
+            result_queue.put({"type": "heartbeat", "worker_id": worker_id, "time": time.time()})
+
+    threading.Thread(target=send_heartbeats, name="mosaic-worker-heartbeat", daemon=True).start()
+
+    # Forward the agent logs of the current job to the API process
+    forwarder = _WorkerLogForwarder(result_queue, worker_id)
+    logging.getLogger("mosaic.agents").addHandler(forwarder)
+
+    try:
+        agents = _import_callable(agent_factory)() or {}
+    except Exception as e:
+        worker_logger.error(f"Error initializing agents: {str(e)}")
+        agents = {}
+
+    # Warm the agents up before taking jobs, so a new or recycled worker
+    # never serves a cold agent
+    warmup_status = None
+    if warm_up:
+        try:
+            # Try importing with the full package path (for local development)
+            from mosaic.backend.app.agent_warmup import agent_warmup
+        except ImportError:
+            # Fall back to relative import (for Docker environment)
+            from backend.app.agent_warmup import agent_warmup
+
+        warmup_status = agent_warmup.run(agents)
+
+    result_queue.put({
+        "type": "ready",
+        "worker_id": worker_id,
+        "pid": os.getpid(),
+        "agents": sorted(agents.keys()),
+        "warmup": warmup_status
+    })
+    worker_logger.info(f"Agent worker {worker_id} ready with {len(agents)} agents")
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+
+        forwarder.job_id = job["job_id"]
+        try:
+            agent = agents.get(job["agent_id"])
+            if agent is None:
+                raise KeyError(f"Agent '{job['agent_id']}' is not available in the worker")
+
+            state = deserialize_state(job["state"])
+
+            if job["stream"]:
+                result = asyncio.run(_stream_job(job["agent_id"], agent, state, job["job_id"], worker_id, result_queue))
+            else:
+                result = agent.invoke(state)
+
+            result_queue.put({
+                "type": "result",
+                "worker_id": worker_id,
+                "job_id": job["job_id"],
+                "state": serialize_state(result)
+            })
+        except Exception as e:
+            worker_logger.error(f"Error running job {job['job_id']} for {job['agent_id']}: {str(e)}")
+            result_queue.put({
+                "type": "error",
+                "worker_id": worker_id,
+                "job_id": job["job_id"],
+                "error": str(e)
+            })
+        finally:
+            forwarder.job_id = None
+
+    stop_event.set()
+    worker_logger.info(f"Agent worker {worker_id} stopped")
+
+
+class AgentWorkerPool:
+    """
+    Pool of agent worker processes with a dispatcher in the API process.
+
+    Each worker runs one job at a time. Jobs wait in the pool's queue until a
+    worker is ready and idle.
+    """
+
+    def __init__(
+        self,
+        processes: int = 2,
+        max_jobs_per_worker: int = 100,
+        agent_factory: str = DEFAULT_AGENT_FACTORY,
+        heartbeat_interval: float = 5.0,
+        heartbeat_timeout: float = 30.0,
+        warm_up: bool = False
+    ):
+        """
+        Initialize the agent worker pool.
+
+        Args:
+            processes: The number of worker processes
+            max_jobs_per_worker: The number of jobs after which a worker is
+                replaced with a fresh process (0 to never recycle)
+            agent_factory: Import path of the function that returns the agents
+            heartbeat_interval: Seconds between worker heartbeats
+            heartbeat_timeout: Seconds without a heartbeat after which a
+                worker is considered hung and replaced
+            warm_up: Whether workers load and compile every agent before
+                reporting ready
+        """
+        self.processes = max(1, processes)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.agent_factory = agent_factory
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.warm_up = warm_up
+
+        # Spawn fresh interpreters; forking a threaded server is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        self._result_queue = None
+
+        self._workers: Dict[int, Dict[str, Any]] = {}
+        self._worker_ids = itertools.count(1)
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+        self._dispatcher: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        # Counters for reporting
+        self._completed = 0
+        self._failed = 0
+        self._recycled = 0
+        self._restarted = 0
+
+    def start(self) -> None:
+        """Start the worker processes and the dispatcher thread."""
+        if self._dispatcher is not None:
+            return
+
+        self._result_queue = self._context.Queue()
+        self._stopping.clear()
+
+        with self._lock:
+            for _ in range(self.processes):
+                self._spawn_worker()
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="mosaic-agent-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+        logger.info(f"Started agent worker pool with {self.processes} processes")
+
+    def _spawn_worker(self) -> Dict[str, Any]:
+        """Start a new worker process (caller holds the lock)."""
+        worker_id = next(self._worker_ids)
+        job_queue = self._context.Queue()
+
+        process = self._context.Process(
+            target=worker_main,
+            args=(worker_id, self.agent_factory, job_queue, self._result_queue, self.heartbeat_interval, self.warm_up),
+            name=f"mosaic-agent-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+
+        worker = {
+            "worker_id": worker_id,
+            "process": process,
+            "job_queue": job_queue,
+            "ready": False,
+            "retiring": False,
+            "current_job": None,
+            "jobs_run": 0,
+            "agents": [],
+            "warmup": None,
+            "started_at": time.time(),
+            "last_heartbeat": time.time()
+        }
+        self._workers[worker_id] = worker
+
+        logger.info(f"Spawned agent worker {worker_id} (pid {process.pid})")
+        return worker
+
+    def _submit(self, agent_id: str, state: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        """
+        Queue a job for the workers.
+
+        Args:
+            agent_id: The ID of the agent
+            state: The agent state
+            stream: Whether the worker should forward stream frames
+
+        Returns:
+            The job record
+        """
+        if self._dispatcher is None:
+            raise AgentWorkerError("Agent worker pool is not running")
+
+        # Forward worker logs to the message being processed, if any
+        try:
+            # Try importing with the full package path (for local development)
+            from mosaic.backend.app.log_pipeline import current_message_id
+        except ImportError:
+            # Fall back to relative import (for Docker environment)
+            from backend.app.log_pipeline import current_message_id
+
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "agent_id": agent_id,
+            "state": serialize_state(state),
+            "stream": stream,
+            "message_id": current_message_id.get(),
+            "loop": asyncio.get_running_loop(),
+            "updates": asyncio.Queue(),
+            "worker_id": None,
+            "submitted_at": time.time()
+        }
+
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._pending.append(job)
+            self._assign_jobs()
+
+        return job
+
+    def _assign_jobs(self) -> None:
+        """Send pending jobs to idle workers (caller holds the lock)."""
+        for worker in self._workers.values():
+            if not self._pending:
+                return
+
+            if worker["ready"] and not worker["retiring"] and worker["current_job"] is None:
+                job = self._pending.popleft()
+                job["worker_id"] = worker["worker_id"]
+                worker["current_job"] = job["job_id"]
+                worker["job_queue"].put({
+                    "job_id": job["job_id"],
+                    "agent_id": job["agent_id"],
+                    "state": job["state"],
+                    "stream": job["stream"]
+                })
+
+    async def _wait_for_result(
+        self,
+        job: Dict[str, Any],
+        on_frame: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Wait for a job to finish, passing stream frames to a callback.
+
+        Args:
+            job: The job record
+            on_frame: Optional coroutine called for every stream frame
+
+        Returns:
+            The final agent state
+
+        Raises:
+            AgentWorkerError: If the job failed or its worker was lost
+        """
+        try:
+            while True:
+                kind, payload = await job["updates"].get()
+
+                if kind == "frame":
+                    if on_frame is not None:
+                        await on_frame(payload)
+                elif kind == "result":
+                    return deserialize_state(payload)
+                else:
+                    raise AgentWorkerError(payload)
+        finally:
+            # Forget the job if the caller stopped waiting (e.g. cancellation)
+            with self._lock:
+                self._jobs.pop(job["job_id"], None)
+                if job in self._pending:
+                    self._pending.remove(job)
+
+    async def invoke(self, agent_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Invoke an agent in a worker process.
+
+        Args:
+            agent_id: The ID of the agent
+            state: The agent state
+
+        Returns:
+            The updated state returned by the agent
+        """
+        return await self._wait_for_result(self._submit(agent_id, state, stream=False))
+
+    async def stream(
+        self,
+        agent_id: str,
+        state: Dict[str, Any],
+        on_frame: Callable[[Dict[str, Any]], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """
+        Run an agent with streaming in a worker process.
+
+        Args:
+            agent_id: The ID of the agent
+            state: The agent state
+            on_frame: Coroutine called for every stream frame (without messageId)
+
+        Returns:
+            The final state of the run
+        """
+        return await self._wait_for_result(self._submit(agent_id, state, stream=True), on_frame)
+
+    def _post_update(self, job: Dict[str, Any], kind: str, payload: Any) -> None:
+        """Pass an update to the event loop that is waiting for a job."""
+        try:
+            job["loop"].call_soon_threadsafe(job["updates"].put_nowait, (kind, payload))
+        except RuntimeError:
+            # The event loop that submitted the job is gone
+            pass
+
+    def _dispatch_loop(self) -> None:
+        """Dispatcher thread main loop."""
+        while not self._stopping.is_set():
+            try:
+                message = self._result_queue.get(timeout=min(1.0, self.heartbeat_interval))
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                break
+
+            try:
+                if message is not None:
+                    self._handle_message(message)
+                self._check_workers()
+            except Exception as e:
+                logger.error(f"Error in agent dispatcher: {str(e)}")
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        """
+        Handle a message from a worker process.
+
+        Args:
+            message: The message
+        """
+        kind = message["type"]
+
+        with self._lock:
+            worker = self._workers.get(message["worker_id"])
+            if worker is not None:
+                worker["last_heartbeat"] = time.time()
+
+            if kind == "ready":
+                if worker is not None:
+                    worker["ready"] = True
+                    worker["agents"] = message["agents"]
+                    worker["warmup"] = message.get("warmup")
+                    self._assign_jobs()
+                return
+
+            if kind == "heartbeat":
+                return
+
+            job = self._jobs.get(message["job_id"])
+
+            if kind == "log":
+                if job is not None and job["message_id"]:
+                    self._forward_log(job["message_id"], message["entry"])
+                return
+
+            if kind == "event":
+                if job is not None:
+                    self._post_update(job, "frame", message["frame"])
+                return
+
+            # The job finished, successfully or not
+            if job is not None:
+                if kind == "result":
+                    self._completed += 1
+                    self._post_update(job, "result", message["state"])
+                else:
+                    self._failed += 1
+                    self._post_update(job, "error", message["error"])
+
+            if worker is not None:
+                worker["current_job"] = None
+                worker["jobs_run"] += 1
+
+                if self.max_jobs_per_worker and worker["jobs_run"] >= self.max_jobs_per_worker:
+                    self._retire_worker(worker)
+
+            self._assign_jobs()
+
+    def _forward_log(self, message_id: str, entry: str) -> None:
+        """Forward a worker log entry to the log pipeline."""
+        try:
+            # Try importing with the full package path (for local development)
+            from mosaic.backend.app.log_pipeline import log_pipeline
+        except ImportError:
+            # Fall back to relative import (for Docker environment)
+            from backend.app.log_pipeline import log_pipeline
+
+        log_pipeline.submit(message_id, entry)
+
+    def _retire_worker(self, worker: Dict[str, Any]) -> None:
+        """Stop a worker after its current job and start a replacement (caller holds the lock)."""
+        worker["retiring"] = True
+        worker["job_queue"].put(None)
+        self._recycled += 1
+
+        logger.info(f"Recycling agent worker {worker['worker_id']} after {worker['jobs_run']} jobs")
+        self._spawn_worker()
+
+    def _check_workers(self) -> None:
+        """Replace workers that exited unexpectedly or stopped sending heartbeats."""
+        now = time.time()
+
+        with self._lock:
+            for worker in list(self._workers.values()):
+                process = worker["process"]
+
+                if not process.is_alive():
+                    del self._workers[worker["worker_id"]]
+
+                    if worker["retiring"]:
+                        process.join(0)
+                        continue
+
+                    self._replace_worker(worker, f"Agent worker {worker['worker_id']} exited with code {process.exitcode}")
+
+                elif now - worker["last_heartbeat"] > self.heartbeat_timeout:
+                    del self._workers[worker["worker_id"]]
+                    process.terminate()
+
+                    self._replace_worker(worker, f"Agent worker {worker['worker_id']} stopped responding")
+
+    def _replace_worker(self, worker: Dict[str, Any], reason: str) -> None:
+        """Fail the lost worker's job and start a replacement (caller holds the lock)."""
+        logger.error(reason)
+
+        job = self._jobs.get(worker["current_job"]) if worker["current_job"] else None
+        if job is not None:
+            self._failed += 1
+            self._post_update(job, "error", reason)
+
+        self._restarted += 1
+        if not self._stopping.is_set():
+            self._spawn_worker()
+            self._assign_jobs()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get worker pool statistics and per-worker health.
+
+        Returns:
+            A dictionary containing worker pool statistics
+        """
+        now = time.time()
+
+        with self._lock:
+            workers: List[Dict[str, Any]] = [
+                {
+                    "worker_id": worker["worker_id"],
+                    "pid": worker["process"].pid,
+                    "alive": worker["process"].is_alive(),
+                    "ready": worker["ready"],
+                    "retiring": worker["retiring"],
+                    "busy": worker["current_job"] is not None,
+                    "jobs_run": worker["jobs_run"],
+                    "agents": len(worker["agents"]),
+                    "warmup": worker["warmup"],
+                    "seconds_since_heartbeat": now - worker["last_heartbeat"]
+                }
+                for worker in self._workers.values()
+            ]
+
+            return {
+                "processes": self.processes,
+                "max_jobs_per_worker": self.max_jobs_per_worker,
+                "pending": len(self._pending),
+                "completed": self._completed,
+                "failed": self._failed,
+                "recycled": self._recycled,
+                "restarted": self._restarted,
+                "workers": workers
+            }
+
+    def is_ready(self) -> bool:
+        """Check whether at least one worker is ready to take jobs."""
+        with self._lock:
+            return any(worker["ready"] and not worker["retiring"] for worker in self._workers.values())
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Stop the worker processes and the dispatcher thread.
+
+        Args:
+            timeout: Seconds to wait for each worker to exit before terminating it
+        """
+        self._stopping.set()
+
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers = {}
+
+            # Fail the jobs that can no longer run
+            for job in list(self._jobs.values()):
+                self._post_update(job, "error", "Agent worker pool is shutting down")
+            self._pending.clear()
+
+        for worker in workers:
+            worker["job_queue"].put(None)
+
+        for worker in workers:
+            worker["process"].join(timeout)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+            self._dispatcher = None
+
+        logger.info("Shut down agent worker pool")
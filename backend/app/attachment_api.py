@@ -0,0 +1,479 @@
+"""
+Attachment API Module for MOSAIC
+
+This module serves the contents of attachments at GET /api/attachments/{id}.
+Contents are streamed in chunks from the blob store, from a file on disk or
+from the database (attachments created before the blob store), so message
+listings only need to carry the attachment URL instead of base64 data.
+
+Attachments are uploaded as binary, either in one multipart request
+(POST /api/attachments) or in resumable chunks (POST /api/attachments/uploads,
+then PUT chunks with an Upload-Offset header, then POST .../complete). The
+returned attachment IDs are referenced by the chat WebSocket message.
+
+Responses carry a strong ETag and long-lived cache headers, since the content
+of an attachment never changes. Requests with a single byte range get a 206
+response with only that range. Images can be requested as a downscaled
+variant (?variant=thumbnail or ?variant=llm).
+"""
+
+import hashlib
+import logging
+import os
+from typing import BinaryIO, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import APIRouter, File, Form, HTTPException, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+# Import the database modules
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+    from mosaic.backend.app.agent_catalog import etag_matches
+    from mosaic.backend.database import AttachmentRepository, AttachmentService, blob_store, run_in_db
+    from mosaic.backend.database.uploads import upload_manager, UploadError, UploadOffsetMismatch
+    from mosaic.backend.database.blob_store import parse_blob_key
+    from mosaic.backend.database.image_variants import get_profiles, ensure_variant, is_image
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+    from backend.app.agent_catalog import etag_matches
+    from backend.database import AttachmentRepository, AttachmentService, blob_store, run_in_db
+    from backend.database.uploads import upload_manager, UploadError, UploadOffsetMismatch
+    from backend.database.blob_store import parse_blob_key
+    from backend.database.image_variants import get_profiles, ensure_variant, is_image
+
+# Configure logging
+logger = logging.getLogger("mosaic.backend.app.attachment_api")
+
+# Create router
+router = APIRouter(prefix="/api/attachments", tags=["attachments"])
+
+# The content of an attachment never changes, so clients may keep it for a year
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+class UploadRequest(BaseModel):
+    """Request model for starting a resumable upload."""
+    size: int
+    filename: Optional[str] = None
+    contentType: Optional[str] = None
+    userId: Optional[str] = None
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header for a single byte range.
+
+    Headers that are missing, malformed, use another unit or ask for several
+    ranges are ignored, and the whole content is served.
+
+    Args:
+        range_header: The value of the Range header
+        size: The size of the content in bytes
+
+    Returns:
+        The (start, end) of the range with end inclusive, or None to serve
+        the whole content
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    if not range_header:
+        return None
+
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        elif last:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise ValueError(f"Range {range_header} not satisfiable for {size} bytes")
+
+    if end < start:
+        return None
+
+    return start, min(end, size - 1)
+
+
+def iter_file(file: BinaryIO, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+    """
+    Read a range of an open file in chunks, closing the file afterwards.
+
+    Args:
+        file: The open file
+        start: The offset of the first byte
+        length: The number of bytes to read
+        chunk_size: The maximum size of a chunk
+
+    Yields:
+        The chunks of the range
+    """
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def iter_bytes(data: bytes, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+    """
+    Split a range of in-memory content into chunks.
+
+    Args:
+        data: The content
+        start: The offset of the first byte
+        length: The number of bytes to yield
+        chunk_size: The maximum size of a chunk
+
+    Yields:
+        The chunks of the range
+    """
+    end = start + length
+    for offset in range(start, end, chunk_size):
+        yield data[offset:min(offset + chunk_size, end)]
+
+
+def _content_disposition(filename: Optional[str]) -> str:
+    """Build a Content-Disposition header that shows the attachment inline."""
+    if not filename:
+        return "inline"
+    return f"inline; filename*=UTF-8''{quote(filename)}"
+
+
+def _open_content(attachment, variant: Optional[str] = None) -> Tuple[Optional[BinaryIO], Optional[bytes], Optional[str], Optional[str]]:
+    """
+    Open the content of an attachment, or of one of its image variants.
+
+    Blob files are opened before the response starts, so a blob that is
+    garbage-collected in the meantime can still be read to the end. If the
+    variant cannot be made, the original content is opened.
+
+    Args:
+        attachment: The attachment, without its inline content loaded
+        variant: Optional name of the image variant
+
+    Returns:
+        A tuple of (open file, in-memory content, ETag, content type); either
+        the file or the content is None, and all are None if the attachment
+        has no content
+    """
+    content_type = attachment.content_type or attachment.type
+    digest = parse_blob_key(attachment.storage_path)
+
+    if digest is not None and variant and is_image(content_type):
+        found = ensure_variant(digest, variant)
+        if found is not None:
+            path, variant_type = found
+            try:
+                return open(path, "rb"), None, f'"{digest}-{variant}"', variant_type
+            except FileNotFoundError:
+                pass
+
+    if digest is not None:
+        try:
+            return open(blob_store.path(digest), "rb"), None, f'"{digest}"', content_type
+        except FileNotFoundError:
+            logger.error(f"Blob {digest} of attachment {attachment.id} is missing")
+            return None, None, None, None
+
+    if attachment.storage_path:
+        try:
+            file = open(attachment.storage_path, "rb")
+        except OSError:
+            logger.error(f"File {attachment.storage_path} of attachment {attachment.id} is missing")
+            return None, None, None, None
+        stat = os.fstat(file.fileno())
+        return file, None, f'"{attachment.id}-{stat.st_size:x}-{stat.st_mtime_ns:x}"', content_type
+
+    data = AttachmentRepository.get_inline_data(attachment.id)
+    if data is None:
+        return None, None, None, None
+    return None, data, '"' + hashlib.sha256(data).hexdigest() + '"', content_type
+
+
+def _get_upload(upload_id: str):
+    """Get an upload in progress or raise a 404 error."""
+    upload = upload_manager.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+async def _receive_chunks(upload, offset: int, chunks) -> None:
+    """
+    Append an async stream of chunks to an upload at an offset.
+
+    Args:
+        upload: The upload
+        offset: The offset the first chunk starts at
+        chunks: The async iterator of byte chunks
+    """
+    try:
+        file = await run_in_threadpool(upload_manager.begin_chunk, upload, offset)
+    except UploadOffsetMismatch as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e),
+            headers={"Upload-Offset": str(e.expected)}
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        async for chunk in chunks:
+            if chunk:
+                await run_in_threadpool(upload_manager.write, upload, file, chunk)
+    except UploadError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await run_in_threadpool(upload_manager.end_chunk, upload, file)
+
+
+async def _complete_upload(upload):
+    """Finish an upload and return its attachment as a dictionary."""
+    try:
+        attachment = await run_in_db(upload_manager.complete, upload)
+    except UploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return await run_in_db(AttachmentService.get_attachment, attachment.id)
+
+
+@router.post("/uploads")
+async def create_upload(request: UploadRequest):
+    """
+    Start a resumable upload.
+
+    Args:
+        request: The size, filename and content type of the attachment
+
+    Returns:
+        The upload ID, the current offset (0) and the suggested chunk size
+    """
+    try:
+        upload = await run_in_threadpool(
+            upload_manager.create,
+            request.size,
+            filename=request.filename,
+            content_type=request.contentType,
+            user_id=request.userId
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    return upload.to_dict()
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """
+    Get the state of an upload, to resume it after an interruption.
+
+    Args:
+        upload_id: The ID of the upload
+
+    Returns:
+        The upload, including the offset the next chunk must start at
+    """
+    upload = await run_in_threadpool(_get_upload, upload_id)
+    return upload.to_dict()
+
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request):
+    """
+    Append the raw request body to an upload.
+
+    The Upload-Offset header must equal the current offset of the upload;
+    otherwise a 409 response with the current offset is returned.
+
+    Args:
+        upload_id: The ID of the upload
+        request: The request whose body is the chunk
+
+    Returns:
+        The upload with its new offset
+    """
+    upload = await run_in_threadpool(_get_upload, upload_id)
+
+    try:
+        offset = int(request.headers.get("upload-offset", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Missing or invalid Upload-Offset header")
+
+    await _receive_chunks(upload, offset, request.stream())
+    return upload.to_dict()
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """
+    Finish an upload whose bytes have all been received.
+
+    Args:
+        upload_id: The ID of the upload
+
+    Returns:
+        The created attachment
+    """
+    upload = await run_in_threadpool(_get_upload, upload_id)
+    return await _complete_upload(upload)
+
+
+@router.delete("/uploads/{upload_id}")
+async def cancel_upload(upload_id: str):
+    """
+    Cancel an upload and delete what was received.
+
+    Args:
+        upload_id: The ID of the upload
+    """
+    if not await run_in_threadpool(upload_manager.cancel, upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return {"success": True}
+
+
+@router.post("")
+async def upload_attachment(file: UploadFile = File(...), userId: Optional[str] = Form(None)):
+    """
+    Upload an attachment in one multipart request.
+
+    The file is streamed into the blob store in chunks.
+
+    Args:
+        file: The uploaded file
+        userId: Optional Clerk user ID
+
+    Returns:
+        The created attachment
+    """
+    def get_size() -> int:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0)
+        return size
+
+    size = await run_in_threadpool(get_size)
+    try:
+        upload = await run_in_threadpool(
+            upload_manager.create,
+            size,
+            filename=file.filename,
+            content_type=file.content_type,
+            user_id=userId
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    async def chunks():
+        while True:
+            chunk = await file.read(settings.ATTACHMENT_UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    try:
+        await _receive_chunks(upload, 0, chunks())
+        return await _complete_upload(upload)
+    except BaseException:
+        await run_in_threadpool(upload_manager.cancel, upload.upload_id)
+        raise
+
+
+@router.get("/{attachment_id}")
+async def get_attachment_content(attachment_id: int, request: Request, variant: Optional[str] = None):
+    """
+    Stream the content of an attachment (supports Range and If-None-Match).
+
+    Args:
+        attachment_id: The ID of the attachment
+        request: The incoming request
+        variant: Optional image variant ("thumbnail" or "llm"); attachments
+            that are not images are served as they are
+
+    Returns:
+        The content (200), a range of it (206), or a 304 response if the
+        client's copy is current
+    """
+    if variant is not None and variant not in get_profiles():
+        raise HTTPException(status_code=400, detail=f"Unknown variant: {variant}")
+
+    attachment = await run_in_db(AttachmentRepository.get_attachment_metadata, attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    file, data, etag, content_type = await run_in_db(_open_content, attachment, variant)
+    if etag is None:
+        raise HTTPException(status_code=404, detail="Attachment content not found")
+
+    size = os.fstat(file.fileno()).st_size if file is not None else len(data)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": _content_disposition(attachment.filename)
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        if file is not None:
+            file.close()
+        return Response(status_code=304, headers=headers)
+
+    # A Range with an outdated If-Range validator gets the whole content
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        if file is not None:
+            file.close()
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        start, length, status_code = 0, size, 200
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+
+    chunk_size = settings.ATTACHMENT_STREAM_CHUNK_SIZE
+    if file is not None:
+        body = iter_file(file, start, length, chunk_size)
+    else:
+        body = iter_bytes(data, start, length, chunk_size)
+
+    return StreamingResponse(
+        body,
+        status_code=status_code,
+        media_type=content_type or "application/octet-stream",
+        headers=headers
+    )
@@ -28,12 +28,79 @@ class Settings(BaseSettings):
         f"sqlite:///{os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'mosaic.db'))}"
     )
     
+    DATABASE_WRITER_ENABLED: bool = os.getenv("DATABASE_WRITER_ENABLED", "true").lower() == "true"  # Serialize inserts through one writer connection
+    DATABASE_WRITER_MAX_BATCH: int = int(os.getenv("DATABASE_WRITER_MAX_BATCH", "200"))  # Writes per group commit
+    DATABASE_WRITER_MAX_LATENCY: float = float(os.getenv("DATABASE_WRITER_MAX_LATENCY", "0.002"))  # Seconds to wait for more writes
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # Milliseconds to wait for the write lock
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))  # Bytes of the database file to memory-map
+    ATTACHMENT_BLOB_DIR: str = os.getenv(
+        "ATTACHMENT_BLOB_DIR",
+        os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'blobs'))
+    )  # Content-addressed attachment files
+    ATTACHMENT_STREAM_CHUNK_SIZE: int = int(os.getenv("ATTACHMENT_STREAM_CHUNK_SIZE", "65536"))  # Bytes per chunk of attachment downloads
+    ATTACHMENT_UPLOAD_CHUNK_SIZE: int = int(os.getenv("ATTACHMENT_UPLOAD_CHUNK_SIZE", "1048576"))  # Bytes per chunk clients should upload
+    ATTACHMENT_UPLOAD_MAX_SIZE: int = int(os.getenv("ATTACHMENT_UPLOAD_MAX_SIZE", "104857600"))  # Largest accepted attachment in bytes
+    ATTACHMENT_UPLOAD_TTL: float = float(os.getenv("ATTACHMENT_UPLOAD_TTL", "86400"))  # Seconds before unfinished uploads are deleted
+    USER_EXPORT_DIR: str = os.getenv(
+        "USER_EXPORT_DIR",
+        os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'exports'))
+    )  # Archives written by user data export jobs
+    USER_EXPORT_TTL: float = float(os.getenv("USER_EXPORT_TTL", "86400"))  # Seconds before finished export jobs and their archives are deleted
+    USER_EXPORT_MAX_JOBS: int = int(os.getenv("USER_EXPORT_MAX_JOBS", "2"))  # Export jobs written at once
+    USER_PURGE_BATCH_SIZE: int = int(os.getenv("USER_PURGE_BATCH_SIZE", "500"))  # Messages or conversations deleted per transaction when user data is purged
+    USER_PURGE_PAUSE: float = float(os.getenv("USER_PURGE_PAUSE", "0.01"))  # Seconds between purge batches, to let other writes run
+    CONVERSATION_ARCHIVE_DIR: str = os.getenv(
+        "CONVERSATION_ARCHIVE_DIR",
+        os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'archives'))
+    )  # Compressed archive files of inactive conversations, one per user per month
+    IMAGE_VARIANT_LLM_MAX_SIZE: int = int(os.getenv("IMAGE_VARIANT_LLM_MAX_SIZE", "1024"))  # Longest edge in pixels of images sent to vision models
+    IMAGE_VARIANT_LLM_QUALITY: int = int(os.getenv("IMAGE_VARIANT_LLM_QUALITY", "85"))  # JPEG quality of images sent to vision models
+    IMAGE_VARIANT_THUMBNAIL_MAX_SIZE: int = int(os.getenv("IMAGE_VARIANT_THUMBNAIL_MAX_SIZE", "320"))  # Longest edge in pixels of image thumbnails
+    IMAGE_VARIANT_THUMBNAIL_QUALITY: int = int(os.getenv("IMAGE_VARIANT_THUMBNAIL_QUALITY", "75"))  # JPEG quality of image thumbnails
+    LLM_CONTEXT_MAX_IMAGES: int = int(os.getenv("LLM_CONTEXT_MAX_IMAGES", "3"))  # Most recent images sent to vision models; older ones become text references
+    DATABASE_EXECUTOR_MAX_WORKERS: int = int(os.getenv("DATABASE_EXECUTOR_MAX_WORKERS", "4"))  # Threads running database calls for async routes
+    
     # OpenAI settings
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     
     # Agent settings
     AGENT_MODE: bool = os.getenv("AGENT_MODE", "false").lower() == "true"
     
+    # Agent execution settings
+    AGENT_EXECUTOR_MAX_WORKERS: int = int(os.getenv("AGENT_EXECUTOR_MAX_WORKERS", "8"))
+    AGENT_EXECUTOR_PER_AGENT_LIMIT: int = int(os.getenv("AGENT_EXECUTOR_PER_AGENT_LIMIT", "4"))
+    AGENT_EXECUTOR_AGENT_LIMITS: str = os.getenv("AGENT_EXECUTOR_AGENT_LIMITS", "research_supervisor=2")  # agent_id=limit pairs
+    AGENT_EXECUTOR_MAX_QUEUE: int = int(os.getenv("AGENT_EXECUTOR_MAX_QUEUE", "100"))  # 0 for unbounded
+    AGENT_DISCOVERY_MODE: str = os.getenv("AGENT_DISCOVERY_MODE", "lazy")  # "lazy" imports agents on first use, "eager" at startup
+    AGENT_WARMUP_ENABLED: bool = os.getenv("AGENT_WARMUP_ENABLED", "true").lower() == "true"  # Load and compile agents after startup
+    AGENT_WARMUP_CONCURRENCY: int = int(os.getenv("AGENT_WARMUP_CONCURRENCY", "4"))  # Agents warmed up at once
+    AGENT_WORKER_PROCESSES: int = int(os.getenv("AGENT_WORKER_PROCESSES", "0"))  # 0 runs agents in the API process
+    AGENT_WORKER_MAX_JOBS: int = int(os.getenv("AGENT_WORKER_MAX_JOBS", "100"))  # Jobs before a worker process is recycled
+    AGENT_WORKER_HEARTBEAT_INTERVAL: float = float(os.getenv("AGENT_WORKER_HEARTBEAT_INTERVAL", "5"))
+    AGENT_WORKER_HEARTBEAT_TIMEOUT: float = float(os.getenv("AGENT_WORKER_HEARTBEAT_TIMEOUT", "30"))
+    
+    # Log pipeline settings
+    LOG_PIPELINE_MAX_BUFFER: int = int(os.getenv("LOG_PIPELINE_MAX_BUFFER", "10000"))  # Records held before new ones are dropped
+    LOG_PIPELINE_BATCH_SIZE: int = int(os.getenv("LOG_PIPELINE_BATCH_SIZE", "200"))  # Records per group commit
+    LOG_PIPELINE_FLUSH_INTERVAL: float = float(os.getenv("LOG_PIPELINE_FLUSH_INTERVAL", "0.1"))  # Seconds to coalesce records
+    
+    # Message log retention settings
+    MESSAGE_LOG_COMPACT_AFTER_DAYS: float = float(os.getenv("MESSAGE_LOG_COMPACT_AFTER_DAYS", "1"))  # Days before the log segments of a message are merged
+    MESSAGE_LOG_RETENTION_DAYS: float = float(os.getenv("MESSAGE_LOG_RETENTION_DAYS", "0"))  # Days message logs are kept; 0 keeps them forever
+    MESSAGE_LOG_RETENTION_INTERVAL: float = float(os.getenv("MESSAGE_LOG_RETENTION_INTERVAL", "3600"))  # Seconds between retention runs; 0 disables them
+    MESSAGE_LOG_RETENTION_BATCH_SIZE: int = int(os.getenv("MESSAGE_LOG_RETENTION_BATCH_SIZE", "100"))  # Messages compacted or segments deleted per transaction
+    MESSAGE_LOG_RETENTION_PAUSE: float = float(os.getenv("MESSAGE_LOG_RETENTION_PAUSE", "0.05"))  # Seconds between batches, to let other writes run
+    
+    # Conversation archive settings
+    CONVERSATION_ARCHIVE_AFTER_DAYS: float = float(os.getenv("CONVERSATION_ARCHIVE_AFTER_DAYS", "0"))  # Days untouched before conversations are archived; 0 never archives them
+    CONVERSATION_ARCHIVE_POLICIES: str = os.getenv("CONVERSATION_ARCHIVE_POLICIES", "")  # JSON overrides of the days per agent and user, e.g. {"agents": {"research": 30}, "users": {"user_123": 0}}
+    CONVERSATION_ARCHIVE_INTERVAL: float = float(os.getenv("CONVERSATION_ARCHIVE_INTERVAL", "3600"))  # Seconds between archival runs; 0 disables them
+    CONVERSATION_ARCHIVE_BATCH_SIZE: int = int(os.getenv("CONVERSATION_ARCHIVE_BATCH_SIZE", "20"))  # Conversations archived per transaction
+    CONVERSATION_ARCHIVE_PAUSE: float = float(os.getenv("CONVERSATION_ARCHIVE_PAUSE", "0.05"))  # Seconds between archival and vacuum batches, to let other writes run
+    CONVERSATION_ARCHIVE_VACUUM_PAGES: int = int(os.getenv("CONVERSATION_ARCHIVE_VACUUM_PAGES", "1000"))  # Free pages returned to the file system per incremental vacuum step
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
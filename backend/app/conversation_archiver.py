@@ -0,0 +1,285 @@
+"""
+Conversation Archiver Module for MOSAIC
+
+This module applies the archival policy of conversations in the background.
+At a fixed interval a thread:
+
+- archives conversations untouched for longer than their policy allows:
+  their messages, logs and attachments are moved to compressed archive
+  files and the conversation rows stay as stubs (see database/archive.py)
+- compacts the archive files, dropping the entries of conversations that
+  were restored or deleted since
+- returns the pages freed in the database file to the file system with
+  incremental vacuuming
+
+The policy is a number of days per user or per agent, falling back to a
+default (a user's policy overrides the agent's); 0 never archives. Both steps
+run in small batches through the single database writer, with a short pause
+between batches, so chat writes are never held up for long.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_, true
+
+# Configure logging
+logger = logging.getLogger("mosaic.conversation_archiver")
+
+# Import the archive and the settings
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database.archive import (
+        archive_conversations, conversation_archive, incremental_vacuum, untouched_before
+    )
+    from mosaic.backend.database.models import Conversation
+    from mosaic.backend.database.writer import database_writer
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database.archive import (
+        archive_conversations, conversation_archive, incremental_vacuum, untouched_before
+    )
+    from backend.database.models import Conversation
+    from backend.database.writer import database_writer
+    from backend.app.config import settings
+
+
+def parse_archive_policies(value: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    Parse the per-agent and per-user archival policies.
+
+    Args:
+        value: JSON like {"agents": {"research": 30}, "users": {"user_123": 0}},
+            or an empty string
+
+    Returns:
+        A tuple of (days by agent ID, days by user ID)
+
+    Raises:
+        ValueError: If the policies are malformed
+    """
+    if not value.strip():
+        return {}, {}
+
+    try:
+        policies = json.loads(value)
+        agent_days = {str(agent_id): float(days) for agent_id, days in policies.get("agents", {}).items()}
+        user_days = {str(user_id): float(days) for user_id, days in policies.get("users", {}).items()}
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid conversation archive policies: {str(e)}")
+
+    return agent_days, user_days
+
+
+class ConversationArchiver:
+    """
+    Archives inactive conversations periodically in a background thread.
+    """
+
+    def __init__(
+        self,
+        after_days: float = 0.0,
+        agent_days: Optional[Dict[str, float]] = None,
+        user_days: Optional[Dict[str, float]] = None,
+        interval: float = 3600.0,
+        batch_size: int = 20,
+        pause: float = 0.05,
+        vacuum_pages: int = 1000
+    ):
+        """
+        Initialize the conversation archiver.
+
+        Args:
+            after_days: Days untouched before a conversation is archived; 0 never archives
+            agent_days: Days by agent ID, overriding after_days
+            user_days: Days by user ID, overriding the agent's and after_days
+            interval: Seconds between runs
+            batch_size: Conversations archived per transaction
+            pause: Seconds to wait between batches
+            vacuum_pages: Free pages returned to the file system per transaction; 0 never vacuums
+        """
+        self.after_days = after_days
+        self.agent_days = dict(agent_days or {})
+        self.user_days = dict(user_days or {})
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Totals reported by get_stats
+        self._runs = 0
+        self._archived = 0
+        self._compacted_files = 0
+        self._vacuumed_pages = 0
+        self._last_run_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    def candidates(self, now: datetime):
+        """
+        Build the filter of the conversations due for archival.
+
+        Args:
+            now: The current UTC time
+
+        Returns:
+            The filter, or None if no policy archives anything
+        """
+        def due(days: float):
+            return untouched_before(now - timedelta(days=days))
+
+        rules = [
+            and_(Conversation.user_id == user_id, due(days))
+            for user_id, days in self.user_days.items() if days > 0
+        ]
+
+        # Conversations of users with a policy of their own follow only that policy
+        no_user_policy = true()
+        if self.user_days:
+            no_user_policy = or_(Conversation.user_id.is_(None), Conversation.user_id.notin_(list(self.user_days)))
+
+        rules += [
+            and_(Conversation.agent_id == agent_id, no_user_policy, due(days))
+            for agent_id, days in self.agent_days.items() if days > 0
+        ]
+
+        if self.after_days > 0:
+            no_agent_policy = Conversation.agent_id.notin_(list(self.agent_days)) if self.agent_days else true()
+            rules.append(and_(no_agent_policy, no_user_policy, due(self.after_days)))
+
+        return or_(*rules) if rules else None
+
+    def _vacuum(self) -> int:
+        """Return the free pages of the database file in batches, returning the total."""
+        total = 0
+        while self.vacuum_pages > 0 and not self._stop.is_set():
+            pages = database_writer.execute(lambda session: incremental_vacuum(session, self.vacuum_pages))
+            total += pages
+            if pages < self.vacuum_pages:
+                break
+            if self.pause:
+                time.sleep(self.pause)
+        return total
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Archive the conversations due for archival once, then compact the
+        archive files and vacuum. Does nothing if no policy archives anything.
+
+        Args:
+            now: The current UTC time (defaults to datetime.utcnow())
+
+        Returns:
+            The number of conversations archived, of archive files compacted
+            and of pages vacuumed
+        """
+        candidates = self.candidates(now or datetime.utcnow())
+
+        # Without a policy nothing is archived, so there is nothing to compact or vacuum
+        if candidates is None:
+            return {"archived": 0, "compacted_files": 0, "vacuumed_pages": 0}
+
+        archived = 0
+        while not self._stop.is_set():
+            count = archive_conversations(candidates, self.batch_size)
+            archived += count
+            if count < self.batch_size:
+                break
+            if self.pause:
+                time.sleep(self.pause)
+
+        compacted_files = 0 if self._stop.is_set() else conversation_archive.compact()
+        vacuumed_pages = self._vacuum()
+
+        with self._lock:
+            self._runs += 1
+            self._archived += archived
+            self._compacted_files += compacted_files
+            self._vacuumed_pages += vacuumed_pages
+            self._last_run_at = time.time()
+
+        if archived or compacted_files or vacuumed_pages:
+            logger.info(
+                f"Archived {archived} conversations, compacted {compacted_files} archive files "
+                f"and vacuumed {vacuumed_pages} pages"
+            )
+        return {"archived": archived, "compacted_files": compacted_files, "vacuumed_pages": vacuumed_pages}
+
+    def _run(self) -> None:
+        """Background thread main loop."""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                with self._lock:
+                    self._last_error = None
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                logger.error(f"Error archiving conversations: {str(e)}")
+
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        """Start the background thread, unless it is running or the interval is 0."""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mosaic-conversation-archiver", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Stop the background thread after its current batch.
+
+        Args:
+            timeout: The maximum number of seconds to wait for the thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get archival statistics.
+
+        Returns:
+            A dictionary with the policies, the number of runs and the totals
+            of archived conversations, compacted archive files and vacuumed pages
+        """
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "after_days": self.after_days,
+                "agent_days": dict(self.agent_days),
+                "user_days": dict(self.user_days),
+                "interval": self.interval,
+                "runs": self._runs,
+                "archived": self._archived,
+                "compacted_files": self._compacted_files,
+                "vacuumed_pages": self._vacuumed_pages,
+                "last_run_at": self._last_run_at,
+                "last_error": self._last_error
+            }
+
+
+# Create a global conversation archiver
+_agent_days, _user_days = parse_archive_policies(settings.CONVERSATION_ARCHIVE_POLICIES)
+conversation_archiver = ConversationArchiver(
+    after_days=settings.CONVERSATION_ARCHIVE_AFTER_DAYS,
+    agent_days=_agent_days,
+    user_days=_user_days,
+    interval=settings.CONVERSATION_ARCHIVE_INTERVAL,
+    batch_size=settings.CONVERSATION_ARCHIVE_BATCH_SIZE,
+    pause=settings.CONVERSATION_ARCHIVE_PAUSE,
+    vacuum_pages=settings.CONVERSATION_ARCHIVE_VACUUM_PAGES
+)
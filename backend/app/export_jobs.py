@@ -0,0 +1,173 @@
+"""
+User Data Export Jobs for MOSAIC
+
+This module writes user data exports in the background for accounts too large
+to stream within one request. A job writes the streamed ZIP archive (see
+database.export) to a file in the export directory while its progress can be
+polled; when it has finished, the archive is downloaded. Finished jobs and
+their archives are deleted after a TTL.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger("mosaic.export_jobs")
+
+# Import the export engine and the settings
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database.export import ExportProgress, iter_user_export
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database.export import ExportProgress, iter_user_export
+    from backend.app.config import settings
+
+
+@dataclass
+class ExportJob:
+    """The state of one export job."""
+    job_id: str
+    user_id: str
+    status: str = "pending"  # "pending", "running", "completed" or "failed"
+    progress: ExportProgress = field(default_factory=ExportProgress)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the job to the dictionary returned by the API."""
+        result = {
+            "jobId": self.job_id,
+            "status": self.status,
+            "progress": self.progress.to_dict(),
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+            "error": self.error
+        }
+        if self.status == "completed":
+            result["downloadUrl"] = f"/api/user-data/export/jobs/{self.job_id}/download?user_id={self.user_id}"
+        return result
+
+
+class ExportJobManager:
+    """
+    Runs export jobs on a small thread pool and keeps track of them.
+    """
+
+    def __init__(self, directory: str, ttl: float = 86400.0, max_jobs: int = 2):
+        """
+        Initialize the export job manager.
+
+        Args:
+            directory: The directory the archives are written to
+            ttl: Seconds after which finished jobs and their archives are deleted
+            max_jobs: The maximum number of jobs written at once
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_jobs = max(1, max_jobs)
+
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def path(self, job_id: str) -> str:
+        """The path of the archive of a job."""
+        return os.path.join(self.directory, f"{job_id}.zip")
+
+    def start(self, user_id: str, user: Dict[str, Any]) -> ExportJob:
+        """
+        Start exporting the data of a user in the background.
+
+        Args:
+            user_id: The Clerk user ID
+            user: The dictionary of the user (see UserRepository.user_to_dict)
+
+        Returns:
+            The new job
+        """
+        self.cleanup_expired()
+        os.makedirs(self.directory, exist_ok=True)
+
+        job = ExportJob(job_id=str(uuid.uuid4()), user_id=user_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="mosaic-export")
+            self._executor.submit(self._run, job, user)
+
+        logger.info(f"Started export job {job.job_id} for user {user_id}")
+        return job
+
+    def _run(self, job: ExportJob, user: Dict[str, Any]) -> None:
+        """Write the archive of a job to a partial file and move it into place."""
+        job.status = "running"
+        path = self.path(job.job_id)
+        part_path = f"{path}.part"
+
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in iter_user_export(user, job.user_id, job.progress):
+                    f.write(chunk)
+            os.replace(part_path, path)
+            job.status = "completed"
+            logger.info(f"Export job {job.job_id} wrote {job.progress.bytes_written} bytes")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Error in export job {job.job_id}: {str(e)}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        """
+        Get an export job.
+
+        Args:
+            job_id: The ID of the job
+
+        Returns:
+            The job, or None if it does not exist (or has expired)
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cleanup_expired(self) -> int:
+        """
+        Delete the finished jobs older than the TTL and their archives.
+
+        Returns:
+            The number of jobs deleted
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished_at is not None and now - job.finished_at > self.ttl
+            ]
+            for job in expired:
+                del self._jobs[job.job_id]
+
+        for job in expired:
+            if os.path.exists(self.path(job.job_id)):
+                os.remove(self.path(job.job_id))
+
+        return len(expired)
+
+
+# Create a global export job manager
+export_jobs = ExportJobManager(
+    directory=settings.USER_EXPORT_DIR,
+    ttl=settings.USER_EXPORT_TTL,
+    max_jobs=settings.USER_EXPORT_MAX_JOBS
+)
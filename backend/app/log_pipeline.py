@@ -0,0 +1,444 @@
+"""
+Log Pipeline Module for MOSAIC
+
+This module buffers the agent logs that are captured while a chat message is
+being processed. Log handlers only append records to a bounded in-memory
+buffer; a background flusher thread then:
+
+- group-commits the buffered records as compressed log segments in batches
+  (one INSERT and one commit per batch instead of one per record)
+- coalesces the records of each message into a single log_update frame per
+  flush interval instead of one WebSocket frame per record
+
+Callers that need every log of a message to be persisted and delivered (for
+example before sending the final response) use the drain barrier.
+
+Records reach the pipeline through a single LogRouter handler installed on the
+"mosaic.agents" logger. The message being processed is tracked in a context
+variable, which follows the request into executor threads and LangGraph
+callbacks, so each record is routed only to the message whose run produced it.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+# Configure logging
+logger = logging.getLogger("mosaic.log_pipeline")
+
+# Import the settings and the chat service
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+    from mosaic.backend.database import ChatService
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+    from backend.database import ChatService
+
+
+class LogSink:
+    """
+    Destination for the logs of one message.
+
+    The sink keeps the delivered logs (so they can be attached to the final
+    response) and forwards them to the client as coalesced log_update frames.
+    """
+
+    def __init__(
+        self,
+        message_id: str,
+        send: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ):
+        """
+        Initialize the log sink.
+
+        Args:
+            message_id: The ID of the message the logs belong to
+            send: Optional coroutine used to send a frame to the client
+            loop: The event loop the send coroutine runs on
+        """
+        self.message_id = message_id
+        self.send = send
+        self.loop = loop
+        self.logs: List[str] = []
+
+        # Frames scheduled on the event loop but possibly not sent yet
+        self._pending: List[Future] = []
+        self._lock = threading.Lock()
+
+    def deliver(self, entries: List[str]) -> None:
+        """
+        Deliver a batch of log entries (called from the flusher thread).
+
+        Args:
+            entries: The log entries, in the order they were recorded
+        """
+        with self._lock:
+            self.logs.extend(entries)
+
+            if self.send is None or self.loop is None or self.loop.is_closed():
+                return
+
+            frame = {
+                "type": "log_update",
+                "messageId": self.message_id,
+                "log": entries[-1],  # Kept for clients that only read a single log
+                "logs": entries
+            }
+
+            try:
+                self._pending.append(asyncio.run_coroutine_threadsafe(self._send(frame), self.loop))
+            except RuntimeError as e:
+                # The event loop is shutting down
+                logger.debug(f"Could not schedule log frame for {self.message_id}: {e}")
+
+    async def _send(self, frame: Dict[str, Any]) -> None:
+        """Send a frame to the client without raising."""
+        try:
+            await self.send(frame)
+        except Exception as e:
+            # Don't raise exceptions from the log pipeline
+            logger.debug(f"Error sending log frame for {self.message_id}: {e}")
+
+    async def wait_sent(self) -> None:
+        """Wait until every scheduled frame has been sent."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        if pending:
+            await asyncio.gather(*[asyncio.wrap_future(future) for future in pending], return_exceptions=True)
+
+    def get_logs(self) -> List[str]:
+        """Get all logs delivered to this sink."""
+        with self._lock:
+            return list(self.logs)
+
+
+class LogPipeline:
+    """
+    Bounded, batched pipeline for message logs.
+
+    Records are appended to a FIFO buffer and numbered in submission order.
+    The flusher thread writes them in batches and advances the flushed count,
+    which is what the drain barrier waits on.
+    """
+
+    def __init__(self, max_buffer: int = 10000, batch_size: int = 200, flush_interval: float = 0.1):
+        """
+        Initialize the log pipeline.
+
+        Args:
+            max_buffer: The maximum number of buffered records; new records
+                are dropped (and counted) while the buffer is full
+            batch_size: The maximum number of records written per commit
+            flush_interval: How long the flusher waits to coalesce records
+        """
+        self.max_buffer = max(1, max_buffer)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        self._buffer: Deque[Tuple[str, str, datetime]] = deque()
+        self._sinks: Dict[str, LogSink] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        # Record counters used by the drain barrier and for statistics
+        self._submitted = 0
+        self._flushed = 0
+        self._flush_target = 0
+        self._dropped = 0
+        self._batches = 0
+
+    def register(
+        self,
+        message_id: str,
+        send: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> LogSink:
+        """
+        Register the sink that receives the logs of a message.
+
+        Args:
+            message_id: The ID of the message
+            send: Optional coroutine used to send a frame to the client
+            loop: The event loop the send coroutine runs on
+
+        Returns:
+            The registered sink
+        """
+        sink = LogSink(message_id, send, loop)
+        with self._condition:
+            self._sinks[message_id] = sink
+        return sink
+
+    def unregister(self, message_id: str) -> None:
+        """
+        Unregister the sink of a message.
+
+        Logs submitted afterwards are still persisted but no longer sent.
+
+        Args:
+            message_id: The ID of the message
+        """
+        with self._condition:
+            self._sinks.pop(message_id, None)
+
+    def submit(self, message_id: str, log_entry: str) -> bool:
+        """
+        Submit a log entry for a message.
+
+        This only appends to the in-memory buffer, so it is cheap enough to
+        call from a log handler on any thread.
+
+        Args:
+            message_id: The ID of the message
+            log_entry: The formatted log entry
+
+        Returns:
+            True if the entry was buffered, False if it was dropped
+        """
+        with self._condition:
+            if len(self._buffer) >= self.max_buffer:
+                self._dropped += 1
+                return False
+
+            self._buffer.append((message_id, log_entry, datetime.utcnow()))
+            self._submitted += 1
+
+            self._ensure_thread()
+
+            # Wake the flusher early once a full batch is waiting
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+
+        return True
+
+    def _ensure_thread(self) -> None:
+        """Start the flusher thread if needed (caller holds the lock)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="mosaic-log-pipeline", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Flusher thread main loop."""
+        while True:
+            with self._condition:
+                while not self._buffer and not self._stopping:
+                    self._condition.wait()
+
+                if not self._buffer and self._stopping:
+                    return
+
+                # Give more records a chance to arrive unless a batch is full,
+                # a drain is waiting or the pipeline is stopping
+                if (
+                    len(self._buffer) < self.batch_size
+                    and self._flushed >= self._flush_target
+                    and not self._stopping
+                ):
+                    self._condition.wait(self.flush_interval)
+
+                count = min(len(self._buffer), self.batch_size)
+                batch = [self._buffer.popleft() for _ in range(count)]
+                sinks = dict(self._sinks)
+
+            self._write_batch(batch, sinks)
+
+            with self._condition:
+                self._flushed += len(batch)
+                self._batches += 1
+                self._condition.notify_all()
+
+    def _write_batch(self, batch: List[Tuple[str, str, datetime]], sinks: Dict[str, LogSink]) -> None:
+        """
+        Persist a batch of records and deliver them to their sinks.
+
+        Args:
+            batch: The (message_id, log_entry, timestamp) records to write
+            sinks: The registered sinks by message ID
+        """
+        try:
+            ChatService.add_logs_to_messages(batch)
+        except Exception as e:
+            logger.error(f"Error storing {len(batch)} logs in database: {str(e)}")
+
+        # Group the entries by message, preserving their order
+        entries_by_message: Dict[str, List[str]] = {}
+        for message_id, log_entry, _ in batch:
+            entries_by_message.setdefault(message_id, []).append(log_entry)
+
+        for message_id, entries in entries_by_message.items():
+            sink = sinks.get(message_id)
+            if sink:
+                sink.deliver(entries)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every record submitted so far has been written.
+
+        Args:
+            timeout: The maximum number of seconds to wait
+
+        Returns:
+            True if the records were written, False if the wait timed out
+        """
+        with self._condition:
+            target = self._submitted
+            self._flush_target = max(self._flush_target, target)
+            self._condition.notify_all()
+
+            return self._condition.wait_for(lambda: self._flushed >= target, timeout)
+
+    async def drain(self, message_id: str, timeout: float = 5.0) -> List[str]:
+        """
+        Wait until the logs of a message have been persisted and sent.
+
+        Args:
+            message_id: The ID of the message
+            timeout: The maximum number of seconds to wait for the flush
+
+        Returns:
+            All logs delivered for the message
+        """
+        if not await asyncio.to_thread(self.flush, timeout):
+            logger.warning(f"Timed out draining logs for message {message_id}")
+
+        with self._condition:
+            sink = self._sinks.get(message_id)
+
+        if sink is None:
+            return []
+
+        await sink.wait_sent()
+        return sink.get_logs()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Flush the remaining records and stop the flusher thread.
+
+        Args:
+            timeout: The maximum number of seconds to wait
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join(timeout)
+
+        logger.info("Shut down log pipeline")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get log pipeline statistics.
+
+        Returns:
+            A dictionary containing log pipeline statistics
+        """
+        with self._condition:
+            return {
+                "buffered": len(self._buffer),
+                "submitted": self._submitted,
+                "written": self._flushed,
+                "batches": self._batches,
+                "dropped": self._dropped,
+                "sinks": len(self._sinks)
+            }
+
+
+# The ID of the message whose run is producing logs in the current context
+current_message_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "mosaic_current_message_id", default=None
+)
+
+
+class LogRouter(logging.Handler):
+    """
+    Log handler that routes records to the message being processed.
+
+    One router is installed for the whole process. Routing a record is a
+    context variable read and a set lookup, so the cost per record does not
+    depend on how many messages are being processed concurrently.
+    """
+
+    def __init__(self, pipeline: LogPipeline, level: int = logging.INFO):
+        """
+        Initialize the log router.
+
+        Args:
+            pipeline: The log pipeline that receives the routed records
+            level: The minimum level of routed records
+        """
+        super().__init__(level)
+        self.pipeline = pipeline
+        self.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', '%H:%M:%S'))
+
+        # Messages that are currently capturing logs
+        self._active: Set[str] = set()
+
+    def install(self, logger_name: str = "mosaic.agents") -> None:
+        """
+        Attach the router to a logger (idempotent).
+
+        Args:
+            logger_name: The name of the logger to attach to; records from
+                its child loggers reach it through propagation
+        """
+        target = logging.getLogger(logger_name)
+        if self not in target.handlers:
+            target.addHandler(self)
+
+    def begin(self, message_id: str) -> contextvars.Token:
+        """
+        Start capturing the logs of the current context for a message.
+
+        Args:
+            message_id: The ID of the message
+
+        Returns:
+            The token to pass to end
+        """
+        self._active.add(message_id)
+        return current_message_id.set(message_id)
+
+    def end(self, token: contextvars.Token) -> None:
+        """
+        Stop capturing logs for the message started with begin.
+
+        Args:
+            token: The token returned by begin
+        """
+        self._active.discard(current_message_id.get())
+        current_message_id.reset(token)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Route a record to the current message, if it is capturing logs."""
+        message_id = current_message_id.get()
+        if message_id is None or message_id not in self._active:
+            return
+
+        try:
+            self.pipeline.submit(message_id, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+# Create a global log pipeline
+log_pipeline = LogPipeline(
+    max_buffer=settings.LOG_PIPELINE_MAX_BUFFER,
+    batch_size=settings.LOG_PIPELINE_BATCH_SIZE,
+    flush_interval=settings.LOG_PIPELINE_FLUSH_INTERVAL
+)
+
+# Create the global log router
+log_router = LogRouter(log_pipeline)
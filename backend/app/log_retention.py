@@ -0,0 +1,182 @@
+"""
+Message Log Retention Module for MOSAIC
+
+This module applies the retention policy of message logs in the background.
+At a fixed interval a thread:
+
+- compacts logs: once the log segments of a message are older than the
+  compaction age, they are merged into one segment compressed at the highest
+  level
+- prunes logs: segments whose newest entry is older than the retention period
+  are deleted (a retention period of 0 keeps logs forever)
+
+Both run in small batches through the single database writer, with a short
+pause between batches, so chat writes are never held up for long.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger("mosaic.log_retention")
+
+# Import the repository and the settings
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database.repository import MessageRepository
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database.repository import MessageRepository
+    from backend.app.config import settings
+
+
+class LogRetention:
+    """
+    Compacts and prunes message logs periodically in a background thread.
+    """
+
+    def __init__(
+        self,
+        compact_after_days: float = 1.0,
+        retention_days: float = 0.0,
+        interval: float = 3600.0,
+        batch_size: int = 100,
+        pause: float = 0.05
+    ):
+        """
+        Initialize the log retention.
+
+        Args:
+            compact_after_days: Days before the segments of a message are merged
+            retention_days: Days logs are kept; 0 keeps them forever
+            interval: Seconds between runs
+            batch_size: Messages compacted or segments deleted per transaction
+            pause: Seconds to wait between batches
+        """
+        self.compact_after_days = compact_after_days
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Totals reported by get_stats
+        self._runs = 0
+        self._compacted = 0
+        self._pruned = 0
+        self._last_run_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    def _run_batches(self, run_batch: Callable[[datetime, int], int], older_than: datetime) -> int:
+        """Run batches until one comes back short, returning the total processed."""
+        total = 0
+        while not self._stop.is_set():
+            count = run_batch(older_than, self.batch_size)
+            total += count
+            if count < self.batch_size:
+                break
+            if self.pause:
+                time.sleep(self.pause)
+        return total
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Compact and prune the message logs once.
+
+        Args:
+            now: The current UTC time (defaults to datetime.utcnow())
+
+        Returns:
+            The number of messages compacted and of segments pruned
+        """
+        now = now or datetime.utcnow()
+
+        # Prune first, so logs about to be deleted are not compacted
+        pruned = 0
+        if self.retention_days > 0:
+            pruned = self._run_batches(MessageRepository.prune_logs, now - timedelta(days=self.retention_days))
+
+        compacted = self._run_batches(MessageRepository.compact_logs, now - timedelta(days=self.compact_after_days))
+
+        with self._lock:
+            self._runs += 1
+            self._compacted += compacted
+            self._pruned += pruned
+            self._last_run_at = time.time()
+
+        if compacted or pruned:
+            logger.info(f"Compacted the logs of {compacted} messages and pruned {pruned} log segments")
+        return {"compacted": compacted, "pruned": pruned}
+
+    def _run(self) -> None:
+        """Background thread main loop."""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                with self._lock:
+                    self._last_error = None
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                logger.error(f"Error applying the message log retention: {str(e)}")
+
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        """Start the background thread, unless it is running or the interval is 0."""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mosaic-log-retention", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Stop the background thread after its current batch.
+
+        Args:
+            timeout: The maximum number of seconds to wait for the thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get retention statistics.
+
+        Returns:
+            A dictionary with the policy, the number of runs and the totals
+            of compacted messages and pruned segments
+        """
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "compact_after_days": self.compact_after_days,
+                "retention_days": self.retention_days,
+                "interval": self.interval,
+                "runs": self._runs,
+                "compacted": self._compacted,
+                "pruned": self._pruned,
+                "last_run_at": self._last_run_at,
+                "last_error": self._last_error
+            }
+
+
+# Create a global log retention
+log_retention = LogRetention(
+    compact_after_days=settings.MESSAGE_LOG_COMPACT_AFTER_DAYS,
+    retention_days=settings.MESSAGE_LOG_RETENTION_DAYS,
+    interval=settings.MESSAGE_LOG_RETENTION_INTERVAL,
+    batch_size=settings.MESSAGE_LOG_RETENTION_BATCH_SIZE,
+    pause=settings.MESSAGE_LOG_RETENTION_PAUSE
+)
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
@@ -15,9 +15,13 @@ import json
 try:
     # Try importing with the full package path (for local development)
     from mosaic.backend.database import init_db, ChatService, AttachmentService, UserPreferenceService
+    from mosaic.backend.database import AsyncChatService, AsyncAttachmentService, db_executor, run_in_db
+    from mosaic.backend.database import database_writer
 except ImportError:
     # Fall back to relative import (for Docker environment)
     from backend.database import init_db, ChatService, AttachmentService, UserPreferenceService
+    from backend.database import AsyncChatService, AsyncAttachmentService, db_executor, run_in_db
+    from backend.database import database_writer
 
 # Import the API routers
 try:
@@ -28,6 +32,8 @@ try:
     from mosaic.backend.app.user_data_api import get_user_data_api_router
     from mosaic.backend.app.file_operations_api import router as file_operations_router
     from mosaic.backend.app.audio_api import router as audio_router
+    from mosaic.backend.app.attachment_api import router as attachment_router
+    from mosaic.backend.app.search_api import router as search_router
     from mosaic.backend.app.apps_api import router as apps_router
     from mosaic.backend.app.apps.db_visualizer.api import router as db_visualizer_router
     from mosaic.backend.app.apps.pdf_ingestion.api import router as pdf_ingestion_router
@@ -39,6 +45,8 @@ except ImportError:
     from backend.app.user_data_api import get_user_data_api_router
     from backend.app.file_operations_api import router as file_operations_router
     from backend.app.audio_api import router as audio_router
+    from backend.app.attachment_api import router as attachment_router
+    from backend.app.search_api import router as search_router
     from backend.app.apps_api import router as apps_router
     from backend.app.apps.db_visualizer.api import router as db_visualizer_router
     from backend.app.apps.pdf_ingestion.api import router as pdf_ingestion_router
@@ -65,6 +73,8 @@ app.include_router(get_webhook_api_router())
 app.include_router(get_user_data_api_router())
 app.include_router(file_operations_router)
 app.include_router(audio_router)
+app.include_router(attachment_router)
+app.include_router(search_router)
 app.include_router(apps_router)
 app.include_router(db_visualizer_router)
 app.include_router(pdf_ingestion_router)
@@ -224,75 +234,178 @@ except ImportError:
 
 # Agent routes
 @app.get("/api/agents")
-async def get_agents():
-    """Get a list of all available agents."""
+async def get_agents(request: Request):
+    """Get a list of all available agents (supports If-None-Match)."""
     try:
-        initialized_agents = get_initialized_agents()
-        agents = []
-        
-        for agent_id, agent in initialized_agents.items():
-            # Extract agent metadata using the agent_api's method
-            metadata = agent_api._extract_agent_metadata(agent_id, agent)
-            agents.append(metadata)
-            
-        return agents
+        # Serve the precomputed agent metadata from the agent catalog
+        return await agent_api.catalog.list_response(request)
     except Exception as e:
         logger.error(f"Error getting agents: {str(e)}")
         return []
 
 @app.get("/api/agents/{agent_id}")
-async def get_agent(agent_id: str):
-    """Get information about a specific agent."""
-    initialized_agents = get_initialized_agents()
-    agent = initialized_agents.get(agent_id)
+async def get_agent(agent_id: str, request: Request):
+    """Get information about a specific agent (supports If-None-Match)."""
+    response = await agent_api.catalog.agent_response(request, agent_id)
     
-    if not agent:
+    if response is None:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    # Extract agent metadata using the agent_api's method
-    return agent_api._extract_agent_metadata(agent_id, agent)
+    return response
 
 # Chat routes
 @app.get("/api/chat/{agent_id}/messages")
-async def get_messages(agent_id: str, user_id: Optional[str] = None):
+async def get_messages(
+    agent_id: str,
+    user_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
+):
     """
-    Get all messages for a specific agent.
+    Get messages for a specific agent.
+    
+    Without pagination parameters the whole active conversation is returned
+    as a list. With limit, before or after, a page of messages is returned
+    together with the cursors for loading older or newer messages.
+    
+    Without fields or include, full messages are returned. fields selects the
+    message fields to return (e.g. "id,role,content,timestamp"); include adds
+    fields such as "logs" or "attachments", which are otherwise left out as
+    soon as a projection is requested. Logs can also be loaded per message.
     
     Args:
         agent_id: The ID of the agent
         user_id: Optional user ID to filter by
+        limit: Optional maximum number of messages to return
+        before: Optional cursor; return the messages just before it
+        after: Optional cursor; return the messages just after it
+        fields: Optional comma-separated message fields to return
+        include: Optional comma-separated message fields to add
         
     Returns:
-        A list of messages
+        A list of messages, or a page of messages if paginating
     """
     try:
+        if limit is not None or before or after:
+            # Get a page of messages, newest page first
+            return await AsyncChatService.get_conversation_messages_page(
+                agent_id, user_id, limit=limit, before=before, after=after, fields=fields, include=include
+            )
+        
         # Get messages from the database, filtered by user_id if provided
-        messages = ChatService.get_conversation_messages(agent_id, user_id)
+        messages = await AsyncChatService.get_conversation_messages(agent_id, user_id, fields=fields, include=include)
         return messages
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting messages for agent {agent_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting messages: {str(e)}")
 
+@app.get("/api/chat/{agent_id}/messages/{message_id}/logs")
+async def get_message_logs(agent_id: str, message_id: str):
+    """
+    Get the logs of a message, for loading them on demand.
+    
+    Args:
+        agent_id: The ID of the agent
+        message_id: The ID of the message
+        
+    Returns:
+        The message ID and its log entries in order
+    """
+    try:
+        logs = await AsyncChatService.get_message_logs(message_id, agent_id)
+    except Exception as e:
+        logger.error(f"Error getting logs of message {message_id} for agent {agent_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting message logs: {str(e)}")
+    
+    if logs is None:
+        raise HTTPException(status_code=404, detail=f"Message {message_id} not found for agent {agent_id}")
+    
+    return {"messageId": message_id, "logs": logs}
+
 @app.get("/api/chat/{agent_id}/conversations")
-async def get_conversations(agent_id: str, user_id: Optional[str] = None):
+async def get_conversations(
+    agent_id: str,
+    user_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """
     Get conversation history for a specific agent.
     
+    Without pagination parameters every conversation is returned as a list.
+    With limit, before or after, a page of conversations is returned together
+    with the cursors for loading older or newer conversations.
+    
     Args:
         agent_id: The ID of the agent
         user_id: Optional user ID to filter by
+        limit: Optional maximum number of conversations to return
+        before: Optional cursor; return conversations updated before it
+        after: Optional cursor; return conversations updated after it
+        fields: Optional comma-separated conversation fields to return (e.g. "id,title,updatedAt")
         
     Returns:
-        A list of conversations
+        A list of conversations, or a page of conversations if paginating
     """
     try:
+        if limit is not None or before or after:
+            return await AsyncChatService.get_conversation_history_page(
+                agent_id, user_id, limit=limit, before=before, after=after, fields=fields
+            )
+        
         # Get conversation history from the database, filtered by user_id if provided
-        conversations = ChatService.get_conversation_history(agent_id, user_id)
+        conversations = await AsyncChatService.get_conversation_history(agent_id, user_id, fields=fields)
         return conversations
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting conversation history for agent {agent_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting conversation history: {str(e)}")
 
+@app.get("/api/chat/{agent_id}/conversations/summaries")
+async def get_conversation_summaries(
+    agent_id: str,
+    user_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get a page of conversation summaries for a specific agent.
+    
+    Each conversation comes with its message count and the time and a preview
+    of its last message, without any messages, for rendering conversation lists.
+    
+    Args:
+        agent_id: The ID of the agent
+        user_id: Optional user ID to filter by
+        limit: Optional maximum number of conversations to return
+        before: Optional cursor; return conversations updated before it
+        after: Optional cursor; return conversations updated after it
+        fields: Optional comma-separated conversation fields to return
+        
+    Returns:
+        A page of conversation summaries with the cursors for loading older or
+        newer conversations
+    """
+    try:
+        return await AsyncChatService.get_conversation_summaries_page(
+            agent_id, user_id, limit=limit, before=before, after=after, fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting conversation summaries for agent {agent_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting conversation summaries: {str(e)}")
+
 @app.post("/api/chat/{agent_id}/conversations/{conversation_id}/activate")
 async def activate_conversation(agent_id: str, conversation_id: int, user_id: Optional[str] = None):
     """
@@ -308,7 +421,7 @@ async def activate_conversation(agent_id: str, conversation_id: int, user_id: Op
     """
     try:
         # Activate the conversation in the database
-        conversation = ChatService.activate_conversation(conversation_id, agent_id, user_id)
+        conversation = await AsyncChatService.activate_conversation(conversation_id, agent_id, user_id)
         if conversation:
             return conversation
         else:
@@ -331,7 +444,7 @@ async def delete_conversation(agent_id: str, conversation_id: int):
     """
     try:
         # Delete the conversation in the database
-        success = ChatService.delete_conversation(conversation_id)
+        success = await AsyncChatService.delete_conversation(conversation_id)
         if success:
             return {"status": "success", "message": f"Conversation {conversation_id} deleted"}
         else:
@@ -354,7 +467,7 @@ async def clear_messages(agent_id: str, user_id: Optional[str] = None):
     """
     try:
         # Clear the conversation in the database
-        success = ChatService.clear_conversation(agent_id, user_id)
+        success = await AsyncChatService.clear_conversation(agent_id, user_id)
         if success:
             return {"status": "success", "message": f"Conversation with agent {agent_id} cleared"}
         else:
@@ -379,7 +492,7 @@ async def send_message(agent_id: str, message: MessageContent, user_id: Optional
     try:
         # Create user message in the database
         user_message_id = str(uuid.uuid4())
-        user_message = ChatService.add_message(
+        user_message = await AsyncChatService.add_message(
             agent_id=agent_id,
             role="user",
             content=message.content,
@@ -399,14 +512,14 @@ async def send_message(agent_id: str, message: MessageContent, user_id: Optional
                 state = {"messages": []}
                 
                 # Get all previous messages for context
-                previous_messages = ChatService.get_messages_for_agent_state(agent_id, user_id)
+                previous_messages = await AsyncChatService.get_messages_for_agent_state(agent_id, user_id)
                 
                 # Add all messages to the state
                 state["messages"] = previous_messages
                 
-                # Invoke the agent
+                # Invoke the agent in the agent executor so the event loop stays responsive
                 logger.info(f"Invoking {agent_id} agent with {len(previous_messages)} previous messages")
-                result = agent.invoke(state)
+                result = await agent_executor.invoke(agent_id, agent, state)
                 logger.info(f"{agent_id} agent completed processing")
                 
                 # Extract the agent response
@@ -466,7 +579,7 @@ async def send_message(agent_id: str, message: MessageContent, user_id: Optional
                                 break
                 
                 # Create the agent message in the database
-                agent_message = ChatService.add_message(
+                agent_message = await AsyncChatService.add_message(
                     agent_id=agent_id,
                     role="assistant",
                     content=agent_response,
@@ -478,7 +591,7 @@ async def send_message(agent_id: str, message: MessageContent, user_id: Optional
                 logger.error(f"Error invoking {agent_id} agent: {str(e)}")
                 
                 # Create error message in the database
-                agent_message = ChatService.add_message(
+                agent_message = await AsyncChatService.add_message(
                     agent_id=agent_id,
                     role="assistant",
                     content=f"Error: {str(e)}",
@@ -492,7 +605,7 @@ async def send_message(agent_id: str, message: MessageContent, user_id: Optional
             logger.warning(f"Agent {agent_id} not found in registry")
             
             # Create error message in the database
-            agent_message = ChatService.add_message(
+            agent_message = await AsyncChatService.add_message(
                 agent_id=agent_id,
                 role="assistant",
                 content=f"Error: Agent '{agent_id}' not found",
@@ -534,56 +647,51 @@ except ImportError:
     # Fall back to relative import (for Docker environment)
     from backend.agents.base import agent_registry
 
-# Custom log handler for WebSocket
-class WebSocketLogHandler(logging.Handler):
-    """Custom log handler to capture logs and send them to the client via WebSocket."""
+# Log capture for WebSocket chat messages
+class WebSocketLogCapture:
+    """
+    Capture the agent logs of one chat message and send them to the client via WebSocket.
+    
+    Agent logs reach the log pipeline through the process-wide log router,
+    which routes each record by the message ID held in the current context.
+    The context follows the agent run into executor threads, so concurrent
+    sessions only ever receive their own logs.
+    """
     
     def __init__(self, websocket: WebSocket, message_id: str, loop=None):
-        super().__init__()
         self.websocket = websocket
         self.message_id = message_id
         self.loop = loop or asyncio.get_event_loop()
-        self.log_queue = []
-        
-    def emit(self, record):
-        log_entry = self.format(record)
-        
-        # Store log in database
-        try:
-            ChatService.add_log_to_message(self.message_id, log_entry)
-        except Exception as e:
-            print(f"Error storing log in database: {e}")
+        self.token = None
         
-        # Add to queue
-        self.log_queue.append(log_entry)
-        
-        # Send log to client asynchronously
-        try:
-            # Use run_coroutine_threadsafe to properly handle the coroutine
-            asyncio.run_coroutine_threadsafe(self._send_log(log_entry), self.loop)
-        except Exception as e:
-            # Don't raise exceptions from the log handler
-            print(f"Error sending log: {e}")
+        # Register the sink that receives this message's logs
+        self.sink = log_pipeline.register(message_id, websocket.send_json, self.loop)
     
-    async def _send_log(self, log_entry: str):
-        try:
-            # Send log to client
-            await self.websocket.send_json({
-                "type": "log_update",
-                "log": log_entry,
-                "messageId": self.message_id
-            })
-        except Exception as e:
-            # Don't raise exceptions from the log handler
-            print(f"Error in _send_log: {e}")
+    def start(self):
+        """Start routing the logs of the current context to this message."""
+        self.token = log_router.begin(self.message_id)
     
     def get_logs(self):
-        """Get all logs collected by this handler."""
-        return self.log_queue
+        """Get all logs delivered for this message."""
+        return self.sink.get_logs()
+    
+    def close(self):
+        """Stop routing logs and unregister the message's sink."""
+        if self.token is not None:
+            log_router.end(self.token)
+            self.token = None
+        log_pipeline.unregister(self.message_id)
 
 # Helper function to process attachments
 async def process_attachments(attachments, temp_message_id=None):
-    """Process attachments from the WebSocket message."""
+    """
+    Process attachments from the WebSocket message.
+    
+    Attachments uploaded through /api/attachments/uploads are referenced by
+    their ID and linked when the message is stored (only if they are uploads
+    of the sender that no message references yet, see ChatService.add_message);
+    attachments with base64 data (older clients) are decoded and stored.
+    """
     processed_attachments = []
     
     if not attachments:
@@ -599,6 +707,14 @@ async def process_attachments(attachments, temp_message_id=None):
         # Create a database attachment
         db_attachment = None
         
+        # Attachments uploaded in advance only need to be linked
+        if not attachment.get('data') and attachment.get('uploaded') and attachment.get('id'):
+            try:
+                processed_attachments.append({"id": int(attachment['id']), "uploaded": True})
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring uploaded attachment with invalid ID: {attachment['id']}")
+            continue
+        
         # If attachment has base64 data, store it
         if attachment.get('data'):
             try:
@@ -606,7 +722,7 @@ async def process_attachments(attachments, temp_message_id=None):
                 file_data = base64.b64decode(attachment['data'])
                 
                 # Store in database with temporary message ID
-                db_attachment = AttachmentService.add_attachment(
+                db_attachment = await AsyncAttachmentService.add_attachment(
                     message_id=temp_message_id,  # Use temporary ID to satisfy NOT NULL constraint
                     attachment_type=attachment['type'],
                     filename=attachment['filename'],
@@ -626,8 +742,24 @@ async def process_attachments(attachments, temp_message_id=None):
     return processed_attachments
 
 # Helper function to format messages for LLM with image support
-def format_messages_for_llm(messages):
-    """Format messages for the LLM, including image attachments."""
+def format_messages_for_llm(messages, max_images=None):
+    """
+    Format messages for the LLM, including image attachments.
+    
+    Only the most recent images (LLM_CONTEXT_MAX_IMAGES by default) are sent,
+    as their downscaled "llm" variant; older images are replaced by a text
+    reference so the model still knows they were shared.
+    """
+    if max_images is None:
+        max_images = settings.LLM_CONTEXT_MAX_IMAGES
+    
+    # Pick the most recent images to send
+    recent_images = set()
+    for msg in reversed(messages):
+        for attachment in reversed(msg.get("attachments") or []):
+            if attachment["type"].startswith("image/") and len(recent_images) < max_images:
+                recent_images.add(id(attachment))
+    
     formatted_messages = []
     
     for msg in messages:
@@ -647,22 +779,35 @@ def format_messages_for_llm(messages):
         if msg.get("attachments"):
             for attachment in msg["attachments"]:
                 if attachment["type"].startswith("image/"):
+                    if id(attachment) not in recent_images:
+                        # Refer to older images by name instead of sending them again
+                        formatted_msg["content"].append({
+                            "type": "text",
+                            "text": f"[Earlier image: {attachment.get('filename') or 'image'} (attachment {attachment.get('id')}), not included]"
+                        })
+                        continue
+                    
                     # Get the image data
                     image_data = attachment.get("data")
+                    image_type = attachment["type"]
                     
-                    # If we don't have the data directly, try to get it from the attachment service
+                    # Message listings carry only the attachment URL, so load
+                    # the downscaled image from the attachment service
                     if not image_data and attachment.get("id"):
                         try:
-                            attachment_details = AttachmentService.get_attachment(attachment["id"])
+                            attachment_details = AttachmentService.get_attachment(
+                                attachment["id"], include_data=True, variant="llm"
+                            )
                             if attachment_details and attachment_details.get("data"):
                                 image_data = attachment_details["data"]
+                                image_type = attachment_details.get("dataType", image_type)
                                 logger.info(f"Retrieved image data from attachment service for ID: {attachment['id']}")
                         except Exception as e:
                             logger.error(f"Error retrieving attachment data: {str(e)}")
                     
                     if image_data:
                         # Add image content
-                        image_url = f"data:{attachment['type']};base64,{image_data}"
+                        image_url = f"data:{image_type};base64,{image_data}"
                         formatted_msg["content"].append({
                             "type": "image_url",
                             "image_url": {
@@ -752,7 +897,15 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                     # Get user_id from the message data if provided
                     user_id = message_data.get("userId")
                     
-                    user_message = ChatService.add_message(
+                    # Create agent response with a unique ID
+                    agent_message_id = str(uuid.uuid4())
+                    
+                    # Create initial log message
+                    initial_log = f"{datetime.now().strftime('%H:%M:%S')} - Starting processing with {agent_id} agent"
+                    
+                    # Store the user message, link its attachments and add the
+                    # initial log of the agent response in one transaction
+                    user_message = await AsyncChatService.add_message(
                         agent_id=agent_id,
                         role="user",
                         content=content,
@@ -760,37 +913,17 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                         status="sent",
                         message_id=user_message_id,
                         client_message_id=message_data.get("clientMessageId"),
-                        user_id=user_id
+                        user_id=user_id,
+                        attachment_ids=[attachment["id"] for attachment in attachments if attachment.get("uploaded")],
+                        logs=[(agent_message_id, initial_log, datetime.utcnow())]
                     )
                     
-                    # Add attachments to the message
-                    for attachment in attachments:
-                        # Update the message_id for the attachment
-                        AttachmentService.update_attachment_message(
-                            attachment_id=attachment["id"],
-                            message_id=user_message_id
-                        )
-                        
-                        # Add attachment to the user message
-                        if "attachments" not in user_message:
-                            user_message["attachments"] = []
-                        user_message["attachments"].append(attachment)
-                    
                     # Send confirmation back to client
                     await websocket.send_json({
                         "type": "message",
                         "message": user_message
                     })
                     
-                    # Create agent response with a unique ID
-                    agent_message_id = str(uuid.uuid4())
-                    
-                    # Create initial log message
-                    initial_log = f"{datetime.now().strftime('%H:%M:%S')} - Starting processing with {agent_id} agent"
-                    
-                    # Add initial log to the database
-                    ChatService.add_log_to_message(agent_message_id, initial_log)
-                    
                     # Send initial log message
                     await websocket.send_json({
                         "type": "log_update",
@@ -803,41 +936,16 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                     agent = initialized_agents.get(agent_id)
                     
                     if agent:
-                        # Set up a custom log handler to capture logs
-                        ws_handler = WebSocketLogHandler(websocket, agent_message_id)
-                        ws_handler.setLevel(logging.INFO)
-                        ws_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', '%H:%M:%S'))
-                        
-                        # Add the handler to the agent's logger
-                        agent_logger = logging.getLogger(f"mosaic.agents.{agent_id}")
-                        agent_logger.addHandler(ws_handler)
-                        
-                        # For research_supervisor, also add the handler to the specialized agents' loggers
-                        if agent_id == "research_supervisor":
-                            # Add handler to web_search logger
-                            web_search_logger = logging.getLogger("mosaic.agents.web_search")
-                            web_search_logger.addHandler(ws_handler)
-                            
-                            # Add handler to browser_interaction logger
-                            browser_interaction_logger = logging.getLogger("mosaic.agents.browser_interaction")
-                            browser_interaction_logger.addHandler(ws_handler)
-                            
-                            # Add handler to data_processing logger
-                            data_processing_logger = logging.getLogger("mosaic.agents.data_processing")
-                            data_processing_logger.addHandler(ws_handler)
-                            
-                            # Add handler to literature logger
-                            literature_logger = logging.getLogger("mosaic.agents.literature")
-                            literature_logger.addHandler(ws_handler)
-                            
-                            logger.info("Added log handlers to all specialized agents for research_supervisor")
+                        # Capture the agent logs produced while processing this message
+                        log_capture = WebSocketLogCapture(websocket, agent_message_id)
+                        log_capture.start()
                         
                         try:
                             # Initialize the conversation state
                             state = {"messages": []}
                             
                             # Get all previous messages for context
-                            previous_messages = ChatService.get_messages_for_agent_state(agent_id, user_id)
+                            previous_messages = await AsyncChatService.get_messages_for_agent_state(agent_id, user_id)
                             
                             # If this is the file_processing_supervisor agent, modify the last message to include the special flag
                             if agent_id == "file_processing_supervisor" and previous_messages:
@@ -893,7 +1001,7 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                             # If we have images, format messages for vision model
                             if has_images:
                                 logger.info("Detected image attachments, formatting for vision model")
-                                formatted_messages = format_messages_for_llm(previous_messages)
+                                formatted_messages = await run_in_db(format_messages_for_llm, previous_messages)
                                 state["messages"] = formatted_messages
                                 state["use_vision"] = True
                                 
@@ -919,9 +1027,15 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                                 # Add all messages to the state in standard format
                                 state["messages"] = previous_messages
                             
-                            # Invoke the agent
+                            # Invoke the agent in the agent executor so other connections,
+                            # pings and REST requests are not blocked while it runs
                             logger.info(f"Invoking {agent_id} agent with {len(previous_messages)} previous messages")
-                            result = agent.invoke(state)
+                            if message_data.get("stream"):
+                                # Push token deltas and tool events while the agent runs;
+                                # the message frame sent below commits the response
+                                result = await stream_agent_run(agent_id, agent, state, agent_message_id, websocket.send_json)
+                            else:
+                                result = await agent_executor.invoke(agent_id, agent, state)
                             logger.info(f"{agent_id} agent completed processing")
                             
                             # Extract the agent response
@@ -987,8 +1101,12 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                                             logger.info(f"Found AI response in object: {agent_response[:50]}...")
                                             break
                             
-                            # Create the agent message in the database
-                            agent_message = ChatService.add_message(
+                            # Wait until the logs captured so far are persisted and sent,
+                            # so they arrive before the final response
+                            await log_pipeline.drain(agent_message_id)
+                            
+                            # Create the agent message in the database, together with its logs
+                            agent_message = await AsyncChatService.add_message(
                                 agent_id=agent_id,
                                 role="assistant",
                                 content=agent_response,
@@ -997,15 +1115,11 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                                 user_id=user_id
                             )
                             
-                            # Send agent response back to client with a small delay
-                            # This ensures the logs have time to be processed
-                            await asyncio.sleep(0.5)
-                            
                             # Log that we're sending the response
                             logger.info(f"Sending agent response back to client: {agent_message['id']}")
                             
                             # Add logs to the message for the response
-                            agent_message["logs"] = ws_handler.get_logs()
+                            agent_message["logs"] = log_capture.get_logs()
                             
                             await websocket.send_json({
                                 "type": "message",
@@ -1015,8 +1129,9 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                         except Exception as e:
                             logger.error(f"Error invoking {agent_id} agent: {str(e)}")
                             
-                            # Create error message in the database
-                            error_message = ChatService.add_message(
+                            # Create error message in the database, together with its logs
+                            await log_pipeline.drain(agent_message_id)
+                            error_message = await AsyncChatService.add_message(
                                 agent_id=agent_id,
                                 role="assistant",
                                 content=f"Error: {str(e)}",
@@ -1028,7 +1143,7 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                             )
                             
                             # Add logs to the message for the response
-                            error_message["logs"] = ws_handler.get_logs()
+                            error_message["logs"] = log_capture.get_logs()
                             
                             # Send error message back to client
                             await websocket.send_json({
@@ -1037,40 +1152,15 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                             })
                         
                         finally:
-                            # Remove the custom log handler from the agent's logger
-                            if ws_handler in agent_logger.handlers:
-                                agent_logger.removeHandler(ws_handler)
-                            
-                            # For research_supervisor, also remove the handler from the specialized agents' loggers
-                            if agent_id == "research_supervisor":
-                                # Remove handler from web_search logger
-                                web_search_logger = logging.getLogger("mosaic.agents.web_search")
-                                if ws_handler in web_search_logger.handlers:
-                                    web_search_logger.removeHandler(ws_handler)
-                                
-                                # Remove handler from browser_interaction logger
-                                browser_interaction_logger = logging.getLogger("mosaic.agents.browser_interaction")
-                                if ws_handler in browser_interaction_logger.handlers:
-                                    browser_interaction_logger.removeHandler(ws_handler)
-                                
-                                # Remove handler from data_processing logger
-                                data_processing_logger = logging.getLogger("mosaic.agents.data_processing")
-                                if ws_handler in data_processing_logger.handlers:
-                                    data_processing_logger.removeHandler(ws_handler)
-                                
-                                # Remove handler from literature logger
-                                literature_logger = logging.getLogger("mosaic.agents.literature")
-                                if ws_handler in literature_logger.handlers:
-                                    literature_logger.removeHandler(ws_handler)
-                                
-                                logger.info("Removed log handlers from all specialized agents for research_supervisor")
+                            # Stop capturing and forwarding this message's logs
+                            log_capture.close()
                     
                     else:
                         # Agent not found
                         logger.warning(f"Agent {agent_id} not found in registry")
                         
                         # Create error message in the database
-                        agent_message = ChatService.add_message(
+                        agent_message = await AsyncChatService.add_message(
                             agent_id=agent_id,
                             role="assistant",
                             content=f"Error: Agent '{agent_id}' not found",
@@ -1102,7 +1192,7 @@ async def chat_websocket_endpoint(websocket: WebSocket, agent_id: str):
                     user_id = data.get("userId")
                     
                     # Clear the conversation in the database
-                    success = ChatService.clear_conversation(agent_id, user_id)
+                    success = await AsyncChatService.clear_conversation(agent_id, user_id)
                     
                     # Send confirmation back to client
                     await websocket.send_json({
@@ -1248,6 +1338,81 @@ except ImportError:
     from backend.app.agent_api import agent_api
     from backend.app.request_tracker import request_tracker
 
+# Import the agent executor, streaming support, log pipeline, log retention and worker pool
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.agent_executor import agent_executor
+    from mosaic.backend.app.agent_streaming import stream_agent_run
+    from mosaic.backend.app.log_pipeline import log_pipeline, log_router
+    from mosaic.backend.app.agent_worker_pool import AgentWorkerPool
+    from mosaic.backend.app.agent_warmup import agent_warmup
+    from mosaic.backend.app.log_retention import log_retention
+    from mosaic.backend.app.conversation_archiver import conversation_archiver
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.agent_executor import agent_executor
+    from backend.app.agent_streaming import stream_agent_run
+    from backend.app.log_pipeline import log_pipeline, log_router
+    from backend.app.agent_worker_pool import AgentWorkerPool
+    from backend.app.agent_warmup import agent_warmup
+    from backend.app.log_retention import log_retention
+    from backend.app.conversation_archiver import conversation_archiver
+
+# Route agent logs to the chat message being processed
+log_router.install("mosaic.agents")
+
+@app.get("/api/executor/stats")
+async def get_executor_stats():
+    """Get agent executor statistics, including per-agent queue depth and recent job timing."""
+    return agent_executor.get_stats()
+
+@app.get("/api/database/stats")
+async def get_database_stats():
+    """Get statistics of the database threads that serve async routes and of the single writer."""
+    stats = db_executor.get_stats()
+    stats["writer"] = database_writer.get_stats()
+    return stats
+
+@app.get("/api/log-pipeline/stats")
+async def get_log_pipeline_stats():
+    """Get log pipeline statistics, including buffered, written and dropped records."""
+    return log_pipeline.get_stats()
+
+@app.get("/api/log-retention/stats")
+async def get_log_retention_stats():
+    """Get message log retention statistics, including compacted messages and pruned log segments."""
+    return log_retention.get_stats()
+
+@app.get("/api/conversation-archive/stats")
+async def get_conversation_archive_stats():
+    """Get conversation archival statistics, including archived conversations and vacuumed pages."""
+    return conversation_archiver.get_stats()
+
+@app.get("/api/health/ready")
+async def get_readiness():
+    """
+    Readiness check for load balancers.
+    
+    Returns 200 once the agents have been loaded and compiled (in this process,
+    or in a worker process when agents run in a worker pool) and 503 until then,
+    with the warm-up status and time of each agent.
+    """
+    worker_pool = agent_executor.worker_pool
+    
+    if worker_pool is not None:
+        # Workers report ready only after warming up their agents
+        ready = worker_pool.is_ready()
+        workers = worker_pool.get_stats()["workers"]
+        warmup = next((worker["warmup"] for worker in workers if worker["ready"] and worker["warmup"]), None)
+        status = {"ready": ready, "workers": workers, "agents": (warmup or {}).get("agents", {})}
+    else:
+        status = agent_warmup.get_status()
+        if not settings.AGENT_WARMUP_ENABLED:
+            # Without a warm-up the agents are ready to load on first use
+            status["ready"] = True
+    
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 # Initialize the agents on startup
 @app.on_event("startup")
 async def startup_event():
@@ -1257,15 +1422,37 @@ async def startup_event():
     init_db()
     logger.info("Database initialized")
     
+    # Compact and prune old message logs in the background
+    log_retention.start()
+    
+    # Archive inactive conversations in the background
+    conversation_archiver.start()
+    
     # Initialize the agents
     logger.info("Initializing agents")
     initialize_agents()
     logger.info("Agents initialized")
+    
+    # Run agents in separate worker processes if configured
+    if settings.AGENT_WORKER_PROCESSES > 0:
+        worker_pool = AgentWorkerPool(
+            processes=settings.AGENT_WORKER_PROCESSES,
+            max_jobs_per_worker=settings.AGENT_WORKER_MAX_JOBS,
+            heartbeat_interval=settings.AGENT_WORKER_HEARTBEAT_INTERVAL,
+            heartbeat_timeout=settings.AGENT_WORKER_HEARTBEAT_TIMEOUT,
+            warm_up=settings.AGENT_WARMUP_ENABLED
+        )
+        worker_pool.start()
+        agent_executor.worker_pool = worker_pool
+        logger.info(f"Agent worker pool started with {settings.AGENT_WORKER_PROCESSES} processes")
+    elif settings.AGENT_WARMUP_ENABLED:
+        # Load and compile the agents in the background while the server starts serving
+        agent_warmup.start(get_initialized_agents())
 
 # Close database connection and request tracker on shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close database connection and request tracker on shutdown."""
+    """Stop the background work, then close the database connection and request tracker."""
     try:
         # Try importing with the full package path (for local development)
         from mosaic.backend.database import close_db_connection
@@ -1273,6 +1460,34 @@ async def shutdown_event():
         # Fall back to relative import (for Docker environment)
         from backend.database import close_db_connection
     
+    # Stop everything that writes to the database before the writer:
+    # agent runs, log flushes, log retention and conversation archival
+    
+    # Shut down the agent executor
+    logger.info("Shutting down agent executor")
+    agent_executor.shutdown()
+    logger.info("Agent executor shut down")
+    
+    # Stop the agent worker processes
+    if agent_executor.worker_pool is not None:
+        agent_executor.worker_pool.shutdown()
+        agent_executor.worker_pool = None
+    
+    # Flush any buffered logs
+    log_pipeline.shutdown()
+    
+    # Stop the message log retention
+    log_retention.shutdown()
+    
+    # Stop the conversation archival
+    conversation_archiver.shutdown()
+    
+    # Stop the database threads used by async routes
+    db_executor.shutdown()
+    
+    # Commit the queued writes and stop the writer thread
+    database_writer.shutdown()
+    
     logger.info("Closing database connection")
     close_db_connection()
     logger.info("Database connection closed")
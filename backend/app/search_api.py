@@ -0,0 +1,63 @@
+"""
+Search API Module for MOSAIC
+
+This module searches the messages of past conversations at
+GET /api/search/messages. Results are ranked by relevance, carry a snippet
+of the message with the matched terms in <mark> tags, and are paged with the
+nextCursor of the previous page.
+"""
+
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+# Import the database modules
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database import AsyncChatService
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database import AsyncChatService
+
+# Configure logging
+logger = logging.getLogger("mosaic.backend.app.search_api")
+
+# Create router
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("/messages")
+async def search_messages(
+    q: str,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+):
+    """
+    Search the messages of past conversations.
+
+    Args:
+        q: The search text; every word must match, a trailing * matches a prefix
+        user_id: Optional user ID to filter by
+        agent_id: Optional agent ID to filter by
+        start: Optional earliest message timestamp (Unix milliseconds)
+        end: Optional latest message timestamp (Unix milliseconds)
+        limit: Optional maximum number of results to return
+        after: Optional cursor of the next page
+
+    Returns:
+        A page of search results, best match first
+    """
+    try:
+        return await AsyncChatService.search_messages(
+            q, user_id=user_id, agent_id=agent_id, start=start, end=end, limit=limit, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching messages: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching messages: {str(e)}")
@@ -21,10 +21,10 @@ logger = logging.getLogger("mosaic.user_api")
 # Import the user preference service
 try:
     # Try importing with the full package path (for local development)
-    from mosaic.backend.database import UserPreferenceService
+    from mosaic.backend.database import AsyncUserPreferenceService
 except ImportError:
     # Fall back to relative import (for Docker environment)
-    from backend.database import UserPreferenceService
+    from backend.database import AsyncUserPreferenceService
 
 # Models for user preferences
 class UserPreferenceCreate(BaseModel):
@@ -80,7 +80,7 @@ async def get_user_preferences(user_id: str = Depends(get_current_user_id)):
     """
     try:
         # Get or create the user preferences
-        user_preference = UserPreferenceService.get_or_create_user_preference(user_id)
+        user_preference = await AsyncUserPreferenceService.get_or_create_user_preference(user_id)
         
         if not user_preference:
             raise HTTPException(status_code=404, detail="User preferences not found")
@@ -107,7 +107,7 @@ async def create_user_preferences(
     """
     try:
         # Create the user preferences
-        user_preference = UserPreferenceService.create_user_preference(
+        user_preference = await AsyncUserPreferenceService.create_user_preference(
             user_id=user_id,
             theme=preferences.theme,
             language=preferences.language,
@@ -137,7 +137,7 @@ async def update_user_preferences(
     """
     try:
         # Update the user preferences
-        user_preference = UserPreferenceService.update_user_preference(
+        user_preference = await AsyncUserPreferenceService.update_user_preference(
             user_id=user_id,
             theme=preferences.theme,
             language=preferences.language,
@@ -166,7 +166,7 @@ async def delete_user_preferences(user_id: str = Depends(get_current_user_id)):
     """
     try:
         # Delete the user preferences
-        success = UserPreferenceService.delete_user_preference(user_id)
+        success = await AsyncUserPreferenceService.delete_user_preference(user_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="User preferences not found")
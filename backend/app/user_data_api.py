@@ -4,23 +4,20 @@ User Data API for MOSAIC
 This module provides API endpoints for user data export and deletion.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
-import json
-import os
-import shutil
-import tempfile
-import zipfile
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from typing import Dict, Any, List, Optional
 import logging
 
 from sqlalchemy.orm import Session
+from .config import settings
 from .database import get_db
 from ..database.user_repository import UserRepository
-from ..database.repository import ConversationRepository, MessageRepository, AttachmentRepository, AgentRepository, UserPreferenceRepository
-from ..database.database import get_db_session
-from ..database.models import Conversation, Message, MessageLog, Attachment
+from ..database.repository import AgentRepository, UserPreferenceRepository
+from ..database.async_service import run_in_db
+from ..database.export import iter_user_export
+from ..database.purge import purge_user_conversations
+from .export_jobs import export_jobs
 
 # Configure logging
 logger = logging.getLogger("mosaic.app.user_data_api")
@@ -34,130 +31,102 @@ def get_user_data_api_router():
     """
     router = APIRouter(prefix="/api/user-data", tags=["user-data"])
     
+    async def get_user_dict(user_id: str, db: Session) -> Dict[str, Any]:
+        """Get the dictionary of a user, raising a 404 if the user does not exist."""
+        user_repo = UserRepository(db)
+        user = await run_in_db(user_repo.get_user, user_id)
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        return user_repo.user_to_dict(user)
+    
     @router.get("/export")
-    async def export_user_data(user_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    async def export_user_data(user_id: str, db: Session = Depends(get_db)):
         """
         Export all data for a user.
         
+        The ZIP archive is streamed while it is written, with one NDJSON file
+        per kind of data and the content of every attachment. For very large
+        accounts, start an export job instead and download its archive.
+        
         Args:
             user_id: The Clerk user ID
-            background_tasks: Background tasks for cleanup
             db: The database session
             
         Returns:
-            A ZIP file containing all user data
+            A streamed ZIP file containing all user data
         """
-        # Check if the user exists
-        user_repo = UserRepository(db)
-        user = user_repo.get_user(user_id)
+        user = await get_user_dict(user_id, db)
         
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        return StreamingResponse(
+            iter_user_export(user, user_id),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="mosaic_user_data_{user_id}.zip"'}
+        )
+    
+    @router.post("/export/jobs", status_code=202)
+    async def start_export_job(user_id: str, db: Session = Depends(get_db)):
+        """
+        Start exporting all data for a user in the background.
         
-        # Create a temporary directory to store the data
-        temp_dir = tempfile.mkdtemp()
-        zip_path = os.path.join(temp_dir, f"user_data_{user_id}.zip")
+        Args:
+            user_id: The Clerk user ID
+            db: The database session
+            
+        Returns:
+            The export job, whose progress is polled at /export/jobs/{job_id}
+        """
+        user = await get_user_dict(user_id, db)
         
         try:
-            # Create a ZIP file
-            with zipfile.ZipFile(zip_path, "w") as zip_file:
-                # Export user data
-                user_data = user_repo.user_to_dict(user)
-                user_file = os.path.join(temp_dir, "user.json")
-                with open(user_file, "w") as f:
-                    json.dump(user_data, f, indent=2)
-                zip_file.write(user_file, "user.json")
-                
-                # Export user preferences
-                user_preference_repo = UserPreferenceRepository()
-                user_preference = user_preference_repo.get_user_preference(user_id)
-                if user_preference:
-                    user_preference_data = user_preference_repo.to_dict(user_preference)
-                    user_preference_file = os.path.join(temp_dir, "user_preferences.json")
-                    with open(user_preference_file, "w") as f:
-                        json.dump(user_preference_data, f, indent=2)
-                    zip_file.write(user_preference_file, "user_preferences.json")
-                
-                # Export conversations
-                conversation_repo = ConversationRepository()
-                conversations = conversation_repo.get_conversations_for_user(user_id)
-                conversations_data = [conversation_repo.to_dict(conv) for conv in conversations]
-                conversations_file = os.path.join(temp_dir, "conversations.json")
-                with open(conversations_file, "w") as f:
-                    json.dump(conversations_data, f, indent=2)
-                zip_file.write(conversations_file, "conversations.json")
-                
-                # Export messages
-                message_repo = MessageRepository()
-                messages = message_repo.get_messages_for_user(user_id)
-                messages_data = [message_repo.to_dict(msg) for msg in messages]
-                messages_file = os.path.join(temp_dir, "messages.json")
-                with open(messages_file, "w") as f:
-                    json.dump(messages_data, f, indent=2)
-                zip_file.write(messages_file, "messages.json")
-                
-                # Export attachments
-                attachment_repo = AttachmentRepository()
-                attachments = attachment_repo.get_attachments_for_user(user_id)
-                attachments_data = [attachment_repo.to_dict(att) for att in attachments]
-                attachments_file = os.path.join(temp_dir, "attachments.json")
-                with open(attachments_file, "w") as f:
-                    json.dump(attachments_data, f, indent=2)
-                zip_file.write(attachments_file, "attachments.json")
-                
-                # Export agents
-                agent_repo = AgentRepository()
-                agents = agent_repo.get_agents_for_user(user_id)
-                agents_data = [agent_repo.to_dict(agent) for agent in agents]
-                agents_file = os.path.join(temp_dir, "agents.json")
-                with open(agents_file, "w") as f:
-                    json.dump(agents_data, f, indent=2)
-                zip_file.write(agents_file, "agents.json")
-                
-                # Add a README file
-                readme = f"""
-                # MOSAIC User Data Export
-                
-                This ZIP file contains all data associated with your MOSAIC account.
-                
-                ## Files
-                
-                - user.json: Your user profile information
-                - user_preferences.json: Your user preferences
-                - conversations.json: Your conversations
-                - messages.json: Your messages
-                - attachments.json: Your attachments
-                - agents.json: Your custom agents
-                
-                ## Export Date
-                
-                {datetime.now().isoformat()}
-                
-                ## User ID
-                
-                {user_id}
-                """
-                
-                readme_file = os.path.join(temp_dir, "README.md")
-                with open(readme_file, "w") as f:
-                    f.write(readme)
-                zip_file.write(readme_file, "README.md")
+            return export_jobs.start(user_id, user).to_dict()
+        except Exception as e:
+            logger.error(f"Error starting the export of user data: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error exporting user data: {str(e)}")
+    
+    def get_export_job(job_id: str, user_id: str):
+        """Get the export job of a user, raising a 404 if it does not exist."""
+        job = export_jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
+        return job
+    
+    @router.get("/export/jobs/{job_id}")
+    async def get_export_job_status(job_id: str, user_id: str):
+        """
+        Get the status and progress of an export job.
+        
+        Args:
+            job_id: The ID of the export job
+            user_id: The Clerk user ID
             
-            # Schedule cleanup of temporary directory
-            background_tasks.add_task(shutil.rmtree, temp_dir)
+        Returns:
+            The export job, with its download URL once it has completed
+        """
+        return get_export_job(job_id, user_id).to_dict()
+    
+    @router.get("/export/jobs/{job_id}/download")
+    async def download_export(job_id: str, user_id: str):
+        """
+        Download the archive written by an export job.
+        
+        Args:
+            job_id: The ID of the export job
+            user_id: The Clerk user ID
             
-            # Return the ZIP file
-            return FileResponse(
-                zip_path,
-                media_type="application/zip",
-                filename=f"mosaic_user_data_{user_id}.zip"
-            )
+        Returns:
+            The ZIP file containing all user data
+        """
+        job = get_export_job(job_id, user_id)
+        if job.status != "completed":
+            raise HTTPException(status_code=409, detail=f"Export job {job_id} is {job.status}")
         
-        except Exception as e:
-            # Clean up temporary directory
-            shutil.rmtree(temp_dir)
-            logger.error(f"Error exporting user data: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error exporting user data: {str(e)}")
+        return FileResponse(
+            export_jobs.path(job_id),
+            media_type="application/zip",
+            filename=f"mosaic_user_data_{user_id}.zip"
+        )
     
     @router.delete("/delete")
     async def delete_user_data(user_id: str, db: Session = Depends(get_db)):
@@ -173,32 +142,43 @@ def get_user_data_api_router():
         """
         # Check if the user exists
         user_repo = UserRepository(db)
-        user = user_repo.get_user(user_id)
+        user = await run_in_db(user_repo.get_user, user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         try:
-            # Delete user preferences
-            user_preference_repo = UserPreferenceRepository()
-            user_preference_repo.delete_user_preference(user_id)
+            def delete_all():
+                """Delete the user and their data (runs on a database thread)."""
+                # Delete user preferences
+                user_preference_repo = UserPreferenceRepository()
+                user_preference_repo.delete_user_preference(user_id)
             
-            # Delete conversations and messages
-            conversation_repo = ConversationRepository()
-            conversations = conversation_repo.get_conversations_for_user(user_id)
-            for conversation in conversations:
-                conversation_repo.delete_conversation(conversation.id)
+                # Delete conversations and messages in batches
+                progress = purge_user_conversations(
+                    user_id,
+                    batch_size=settings.USER_PURGE_BATCH_SIZE,
+                    pause=settings.USER_PURGE_PAUSE
+                )
             
-            # Delete agents
-            agent_repo = AgentRepository()
-            agents = agent_repo.get_agents_for_user(user_id)
-            for agent in agents:
-                agent_repo.delete_agent(agent.id)
+                # Delete the agents of the user (not the public ones)
+                agent_repo = AgentRepository()
+                for agent in agent_repo.get_all_agents(user_id):
+                    if agent.user_id == user_id:
+                        agent_repo.delete_agent(agent.id)
             
-            # Delete the user
-            user_repo.delete_user(user_id)
+                # Delete the user
+                user_repo.delete_user(user_id)
+                
+                return progress
             
-            return JSONResponse(content={"status": "success", "message": "User data deleted successfully"})
+            progress = await run_in_db(delete_all)
+            
+            return JSONResponse(content={
+                "status": "success",
+                "message": "User data deleted successfully",
+                "deleted": progress.to_dict()
+            })
         
         except Exception as e:
             logger.error(f"Error deleting user data: {str(e)}")
@@ -218,7 +198,8 @@ def get_user_data_api_router():
         """
         # Create or update the user if it doesn't exist
         user_repo = UserRepository(db)
-        user = user_repo.create_or_update_user(
+        user = await run_in_db(
+            user_repo.create_or_update_user,
             user_id=user_id,
             email=None,
             first_name=None,
@@ -227,73 +208,18 @@ def get_user_data_api_router():
         )
         
         try:
-            # Get all conversations for the user
-            with get_db_session() as session:
-                # Get count of conversations before deletion for logging
-                conversations = session.query(Conversation).filter(
-                    Conversation.user_id == user_id
-                ).all()
-                
-                conversation_count = len(conversations)
-                conversation_ids = [conv.id for conv in conversations]
-                
-                # Get count of messages before deletion for logging
-                message_count = session.query(Message).filter(
-                    Message.conversation_id.in_(conversation_ids)
-                ).count() if conversation_ids else 0
-                
-                # Get all message IDs for the conversations
-                message_ids = [
-                    msg.id for msg in session.query(Message).filter(
-                        Message.conversation_id.in_(conversation_ids)
-                    ).all()
-                ] if conversation_ids else []
-                
-                # Get count of logs and attachments before deletion for logging
-                log_count = session.query(MessageLog).filter(
-                    MessageLog.message_id.in_(message_ids)
-                ).count() if message_ids else 0
-                
-                attachment_count = session.query(Attachment).filter(
-                    Attachment.message_id.in_(message_ids)
-                ).count() if message_ids else 0
-                
-                logger.info(f"Found {conversation_count} conversations, {message_count} messages, {log_count} logs, and {attachment_count} attachments for user {user_id}")
-                
-                # Delete all message logs (foreign key to messages)
-                if message_ids:
-                    session.query(MessageLog).filter(
-                        MessageLog.message_id.in_(message_ids)
-                    ).delete(synchronize_session=False)
-                    logger.info(f"Deleted {log_count} message logs for user {user_id}")
-                
-                # Delete all attachments (foreign key to messages)
-                if message_ids:
-                    session.query(Attachment).filter(
-                        Attachment.message_id.in_(message_ids)
-                    ).delete(synchronize_session=False)
-                    logger.info(f"Deleted {attachment_count} attachments for user {user_id}")
-                
-                # Delete all messages (foreign key to conversations)
-                if conversation_ids:
-                    session.query(Message).filter(
-                        Message.conversation_id.in_(conversation_ids)
-                    ).delete(synchronize_session=False)
-                    logger.info(f"Deleted {message_count} messages for user {user_id}")
-                
-                # Delete all conversations
-                if conversation_ids:
-                    session.query(Conversation).filter(
-                        Conversation.id.in_(conversation_ids)
-                    ).delete(synchronize_session=False)
-                    logger.info(f"Deleted {conversation_count} conversations for user {user_id}")
-                
-                # Commit the transaction
-                session.commit()
+            progress = await run_in_db(
+                purge_user_conversations,
+                user_id,
+                batch_size=settings.USER_PURGE_BATCH_SIZE,
+                pause=settings.USER_PURGE_PAUSE
+            )
+            logger.info(f"Cleared the conversations of user {user_id}: {progress.to_dict()}")
             
             return JSONResponse(content={
                 "status": "success", 
-                "message": f"Cleared {conversation_count} conversations, {message_count} messages, {log_count} logs, and {attachment_count} attachments for user {user_id}"
+                "message": f"Cleared {progress.conversations} conversations, {progress.messages} messages, {progress.logs} logs, and {progress.attachments} attachments for user {user_id}",
+                "deleted": progress.to_dict()
             })
         
         except Exception as e:
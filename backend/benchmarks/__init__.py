@@ -0,0 +1,6 @@
+"""
+Benchmarks for MOSAIC.
+
+This package contains standalone scripts that measure the performance of
+performance-sensitive code paths.
+"""
@@ -0,0 +1,121 @@
+"""
+Benchmark for concurrent message listing.
+
+This script compares listing conversation messages from async code with the
+sync ChatService (every query blocks the event loop) and with the
+AsyncChatService (queries run on the database threads). It seeds a scratch
+SQLite database, starts a number of concurrent listing requests on one event
+loop, and reports the total time and the worst event loop stall, measured by
+a ticker task that should wake up every millisecond.
+
+Usage:
+    python -m backend.benchmarks.concurrent_listing [--requests 50] [--messages 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Tuple
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database import database
+    from mosaic.backend.database.service import ChatService
+    from mosaic.backend.database.async_service import AsyncChatService, db_executor
+    from mosaic.backend.benchmarks.message_serializer import seed_conversation
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database import database
+    from backend.database.service import ChatService
+    from backend.database.async_service import AsyncChatService, db_executor
+    from backend.benchmarks.message_serializer import seed_conversation
+
+# How often the ticker task expects to run
+TICK_INTERVAL = 0.001
+
+
+async def list_messages_sync() -> None:
+    """List the messages the old way, blocking the event loop."""
+    ChatService.get_conversation_messages("benchmark")
+
+
+async def list_messages_async() -> None:
+    """List the messages without blocking the event loop."""
+    await AsyncChatService.get_conversation_messages("benchmark")
+
+
+async def measure(request: Callable[[], Awaitable[None]], requests: int) -> Tuple[float, float]:
+    """
+    Run concurrent listing requests and measure the time and event loop stalls.
+
+    Args:
+        request: The coroutine function that lists the messages
+        requests: The number of concurrent requests
+
+    Returns:
+        A tuple of (total milliseconds, worst event loop stall in milliseconds)
+    """
+    worst_stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal worst_stall
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK_INTERVAL)
+            worst_stall = max(worst_stall, time.perf_counter() - started - TICK_INTERVAL)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[request() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+
+    running = False
+    await ticker_task
+
+    return elapsed * 1000, worst_stall * 1000
+
+
+def run_benchmark(requests: int, messages: int) -> None:
+    """
+    Run the benchmark and print a report.
+
+    Args:
+        requests: The number of concurrent listing requests
+        messages: The number of messages in the listed conversation
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database.configure_database(f"sqlite:///{os.path.join(temp_dir, 'benchmark.db')}")
+        database.init_db()
+        seed_conversation(messages)
+
+        # Warm up the connection pool and the database threads
+        asyncio.run(measure(list_messages_async, db_executor.max_workers))
+
+        print(f"{requests} concurrent listings of {messages} messages ({db_executor.max_workers} database threads)")
+        print(f"{'service':>10} {'total ms':>10} {'worst loop stall ms':>20}")
+
+        for name, request in (("sync", list_messages_sync), ("async", list_messages_async)):
+            total_ms, stall_ms = asyncio.run(measure(request, requests))
+            print(f"{name:>10} {total_ms:>10.1f} {stall_ms:>20.1f}")
+
+        db_executor.shutdown()
+        database.close_db_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent message listing")
+    parser.add_argument("--requests", type=int, default=50, help="Number of concurrent listing requests")
+    parser.add_argument("--messages", type=int, default=200, help="Number of messages in the conversation")
+    args = parser.parse_args()
+
+    run_benchmark(args.requests, args.messages)
@@ -0,0 +1,112 @@
+"""
+Benchmark for concurrent message inserts.
+
+This script compares inserting messages from many threads with each insert
+committing its own transaction on a pooled connection (the writer disabled)
+and with the inserts queued to the single writer, which commits them in
+groups. It seeds a scratch SQLite database, starts a number of threads that
+each insert messages through the MessageRepository, and reports the inserts
+per second and the number of inserts that failed (e.g. "database is locked").
+
+Usage:
+    python -m backend.benchmarks.message_inserts [--threads 16] [--inserts 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Tuple
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database import database
+    from mosaic.backend.database.repository import ConversationRepository, MessageRepository
+    from mosaic.backend.database.writer import database_writer
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database import database
+    from backend.database.repository import ConversationRepository, MessageRepository
+    from backend.database.writer import database_writer
+
+
+def measure(conversation_id: int, threads: int, inserts: int) -> Tuple[float, int]:
+    """
+    Insert messages from concurrent threads.
+
+    Args:
+        conversation_id: The ID of the conversation to insert into
+        threads: The number of inserting threads
+        inserts: The number of inserts per thread
+
+    Returns:
+        A tuple of (inserts per second, failed inserts)
+    """
+    failed = 0
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def insert_messages():
+        nonlocal failed
+        start.wait()
+        for i in range(inserts):
+            try:
+                MessageRepository.create_message(conversation_id, "assistant", f"Message {i}")
+            except Exception:
+                with lock:
+                    failed += 1
+
+    workers = [threading.Thread(target=insert_messages) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    start.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    return (threads * inserts - failed) / elapsed, failed
+
+
+def run_benchmark(threads: int, inserts: int) -> None:
+    """
+    Run the benchmark and print a report.
+
+    Args:
+        threads: The number of inserting threads
+        inserts: The number of inserts per thread
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database.configure_database(f"sqlite:///{os.path.join(temp_dir, 'benchmark.db')}")
+        database.init_db()
+        conversation_id = ConversationRepository.create_conversation("benchmark").id
+
+        print(f"{threads} threads x {inserts} message inserts")
+        print(f"{'writer':>10} {'inserts/s':>10} {'failed':>8}")
+
+        for name, enabled in (("disabled", False), ("enabled", True)):
+            database_writer.enabled = enabled
+            rate, failed = measure(conversation_id, threads, inserts)
+            print(f"{name:>10} {rate:>10.0f} {failed:>8}")
+
+        stats = database_writer.get_stats()
+        print(f"writer: {stats['batches']} group commits, {stats['avg_batch']} inserts per commit on average")
+
+        database_writer.shutdown()
+        database.close_db_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent message inserts")
+    parser.add_argument("--threads", type=int, default=16, help="Number of inserting threads")
+    parser.add_argument("--inserts", type=int, default=200, help="Number of inserts per thread")
+    args = parser.parse_args()
+
+    run_benchmark(args.threads, args.inserts)
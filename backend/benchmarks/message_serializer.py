@@ -0,0 +1,183 @@
+"""
+Benchmark for the message serializer.
+
+This script compares the per-message serializer (message_to_dict, which
+issues several queries for every message) with the batched serializer used
+by ChatService.get_conversation_messages. It seeds a scratch SQLite database
+with conversations of 10, 100 and 1000 messages and reports the number of
+SQL statements and the latency of each approach.
+
+Usage:
+    python -m backend.benchmarks.message_serializer [--sizes 10,100,1000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import event, insert
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database import database
+    from mosaic.backend.database.models import Conversation, Message, MessageLogSegment, Attachment
+    from mosaic.backend.database.log_segments import build_segments
+    from mosaic.backend.database.repository import MessageRepository, message_to_dict
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database import database
+    from backend.database.models import Conversation, Message, MessageLogSegment, Attachment
+    from backend.database.log_segments import build_segments
+    from backend.database.repository import MessageRepository, message_to_dict
+
+# Number of logs per assistant message and how often a message has an attachment
+LOGS_PER_MESSAGE = 3
+ATTACHMENT_EVERY = 10
+
+
+@contextmanager
+def count_queries(engine):
+    """
+    Count the SQL statements executed on an engine.
+
+    Args:
+        engine: The SQLAlchemy engine to instrument
+
+    Yields:
+        A single-item list holding the running count
+    """
+    counter = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seed_conversation(message_count: int) -> int:
+    """
+    Create a conversation with the given number of messages.
+
+    Every assistant message gets a few logs, and every tenth message gets a
+    small image attachment.
+
+    Args:
+        message_count: The number of messages to create
+
+    Returns:
+        The ID of the conversation
+    """
+    with database.get_db_session() as session:
+        conversation = Conversation(agent_id="benchmark", title=f"Benchmark {message_count}")
+        session.add(conversation)
+        session.flush()
+
+        for i in range(message_count):
+            role = "user" if i % 2 == 0 else "assistant"
+            message = Message(
+                id=str(uuid.uuid4()),
+                conversation_id=conversation.id,
+                role=role,
+                content=f"Message {i}",
+                timestamp=1700000000000 + i,
+                status="sent"
+            )
+            session.add(message)
+
+            if role == "assistant":
+                session.execute(insert(MessageLogSegment), build_segments(
+                    (message.id, f"Log {j} for message {i}", None) for j in range(LOGS_PER_MESSAGE)
+                ))
+
+            if i % ATTACHMENT_EVERY == 0:
+                session.add(Attachment(
+                    message_id=message.id,
+                    type="image/png",
+                    filename=f"image_{i}.png",
+                    content_type="image/png",
+                    size=16,
+                    data=b"\x89PNG" + bytes(12)
+                ))
+
+        return conversation.id
+
+
+def serialize_per_message(conversation_id: int) -> List[Dict[str, Any]]:
+    """Serialize a conversation the old way, one message at a time."""
+    messages = MessageRepository.get_messages_for_conversation(conversation_id)
+    return [message_to_dict(message) for message in messages]
+
+
+def serialize_batched(conversation_id: int) -> List[Dict[str, Any]]:
+    """Serialize a conversation with the batched serializer."""
+    return MessageRepository.get_message_dicts_for_conversation(conversation_id)
+
+
+def measure(func: Callable[[int], List[Dict[str, Any]]], conversation_id: int) -> Tuple[List[Dict[str, Any]], int, float]:
+    """
+    Run a serializer and measure its query count and latency.
+
+    Args:
+        func: The serializer to run
+        conversation_id: The ID of the conversation to serialize
+
+    Returns:
+        A tuple of (result, query count, latency in milliseconds)
+    """
+    with count_queries(database.get_engine()) as counter:
+        started = time.perf_counter()
+        result = func(conversation_id)
+        elapsed = (time.perf_counter() - started) * 1000
+
+    return result, counter[0], elapsed
+
+
+def run_benchmark(sizes: List[int]) -> None:
+    """
+    Run the benchmark for the given conversation sizes and print a report.
+
+    Args:
+        sizes: The conversation sizes (number of messages) to benchmark
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database.configure_database(f"sqlite:///{os.path.join(temp_dir, 'benchmark.db')}")
+        database.init_db()
+
+        print(f"{'messages':>10} {'per-message queries':>20} {'per-message ms':>15} {'batched queries':>16} {'batched ms':>11}")
+
+        for size in sizes:
+            conversation_id = seed_conversation(size)
+
+            # Warm up the connection pool before measuring
+            serialize_batched(conversation_id)
+
+            old_result, old_queries, old_ms = measure(serialize_per_message, conversation_id)
+            new_result, new_queries, new_ms = measure(serialize_batched, conversation_id)
+
+            if old_result != new_result:
+                raise AssertionError(f"Serializers disagree for a conversation of {size} messages")
+
+            print(f"{size:>10} {old_queries:>20} {old_ms:>15.1f} {new_queries:>16} {new_ms:>11.1f}")
+
+        database.close_db_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the message serializer")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated conversation sizes")
+    args = parser.parse_args()
+
+    run_benchmark([int(size) for size in args.sizes.split(",")])
@@ -4,18 +4,30 @@ Database Package for MOSAIC
 This package provides database functionality for the MOSAIC system.
 """
 
-from .models import Base, Conversation, Message, Attachment, MessageLog
-from .database import init_db, get_db_session, get_engine, close_db_connection
+from .models import Base, Conversation, Message, Attachment, MessageLog, MessageLogSegment, Blob
+from .database import init_db, get_db_session, get_engine, close_db_connection, configure_database
+from .writer import DatabaseWriter, database_writer
+from .blob_store import BlobStore, blob_store
+from .uploads import UploadManager, upload_manager
 from .repository import (
     ConversationRepository,
     MessageRepository,
     AttachmentRepository,
+    BlobRepository,
     UserPreferenceRepository,
     message_to_dict,
+    messages_to_dicts,
     conversation_to_dict,
     user_preference_to_dict
 )
 from .service import ChatService, AttachmentService, UserPreferenceService
+from .async_service import (
+    AsyncChatService,
+    AsyncAttachmentService,
+    AsyncUserPreferenceService,
+    db_executor,
+    run_in_db
+)
 
 __all__ = [
     # Models
@@ -24,17 +36,31 @@ __all__ = [
     'Message',
     'Attachment',
     'MessageLog',
+    'MessageLogSegment',
+    'Blob',
     
     # Database functions
     'init_db',
     'get_db_session',
     'get_engine',
     'close_db_connection',
+    'configure_database',
+    
+    # Single writer
+    'DatabaseWriter',
+    'database_writer',
+    
+    # Attachment blob store
+    'BlobStore',
+    'blob_store',
+    'UploadManager',
+    'upload_manager',
     
     # Repositories
     'ConversationRepository',
     'MessageRepository',
     'AttachmentRepository',
+    'BlobRepository',
     'UserPreferenceRepository',
     
     # Services
@@ -42,8 +68,16 @@ __all__ = [
     'AttachmentService',
     'UserPreferenceService',
     
+    # Async services
+    'AsyncChatService',
+    'AsyncAttachmentService',
+    'AsyncUserPreferenceService',
+    'db_executor',
+    'run_in_db',
+    
     # Helper functions
     'message_to_dict',
+    'messages_to_dicts',
     'conversation_to_dict',
     'user_preference_to_dict'
 ]
@@ -0,0 +1,666 @@
+"""
+Conversation Archive for MOSAIC
+
+This module moves conversations nobody has touched for a while out of the
+database into compressed archive files, one ZIP file per user per month of
+the last activity:
+
+    <root>/<user>/<YYYY-MM>.zip
+        <entry>/conversation.json        rows of the messages, their log
+                                         segments and their attachments
+        <entry>/attachments/<id>         content of each attachment
+
+where <entry> is the conversation ID with a random suffix. The conversation
+row stays as a stub with its summary (message count, time and preview of the
+last message), so conversation lists keep working, and archive_path points
+at its entry. Reading the messages of an archived conversation restores them
+first (see ChatService).
+
+An archive file is never modified in place: the entries still referenced by
+a stub are copied to a new file together with the new entries, and the new
+file replaces the old one, once per archival batch. An interrupted write
+never damages an archive, and readers keep reading the file they opened.
+Restoring or deleting a conversation only drops the reference to its entry;
+the unreferenced entries are dropped by compact, which the archiver runs
+periodically, and a file left without references is deleted right away.
+Each file has its own lock, so users never wait for each other's archives.
+The rows are deleted (or restored) in short transactions through the single
+database writer; the pages they free are returned to the file system with
+incremental_vacuum.
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import sha256
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import DateTime, LargeBinary, and_, insert, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from .blob_store import blob_store, blob_key, parse_blob_key
+from .database import get_db_session
+from .models import Attachment, Conversation, Message, MessageLog, MessageLogSegment
+from .repository import BlobRepository, MessageRepository
+from .writer import database_writer
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.archive")
+
+# Import the settings from the config
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+
+# Version of the layout of conversation.json
+ARCHIVE_FORMAT_VERSION = 1
+
+# Rows deleted or looked up per statement, to stay below SQLite's limit of variables
+_DELETE_CHUNK_SIZE = 500
+
+# Bytes copied at a time when an archive file is rewritten
+_COPY_CHUNK_SIZE = 65536
+
+_EPOCH = datetime(1970, 1, 1)
+
+# User IDs that are safe to use as a directory name
+_SAFE_USER_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+
+def row_to_json(table, row: Mapping[str, Any]) -> Dict[str, Any]:
+    """Convert a row of a table to JSON values (datetimes as ISO 8601, bytes as base64)."""
+    values = {}
+    for column in table.columns:
+        value = row[column.name]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, (bytes, memoryview)):
+            value = base64.b64encode(bytes(value)).decode("ascii")
+        values[column.name] = value
+    return values
+
+
+def row_from_json(table, values: Mapping[str, Any]) -> Dict[str, Any]:
+    """Convert JSON values written by row_to_json back to the values of a row."""
+    row = {}
+    for column in table.columns:
+        if column.name not in values:
+            continue
+        value = values[column.name]
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(column.type, LargeBinary):
+            value = base64.b64decode(value)
+        row[column.name] = value
+    return row
+
+
+def untouched_before(cutoff: datetime):
+    """
+    Build the filter of the conversations not archived and untouched since a time.
+
+    A conversation is touched when it is updated or gets a new message.
+
+    Args:
+        cutoff: The UTC time
+
+    Returns:
+        The filter, for a query of conversations
+    """
+    cutoff_ms = int((cutoff - _EPOCH).total_seconds() * 1000)
+    return and_(
+        Conversation.archived_at.is_(None),
+        Conversation.updated_at < cutoff,
+        or_(Conversation.last_message_at.is_(None), Conversation.last_message_at < cutoff_ms)
+    )
+
+
+def _user_directory(user_id: Optional[str]) -> str:
+    """The directory of the archive files of a user."""
+    if user_id is None:
+        return "_public"
+    if _SAFE_USER_ID.fullmatch(user_id):
+        return user_id
+    return "_" + sha256(user_id.encode("utf-8")).hexdigest()[:32]
+
+
+def _split_archive_path(archive_path: str) -> Tuple[str, str]:
+    """Split the archive path of a stub into the archive file and the entry."""
+    file_name, _, entry = archive_path.rpartition("#")
+    return file_name, entry
+
+
+class ConversationArchive:
+    """
+    Stores the archive files of conversations in a directory.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initialize the archive.
+
+        Args:
+            root: The directory the archive files are stored in
+        """
+        self.root = root
+
+        # Locks by archive file name, created on first use
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_lock = threading.Lock()
+
+    def lock(self, file_name: str) -> threading.RLock:
+        """
+        Get the lock of an archive file.
+
+        It is held while the file is rewritten or deleted, and by the
+        archival until its stubs are committed, so a rewrite never drops an
+        entry that is about to be referenced.
+
+        Args:
+            file_name: The name of the archive file
+
+        Returns:
+            The lock of the file
+        """
+        with self._locks_lock:
+            return self._locks.setdefault(file_name, threading.RLock())
+
+    def file_name(self, user_id: Optional[str], last_activity: datetime) -> str:
+        """The name of the archive file of a user for the month of the last activity."""
+        return f"{_user_directory(user_id)}/{last_activity:%Y-%m}.zip"
+
+    def path(self, file_name: str) -> str:
+        """The path of an archive file."""
+        return os.path.join(self.root, *file_name.split("/"))
+
+    def _referenced_entries(self, file_name: str) -> Set[str]:
+        """Get the entries of an archive file referenced by a conversation stub."""
+        with get_db_session() as session:
+            archive_paths = session.query(Conversation.archive_path).filter(
+                Conversation.archive_path.startswith(f"{file_name}#", autoescape=True)
+            ).all()
+        return {_split_archive_path(archive_path)[1] for archive_path, in archive_paths}
+
+    def rewrite(
+        self,
+        file_name: str,
+        new_entries: Iterable[Tuple[str, Dict[str, Any], Dict[str, bytes]]] = ()
+    ) -> None:
+        """
+        Replace an archive file with its referenced entries and new entries.
+
+        Args:
+            file_name: The name of the archive file
+            new_entries: (entry, conversation data, attachment contents by ID) tuples to add
+        """
+        path = self.path(file_name)
+        part_path = f"{path}.part"
+
+        with self.lock(file_name):
+            keep = self._referenced_entries(file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            written = 0
+            with zipfile.ZipFile(part_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+                if os.path.exists(path):
+                    with zipfile.ZipFile(path) as old_file:
+                        for info in old_file.infolist():
+                            if info.filename.split("/", 1)[0] not in keep:
+                                continue
+                            with old_file.open(info) as source, zip_file.open(info, "w") as target:
+                                shutil.copyfileobj(source, target, _COPY_CHUNK_SIZE)
+                            written += 1
+
+                for entry, data, contents in new_entries:
+                    zip_file.writestr(f"{entry}/conversation.json", json.dumps(data, ensure_ascii=False))
+                    for attachment_id, content in contents.items():
+                        zip_file.writestr(f"{entry}/attachments/{attachment_id}", content)
+                    written += 1
+
+            if not written:
+                # Nothing is left in the file
+                os.remove(part_path)
+                if os.path.exists(path):
+                    os.remove(path)
+                return
+
+            with open(part_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(part_path, path)
+
+    def read(self, archive_path: str) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+        """
+        Read the entry of an archived conversation.
+
+        Args:
+            archive_path: The archive path of the conversation stub
+
+        Returns:
+            A tuple of (conversation data, attachment contents by ID)
+        """
+        file_name, entry = _split_archive_path(archive_path)
+
+        # A rewrite replaces the file, so this reads the old or the new one;
+        # both hold the entries still referenced
+        with zipfile.ZipFile(self.path(file_name)) as zip_file:
+            data = json.loads(zip_file.read(f"{entry}/conversation.json"))
+            prefix = f"{entry}/attachments/"
+            contents = {
+                name[len(prefix):]: zip_file.read(name)
+                for name in zip_file.namelist()
+                if name.startswith(prefix)
+            }
+        return data, contents
+
+    def remove(self, archive_path: str) -> None:
+        """
+        Release the entry of a conversation that is no longer archived.
+
+        The entry stays in its archive file until the file is compacted,
+        unless no entry of the file is referenced anymore: then the file is
+        deleted right away.
+
+        Args:
+            archive_path: The former archive path of the conversation stub
+        """
+        file_name, _ = _split_archive_path(archive_path)
+        path = self.path(file_name)
+        with self.lock(file_name):
+            if os.path.exists(path) and not self._referenced_entries(file_name):
+                os.remove(path)
+
+    def _files(self, user_id: Optional[str] = None) -> List[str]:
+        """List the names of the archive files, of a user or of all users."""
+        if user_id is not None:
+            directories = [_user_directory(user_id)]
+        elif os.path.isdir(self.root):
+            directories = sorted(os.listdir(self.root))
+        else:
+            directories = []
+
+        return [
+            f"{directory}/{name}"
+            for directory in directories if os.path.isdir(os.path.join(self.root, directory))
+            for name in sorted(os.listdir(os.path.join(self.root, directory))) if name.endswith(".zip")
+        ]
+
+    def compact(self, user_id: Optional[str] = None) -> int:
+        """
+        Rewrite the archive files holding entries no conversation stub references.
+
+        Args:
+            user_id: Optional Clerk user ID whose files are compacted (defaults to all users)
+
+        Returns:
+            The number of archive files rewritten
+        """
+        with get_db_session() as session:
+            query = session.query(Conversation.archive_path).filter(Conversation.archive_path.isnot(None))
+            if user_id is not None:
+                query = query.filter(
+                    Conversation.archive_path.startswith(f"{_user_directory(user_id)}/", autoescape=True)
+                )
+            referenced: Dict[str, Set[str]] = {}
+            for archive_path, in query:
+                file_name, entry = _split_archive_path(archive_path)
+                referenced.setdefault(file_name, set()).add(entry)
+
+        compacted = 0
+        for file_name in self._files(user_id):
+            try:
+                with zipfile.ZipFile(self.path(file_name)) as zip_file:
+                    entries = {name.split("/", 1)[0] for name in zip_file.namelist()}
+            except FileNotFoundError:
+                continue
+
+            # The rewrite checks the references again under the lock of the file
+            if entries - referenced.get(file_name, set()):
+                self.rewrite(file_name)
+                compacted += 1
+
+        return compacted
+
+    def user_files(self, user_id: str) -> List[str]:
+        """
+        List the archive files of a user.
+
+        Args:
+            user_id: The Clerk user ID
+
+        Returns:
+            The paths of the archive files, oldest month first
+        """
+        directory = os.path.join(self.root, _user_directory(user_id))
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".zip")]
+
+    def delete_user(self, user_id: str) -> None:
+        """
+        Delete all archive files of a user.
+
+        Args:
+            user_id: The Clerk user ID
+        """
+        for file_name in self._files(user_id):
+            with self.lock(file_name):
+                path = self.path(file_name)
+                if os.path.exists(path):
+                    os.remove(path)
+        shutil.rmtree(os.path.join(self.root, _user_directory(user_id)), ignore_errors=True)
+
+
+def _read_conversation(session: Session, conversation_id: int) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """Read the rows of the messages of a conversation and the contents of their attachments."""
+    message_ids = select(Message.id).where(Message.conversation_id == conversation_id)
+
+    def rows(table, *where, order_by):
+        return session.execute(select(table).where(*where).order_by(*order_by)).mappings().all()
+
+    messages = rows(
+        Message.__table__, Message.conversation_id == conversation_id,
+        order_by=(Message.timestamp, Message.id)
+    )
+    segments = rows(
+        MessageLogSegment.__table__, MessageLogSegment.message_id.in_(message_ids),
+        order_by=(MessageLogSegment.id,)
+    )
+    logs = rows(MessageLog.__table__, MessageLog.message_id.in_(message_ids), order_by=(MessageLog.id,))
+    attachments = rows(Attachment.__table__, Attachment.message_id.in_(message_ids), order_by=(Attachment.id,))
+
+    contents: Dict[str, bytes] = {}
+    attachment_rows = []
+    for attachment in attachments:
+        values = row_to_json(Attachment.__table__, attachment)
+        inline_data = values.pop("data")
+
+        # The content is kept in the archive; files outside the blob store stay where they are
+        digest = parse_blob_key(attachment["storage_path"])
+        values["content"] = None
+        if digest is not None:
+            try:
+                contents[str(attachment["id"])] = blob_store.read(digest)
+                values["content"] = "blob"
+            except OSError:
+                logger.error(f"Content of attachment {attachment['id']} is missing")
+        elif inline_data is not None:
+            contents[str(attachment["id"])] = attachment["data"]
+            values["content"] = "inline"
+        attachment_rows.append(values)
+
+    data = {
+        "version": ARCHIVE_FORMAT_VERSION,
+        "conversationId": conversation_id,
+        "messages": [row_to_json(Message.__table__, row) for row in messages],
+        "logSegments": [row_to_json(MessageLogSegment.__table__, row) for row in segments],
+        "logs": [row_to_json(MessageLog.__table__, row) for row in logs],
+        "attachments": attachment_rows
+    }
+    return data, contents
+
+
+def _snapshot(conversation: Conversation) -> Dict[str, Any]:
+    """Record what a conversation looked like when it was picked for archival."""
+    last_activity = conversation.updated_at or _EPOCH
+    if conversation.last_message_at is not None:
+        last_activity = max(last_activity, datetime.utcfromtimestamp(conversation.last_message_at / 1000))
+
+    return {
+        "id": conversation.id,
+        "user_id": conversation.user_id,
+        "updated_at": conversation.updated_at,
+        "message_count": conversation.message_count,
+        "last_message_at": conversation.last_message_at,
+        "last_activity": last_activity
+    }
+
+
+def _archive_file(archive: ConversationArchive, file_name: str, snapshots: List[Dict[str, Any]]) -> int:
+    """Write conversations to one archive file and turn them into stubs."""
+    entries = []
+
+    def new_entries():
+        for snapshot in snapshots:
+            with get_db_session() as session:
+                data, contents = _read_conversation(session, snapshot["id"])
+            entry = f"{snapshot['id']}-{uuid.uuid4().hex[:8]}"
+            entries.append((snapshot, entry, [message["id"] for message in data["messages"]]))
+            yield entry, data, contents
+
+    def write(session: Session) -> int:
+        archived_at = datetime.utcnow()
+        count = 0
+        for snapshot, entry, archived_ids in entries:
+            conversation = session.query(Conversation).filter(Conversation.id == snapshot["id"]).first()
+
+            # Skip conversations touched since they were read
+            if (
+                conversation is None
+                or conversation.archived_at is not None
+                or conversation.updated_at != snapshot["updated_at"]
+                or conversation.message_count != snapshot["message_count"]
+                or conversation.last_message_at != snapshot["last_message_at"]
+            ):
+                continue
+            message_ids = session.execute(
+                select(Message.id).where(Message.conversation_id == snapshot["id"])
+            ).scalars().all()
+            if set(message_ids) != set(archived_ids):
+                continue
+
+            for start in range(0, len(message_ids), _DELETE_CHUNK_SIZE):
+                MessageRepository.bulk_delete_messages(session, message_ids[start:start + _DELETE_CHUNK_SIZE])
+
+            # Keep the summary; archiving is not an update of the conversation
+            session.execute(
+                update(Conversation.__table__).where(Conversation.__table__.c.id == snapshot["id"]).values(
+                    archived_at=archived_at,
+                    archive_path=f"{file_name}#{entry}",
+                    updated_at=Conversation.__table__.c.updated_at
+                )
+            )
+            count += 1
+        return count
+
+    # Hold the archive file until the stubs reference the new entries
+    with archive.lock(file_name):
+        archive.rewrite(file_name, new_entries())
+        return database_writer.execute(write)
+
+
+def archive_conversations(candidates, batch_size: int = 20, archive: Optional[ConversationArchive] = None) -> int:
+    """
+    Archive a batch of conversations.
+
+    Args:
+        candidates: The filter of the conversations to archive (see untouched_before)
+        batch_size: The maximum number of conversations archived
+        archive: The archive to write to (defaults to conversation_archive)
+
+    Returns:
+        The number of conversations archived
+    """
+    archive = archive or conversation_archive
+
+    with get_db_session() as session:
+        conversations = session.query(Conversation).filter(candidates).order_by(
+            Conversation.updated_at, Conversation.id
+        ).limit(batch_size).all()
+        snapshots = [_snapshot(conversation) for conversation in conversations]
+
+    if not snapshots:
+        return 0
+
+    files: Dict[str, List[Dict[str, Any]]] = OrderedDict()
+    for snapshot in snapshots:
+        files.setdefault(archive.file_name(snapshot["user_id"], snapshot["last_activity"]), []).append(snapshot)
+
+    archived = sum(_archive_file(archive, file_name, group) for file_name, group in files.items())
+    logger.info(f"Archived {archived} conversations to {len(files)} archive files")
+
+    # Delete the attachment blobs now held only by the archives
+    BlobRepository.collect_garbage()
+    return archived
+
+
+def _taken_ids(connection, table, rows: List[Mapping[str, Any]]) -> Set[int]:
+    """Get the IDs of archived rows that are used by other rows of a table."""
+    ids = [row["id"] for row in rows]
+    taken: Set[int] = set()
+    for start in range(0, len(ids), _DELETE_CHUNK_SIZE):
+        taken.update(connection.execute(
+            select(table.c.id).where(table.c.id.in_(ids[start:start + _DELETE_CHUNK_SIZE]))
+        ).scalars())
+    return taken
+
+
+def restore_conversation(conversation_id: int, archive: Optional[ConversationArchive] = None) -> bool:
+    """
+    Move the messages of an archived conversation back into the database.
+
+    Args:
+        conversation_id: The ID of the conversation
+        archive: The archive to read from (defaults to conversation_archive)
+
+    Returns:
+        True if the conversation was restored, False if it is not archived
+    """
+    archive = archive or conversation_archive
+
+    with get_db_session() as session:
+        archive_path = session.query(Conversation.archive_path).filter(Conversation.id == conversation_id).scalar()
+    if not archive_path:
+        return False
+
+    try:
+        data, contents = archive.read(archive_path)
+    except (KeyError, FileNotFoundError):
+        # Another request may have restored the conversation and its entry been compacted meanwhile
+        with get_db_session() as session:
+            current = session.query(Conversation.archive_path).filter(Conversation.id == conversation_id).scalar()
+        if current != archive_path:
+            return False
+        raise
+
+    # Store the attachment contents before taking the writer (see AttachmentRepository.create_attachment)
+    digests = {
+        attachment["id"]: blob_store.put(contents[str(attachment["id"])])
+        for attachment in data["attachments"]
+        if attachment["content"] == "blob" and str(attachment["id"]) in contents
+    }
+
+    def write(session: Session) -> bool:
+        # Another request may have restored the conversation meanwhile
+        current = session.query(Conversation.archive_path).filter(Conversation.id == conversation_id).scalar()
+        if current != archive_path:
+            return False
+
+        connection = session.connection()
+        if data["messages"]:
+            connection.execute(insert(Message.__table__), [
+                row_from_json(Message.__table__, row) for row in data["messages"]
+            ])
+
+        # The rows keep their IDs, so saved attachment URLs keep working; an
+        # ID taken by a row created since the archival gets a new one
+        for table, rows in ((MessageLogSegment.__table__, data["logSegments"]), (MessageLog.__table__, data["logs"])):
+            values = [row_from_json(table, row) for row in rows]
+            taken = _taken_ids(connection, table, values)
+            for row in values:
+                if row["id"] in taken:
+                    row.pop("id")
+            if values:
+                connection.execute(insert(table), values)
+
+        taken = _taken_ids(connection, Attachment.__table__, data["attachments"])
+        for attachment in data["attachments"]:
+            values = row_from_json(Attachment.__table__, attachment)
+            if values["id"] in taken:
+                logger.warning(f"Attachment {values['id']} of conversation {conversation_id} is restored with a new ID")
+                values.pop("id")
+            content = contents.get(str(attachment["id"]))
+            digest = digests.get(attachment["id"])
+            if digest is not None:
+                # The blob may have been garbage-collected since it was stored
+                if not blob_store.exists(digest):
+                    blob_store.put(content)
+                values["storage_path"] = blob_key(digest)
+                BlobRepository.acquire(connection, digest, len(content))
+            elif attachment["content"] == "inline":
+                values["data"] = content
+            connection.execute(insert(Attachment.__table__), values)
+
+        # The summary already counts the archived messages
+        conversations = Conversation.__table__
+        connection.execute(
+            update(conversations).where(conversations.c.id == conversation_id).values(
+                archived_at=None,
+                archive_path=None,
+                updated_at=conversations.c.updated_at
+            )
+        )
+        return True
+
+    restored = database_writer.execute(write)
+    if restored:
+        archive.remove(archive_path)
+        logger.info(f"Restored conversation {conversation_id} from {archive_path}")
+    return restored
+
+
+def incremental_vacuum(session: Session, pages: int) -> int:
+    """
+    Return free pages of the database file to the file system.
+
+    This does nothing unless the database uses auto_vacuum=INCREMENTAL
+    (see enable_incremental_vacuum in migrations/runner.py); unlike a full
+    VACUUM it keeps the rowids.
+
+    Args:
+        session: The session of the write transaction
+        pages: The maximum number of pages to free
+
+    Returns:
+        The number of pages freed
+    """
+    if session.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+        return 0
+
+    before = session.execute(text("PRAGMA freelist_count")).scalar()
+    if not before:
+        return 0
+
+    # Free the pages in one statement, reading all its rows (one per page
+    # freed) so that the driver steps it to completion
+    target = min(before, pages)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA incremental_vacuum({int(target)})")
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    freed = before - session.execute(text("PRAGMA freelist_count")).scalar()
+
+    # The sqlite3 driver stops after the first row of a statement without
+    # columns, so there each statement frees a single page
+    if 0 < freed < target:
+        for _ in range(target - freed):
+            session.execute(text("PRAGMA incremental_vacuum(1)"))
+        freed = before - session.execute(text("PRAGMA freelist_count")).scalar()
+
+    return freed
+
+
+# Create the global conversation archive
+conversation_archive = ConversationArchive(settings.CONVERSATION_ARCHIVE_DIR)
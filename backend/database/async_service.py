@@ -0,0 +1,233 @@
+"""
+Async Database Service Layer for MOSAIC
+
+This module provides awaitable versions of the database services for use in
+async FastAPI routes and the chat WebSocket loop, so database round-trips no
+longer block the event loop.
+
+The async services mirror the ChatService, AttachmentService and
+UserPreferenceService APIs one to one. Each call runs the corresponding sync
+service method on a dedicated, bounded pool of database threads (SQLite
+drivers are blocking, and async SQLite drivers also run every connection on
+its own thread), so the repositories and the transaction handling stay shared
+with the sync API that agents use from their worker threads.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .service import ChatService, AttachmentService, UserPreferenceService
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.async")
+
+# Import the settings from the config
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+
+
+class DatabaseExecutor:
+    """
+    Bounded thread pool that runs blocking database calls for async code.
+
+    The pool is sized to stay within the connection pool of the engine, so
+    database threads never wait on each other for a connection.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Initialize the database executor.
+
+        Args:
+            max_workers: The maximum number of concurrent database calls
+        """
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # Counters for reporting
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the thread pool, creating it on first use (or after shutdown)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mosaic-db")
+            return self._executor
+
+    def _call(self, func: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Run a database call on a pool thread and record its timing."""
+        start_time = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._total_seconds += time.perf_counter() - start_time
+
+        with self._lock:
+            self._completed += 1
+        return result
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking database call without blocking the event loop.
+
+        The caller's context variables (e.g. the message whose logs are being
+        captured) are carried over to the database thread.
+
+        Args:
+            func: The blocking function to call
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The result of the function
+        """
+        with self._lock:
+            self._in_flight += 1
+
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, self._call, func, args, kwargs)
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        except RuntimeError:
+            # The call never reached the pool (e.g. it was shut down)
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+        return await future
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the database threads.
+
+        Args:
+            wait: Whether to wait for running calls to finish
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=wait)
+            logger.info("Shut down database executor")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get database executor statistics.
+
+        Returns:
+            A dictionary containing database executor statistics
+        """
+        with self._lock:
+            calls = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_ms": round(self._total_seconds / calls * 1000, 3) if calls else None
+            }
+
+
+# Create a global database executor
+db_executor = DatabaseExecutor(max_workers=settings.DATABASE_EXECUTOR_MAX_WORKERS)
+
+
+async def run_in_db(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking database function on the database executor.
+
+    Use this for database work in async code that has no async service
+    method (e.g. a block of repository calls that belong together).
+
+    Args:
+        func: The blocking function to call
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        The result of the function
+    """
+    return await db_executor.run(func, *args, **kwargs)
+
+
+def _async_method(method: Callable) -> staticmethod:
+    """
+    Create an awaitable version of a sync service method.
+
+    Args:
+        method: The sync service method
+
+    Returns:
+        A static coroutine method with the same name, signature and docstring
+    """
+    @functools.wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return await db_executor.run(method, *args, **kwargs)
+
+    return staticmethod(wrapper)
+
+
+class AsyncChatService:
+    """
+    Async version of ChatService.
+    """
+
+    get_or_create_conversation = _async_method(ChatService.get_or_create_conversation)
+    get_conversation_messages = _async_method(ChatService.get_conversation_messages)
+    get_conversation_messages_page = _async_method(ChatService.get_conversation_messages_page)
+    add_message = _async_method(ChatService.add_message)
+    get_message_logs = _async_method(ChatService.get_message_logs)
+    add_log_to_message = _async_method(ChatService.add_log_to_message)
+    add_logs_to_messages = _async_method(ChatService.add_logs_to_messages)
+    clear_conversation = _async_method(ChatService.clear_conversation)
+    activate_conversation = _async_method(ChatService.activate_conversation)
+    delete_conversation = _async_method(ChatService.delete_conversation)
+    get_conversation_history = _async_method(ChatService.get_conversation_history)
+    get_conversation_history_page = _async_method(ChatService.get_conversation_history_page)
+    get_conversation_summaries_page = _async_method(ChatService.get_conversation_summaries_page)
+    search_messages = _async_method(ChatService.search_messages)
+    get_conversation_with_messages = _async_method(ChatService.get_conversation_with_messages)
+    get_messages_for_agent_state = _async_method(ChatService.get_messages_for_agent_state)
+
+
+class AsyncAttachmentService:
+    """
+    Async version of AttachmentService.
+    """
+
+    add_attachment = _async_method(AttachmentService.add_attachment)
+    update_attachment_message = _async_method(AttachmentService.update_attachment_message)
+    get_attachment = _async_method(AttachmentService.get_attachment)
+
+
+class AsyncUserPreferenceService:
+    """
+    Async version of UserPreferenceService.
+    """
+
+    get_user_preference = _async_method(UserPreferenceService.get_user_preference)
+    create_user_preference = _async_method(UserPreferenceService.create_user_preference)
+    update_user_preference = _async_method(UserPreferenceService.update_user_preference)
+    delete_user_preference = _async_method(UserPreferenceService.delete_user_preference)
+    get_or_create_user_preference = _async_method(UserPreferenceService.get_or_create_user_preference)
@@ -0,0 +1,268 @@
+"""
+Attachment Blob Store for MOSAIC
+
+This module stores attachment contents as files outside the SQLite database,
+addressed by the SHA-256 digest of their content. Identical uploads share one
+file, and files are written to a temporary file and renamed into place, so a
+blob is either complete or absent.
+
+Attachments refer to their blob through the storage_path column with a key of
+the form "sha256:<hex digest>". The number of attachments referring to each
+blob is tracked in the blobs table (see BlobRepository), and blobs that are no
+longer referenced are removed by BlobRepository.collect_garbage.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.blob_store")
+
+# Import the settings from the config
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+
+# Prefix of the storage_path of attachments stored in the blob store
+BLOB_KEY_PREFIX = "sha256:"
+
+
+def blob_key(digest: str) -> str:
+    """
+    Get the storage_path value that refers to a blob.
+
+    Args:
+        digest: The SHA-256 hex digest of the blob
+
+    Returns:
+        The blob key
+    """
+    return f"{BLOB_KEY_PREFIX}{digest}"
+
+
+def parse_blob_key(storage_path: Optional[str]) -> Optional[str]:
+    """
+    Get the digest a storage_path value refers to.
+
+    Args:
+        storage_path: The storage_path of an attachment
+
+    Returns:
+        The SHA-256 hex digest, or None if the path is not a blob key
+    """
+    if storage_path and storage_path.startswith(BLOB_KEY_PREFIX):
+        return storage_path[len(BLOB_KEY_PREFIX):]
+    return None
+
+
+class BlobStore:
+    """
+    Content-addressed file store for attachment contents.
+
+    Blobs are stored at <root>/<first 2 hex digits>/<next 2 hex digits>/<digest>
+    so no directory grows too large. Variants derived from a blob are stored
+    next to it as <digest>.<variant name>.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initialize the blob store.
+
+        Args:
+            root: The directory the blobs are stored in
+        """
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        """
+        Get the path of a blob.
+
+        Args:
+            digest: The SHA-256 hex digest of the blob
+
+        Returns:
+            The path of the blob file
+        """
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        """
+        Check whether a blob is stored.
+
+        Args:
+            digest: The SHA-256 hex digest of the blob
+
+        Returns:
+            True if the blob is stored, False otherwise
+        """
+        return os.path.exists(self.path(digest))
+
+    def size(self, digest: str) -> Optional[int]:
+        """
+        Get the size of a blob.
+
+        Args:
+            digest: The SHA-256 hex digest of the blob
+
+        Returns:
+            The size in bytes, or None if the blob is not stored
+        """
+        try:
+            return os.path.getsize(self.path(digest))
+        except FileNotFoundError:
+            return None
+
+    def variant_path(self, digest: str, name: str) -> str:
+        """
+        Get the path of a variant derived from a blob (e.g. a downscaled image).
+
+        Variants are stored next to their blob and deleted with it.
+
+        Args:
+            digest: The SHA-256 hex digest of the blob
+            name: The name of the variant, including its file extension
+
+        Returns:
+            The path of the variant file
+        """
+        if not name or "/" in name or os.sep in name or name.startswith("."):
+            raise ValueError(f"Invalid variant name: {name!r}")
+        return f"{self.path(digest)}.{name}"
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        """Write a file through a temporary file renamed into place."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file in the same directory and rename it into
+        # place, so readers never see a partially written file
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def put(self, data: bytes) -> str:
+        """
+        Store a blob, unless a blob with the same content is already stored.
+
+        Args:
+            data: The content of the blob
+
+        Returns:
+            The SHA-256 hex digest of the blob
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+
+        if os.path.exists(path):
+            return digest
+
+        self._write_atomic(path, data)
+        logger.debug(f"Stored blob {digest} ({len(data)} bytes)")
+        return digest
+
+    def put_file(self, path: str, digest: str) -> None:
+        """
+        Move a file whose digest is already known into the blob store.
+
+        The file must be on the same file system as the blob store. If the
+        blob is already stored, the file is deleted instead.
+
+        Args:
+            path: The path of the file
+            digest: The SHA-256 hex digest of the file
+        """
+        blob_path = self.path(digest)
+        if os.path.exists(blob_path):
+            os.unlink(path)
+            return
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        with open(path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(path, blob_path)
+        logger.debug(f"Stored blob {digest} from {path}")
+
+    def put_variant(self, digest: str, name: str, data: bytes) -> str:
+        """
+        Store a variant derived from a blob.
+
+        Args:
+            digest: The SHA-256 hex digest of the blob
+            name: The name of the variant, including its file extension
+            data: The content of the variant
+
+        Returns:
+            The path of the variant file
+        """
+        path = self.variant_path(digest, name)
+        self._write_atomic(path, data)
+        logger.debug(f"Stored variant {name} of blob {digest} ({len(data)} bytes)")
+        return path
+
+    def read(self, digest: str) -> bytes:
+        """
+        Read the content of a blob.
+
+        Args:
+            digest: The SHA-256 hex digest of the blob
+
+        Returns:
+            The content of the blob
+        """
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def delete(self, digest: str) -> bool:
+        """
+        Delete a blob.
+
+        Args:
+            digest: The SHA-256 hex digest of the blob
+
+        Returns:
+            True if the blob was deleted, False if it was not stored
+        """
+        path = self.path(digest)
+
+        # Delete the variants derived from the blob first
+        prefix = f"{digest}."
+        try:
+            names = os.listdir(os.path.dirname(path))
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if name.startswith(prefix):
+                try:
+                    os.unlink(os.path.join(os.path.dirname(path), name))
+                except FileNotFoundError:
+                    pass
+
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+
+        logger.debug(f"Deleted blob {digest}")
+        return True
+
+
+# Create the global blob store
+blob_store = BlobStore(settings.ATTACHMENT_BLOB_DIR)
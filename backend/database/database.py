@@ -8,12 +8,13 @@ and managing database sessions.
 
 import os
 import logging
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 
 from .models import Base
+from .migrations.runner import run_migrations
 
 # Configure logging
 logger = logging.getLogger("mosaic.database")
@@ -35,20 +36,76 @@ DATABASE_PATH = DATABASE_URL.replace("sqlite:///", "")
 # Ensure the database directory exists
 os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
 
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    Apply the SQLite PRAGMAs to a new connection.
+    
+    WAL lets readers run while the writer commits, synchronous=NORMAL is
+    durable in WAL mode without an fsync per commit, busy_timeout makes
+    connections wait for the write lock instead of failing with "database is
+    locked", and mmap_size serves reads from memory-mapped pages.
+    auto_vacuum=INCREMENTAL only takes effect on a database without tables,
+    so new databases return the pages freed by archival cheaply; existing
+    ones are switched by hand (see migrations/runner.py).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+def _create_engine(database_url: str, writer: bool = False):
+    """
+    Create an engine with connection pooling for the given database URL.
+    
+    Args:
+        database_url: The SQLAlchemy database URL
+        writer: Whether to create the engine of the single writer connection
+        
+    Returns:
+        The SQLAlchemy engine instance
+    """
+    engine = create_engine(
+        database_url,
+        poolclass=QueuePool,
+        pool_size=1 if writer else 5,
+        max_overflow=0 if writer else 10,
+        pool_timeout=30,
+        pool_recycle=1800,
+        connect_args={"check_same_thread": False}  # Needed for SQLite
+    )
+    
+    if database_url.startswith("sqlite"):
+        event.listen(engine, "connect", _configure_sqlite_connection)
+        
+        if writer:
+            # Let SQLAlchemy emit BEGIN itself, so savepoints work with the
+            # sqlite3 driver and the write lock is taken when the transaction starts
+            @event.listens_for(engine, "connect")
+            def _disable_driver_transactions(dbapi_connection, connection_record):
+                dbapi_connection.isolation_level = None
+            
+            @event.listens_for(engine, "begin")
+            def _begin_immediate(connection):
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+    
+    return engine
+
 # Create engine with connection pooling
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+engine = _create_engine(DATABASE_URL)
+
+# Create the engine of the single writer connection (see writer.py)
+writer_engine = _create_engine(DATABASE_URL, writer=True)
 
 # Create session factory
 SessionFactory = sessionmaker(bind=engine)
 
+# Create the session factory of the writer; objects stay loaded after the
+# group commit so they can be handed back to the callers
+WriterSessionFactory = sessionmaker(bind=writer_engine, expire_on_commit=False)
+
 # Create scoped session for thread safety
 Session = scoped_session(SessionFactory)
 
@@ -57,10 +114,18 @@ def init_db():
     Initialize the database by creating all tables.
     
     This function creates all tables defined in the models module
-    if they don't already exist.
+    if they don't already exist, then applies the pending migrations
+    (see migrations/runner.py).
     """
     logger.info(f"Initializing database at {DATABASE_PATH}")
     Base.metadata.create_all(engine)
+    
+    # create_all skips tables that already exist, so indexes introduced
+    # after the tables were created are added by migrations
+    applied = run_migrations(engine)
+    if applied:
+        logger.info(f"Applied migrations {applied}")
+    
     logger.info("Database initialization complete")
 
 @contextmanager
@@ -87,6 +152,44 @@ def get_db_session():
     finally:
         session.close()
 
+def configure_database(database_url: str):
+    """
+    Point the engine and session factory at a different database.
+    
+    This is used by tests and benchmarks to run against a scratch database
+    without touching the application database.
+    
+    Args:
+        database_url: The SQLAlchemy database URL
+        
+    Returns:
+        The new SQLAlchemy engine instance
+    """
+    global engine, writer_engine, DATABASE_URL, DATABASE_PATH
+    
+    # Release connections to the previous database
+    Session.remove()
+    engine.dispose()
+    writer_engine.dispose()
+    
+    DATABASE_URL = database_url
+    DATABASE_PATH = DATABASE_URL.replace("sqlite:///", "")
+    engine = _create_engine(DATABASE_URL)
+    writer_engine = _create_engine(DATABASE_URL, writer=True)
+    
+    # Rebind the session factories
+    SessionFactory.configure(bind=engine)
+    WriterSessionFactory.configure(bind=writer_engine)
+    Session.configure(bind=engine)
+    
+    # Let the writer (stopped with the previous database) write to this one;
+    # imported here because the writer module imports this one
+    from .writer import database_writer
+    database_writer.start()
+    
+    logger.info(f"Configured database at {DATABASE_PATH}")
+    return engine
+
 def get_engine():
     """
     Get the SQLAlchemy engine.
@@ -96,6 +199,15 @@ def get_engine():
     """
     return engine
 
+def get_writer_engine():
+    """
+    Get the SQLAlchemy engine of the single writer connection.
+    
+    Returns:
+        The SQLAlchemy engine instance.
+    """
+    return writer_engine
+
 def close_db_connection():
     """
     Close the database connection.
@@ -105,4 +217,5 @@ def close_db_connection():
     logger.info("Closing database connection")
     Session.remove()
     engine.dispose()
+    writer_engine.dispose()
     logger.info("Database connection closed")
@@ -0,0 +1,330 @@
+"""
+Streaming User Data Export for MOSAIC
+
+This module writes all data of a user as a ZIP archive that is produced as a
+stream of byte chunks, so it can be sent to a client while it is being
+written or saved to a file by a background job. Nothing is held in memory
+beyond one batch of rows and one chunk of an attachment:
+
+- rows are read with yield_per in batches and written as NDJSON (one JSON
+  object per line) to conversations.ndjson, messages.ndjson,
+  attachments.ndjson and agents.ndjson
+- the content of each attachment is copied in chunks from the blob store (or
+  its file, or the database for attachments stored inline) to
+  attachments/<id>/<filename>
+- the archive files of archived conversations (see archive.py) are copied
+  as they are to archives/<YYYY-MM>.zip
+
+The archive is written to a non-seekable stream, so every entry is followed
+by a data descriptor and uses ZIP64 sizes; Python's zipfile and common unzip
+tools read it.
+"""
+
+import json
+import logging
+import os
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import defer
+
+from .archive import conversation_archive
+from .blob_store import blob_store, parse_blob_key
+from .database import SessionFactory
+from .models import Agent, Attachment, Conversation, Message, UserPreference
+from .repository import (
+    _attachment_to_dict,
+    agent_to_dict,
+    conversation_to_dict,
+    messages_to_dicts,
+    user_preference_to_dict
+)
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.export")
+
+# Rows read and serialized per batch
+EXPORT_BATCH_SIZE = 500
+
+# Bytes of attachment content copied at a time
+EXPORT_CHUNK_SIZE = 65536
+
+# Content types that are already compressed and are stored without deflating
+_COMPRESSED_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/pdf")
+
+
+@dataclass
+class ExportProgress:
+    """The progress of an export, updated while it is written."""
+    phase: str = "pending"
+    total_messages: int = 0
+    conversations: int = 0
+    messages: int = 0
+    attachments: int = 0
+    agents: int = 0
+    bytes_written: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the progress to the dictionary returned by the API."""
+        return {
+            "phase": self.phase,
+            "totalMessages": self.total_messages,
+            "conversations": self.conversations,
+            "messages": self.messages,
+            "attachments": self.attachments,
+            "agents": self.agents,
+            "bytesWritten": self.bytes_written
+        }
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable file object that collects what ZipFile writes."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        """Return and forget the bytes written so far."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+@contextmanager
+def _export_session():
+    """
+    Open a read session of the export's own.
+    
+    The export generator may be resumed on a different thread for every
+    chunk (e.g. by a streaming response), so it cannot use the thread-local
+    session of get_db_session.
+    """
+    session = SessionFactory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _user_messages(user_id: str):
+    """Build the filter of the messages of a user (in their conversations or sent by them)."""
+    conversation_ids = select(Conversation.id).where(Conversation.user_id == user_id)
+    return or_(Message.conversation_id.in_(conversation_ids), Message.user_id == user_id)
+
+
+def _user_attachments(user_id: str):
+    """Build the filter of the attachments of a user."""
+    message_ids = select(Message.id).where(_user_messages(user_id))
+    return or_(Attachment.message_id.in_(message_ids), Attachment.user_id == user_id)
+
+
+def _attachment_path(attachment: Attachment) -> str:
+    """The path of the content of an attachment in the archive."""
+    filename = os.path.basename((attachment.filename or "").replace("\\", "/")) or "attachment"
+    return f"attachments/{attachment.id}/{filename}"
+
+
+def _ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    """Encode rows as NDJSON."""
+    return "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows).encode("utf-8")
+
+
+def _open_attachment(session, attachment: Attachment):
+    """Open the content of an attachment, or return its inline bytes; None if it has none."""
+    digest = parse_blob_key(attachment.storage_path)
+    try:
+        if digest is not None:
+            return open(blob_store.path(digest), "rb")
+        if attachment.storage_path:
+            return open(attachment.storage_path, "rb")
+    except OSError:
+        logger.error(f"Content of attachment {attachment.id} is missing")
+        return None
+
+    return session.query(Attachment.inline_data).filter(Attachment.id == attachment.id).scalar()
+
+
+def _write_entries(zip_file: zipfile.ZipFile, user: Dict[str, Any], user_id: str, progress: ExportProgress) -> Iterator[None]:
+    """Write the entries of the archive, yielding whenever output may be ready."""
+    zip_file.writestr("user.json", json.dumps(user, indent=2, default=str))
+
+    with _export_session() as session:
+        progress.total_messages = session.query(Message.id).filter(_user_messages(user_id)).count()
+
+        preference = session.query(UserPreference).filter(UserPreference.user_id == user_id).first()
+        if preference:
+            zip_file.writestr("user_preferences.json", json.dumps(user_preference_to_dict(preference), indent=2))
+    yield
+
+    # Conversations
+    progress.phase = "conversations"
+    with _export_session() as session, zip_file.open("conversations.ndjson", "w", force_zip64=True) as entry:
+        result = session.execute(
+            select(Conversation).where(Conversation.user_id == user_id).order_by(Conversation.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        ).scalars()
+        for batch in result.partitions():
+            entry.write(_ndjson([conversation_to_dict(conversation) for conversation in batch]))
+            progress.conversations += len(batch)
+            yield
+
+    # Messages, with their logs and attachment metadata loaded per batch
+    progress.phase = "messages"
+    with _export_session() as session, zip_file.open("messages.ndjson", "w", force_zip64=True) as entry:
+        result = session.execute(
+            select(Message).where(_user_messages(user_id))
+            .order_by(Message.conversation_id, Message.timestamp, Message.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        ).scalars()
+        for batch in result.partitions():
+            rows = messages_to_dicts(session, batch)
+            for message, row in zip(batch, rows):
+                row["conversationId"] = message.conversation_id
+            entry.write(_ndjson(rows))
+            progress.messages += len(batch)
+            yield
+
+    # Attachment metadata, pointing at the content in the archive
+    progress.phase = "attachments"
+    with _export_session() as session, zip_file.open("attachments.ndjson", "w", force_zip64=True) as entry:
+        result = session.execute(
+            select(Attachment).options(defer(Attachment.inline_data)).where(_user_attachments(user_id))
+            .order_by(Attachment.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        ).scalars()
+        for batch in result.partitions():
+            rows = []
+            for attachment in batch:
+                row = _attachment_to_dict(attachment)
+                row["messageId"] = attachment.message_id
+                row["createdAt"] = attachment.created_at.isoformat() if attachment.created_at else None
+                row["path"] = _attachment_path(attachment)
+                rows.append(row)
+            entry.write(_ndjson(rows))
+            yield
+
+    # Attachment contents, copied a chunk at a time
+    with _export_session() as session:
+        result = session.execute(
+            select(Attachment).options(defer(Attachment.inline_data)).where(_user_attachments(user_id))
+            .order_by(Attachment.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        ).scalars()
+        for attachment in result:
+            content = _open_attachment(session, attachment)
+            if content is not None:
+                content_type = attachment.content_type or attachment.type or ""
+                info = zipfile.ZipInfo(_attachment_path(attachment), date_time=datetime.utcnow().timetuple()[:6])
+                info.compress_type = (
+                    zipfile.ZIP_STORED if content_type.startswith(_COMPRESSED_TYPES) else zipfile.ZIP_DEFLATED
+                )
+                with zip_file.open(info, "w", force_zip64=True) as entry:
+                    if isinstance(content, bytes):
+                        entry.write(content)
+                    else:
+                        with content:
+                            for chunk in iter(lambda: content.read(EXPORT_CHUNK_SIZE), b""):
+                                entry.write(chunk)
+                                yield
+            progress.attachments += 1
+            yield
+
+    # Archived conversations; their files are already compressed, and are
+    # compacted first so they hold no restored or deleted conversations
+    conversation_archive.compact(user_id)
+    for path in conversation_archive.user_files(user_id):
+        info = zipfile.ZipInfo(f"archives/{os.path.basename(path)}", date_time=datetime.utcnow().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        try:
+            source = open(path, "rb")
+        except FileNotFoundError:
+            # The file was emptied by a restore meanwhile
+            continue
+        with source, zip_file.open(info, "w", force_zip64=True) as entry:
+            for chunk in iter(lambda: source.read(EXPORT_CHUNK_SIZE), b""):
+                entry.write(chunk)
+                yield
+
+    # Agents, with their tools and capabilities
+    progress.phase = "agents"
+    with _export_session() as session, zip_file.open("agents.ndjson", "w", force_zip64=True) as entry:
+        result = session.execute(
+            select(Agent).where(Agent.user_id == user_id).order_by(Agent.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        ).scalars()
+        for batch in result.partitions():
+            entry.write(_ndjson([agent_to_dict(agent, include_tools=True, include_capabilities=True) for agent in batch]))
+            progress.agents += len(batch)
+            yield
+
+    zip_file.writestr("README.md", _readme(user_id))
+
+
+def _readme(user_id: str) -> str:
+    """The README of an export."""
+    return f"""# MOSAIC User Data Export
+
+This ZIP file contains all data associated with your MOSAIC account.
+
+## Files
+
+- user.json: Your user profile information
+- user_preferences.json: Your user preferences
+- conversations.ndjson: Your conversations, one JSON object per line
+- messages.ndjson: Your messages with their logs, one JSON object per line
+- attachments.ndjson: Your attachments, one JSON object per line; "path" is
+  the file in attachments/ with the content of the attachment
+- agents.ndjson: Your custom agents, one JSON object per line
+- archives/: The messages of your archived conversations, one ZIP file per
+  month with a conversation.json file (and the attachment contents) for each
+  conversation
+
+## Export Date
+
+{datetime.now().isoformat()}
+
+## User ID
+
+{user_id}
+"""
+
+
+def iter_user_export(user: Dict[str, Any], user_id: str, progress: Optional[ExportProgress] = None) -> Iterator[bytes]:
+    """
+    Write the data of a user as a ZIP archive, chunk by chunk.
+
+    Args:
+        user: The dictionary of the user (see UserRepository.user_to_dict)
+        user_id: The Clerk user ID
+        progress: Optional progress to update while the archive is written
+
+    Yields:
+        The bytes of the archive, in order
+    """
+    if progress is None:
+        progress = ExportProgress()
+
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for _ in _write_entries(zip_file, user, user_id, progress):
+            data = buffer.take()
+            if data:
+                progress.bytes_written += len(data)
+                yield data
+
+    # The central directory is written when the archive is closed
+    data = buffer.take()
+    progress.bytes_written += len(data)
+    progress.phase = "completed"
+    yield data
@@ -0,0 +1,186 @@
+"""
+Image Variants for MOSAIC
+
+This module derives size-capped, recompressed variants of image attachments:
+an "llm" variant sent to vision models and a "thumbnail" variant shown in the
+chat. Variants are generated when an image is uploaded and stored next to the
+original blob in the blob store, keyed by its content hash and the variant
+profile, so every later request reuses them. Variants missing for older
+blobs are generated on first use.
+
+Generating variants requires Pillow. Without it, or for content Pillow cannot
+decode, consumers get the original image instead.
+"""
+
+import io
+import logging
+import os
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.image_variants")
+
+# Import the settings from the config
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+
+from .blob_store import blob_store
+
+# Pillow is optional; without it the original images are used
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+# File extensions and content types of the variant formats
+_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+}
+
+
+class ImageProfile(NamedTuple):
+    """The size cap and compression of an image variant."""
+    max_size: int  # Longest edge in pixels
+    quality: int  # JPEG quality
+
+
+def get_profiles() -> Dict[str, ImageProfile]:
+    """
+    Get the image variant profiles.
+
+    Returns:
+        A dictionary mapping the variant name to its profile
+    """
+    return {
+        "llm": ImageProfile(settings.IMAGE_VARIANT_LLM_MAX_SIZE, settings.IMAGE_VARIANT_LLM_QUALITY),
+        "thumbnail": ImageProfile(settings.IMAGE_VARIANT_THUMBNAIL_MAX_SIZE, settings.IMAGE_VARIANT_THUMBNAIL_QUALITY),
+    }
+
+
+def is_image(content_type: Optional[str]) -> bool:
+    """
+    Check whether a content type is an image that variants can be made of.
+
+    Args:
+        content_type: The MIME type
+
+    Returns:
+        True if the content type is a raster image, False otherwise
+    """
+    return bool(content_type) and content_type.startswith("image/") and content_type != "image/svg+xml"
+
+
+def render_variant(data: bytes, profile: ImageProfile) -> Optional[Tuple[bytes, str]]:
+    """
+    Downscale and recompress an image.
+
+    Opaque images are encoded as JPEG, images with transparency as PNG.
+
+    Args:
+        data: The content of the original image
+        profile: The profile of the variant
+
+    Returns:
+        A tuple of (content, format name), or None if Pillow is not installed
+        or cannot decode the image
+    """
+    if Image is None:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Let JPEG decoding skip detail that is thrown away anyway
+            image.draft("RGB", (profile.max_size, profile.max_size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((profile.max_size, profile.max_size), Image.LANCZOS)
+
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            output = io.BytesIO()
+            if has_alpha:
+                image.convert("RGBA").save(output, format="PNG", optimize=True)
+                return output.getvalue(), "PNG"
+
+            image.convert("RGB").save(output, format="JPEG", quality=profile.quality, optimize=True)
+            return output.getvalue(), "JPEG"
+    except Exception as e:
+        logger.warning(f"Could not render image variant: {str(e)}")
+        return None
+
+
+def find_variant(digest: str, name: str) -> Optional[Tuple[str, str]]:
+    """
+    Find a stored variant of a blob.
+
+    Args:
+        digest: The SHA-256 hex digest of the original image
+        name: The name of the variant profile
+
+    Returns:
+        A tuple of (path, content type), or None if the variant is not stored
+    """
+    for extension, content_type in _FORMATS.values():
+        path = blob_store.variant_path(digest, f"{name}.{extension}")
+        if os.path.exists(path):
+            return path, content_type
+    return None
+
+
+def ensure_variant(digest: str, name: str, data: Optional[bytes] = None) -> Optional[Tuple[str, str]]:
+    """
+    Get a variant of a blob, generating and storing it if needed.
+
+    Args:
+        digest: The SHA-256 hex digest of the original image
+        name: The name of the variant profile
+        data: Optional content of the original image, read from the blob
+            store if not given
+
+    Returns:
+        A tuple of (path, content type), or None if the variant cannot be made
+    """
+    profile = get_profiles()[name]
+
+    variant = find_variant(digest, name)
+    if variant is not None:
+        return variant
+
+    if data is None:
+        if not blob_store.exists(digest):
+            return None
+        data = blob_store.read(digest)
+
+    rendered = render_variant(data, profile)
+    if rendered is None:
+        return None
+
+    content, format_name = rendered
+    extension, content_type = _FORMATS[format_name]
+    path = blob_store.put_variant(digest, f"{name}.{extension}", content)
+    return path, content_type
+
+
+def generate_variants(digest: str, data: bytes) -> None:
+    """
+    Generate every variant of an uploaded image.
+
+    Failures are logged and never fail the upload; the variants are then
+    generated on first use or the original is used.
+
+    Args:
+        digest: The SHA-256 hex digest of the image
+        data: The content of the image
+    """
+    if Image is None:
+        return
+
+    for name in get_profiles():
+        try:
+            ensure_variant(digest, name, data)
+        except Exception as e:
+            logger.error(f"Error generating {name} variant of blob {digest}: {str(e)}")
@@ -0,0 +1,308 @@
+"""
+Compressed Log Segments for MOSAIC
+
+This module stores the logs of messages as compressed, append-only segments
+instead of one row per log entry. A segment holds the entries of one message
+written in one batch as framed records:
+
+    timestamp (8 bytes, microseconds since the Unix epoch, big-endian)
+    length    (4 bytes, big-endian)
+    entry     (length bytes of UTF-8)
+
+compressed together with zlib. Segments are only decompressed when the logs
+of a message are read, and the records are decoded incrementally as they are
+iterated.
+
+Retention runs in batches, each a short write transaction: compaction merges
+the segments of a message into one segment compressed at the highest level,
+and pruning deletes segments whose newest entry is past the retention period.
+"""
+
+import logging
+import struct
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, undefer
+
+from .models import MessageLogSegment
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.log_segments")
+
+# Header of each record: timestamp in microseconds and length of the entry
+_RECORD_HEADER = struct.Struct(">qI")
+
+_EPOCH = datetime(1970, 1, 1)
+
+# zlib levels of segments written by the log pipeline and of compacted segments
+WRITE_COMPRESSION_LEVEL = 6
+COMPACT_COMPRESSION_LEVEL = 9
+
+# Bytes of compressed data decompressed at a time while reading a segment
+_READ_CHUNK_SIZE = 16384
+
+
+class LogEntry(NamedTuple):
+    """A log entry of a message."""
+    timestamp: datetime
+    log_entry: str
+
+
+def encode_segment(entries: Sequence[Tuple[datetime, str]], level: int = WRITE_COMPRESSION_LEVEL) -> Tuple[bytes, int]:
+    """
+    Encode log entries as a compressed segment.
+
+    Args:
+        entries: The (timestamp, log_entry) pairs, in order
+        level: The zlib compression level
+
+    Returns:
+        A tuple of (compressed data, size of the uncompressed records)
+    """
+    records = bytearray()
+    for timestamp, log_entry in entries:
+        encoded = log_entry.encode("utf-8")
+        microseconds = (timestamp - _EPOCH) // timedelta(microseconds=1)
+        records += _RECORD_HEADER.pack(microseconds, len(encoded))
+        records += encoded
+
+    return zlib.compress(bytes(records), level), len(records)
+
+
+def _decode_records(buffer: bytearray) -> Tuple[List[LogEntry], int]:
+    """Decode the complete records at the start of a buffer, returning them and the bytes used."""
+    entries = []
+    offset = 0
+    while len(buffer) - offset >= _RECORD_HEADER.size:
+        microseconds, length = _RECORD_HEADER.unpack_from(buffer, offset)
+        end = offset + _RECORD_HEADER.size + length
+        if end > len(buffer):
+            break
+
+        entries.append(LogEntry(
+            _EPOCH + timedelta(microseconds=microseconds),
+            buffer[offset + _RECORD_HEADER.size:end].decode("utf-8")
+        ))
+        offset = end
+
+    return entries, offset
+
+
+def iter_segment(data: bytes, codec: str = "zlib") -> Iterator[LogEntry]:
+    """
+    Decode the log entries of a segment lazily.
+
+    The data is decompressed a chunk at a time as the entries are iterated.
+
+    Args:
+        data: The compressed data of the segment
+        codec: The codec of the segment
+
+    Yields:
+        The log entries of the segment, in order
+
+    Raises:
+        ValueError: If the codec is unknown or the segment is truncated
+    """
+    if codec != "zlib":
+        raise ValueError(f"Unknown log segment codec: {codec}")
+
+    decompressor = zlib.decompressobj()
+    buffer = bytearray()
+    for start in range(0, len(data), _READ_CHUNK_SIZE):
+        buffer += decompressor.decompress(data[start:start + _READ_CHUNK_SIZE])
+        entries, used = _decode_records(buffer)
+        del buffer[:used]
+        yield from entries
+
+    buffer += decompressor.flush()
+    entries, used = _decode_records(buffer)
+    yield from entries
+
+    if used != len(buffer) or not decompressor.eof:
+        raise ValueError("Truncated log segment")
+
+
+def iter_log_entries(segments: Iterable[MessageLogSegment]) -> Iterator[LogEntry]:
+    """
+    Iterate over the log entries of segments, decompressing each segment lazily.
+
+    Args:
+        segments: The segments of a message, in the order they were written
+
+    Yields:
+        The log entries, in order
+    """
+    for segment in segments:
+        yield from iter_segment(segment.data, segment.codec)
+
+
+def build_segments(
+    logs: Iterable[Tuple[str, str, Optional[datetime]]],
+    compacted: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Group log entries by message and encode one segment per message.
+
+    Args:
+        logs: (message_id, log_entry, timestamp) tuples, in order
+        compacted: Whether to compress the segments as compacted segments
+
+    Returns:
+        The column values of the segments, for an INSERT
+    """
+    entries_by_message: Dict[str, List[Tuple[datetime, str]]] = OrderedDict()
+    for message_id, log_entry, timestamp in logs:
+        entries_by_message.setdefault(message_id, []).append((timestamp or datetime.utcnow(), log_entry))
+
+    level = COMPACT_COMPRESSION_LEVEL if compacted else WRITE_COMPRESSION_LEVEL
+    segments = []
+    for message_id, entries in entries_by_message.items():
+        data, raw_size = encode_segment(entries, level)
+        segments.append({
+            "message_id": message_id,
+            "entry_count": len(entries),
+            "first_timestamp": min(timestamp for timestamp, _ in entries),
+            "last_timestamp": max(timestamp for timestamp, _ in entries),
+            "codec": "zlib",
+            "raw_size": raw_size,
+            "compacted": compacted,
+            "data": data
+        })
+
+    return segments
+
+
+def read_message_logs(session: Session, message_id: str) -> List[LogEntry]:
+    """
+    Read the log entries of a message.
+
+    Args:
+        session: The database session
+        message_id: The ID of the message
+
+    Returns:
+        The log entries, in order
+    """
+    segments = session.query(MessageLogSegment).options(undefer(MessageLogSegment.data)).filter(
+        MessageLogSegment.message_id == message_id
+    ).order_by(MessageLogSegment.id).all()
+    return list(iter_log_entries(segments))
+
+
+def compact_message_logs(session: Session, older_than: datetime, batch_size: int = 100) -> int:
+    """
+    Merge the segments of messages into one compacted segment per message.
+
+    Messages with segments written before older_than that were not compacted
+    yet are picked, up to batch_size of them.
+
+    Args:
+        session: The session of the write transaction
+        older_than: Compact the messages with segments written before this time
+        batch_size: The maximum number of messages compacted
+
+    Returns:
+        The number of messages compacted
+    """
+    message_ids = session.execute(
+        select(MessageLogSegment.message_id).where(
+            MessageLogSegment.compacted.is_(False),
+            MessageLogSegment.created_at < older_than
+        ).distinct().limit(batch_size)
+    ).scalars().all()
+    if not message_ids:
+        return 0
+
+    segments = session.query(MessageLogSegment).options(undefer(MessageLogSegment.data)).filter(
+        MessageLogSegment.message_id.in_(message_ids)
+    ).order_by(MessageLogSegment.message_id, MessageLogSegment.id).all()
+
+    logs = [
+        (segment.message_id, entry.log_entry, entry.timestamp)
+        for segment in segments
+        for entry in iter_segment(segment.data, segment.codec)
+    ]
+
+    session.execute(delete(MessageLogSegment).where(MessageLogSegment.message_id.in_(message_ids)))
+    session.execute(insert(MessageLogSegment), build_segments(logs, compacted=True))
+    return len(message_ids)
+
+
+def prune_message_logs(session: Session, older_than: datetime, batch_size: int = 1000) -> int:
+    """
+    Delete segments whose newest log entry is older than a time.
+
+    Args:
+        session: The session of the write transaction
+        older_than: Delete the segments with only entries before this time
+        batch_size: The maximum number of segments deleted
+
+    Returns:
+        The number of segments deleted
+    """
+    segment_ids = session.execute(
+        select(MessageLogSegment.id).where(
+            MessageLogSegment.last_timestamp < older_than
+        ).limit(batch_size)
+    ).scalars().all()
+    if not segment_ids:
+        return 0
+
+    session.execute(delete(MessageLogSegment).where(MessageLogSegment.id.in_(segment_ids)))
+    return len(segment_ids)
+
+
+def migrate_legacy_logs(engine: Engine, batch_size: int = 500) -> None:
+    """
+    Migration step that moves the rows of message_logs into compacted segments.
+
+    The logs are moved a batch of messages at a time, each in its own
+    transaction, and the moved rows are deleted, so an interrupted migration
+    continues where it stopped.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+        batch_size: The number of messages moved per transaction
+    """
+    moved = 0
+    while True:
+        with engine.begin() as connection:
+            message_ids = [row[0] for row in connection.execute(
+                text("SELECT DISTINCT message_id FROM message_logs LIMIT :limit"),
+                {"limit": batch_size}
+            )]
+            if not message_ids:
+                break
+
+            parameters = {f"id_{index}": message_id for index, message_id in enumerate(message_ids)}
+            placeholders = ", ".join(f":{name}" for name in parameters)
+            rows = connection.execute(
+                text(
+                    "SELECT message_id, log_entry, timestamp FROM message_logs "
+                    f"WHERE message_id IN ({placeholders}) ORDER BY message_id, timestamp, id"
+                ),
+                parameters
+            ).all()
+
+            logs = [
+                (message_id, log_entry, _parse_timestamp(timestamp))
+                for message_id, log_entry, timestamp in rows
+            ]
+            connection.execute(insert(MessageLogSegment), build_segments(logs, compacted=True))
+            connection.execute(text(f"DELETE FROM message_logs WHERE message_id IN ({placeholders})"), parameters)
+
+        moved += len(message_ids)
+        logger.info(f"Moved the logs of {moved} messages to log segments")
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse a timestamp read with a raw SQL query, which SQLite returns as text."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
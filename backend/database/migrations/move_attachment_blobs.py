@@ -0,0 +1,120 @@
+"""
+Migration script to move attachment contents out of the database.
+
+This script moves the contents of attachments stored in the attachments.data
+column to the content-addressed blob store, sets their storage_path to the
+blob key and counts their references in the blobs table. Attachments are
+moved in batches, each in its own transaction, so the migration can be
+interrupted and resumed.
+
+Usage:
+    python -m backend.database.migrations.move_attachment_blobs [--batch-size 100] [--vacuum]
+"""
+
+import argparse
+import os
+import sys
+import logging
+from pathlib import Path
+
+from sqlalchemy import select, update, text
+
+# Add the parent directory to the Python path
+parent_dir = str(Path(__file__).parent.parent.parent)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger("mosaic.database.migrations")
+
+# Import the database models and connection
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.database.models import Base, Attachment, Blob
+    from mosaic.backend.database.database import get_engine
+    from mosaic.backend.database.blob_store import blob_store, blob_key
+    from mosaic.backend.database.repository import BlobRepository
+    from mosaic.backend.database.search import rebuild_search_index
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.database.models import Base, Attachment, Blob
+    from backend.database.database import get_engine
+    from backend.database.blob_store import blob_store, blob_key
+    from backend.database.repository import BlobRepository
+    from backend.database.search import rebuild_search_index
+
+
+def move_attachment_blobs(batch_size: int = 100, vacuum: bool = False) -> int:
+    """
+    Move the attachment contents stored in the database to the blob store.
+
+    Args:
+        batch_size: The number of attachments moved per transaction
+        vacuum: Whether to VACUUM the database afterwards to return the freed
+            pages to the file system
+
+    Returns:
+        The number of moved attachments
+    """
+    engine = get_engine()
+    attachments = Attachment.__table__
+
+    # Create the reference count table if needed
+    Base.metadata.create_all(engine, tables=[Blob.__table__])
+
+    moved = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(attachments.c.id, attachments.c.data)
+                .where(attachments.c.data.isnot(None))
+                .order_by(attachments.c.id)
+                .limit(batch_size)
+            ).all()
+
+            if not rows:
+                break
+
+            for attachment_id, data in rows:
+                digest = blob_store.put(data)
+                BlobRepository.acquire(connection, digest, len(data))
+                connection.execute(
+                    update(attachments)
+                    .where(attachments.c.id == attachment_id)
+                    .values(storage_path=blob_key(digest), data=None)
+                )
+
+        moved += len(rows)
+        logger.info(f"Moved {moved} attachments to the blob store")
+
+    if vacuum:
+        logger.info("Vacuuming the database")
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+        # VACUUM may renumber the message rowids the search index refers to
+        logger.info("Rebuilding the message search index")
+        with engine.begin() as connection:
+            rebuild_search_index(connection)
+
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move attachment contents to the blob store")
+    parser.add_argument("--batch-size", type=int, default=100, help="Number of attachments moved per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards")
+    args = parser.parse_args()
+
+    try:
+        count = move_attachment_blobs(args.batch_size, args.vacuum)
+        print(f"Moved {count} attachments to the blob store at {blob_store.root}")
+        sys.exit(0)
+    except Exception as e:
+        logger.error(f"Error moving attachments to the blob store: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,383 @@
+"""
+Versioned migration runner for the MOSAIC database.
+
+Schema changes that cannot be expressed by creating missing tables are listed
+here as numbered migrations. The versions applied to a database are recorded
+in the schema_migrations table, so each migration runs once; init_db runs the
+pending ones at startup and this module can run them by hand on a large
+database before deploying.
+
+Migrations are made of small steps, each committed in its own short
+transaction, so the single writer and other connections only wait for one
+step at a time (connections wait for the write lock up to busy_timeout). An
+optional pause between steps gives them a chance to run. SQLite builds an
+index in one statement, so adding an index is one step; the steps are
+idempotent, so a migration that was interrupted is simply run again.
+
+Slow maintenance that rewrites the whole database file is not a migration;
+it is run by hand with an option of this module (see enable_incremental_vacuum).
+
+Usage:
+    python -m backend.database.migrations.runner [--pause 0.5] [--status] [--incremental-vacuum]
+"""
+
+import argparse
+import sys
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Add the parent directory to the Python path
+parent_dir = str(Path(__file__).parent.parent.parent)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.migrations")
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A numbered schema change made of idempotent steps."""
+    version: int
+    name: str
+    steps: Sequence[Callable[[Engine], None]]
+
+
+def create_index(name: str, table: str, columns: List[str]) -> Callable[[Engine], None]:
+    """
+    Build a migration step that creates an index if it does not exist.
+
+    Args:
+        name: The name of the index
+        table: The name of the table
+        columns: The indexed columns, in order
+
+    Returns:
+        The migration step
+    """
+    def step(engine: Engine) -> None:
+        logger.info(f"Creating index {name} on {table} ({', '.join(columns)})")
+        with engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+            ))
+
+    return step
+
+
+def add_column(table: str, column: str, definition: str) -> Callable[[Engine], None]:
+    """
+    Build a migration step that adds a column to a table if it does not exist.
+
+    Args:
+        table: The name of the table
+        column: The name of the column
+        definition: The type and constraints of the column
+
+    Returns:
+        The migration step
+    """
+    def step(engine: Engine) -> None:
+        with engine.begin() as connection:
+            columns = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+            if column not in columns:
+                logger.info(f"Adding column {table}.{column}")
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+
+    return step
+
+
+def backfill_conversation_summaries(engine: Engine, batch_size: int = 500) -> None:
+    """
+    Migration step that computes the message summaries of existing conversations.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+        batch_size: The number of conversations updated per transaction
+    """
+    # Import here to avoid a circular import with the database module
+    try:
+        # Try importing with the full package path (for local development)
+        from mosaic.backend.database.repository import ConversationRepository
+    except ImportError:
+        # Fall back to relative import (for Docker environment)
+        from backend.database.repository import ConversationRepository
+
+    last_id = 0
+    updated = 0
+    while True:
+        with engine.begin() as connection:
+            conversation_ids = [row[0] for row in connection.execute(
+                text("SELECT id FROM conversations WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size}
+            )]
+            if not conversation_ids:
+                break
+            ConversationRepository.refresh_summaries(connection, conversation_ids)
+
+        last_id = conversation_ids[-1]
+        updated += len(conversation_ids)
+        logger.info(f"Computed the summaries of {updated} conversations")
+
+
+def message_search_index(engine: Engine) -> None:
+    """
+    Migration step that creates the full-text index of the messages and fills it.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+    """
+    # Import here to avoid a circular import with the database module
+    try:
+        # Try importing with the full package path (for local development)
+        from mosaic.backend.database.search import create_search_table, backfill_search_index
+    except ImportError:
+        # Fall back to relative import (for Docker environment)
+        from backend.database.search import create_search_table, backfill_search_index
+
+    create_search_table(engine)
+    backfill_search_index(engine)
+
+
+def message_log_segments(engine: Engine) -> None:
+    """
+    Migration step that moves the message logs into compressed segments.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+    """
+    # Import here to avoid a circular import with the database module
+    try:
+        # Try importing with the full package path (for local development)
+        from mosaic.backend.database.log_segments import migrate_legacy_logs
+    except ImportError:
+        # Fall back to relative import (for Docker environment)
+        from backend.database.log_segments import migrate_legacy_logs
+
+    migrate_legacy_logs(engine)
+
+
+def enable_incremental_vacuum(engine: Engine) -> bool:
+    """
+    Switch an existing database to incremental vacuuming.
+
+    Archiving conversations frees pages; with auto_vacuum=INCREMENTAL they
+    are returned to the file system by PRAGMA incremental_vacuum. New
+    databases are created in this mode (see database.py), but changing the
+    mode of an existing database takes one full VACUUM, which rewrites the
+    whole file and blocks every other connection meanwhile. It is therefore
+    not a migration step: run it by hand, during maintenance, with the
+    --incremental-vacuum option. A full VACUUM can renumber the rowids of
+    the messages, so the search index is rebuilt afterwards.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+
+    Returns:
+        True if the database was switched, False if it already was or is not SQLite
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    # Import here to avoid a circular import with the database module
+    try:
+        # Try importing with the full package path (for local development)
+        from mosaic.backend.database.search import rebuild_search_index
+    except ImportError:
+        # Fall back to relative import (for Docker environment)
+        from backend.database.search import rebuild_search_index
+
+    with engine.connect() as connection:
+        if connection.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return False
+
+    logger.info("Switching to incremental vacuuming (full VACUUM)")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        connection.execute(text("VACUUM"))
+
+    with engine.begin() as connection:
+        rebuild_search_index(connection)
+    return True
+
+
+def analyze(*tables: str) -> Callable[[Engine], None]:
+    """
+    Build a migration step that refreshes the query planner statistics of tables.
+
+    analysis_limit makes ANALYZE sample each index instead of reading all of
+    it, which keeps the step short on large tables.
+
+    Args:
+        tables: The names of the tables
+
+    Returns:
+        The migration step
+    """
+    def step(engine: Engine) -> None:
+        with engine.begin() as connection:
+            connection.execute(text("PRAGMA analysis_limit=1000"))
+            for table in tables:
+                connection.execute(text(f"ANALYZE {table}"))
+
+    return step
+
+
+# The migrations in order of version; never renumber or edit an applied
+# migration, add a new one instead
+MIGRATIONS: List[Migration] = [
+    Migration(1, "keyset pagination indexes", [
+        create_index("ix_conversations_agent_updated_id", "conversations", ["agent_id", "updated_at", "id"]),
+        create_index("ix_messages_conversation_timestamp_id", "messages", ["conversation_id", "timestamp", "id"]),
+    ]),
+    Migration(2, "hot chat query indexes", [
+        create_index(
+            "ix_conversations_agent_user_active_updated", "conversations",
+            ["agent_id", "user_id", "is_active", "updated_at"]
+        ),
+        create_index("ix_message_logs_message_timestamp_id", "message_logs", ["message_id", "timestamp", "id"]),
+        create_index("ix_attachments_message_id", "attachments", ["message_id"]),
+        analyze("conversations", "messages", "message_logs", "attachments"),
+    ]),
+    Migration(3, "conversation summaries", [
+        add_column("conversations", "message_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("conversations", "last_message_at", "INTEGER"),
+        add_column("conversations", "last_message_preview", "VARCHAR(160)"),
+        backfill_conversation_summaries,
+        create_index(
+            "ix_conversations_agent_user_updated_id", "conversations",
+            ["agent_id", "user_id", "updated_at", "id"]
+        ),
+        analyze("conversations"),
+    ]),
+    Migration(4, "message search index", [
+        message_search_index,
+    ]),
+    Migration(5, "message log segments", [
+        message_log_segments,
+        analyze("message_log_segments"),
+    ]),
+    Migration(6, "conversation archive", [
+        add_column("conversations", "archived_at", "DATETIME"),
+        add_column("conversations", "archive_path", "VARCHAR(512)"),
+        create_index("ix_conversations_archived_updated", "conversations", ["archived_at", "updated_at"]),
+    ]),
+]
+
+
+def _ensure_version_table(engine: Engine) -> None:
+    """Create the table recording the applied migrations if needed."""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)"
+        ))
+
+
+def get_applied_versions(engine: Engine) -> Dict[int, str]:
+    """
+    Get the migrations applied to a database.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+
+    Returns:
+        A dictionary of the applied versions to the time they were applied
+    """
+    _ensure_version_table(engine)
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT version, applied_at FROM schema_migrations")).all()
+    return {version: applied_at for version, applied_at in rows}
+
+
+def run_migrations(
+    engine: Engine,
+    migrations: Optional[List[Migration]] = None,
+    pause: float = 0.0
+) -> List[int]:
+    """
+    Apply the pending migrations to a database.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+        migrations: The migrations to apply (defaults to MIGRATIONS)
+        pause: Seconds to wait between steps, to let other connections write
+
+    Returns:
+        The versions that were applied
+    """
+    if migrations is None:
+        migrations = MIGRATIONS
+
+    applied = get_applied_versions(engine)
+    pending = sorted(
+        (migration for migration in migrations if migration.version not in applied),
+        key=lambda migration: migration.version
+    )
+
+    versions = []
+    for migration in pending:
+        logger.info(f"Applying migration {migration.version}: {migration.name}")
+        for index, step in enumerate(migration.steps):
+            if index and pause:
+                time.sleep(pause)
+            step(engine)
+
+        with engine.begin() as connection:
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+            )
+        versions.append(migration.version)
+
+    return versions
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(description="Apply the pending database migrations")
+    parser.add_argument("--pause", type=float, default=0.5, help="Seconds to wait between migration steps")
+    parser.add_argument("--status", action="store_true", help="List the migrations without applying them")
+    parser.add_argument(
+        "--incremental-vacuum", action="store_true",
+        help="Switch the database to incremental vacuuming (full VACUUM) after applying the migrations"
+    )
+    args = parser.parse_args()
+
+    # Import the database connection
+    try:
+        # Try importing with the full package path (for local development)
+        from mosaic.backend.database.database import get_engine
+    except ImportError:
+        # Fall back to relative import (for Docker environment)
+        from backend.database.database import get_engine
+
+    try:
+        engine = get_engine()
+        if args.status:
+            applied = get_applied_versions(engine)
+            for migration in MIGRATIONS:
+                state = f"applied {applied[migration.version]}" if migration.version in applied else "pending"
+                print(f"{migration.version:4d}  {migration.name:40s}  {state}")
+        else:
+            versions = run_migrations(engine, pause=args.pause)
+            print(f"Applied {len(versions)} migrations")
+            if args.incremental_vacuum:
+                switched = enable_incremental_vacuum(engine)
+                print("Switched to incremental vacuuming" if switched else "Incremental vacuuming already enabled")
+        sys.exit(0)
+    except Exception as e:
+        logger.error(f"Error applying migrations: {str(e)}")
+        sys.exit(1)
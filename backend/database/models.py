@@ -4,13 +4,18 @@ Database Models for MOSAIC
 This module defines the SQLAlchemy models for the MOSAIC database.
 """
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, LargeBinary, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, LargeBinary, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 import datetime
 
+from .blob_store import blob_store, parse_blob_key
+
 Base = declarative_base()
 
+# Number of characters of the last message stored with a conversation
+CONVERSATION_PREVIEW_LENGTH = 160
+
 class User(Base):
     """
     Model for a user.
@@ -57,6 +62,16 @@ class Conversation(Base):
     A conversation is a collection of messages between a user and an agent.
     """
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Keyset pagination of an agent's conversations by (updated_at, id)
+        Index("ix_conversations_agent_updated_id", "agent_id", "updated_at", "id"),
+        # Lookup of the active conversation of an agent and user, newest first
+        Index("ix_conversations_agent_user_active_updated", "agent_id", "user_id", "is_active", "updated_at"),
+        # Keyset pagination of a user's conversation summaries by (updated_at, id)
+        Index("ix_conversations_agent_user_updated_id", "agent_id", "user_id", "updated_at", "id"),
+        # Lookup of the conversations to archive, untouched the longest first
+        Index("ix_conversations_archived_updated", "archived_at", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True)
     agent_id = Column(String(50), nullable=False, index=True)
@@ -66,6 +81,17 @@ class Conversation(Base):
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     is_active = Column(Boolean, default=True)
     
+    # Summary of the messages, kept up to date in the transaction that inserts
+    # or deletes a message (see ConversationRepository.refresh_summaries)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(Integer, nullable=True)  # Unix timestamp in milliseconds
+    last_message_preview = Column(String(CONVERSATION_PREVIEW_LENGTH), nullable=True)
+    
+    # Set while the messages of the conversation are moved to an archive file
+    # (see database/archive.py); the row stays as a stub with its summary
+    archived_at = Column(DateTime, nullable=True)
+    archive_path = Column(String(512), nullable=True)  # "<archive file>#<entry>"
+    
     # Relationships
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     
@@ -81,6 +107,10 @@ class Message(Base):
     and references to attachments.
     """
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination of a conversation's messages by (timestamp, id)
+        Index("ix_messages_conversation_timestamp_id", "conversation_id", "timestamp", "id"),
+    )
     
     id = Column(String(36), primary_key=True)  # UUID as string
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
@@ -97,6 +127,7 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
     attachments = relationship("Attachment", back_populates="message", cascade="all, delete-orphan")
     logs = relationship("MessageLog", back_populates="message", cascade="all, delete-orphan")
+    log_segments = relationship("MessageLogSegment", back_populates="message", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Message(id='{self.id}', role='{self.role}', conversation_id={self.conversation_id})>"
@@ -109,6 +140,10 @@ class Attachment(Base):
     An attachment can be an image, file, or other binary data.
     """
     __tablename__ = "attachments"
+    __table_args__ = (
+        # Lookup of the attachments of a message
+        Index("ix_attachments_message_id", "message_id"),
+    )
     
     id = Column(Integer, primary_key=True)
     message_id = Column(String(36), ForeignKey("messages.id"), nullable=False)
@@ -117,26 +152,67 @@ class Attachment(Base):
     filename = Column(String(255), nullable=True)
     content_type = Column(String(100), nullable=True)  # MIME type
     size = Column(Integer, nullable=True)  # Size in bytes
-    storage_path = Column(String(255), nullable=True)  # Path to file on disk
+    storage_path = Column(String(255), nullable=True)  # Blob key ("sha256:<digest>") or path to file on disk
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
-    # For small attachments, store directly in the database
-    data = Column(LargeBinary, nullable=True)
+    # Content stored directly in the database (attachments created before the
+    # blob store; new contents go to the blob store)
+    inline_data = Column("data", LargeBinary, nullable=True)
     
     # Relationships
     message = relationship("Message", back_populates="attachments")
     
+    @property
+    def data(self):
+        """The content of the attachment, read from the blob store or the database."""
+        if self.inline_data is not None:
+            return self.inline_data
+        
+        digest = parse_blob_key(self.storage_path)
+        if digest is not None:
+            return blob_store.read(digest)
+        
+        return None
+    
+    @data.setter
+    def data(self, value):
+        self.inline_data = value
+    
     def __repr__(self):
         return f"<Attachment(id={self.id}, type='{self.type}', filename='{self.filename}')>"
 
 
+class Blob(Base):
+    """
+    Model for a content-addressed attachment blob.
+    
+    Tracks how many attachments refer to each blob in the blob store, so
+    blobs that are no longer referenced can be garbage-collected.
+    """
+    __tablename__ = "blobs"
+    
+    digest = Column(String(64), primary_key=True)  # SHA-256 hex digest
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, index=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<Blob(digest='{self.digest}', size={self.size}, ref_count={self.ref_count})>"
+
+
 class MessageLog(Base):
     """
-    Model for logs associated with a message.
+    Model for logs associated with a message, one row per log entry.
     
     Logs are generated during message processing and can be used for debugging.
+    Logs are now stored in MessageLogSegment; the rows of this table were
+    written before and are moved to segments by a migration.
     """
     __tablename__ = "message_logs"
+    __table_args__ = (
+        # The logs of a message in order of (timestamp, id)
+        Index("ix_message_logs_message_timestamp_id", "message_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True)
     message_id = Column(String(36), ForeignKey("messages.id"), nullable=False)
@@ -150,6 +226,43 @@ class MessageLog(Base):
         return f"<MessageLog(id={self.id}, message_id='{self.message_id}')>"
 
 
+class MessageLogSegment(Base):
+    """
+    Model for a compressed, append-only chunk of the logs of a message.
+    
+    Each batch of logs written for a message becomes one segment; the log
+    entries are framed records compressed together (see log_segments). The
+    retention job later merges the segments of a message into one compacted
+    segment and deletes segments past the retention period.
+    """
+    __tablename__ = "message_log_segments"
+    __table_args__ = (
+        # The segments of a message in the order they were written
+        Index("ix_message_log_segments_message_id_id", "message_id", "id"),
+        # Segments waiting to be compacted, oldest first
+        Index("ix_message_log_segments_compacted_created_at", "compacted", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    message_id = Column(String(36), ForeignKey("messages.id"), nullable=False)
+    entry_count = Column(Integer, nullable=False)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False, index=True)
+    codec = Column(String(20), nullable=False, default="zlib")
+    raw_size = Column(Integer, nullable=False)  # Size in bytes of the uncompressed records
+    compacted = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    # Only loaded when the logs are read
+    data = deferred(Column(LargeBinary, nullable=False))
+    
+    # Relationships
+    message = relationship("Message", back_populates="log_segments")
+    
+    def __repr__(self):
+        return f"<MessageLogSegment(id={self.id}, message_id='{self.message_id}', entry_count={self.entry_count})>"
+
+
 class Agent(Base):
     """
     Model for an agent definition.
@@ -0,0 +1,166 @@
+"""
+Bulk Purge of User Data for MOSAIC
+
+This module deletes the conversations of a user with set-based statements
+instead of loading every conversation, message, log and attachment through
+the ORM cascade. The purge runs in bounded batches, each a short transaction
+through the single database writer, children first:
+
+- message log segments (and legacy log rows) of a batch of messages
+- attachments of those messages, releasing their blob references
+- the messages themselves (the search index is kept in sync by triggers)
+
+and once a user has no messages left, their conversations (including the
+stubs of archived conversations). Between batches the writer is free to run
+other writes, and the progress is reported. The archive files of the user
+and the blobs that are no longer referenced are deleted at the end.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .archive import conversation_archive
+from .models import Conversation, Message
+from .repository import BlobRepository, ConversationRepository, MessageRepository
+from .writer import database_writer
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.purge")
+
+
+@dataclass
+class PurgeProgress:
+    """The progress of a purge, updated after every batch."""
+    batches: int = 0
+    conversations: int = 0
+    messages: int = 0
+    logs: int = 0
+    attachments: int = 0
+    blobs: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the progress to the dictionary returned by the API."""
+        return {
+            "batches": self.batches,
+            "conversations": self.conversations,
+            "messages": self.messages,
+            "logs": self.logs,
+            "attachments": self.attachments,
+            "blobs": self.blobs
+        }
+
+    def add(self, counts: Dict[str, int]) -> None:
+        """Add the rows deleted by a batch."""
+        for name, count in counts.items():
+            setattr(self, name, getattr(self, name) + count)
+
+
+def _user_conversations(user_id: str):
+    """Select the IDs of the conversations of a user."""
+    return select(Conversation.id).where(Conversation.user_id == user_id)
+
+
+def delete_message_batch(session: Session, user_id: str, batch_size: int) -> Dict[str, int]:
+    """
+    Delete a batch of the messages in the conversations of a user, with their logs and attachments.
+
+    Args:
+        session: The session of the write transaction
+        user_id: The Clerk user ID
+        batch_size: The maximum number of messages deleted
+
+    Returns:
+        The number of messages, log entries and attachments deleted
+    """
+    rows = session.execute(
+        select(Message.id, Message.conversation_id).where(
+            Message.conversation_id.in_(_user_conversations(user_id))
+        ).limit(batch_size)
+    ).all()
+    if not rows:
+        return {"messages": 0}
+
+    ids: List[str] = [message_id for message_id, _ in rows]
+    counts = MessageRepository.bulk_delete_messages(session, ids)
+
+    # Keep the summaries of the conversations right while they are purged
+    ConversationRepository.refresh_summaries(
+        session.connection(),
+        sorted({conversation_id for _, conversation_id in rows})
+    )
+
+    return {"messages": len(ids), **counts}
+
+
+def delete_conversation_batch(session: Session, user_id: str, batch_size: int) -> Dict[str, int]:
+    """
+    Delete a batch of the conversations of a user that have no messages left.
+
+    Args:
+        session: The session of the write transaction
+        user_id: The Clerk user ID
+        batch_size: The maximum number of conversations deleted
+
+    Returns:
+        The number of conversations deleted
+    """
+    conversation_ids = _user_conversations(user_id).where(
+        ~select(Message.id).where(Message.conversation_id == Conversation.id).exists()
+    ).limit(batch_size)
+    count = session.execute(
+        delete(Conversation).where(Conversation.id.in_(conversation_ids)).execution_options(synchronize_session=False)
+    ).rowcount
+    return {"conversations": count}
+
+
+def purge_user_conversations(
+    user_id: str,
+    batch_size: int = 500,
+    pause: float = 0.01,
+    progress: Optional[PurgeProgress] = None,
+    on_progress: Optional[Callable[[PurgeProgress], None]] = None
+) -> PurgeProgress:
+    """
+    Delete all conversations of a user in batches, children first.
+
+    Args:
+        user_id: The Clerk user ID
+        batch_size: The maximum number of messages (or conversations) deleted per transaction
+        pause: Seconds to wait between batches, to let other writes run
+        progress: Optional progress to update while the purge runs
+        on_progress: Optional function called with the progress after every batch
+
+    Returns:
+        The progress, with the totals of the deleted rows
+    """
+    if progress is None:
+        progress = PurgeProgress()
+    batch_size = max(1, batch_size)
+
+    # Children first: the conversations are deleted once their messages are gone
+    for delete_batch, name in ((delete_message_batch, "messages"), (delete_conversation_batch, "conversations")):
+        while True:
+            counts = database_writer.execute(lambda session: delete_batch(session, user_id, batch_size))
+            progress.add(counts)
+            count = counts[name]
+            if count:
+                progress.batches += 1
+                logger.info(f"Purging user {user_id}: {progress.to_dict()}")
+                if on_progress is not None:
+                    on_progress(progress)
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+    # Delete the archive files of the conversations that were archived
+    conversation_archive.delete_user(user_id)
+
+    # Delete the attachment blobs the user was the last user of
+    progress.blobs = BlobRepository.collect_garbage()
+    return progress
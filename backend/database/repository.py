@@ -9,18 +9,300 @@ to interact with the database.
 import logging
 import uuid
 import base64
+import json
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, FrozenSet, Iterable, Optional, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.orm import Session, defer, load_only, undefer
+from sqlalchemy import delete, desc, select, insert, update, and_, or_, case, func, event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from .models import Conversation, Message, Attachment, MessageLog, Agent, Tool, Capability, UserPreference
+from .models import (
+    Conversation, Message, Attachment, MessageLog, MessageLogSegment, Agent, Tool, Capability, UserPreference, Blob,
+    CONVERSATION_PREVIEW_LENGTH
+)
 from .database import get_db_session
+from .writer import database_writer
+from .blob_store import blob_store, blob_key, parse_blob_key
+from .image_variants import is_image, generate_variants
+from .log_segments import (
+    LogEntry, build_segments, iter_log_entries, read_message_logs, compact_message_logs, prune_message_logs
+)
 
 # Configure logging
 logger = logging.getLogger("mosaic.database.repository")
 
+# Default and maximum page sizes for paginated history queries
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Fields of a message dictionary read from columns of the message
+MESSAGE_COLUMN_FIELDS = {
+    "id": "id",
+    "role": "role",
+    "content": "content",
+    "timestamp": "timestamp",
+    "agentId": "conversation_id",
+    "userId": "user_id",
+    "status": "status",
+    "error": "error",
+    "clientMessageId": "client_message_id",
+    "customData": "custom_data"
+}
+
+# Fields of a message dictionary loaded from related tables
+MESSAGE_RELATION_FIELDS = ("logs", "attachments")
+
+# Fields of a conversation dictionary and the columns they are read from
+CONVERSATION_COLUMN_FIELDS = {
+    "id": "id",
+    "agentId": "agent_id",
+    "title": "title",
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+    "isActive": "is_active",
+    "messageCount": "message_count",
+    "lastMessageAt": "last_message_at",
+    "lastMessagePreview": "last_message_preview",
+    "archivedAt": "archived_at",
+    "userId": "user_id"
+}
+CONVERSATION_FIELDS = tuple(CONVERSATION_COLUMN_FIELDS)
+
+
+def _split_fields(value: Optional[str]) -> List[str]:
+    """Split a comma-separated list of field names."""
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def parse_message_fields(fields: Optional[str] = None, include: Optional[str] = None) -> Optional[FrozenSet[str]]:
+    """
+    Parse the projection of message dictionaries requested by a client.
+    
+    fields lists the fields to return; without it all column fields are
+    returned but none of the related logs and attachments. include adds
+    fields, typically the relations. The id and timestamp, which cursors are
+    made of, are always returned.
+    
+    Args:
+        fields: Optional comma-separated fields to return (e.g. "id,role,content")
+        include: Optional comma-separated fields to add (e.g. "attachments")
+        
+    Returns:
+        The set of fields, or None for full messages if neither is given
+        
+    Raises:
+        ValueError: If a field is unknown
+    """
+    if fields is None and include is None:
+        return None
+    
+    requested = set(_split_fields(fields)) if fields is not None else set(MESSAGE_COLUMN_FIELDS)
+    requested.update(_split_fields(include))
+    
+    unknown = requested - set(MESSAGE_COLUMN_FIELDS) - set(MESSAGE_RELATION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown message fields: {', '.join(sorted(unknown))}")
+    
+    return frozenset(requested | {"id", "timestamp"})
+
+
+def parse_conversation_fields(fields: Optional[str] = None) -> Optional[FrozenSet[str]]:
+    """
+    Parse the projection of conversation dictionaries requested by a client.
+    
+    Args:
+        fields: Optional comma-separated fields to return (the id is always returned)
+        
+    Returns:
+        The set of fields, or None for full conversations
+        
+    Raises:
+        ValueError: If a field is unknown
+    """
+    if fields is None:
+        return None
+    
+    requested = set(_split_fields(fields))
+    unknown = requested - set(CONVERSATION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown conversation fields: {', '.join(sorted(unknown))}")
+    
+    return frozenset(requested | {"id"})
+
+
+def _message_load_options(fields: Optional[FrozenSet[str]]) -> List[Any]:
+    """Build the query options that load only the columns of the requested message fields."""
+    if fields is None:
+        return []
+    
+    columns = {"id", "timestamp", "conversation_id"}
+    columns.update(MESSAGE_COLUMN_FIELDS[name] for name in fields if name in MESSAGE_COLUMN_FIELDS)
+    return [load_only(*(getattr(Message, column) for column in sorted(columns)))]
+
+
+def _conversation_columns(fields: Optional[FrozenSet[str]]) -> List[Any]:
+    """
+    Get the columns to select for the requested conversation fields.
+    
+    The id and updated_at, which cursors are made of, are always selected.
+    
+    Args:
+        fields: Optional conversation fields (see parse_conversation_fields);
+            all fields without them
+        
+    Returns:
+        The Conversation columns
+    """
+    columns = ["id", "updated_at"]
+    for name, column in CONVERSATION_COLUMN_FIELDS.items():
+        if (fields is None or name in fields) and column not in columns:
+            columns.append(column)
+    return [getattr(Conversation, column) for column in columns]
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode a pagination position as an opaque cursor.
+    
+    Args:
+        *values: The sort key values of the row (e.g. timestamp and ID)
+        
+    Returns:
+        A URL-safe cursor string
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode an opaque cursor back into its sort key values.
+    
+    Args:
+        cursor: The cursor string returned by encode_cursor
+        
+    Returns:
+        The list of sort key values
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    
+    return values
+
+
+def _keyset_filter(sort_column, id_column, cursor_values: List[Any], before: bool):
+    """
+    Build the filter that selects rows strictly before or after a cursor.
+    
+    Args:
+        sort_column: The primary sort column
+        id_column: The ID column used as a tie-breaker
+        cursor_values: The decoded (sort value, ID) of the cursor
+        before: Whether to select rows before (True) or after (False) the cursor
+        
+    Returns:
+        The SQLAlchemy filter expression
+    """
+    sort_value, id_value = cursor_values
+    if before:
+        return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < id_value))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > id_value))
+
+
+def _page_conversations(query, limit: int, before: Optional[str], after: Optional[str]) -> Tuple[List[Any], bool]:
+    """
+    Get a page of a conversation query, newest first, by (updated_at, id) cursors.
+    
+    Args:
+        query: The query of the conversations (or of some of their columns)
+        limit: The maximum number of rows to return
+        before: Optional cursor; return conversations updated before it
+        after: Optional cursor; return conversations updated after it
+        
+    Returns:
+        A tuple of (rows ordered newest first, whether more rows exist in the
+        paging direction)
+        
+    Raises:
+        ValueError: If a cursor is malformed
+    """
+    if after:
+        # Walk forward in time from the cursor, then restore newest-first order
+        updated_at, conversation_id = decode_cursor(after)
+        query = query.filter(_keyset_filter(
+            Conversation.updated_at, Conversation.id,
+            [datetime.fromisoformat(updated_at), conversation_id], before=False
+        ))
+        query = query.order_by(Conversation.updated_at, Conversation.id)
+    else:
+        if before:
+            updated_at, conversation_id = decode_cursor(before)
+            query = query.filter(_keyset_filter(
+                Conversation.updated_at, Conversation.id,
+                [datetime.fromisoformat(updated_at), conversation_id], before=True
+            ))
+        query = query.order_by(desc(Conversation.updated_at), desc(Conversation.id))
+    
+    # Fetch one extra row to find out whether there is another page
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    if after:
+        rows.reverse()
+    
+    return rows, has_more
+
+
+def _message_preview(content: Optional[str]) -> Optional[str]:
+    """Truncate the content of a message to the preview stored with its conversation."""
+    if content is None:
+        return None
+    return content[:CONVERSATION_PREVIEW_LENGTH]
+
+
+def _last_message_column(column):
+    """Select a column of the last message of the conversation being updated."""
+    conversations = Conversation.__table__
+    return select(column).where(
+        Message.conversation_id == conversations.c.id
+    ).order_by(desc(Message.timestamp), desc(Message.id)).limit(1).scalar_subquery()
+
+
+def _get_for_write(session: Session, model, key: Any):
+    """
+    Get an object by primary key for a write, keeping it for the rest of the session.
+    
+    The single writer runs many writes in one session (e.g. a burst of messages
+    for the same conversation), so later writes find the object without a
+    query and without flushing the writes queued before them.
+    
+    Args:
+        session: The session of the write
+        model: The model class
+        key: The primary key
+        
+    Returns:
+        The object, or None if it does not exist
+    """
+    loaded = session.info.setdefault("loaded_for_write", {})
+    obj = loaded.get((model, key))
+    if obj is None:
+        obj = session.get(model, key)
+        if obj is not None:
+            loaded[(model, key)] = obj
+    return obj
+
+
 class ConversationRepository:
     """
     Repository for conversation-related database operations.
@@ -39,20 +321,19 @@ class ConversationRepository:
         Returns:
             The created conversation
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Conversation:
             conversation = Conversation(
                 agent_id=agent_id,
                 title=title or f"Conversation with {agent_id}",
                 user_id=user_id
             )
             session.add(conversation)
-            session.commit()
+            session.flush()
             logger.info(f"Created conversation {conversation.id} for agent {agent_id}")
-            
-            # Detach the conversation from the session by expunging it
-            session.expunge(conversation)
-            
             return conversation
+        
+        # The writer commits the conversation and returns it detached
+        return database_writer.execute(write)
     
     @staticmethod
     def get_conversation(conversation_id: int) -> Optional[Conversation]:
@@ -75,19 +356,27 @@ class ConversationRepository:
             return conversation
     
     @staticmethod
-    def get_conversations_for_agent(agent_id: str, user_id: Optional[str] = None) -> List[Conversation]:
+    def get_conversations_for_agent(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> List[Any]:
         """
         Get all conversations for an agent.
         
         Args:
             agent_id: The ID of the agent
             user_id: Optional Clerk user ID to filter by
+            fields: Optional conversation fields; only their columns are
+                selected, and rows are returned instead of models
             
         Returns:
-            A list of conversations
+            A list of conversations (or rows of their columns)
         """
         with get_db_session() as session:
-            query = session.query(Conversation).filter(
+            query = session.query(
+                *(_conversation_columns(fields) if fields is not None else [Conversation])
+            ).filter(
                 Conversation.agent_id == agent_id
             )
             
@@ -96,6 +385,8 @@ class ConversationRepository:
                 query = query.filter(Conversation.user_id == user_id)
                 
             conversations = query.order_by(desc(Conversation.updated_at)).all()
+            if fields is not None:
+                return conversations
             
             # Detach all conversations from the session by expunging them
             for conversation in conversations:
@@ -103,6 +394,183 @@ class ConversationRepository:
                 
             return conversations
     
+    @staticmethod
+    def get_conversations_page_for_agent(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> Tuple[List[Any], bool]:
+        """
+        Get a page of conversations for an agent, newest first.
+        
+        Pages are addressed with (updated_at, id) cursors. Without a cursor the
+        most recently updated conversations are returned.
+        
+        Args:
+            agent_id: The ID of the agent
+            user_id: Optional Clerk user ID to filter by
+            limit: The maximum number of conversations to return
+            before: Optional cursor; return conversations updated before it
+            after: Optional cursor; return conversations updated after it
+            fields: Optional conversation fields; only their columns are
+                selected, and rows are returned instead of models
+            
+        Returns:
+            A tuple of (conversations ordered newest first, whether more
+            conversations exist in the paging direction)
+            
+        Raises:
+            ValueError: If a cursor is malformed
+        """
+        with get_db_session() as session:
+            query = session.query(
+                *(_conversation_columns(fields) if fields is not None else [Conversation])
+            ).filter(
+                Conversation.agent_id == agent_id
+            )
+            
+            # Filter by user_id if provided
+            if user_id:
+                query = query.filter(Conversation.user_id == user_id)
+            
+            conversations, has_more = _page_conversations(query, limit, before, after)
+            if fields is not None:
+                return conversations, has_more
+            
+            # Detach all conversations from the session by expunging them
+            for conversation in conversations:
+                session.expunge(conversation)
+                
+            return conversations, has_more
+    
+    @staticmethod
+    def get_conversation_summaries_page_for_agent(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> Tuple[List[Any], bool]:
+        """
+        Get a page of conversation summaries for an agent, newest first.
+        
+        Only the columns shown in a conversation list are selected, including
+        the stored message count and last message, so a page is read with one
+        query on the conversations index without touching the messages.
+        
+        Args:
+            agent_id: The ID of the agent
+            user_id: Optional Clerk user ID to filter by
+            limit: The maximum number of conversations to return
+            before: Optional cursor; return conversations updated before it
+            after: Optional cursor; return conversations updated after it
+            fields: Optional conversation fields; only their columns are selected
+            
+        Returns:
+            A tuple of (summary rows ordered newest first, whether more
+            conversations exist in the paging direction)
+            
+        Raises:
+            ValueError: If a cursor is malformed
+        """
+        with get_db_session() as session:
+            query = session.query(*_conversation_columns(fields)).filter(
+                Conversation.agent_id == agent_id
+            )
+            
+            # Filter by user_id if provided
+            if user_id:
+                query = query.filter(Conversation.user_id == user_id)
+            
+            return _page_conversations(query, limit, before, after)
+    
+    @staticmethod
+    def count_message(connection, conversation_id: int, timestamp: int, content: str) -> None:
+        """
+        Add a new message to the summary of its conversation.
+        
+        Args:
+            connection: The connection of the current transaction
+            conversation_id: The ID of the conversation
+            timestamp: The timestamp of the message
+            content: The content of the message
+        """
+        conversations = Conversation.__table__
+        is_last = or_(conversations.c.last_message_at.is_(None), conversations.c.last_message_at <= timestamp)
+        connection.execute(
+            update(conversations).where(conversations.c.id == conversation_id).values(
+                message_count=conversations.c.message_count + 1,
+                last_message_at=case((is_last, timestamp), else_=conversations.c.last_message_at),
+                last_message_preview=case((is_last, _message_preview(content)), else_=conversations.c.last_message_preview),
+                # A new message is not an update of the conversation itself
+                updated_at=conversations.c.updated_at
+            )
+        )
+    
+    @staticmethod
+    def uncount_message(connection, conversation_id: int, timestamp: int) -> None:
+        """
+        Remove a deleted message from the summary of its conversation.
+        
+        The last message is looked up again only if the deleted message was
+        the last one.
+        
+        Args:
+            connection: The connection of the current transaction
+            conversation_id: The ID of the conversation
+            timestamp: The timestamp of the deleted message
+        """
+        conversations = Conversation.__table__
+        was_last = conversations.c.last_message_at <= timestamp
+        connection.execute(
+            update(conversations).where(conversations.c.id == conversation_id).values(
+                message_count=case(
+                    (conversations.c.message_count > 0, conversations.c.message_count - 1), else_=0
+                ),
+                last_message_at=case(
+                    (was_last, _last_message_column(Message.timestamp)), else_=conversations.c.last_message_at
+                ),
+                last_message_preview=case(
+                    (was_last, _last_message_column(func.substr(Message.content, 1, CONVERSATION_PREVIEW_LENGTH))),
+                    else_=conversations.c.last_message_preview
+                ),
+                updated_at=conversations.c.updated_at
+            )
+        )
+    
+    @staticmethod
+    def refresh_summaries(connection, conversation_ids: List[int]) -> None:
+        """
+        Recompute the message summaries of conversations from their messages.
+        
+        The summaries are kept up to date when messages are inserted, updated
+        or deleted through the ORM (including cascading deletes of
+        conversations). Bulk inserts or deletes of messages must call this for
+        the conversations involved in the same transaction.
+        
+        Args:
+            connection: The connection of the current transaction
+            conversation_ids: The IDs of the conversations
+        """
+        if not conversation_ids:
+            return
+        
+        conversations = Conversation.__table__
+        connection.execute(
+            update(conversations).where(conversations.c.id.in_(conversation_ids)).values(
+                message_count=select(func.count()).where(
+                    Message.conversation_id == conversations.c.id
+                ).scalar_subquery(),
+                last_message_at=_last_message_column(Message.timestamp),
+                last_message_preview=_last_message_column(func.substr(Message.content, 1, CONVERSATION_PREVIEW_LENGTH)),
+                updated_at=conversations.c.updated_at
+            )
+        )
+    
     @staticmethod
     def get_active_conversation_for_agent(agent_id: str, user_id: Optional[str] = None) -> Optional[Conversation]:
         """
@@ -145,17 +613,14 @@ class ConversationRepository:
         Returns:
             The updated conversation, or None if not found
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Optional[Conversation]:
             conversation = session.query(Conversation).filter(Conversation.id == conversation_id).first()
             if conversation:
                 conversation.title = title
-                session.commit()
                 logger.info(f"Updated title for conversation {conversation_id}")
-                
-                # Detach the conversation from the session by expunging it
-                session.expunge(conversation)
-            
             return conversation
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def deactivate_conversation(conversation_id: int) -> Optional[Conversation]:
@@ -168,17 +633,14 @@ class ConversationRepository:
         Returns:
             The updated conversation, or None if not found
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Optional[Conversation]:
             conversation = session.query(Conversation).filter(Conversation.id == conversation_id).first()
             if conversation:
                 conversation.is_active = False
-                session.commit()
                 logger.info(f"Deactivated conversation {conversation_id}")
-                
-                # Detach the conversation from the session by expunging it
-                session.expunge(conversation)
-            
             return conversation
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def activate_conversation(conversation_id: int, agent_id: str, user_id: Optional[str] = None) -> Optional[Conversation]:
@@ -193,7 +655,7 @@ class ConversationRepository:
         Returns:
             The activated conversation, or None if not found
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Optional[Conversation]:
             # First, deactivate all conversations for this agent and user
             query = session.query(Conversation).filter(
                 Conversation.agent_id == agent_id,
@@ -208,30 +670,15 @@ class ConversationRepository:
                 active_conversation.is_active = False
                 logger.info(f"Deactivated conversation {active_conversation.id}")
             
-            # Then, activate the specified conversation
+            # Then, activate the specified conversation; the deactivations
+            # are committed even if it wasn't found
             conversation = session.query(Conversation).filter(Conversation.id == conversation_id).first()
             if conversation:
                 conversation.is_active = True
-                session.commit()
                 logger.info(f"Activated conversation {conversation_id}")
-                
-                # Create a new instance of the conversation to return
-                # This avoids the "not bound to a Session" error
-                activated_conversation = Conversation(
-                    id=conversation.id,
-                    agent_id=conversation.agent_id,
-                    title=conversation.title,
-                    is_active=True,
-                    user_id=conversation.user_id,
-                    created_at=conversation.created_at,
-                    updated_at=conversation.updated_at
-                )
-                
-                return activated_conversation
-            else:
-                # If the conversation wasn't found, still commit the deactivations
-                session.commit()
-                return None
+            return conversation
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def delete_conversation(conversation_id: int) -> bool:
@@ -244,14 +691,21 @@ class ConversationRepository:
         Returns:
             True if the conversation was deleted, False otherwise
         """
-        with get_db_session() as session:
+        def write(session: Session) -> bool:
             conversation = session.query(Conversation).filter(Conversation.id == conversation_id).first()
-            if conversation:
-                session.delete(conversation)
-                session.commit()
-                logger.info(f"Deleted conversation {conversation_id}")
-                return True
-            return False
+            if not conversation:
+                return False
+            
+            session.delete(conversation)
+            session.flush()
+            
+            # Delete the attachment blobs the conversation was the last user of
+            BlobRepository.collect_garbage()
+            
+            logger.info(f"Deleted conversation {conversation_id}")
+            return True
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def get_conversations_for_user(user_id: str) -> List[Conversation]:
@@ -311,12 +765,13 @@ class MessageRepository:
         Returns:
             The created message
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Message:
             # If user_id is not provided, try to get it from the conversation
-            if user_id is None:
-                conversation = session.query(Conversation).filter(Conversation.id == conversation_id).first()
+            message_user_id = user_id
+            if message_user_id is None:
+                conversation = _get_for_write(session, Conversation, conversation_id)
                 if conversation:
-                    user_id = conversation.user_id
+                    message_user_id = conversation.user_id
             
             message = Message(
                 id=message_id or str(uuid.uuid4()),
@@ -327,17 +782,15 @@ class MessageRepository:
                 status=status,
                 error=error,
                 client_message_id=client_message_id,
-                user_id=user_id,
+                user_id=message_user_id,
                 custom_data=custom_data
             )
             session.add(message)
-            session.commit()
             logger.info(f"Created message {message.id} in conversation {conversation_id}")
-            
-            # Detach the message from the session by expunging it
-            session.expunge(message)
-            
             return message
+        
+        # The writer commits the message and returns it detached
+        return database_writer.execute(write)
     
     @staticmethod
     def get_message(message_id: str) -> Optional[Message]:
@@ -382,32 +835,152 @@ class MessageRepository:
             return messages
     
     @staticmethod
-    def add_log_to_message(message_id: str, log_entry: str) -> MessageLog:
+    def get_message_page_for_conversation(
+        conversation_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], bool]:
         """
-        Add a log entry to a message.
+        Get a page of messages for a conversation as API dictionaries.
+        
+        Pages are addressed with (timestamp, id) cursors. Without a cursor the
+        most recent messages are returned, so clients can show the end of the
+        conversation and scroll back with the before cursor.
         
         Args:
-            message_id: The ID of the message
-            log_entry: The log entry to add
+            conversation_id: The ID of the conversation
+            limit: The maximum number of messages to return
+            before: Optional cursor; return the messages just before it
+            after: Optional cursor; return the messages just after it
+            fields: Optional message fields to return (see parse_message_fields)
             
         Returns:
-            The created message log
+            A tuple of (message dictionaries ordered by timestamp, whether more
+            messages exist in the paging direction)
+            
+        Raises:
+            ValueError: If a cursor is malformed
         """
         with get_db_session() as session:
-            message_log = MessageLog(
-                message_id=message_id,
-                log_entry=log_entry
+            conversation = session.query(Conversation.agent_id).filter(
+                Conversation.id == conversation_id
+            ).first()
+            
+            query = session.query(Message).options(*_message_load_options(fields)).filter(
+                Message.conversation_id == conversation_id
+            )
+            
+            if after:
+                query = query.filter(_keyset_filter(Message.timestamp, Message.id, decode_cursor(after), before=False))
+                query = query.order_by(Message.timestamp, Message.id)
+            else:
+                # Walk backwards from the cursor (or the end), then restore chronological order
+                if before:
+                    query = query.filter(_keyset_filter(Message.timestamp, Message.id, decode_cursor(before), before=True))
+                query = query.order_by(desc(Message.timestamp), desc(Message.id))
+            
+            # Fetch one extra row to find out whether there is another page
+            messages = query.limit(limit + 1).all()
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            
+            if not after:
+                messages.reverse()
+            
+            return messages_to_dicts(
+                session,
+                messages,
+                agent_id=conversation.agent_id if conversation else None,
+                fields=fields
+            ), has_more
+    
+    @staticmethod
+    def get_message_dicts_for_conversation(
+        conversation_id: int,
+        fields: Optional[FrozenSet[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all messages for a conversation as API dictionaries.
+        
+        The conversation, its messages, their logs and their attachments are
+        loaded in four queries regardless of the length of the conversation;
+        relations that are not among the requested fields are not loaded.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            fields: Optional message fields to return (see parse_message_fields)
+            
+        Returns:
+            A list of message dictionaries ordered by timestamp
+        """
+        with get_db_session() as session:
+            conversation = session.query(Conversation.agent_id).filter(
+                Conversation.id == conversation_id
+            ).first()
+            
+            messages = session.query(Message).options(*_message_load_options(fields)).filter(
+                Message.conversation_id == conversation_id
+            ).order_by(Message.timestamp).all()
+            
+            # Select the related rows by conversation rather than by a long ID list
+            message_ids = select(Message.id).where(
+                Message.conversation_id == conversation_id
             )
-            session.add(message_log)
-            session.commit()
             
-            # Detach the message log from the session by expunging it
-            session.expunge(message_log)
+            return messages_to_dicts(
+                session,
+                messages,
+                agent_id=conversation.agent_id if conversation else None,
+                message_ids=message_ids,
+                fields=fields
+            )
+    
+    @staticmethod
+    def add_log_to_message(message_id: str, log_entry: str) -> LogEntry:
+        """
+        Add a log entry to a message.
+        
+        Args:
+            message_id: The ID of the message
+            log_entry: The log entry to add
+            
+        Returns:
+            The added log entry
+        """
+        entry = LogEntry(datetime.utcnow(), log_entry)
+        
+        def write(session: Session) -> None:
+            session.execute(insert(MessageLogSegment), build_segments([(message_id, entry.log_entry, entry.timestamp)]))
+        
+        database_writer.execute(write)
+        return entry
+    
+    @staticmethod
+    def add_logs_to_messages(logs: List[Tuple[str, str, datetime]]) -> int:
+        """
+        Add a batch of log entries with a single multi-row INSERT and commit.
+        
+        The entries of each message are written as one compressed segment.
+        
+        Args:
+            logs: A list of (message_id, log_entry, timestamp) tuples
             
-            return message_log
+        Returns:
+            The number of log entries added
+        """
+        if not logs:
+            return 0
+        
+        def write(session: Session) -> None:
+            session.execute(insert(MessageLogSegment), build_segments(logs))
+        
+        database_writer.execute(write)
+        return len(logs)
     
     @staticmethod
-    def get_logs_for_message(message_id: str) -> List[MessageLog]:
+    def get_logs_for_message(message_id: str) -> List[LogEntry]:
         """
         Get all logs for a message.
         
@@ -415,18 +988,73 @@ class MessageRepository:
             message_id: The ID of the message
             
         Returns:
-            A list of message logs
+            A list of log entries, in the order they were written
         """
         with get_db_session() as session:
-            logs = session.query(MessageLog).filter(
-                MessageLog.message_id == message_id
-            ).order_by(MessageLog.timestamp).all()
+            return read_message_logs(session, message_id)
+    
+    @staticmethod
+    def compact_logs(older_than: datetime, batch_size: int = 100) -> int:
+        """
+        Merge the log segments of a batch of messages into one segment per message.
+        
+        Args:
+            older_than: Compact the messages with segments written before this time
+            batch_size: The maximum number of messages compacted in this transaction
             
-            # Detach all logs from the session by expunging them
-            for log in logs:
-                session.expunge(log)
-                
-            return logs
+        Returns:
+            The number of messages compacted
+        """
+        return database_writer.execute(
+            lambda session: compact_message_logs(session, older_than, batch_size)
+        )
+    
+    @staticmethod
+    def prune_logs(older_than: datetime, batch_size: int = 1000) -> int:
+        """
+        Delete a batch of log segments whose entries are all older than a time.
+        
+        Args:
+            older_than: Delete the segments with only entries before this time
+            batch_size: The maximum number of segments deleted in this transaction
+            
+        Returns:
+            The number of segments deleted
+        """
+        return database_writer.execute(
+            lambda session: prune_message_logs(session, older_than, batch_size)
+        )
+    
+    @staticmethod
+    def bulk_delete_messages(session: Session, message_ids: List[str]) -> Dict[str, int]:
+        """
+        Delete messages with set-based statements, children first.
+        
+        The log segments (and legacy log rows) and the attachments of the
+        messages are deleted before the messages, and the blob references of
+        the attachments are released. The summaries of the conversations are
+        not refreshed (see ConversationRepository.refresh_summaries).
+        
+        Args:
+            session: The session of the write transaction
+            message_ids: The IDs of the messages
+            
+        Returns:
+            The number of log entries and attachments deleted
+        """
+        logs = session.execute(
+            select(func.coalesce(func.sum(MessageLogSegment.entry_count), 0)).where(
+                MessageLogSegment.message_id.in_(message_ids)
+            )
+        ).scalar()
+        session.execute(delete(MessageLogSegment).where(MessageLogSegment.message_id.in_(message_ids)))
+        logs += session.execute(delete(MessageLog).where(MessageLog.message_id.in_(message_ids))).rowcount
+        
+        BlobRepository.release_for_messages(session, message_ids)
+        attachments = session.execute(delete(Attachment).where(Attachment.message_id.in_(message_ids))).rowcount
+        
+        session.execute(delete(Message).where(Message.id.in_(message_ids)))
+        return {"logs": logs, "attachments": attachments}
     
     @staticmethod
     def get_messages_for_user(user_id: str) -> List[Message]:
@@ -477,18 +1105,27 @@ class AttachmentRepository:
             content_type: Optional MIME type
             size: Optional size in bytes
             storage_path: Optional path to file on disk
-            data: Optional binary data
+            data: Optional binary data, stored in the blob store
             user_id: Optional Clerk user ID
             
         Returns:
             The created attachment
         """
-        with get_db_session() as session:
+        # Store the content outside the database (before taking the writer,
+        # so the file write does not hold up other writes)
+        digest = blob_store.put(data) if data is not None else None
+        
+        # Derive the downscaled variants of images once, on upload
+        if digest and is_image(content_type or attachment_type):
+            generate_variants(digest, data)
+        
+        def write(session: Session) -> Attachment:
             # If user_id is not provided, try to get it from the message
-            if user_id is None:
-                message = session.query(Message).filter(Message.id == message_id).first()
+            attachment_user_id = user_id
+            if attachment_user_id is None:
+                message = _get_for_write(session, Message, message_id)
                 if message:
-                    user_id = message.user_id
+                    attachment_user_id = message.user_id
             
             attachment = Attachment(
                 message_id=message_id,
@@ -496,18 +1133,22 @@ class AttachmentRepository:
                 filename=filename,
                 content_type=content_type,
                 size=size,
-                storage_path=storage_path,
-                data=data,
-                user_id=user_id
+                storage_path=blob_key(digest) if digest else storage_path,
+                user_id=attachment_user_id
             )
             session.add(attachment)
-            session.commit()
-            logger.info(f"Created attachment for message {message_id}")
+            session.flush()
             
-            # Detach the attachment from the session by expunging it
-            session.expunge(attachment)
+            # The blob may have been garbage-collected since it was stored, if
+            # its last reference was deleted in the meantime
+            if digest and not blob_store.exists(digest):
+                blob_store.put(data)
             
+            logger.info(f"Created attachment for message {message_id}")
             return attachment
+        
+        # The writer commits the attachment and returns it detached
+        return database_writer.execute(write)
     
     @staticmethod
     def get_attachment(attachment_id: int) -> Optional[Attachment]:
@@ -528,7 +1169,44 @@ class AttachmentRepository:
                 session.expunge(attachment)
                 
             return attachment
-    
+
+    @staticmethod
+    def get_attachment_metadata(attachment_id: int) -> Optional[Attachment]:
+        """
+        Get an attachment by ID without loading content stored in the database.
+
+        Args:
+            attachment_id: The ID of the attachment
+
+        Returns:
+            The attachment with its inline_data column unloaded, or None if not found
+        """
+        with get_db_session() as session:
+            attachment = session.query(Attachment).options(defer(Attachment.inline_data)).filter(
+                Attachment.id == attachment_id
+            ).first()
+
+            if attachment:
+                session.expunge(attachment)
+
+            return attachment
+
+    @staticmethod
+    def get_inline_data(attachment_id: int) -> Optional[bytes]:
+        """
+        Get the content of an attachment stored in the database.
+
+        Args:
+            attachment_id: The ID of the attachment
+
+        Returns:
+            The content, or None if the attachment has no content in the database
+        """
+        with get_db_session() as session:
+            return session.query(Attachment.inline_data).filter(
+                Attachment.id == attachment_id
+            ).scalar()
+
     @staticmethod
     def get_attachments_for_message(message_id: str) -> List[Attachment]:
         """
@@ -574,6 +1252,174 @@ class AttachmentRepository:
             return attachments
 
 
+class BlobRepository:
+    """
+    Repository for the reference counts of attachment blobs.
+    
+    The reference counts are kept up to date when attachments are inserted,
+    updated or deleted through the ORM (including cascading deletes of
+    conversations and messages). Bulk deletes of attachments must call
+    release_for_messages before deleting the rows.
+    """
+    
+    @staticmethod
+    def acquire(connection, digest: str, size: int, count: int = 1) -> None:
+        """
+        Add references to a blob.
+        
+        Args:
+            connection: The connection of the current transaction
+            digest: The SHA-256 hex digest of the blob
+            size: The size of the blob in bytes
+            count: The number of references to add
+        """
+        statement = sqlite_insert(Blob).values(
+            digest=digest,
+            size=size,
+            ref_count=count,
+            created_at=datetime.utcnow()
+        )
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[Blob.digest],
+            set_={"ref_count": Blob.ref_count + statement.excluded.ref_count}
+        ))
+    
+    @staticmethod
+    def release(connection, digest: str, count: int = 1) -> None:
+        """
+        Remove references to a blob.
+        
+        Args:
+            connection: The connection of the current transaction
+            digest: The SHA-256 hex digest of the blob
+            count: The number of references to remove
+        """
+        connection.execute(
+            update(Blob).where(Blob.digest == digest).values(ref_count=Blob.ref_count - count)
+        )
+    
+    @staticmethod
+    def release_for_messages(session: Session, message_ids: List[str]) -> None:
+        """
+        Remove the blob references of the attachments of messages that are about to be bulk-deleted.
+        
+        Args:
+            session: The session that deletes the attachments
+            message_ids: The IDs of the messages
+        """
+        if not message_ids:
+            return
+        
+        rows = session.query(Attachment.storage_path, func.count()).filter(
+            Attachment.message_id.in_(message_ids),
+            Attachment.storage_path.isnot(None)
+        ).group_by(Attachment.storage_path).all()
+        
+        for storage_path, count in rows:
+            digest = parse_blob_key(storage_path)
+            if digest is not None:
+                BlobRepository.release(session.connection(), digest, count)
+    
+    @staticmethod
+    def collect_garbage() -> int:
+        """
+        Delete the blobs that are no longer referenced by any attachment.
+        
+        Returns:
+            The number of deleted blobs
+        """
+        def write(session: Session) -> int:
+            digests = [digest for digest, in session.query(Blob.digest).filter(Blob.ref_count <= 0)]
+            if not digests:
+                return 0
+            
+            session.query(Blob).filter(Blob.digest.in_(digests)).delete(synchronize_session=False)
+            
+            def delete_files() -> None:
+                # Runs on the writer before the next batch, so no attachment
+                # can take a new reference meanwhile; a later write of the
+                # same batch may already have taken one (and kept the file)
+                with get_db_session() as read_session:
+                    referenced = {
+                        digest for digest, in read_session.query(Blob.digest).filter(Blob.digest.in_(digests))
+                    }
+                for digest in digests:
+                    if digest not in referenced:
+                        blob_store.delete(digest)
+            
+            # Delete the files only once the rows are gone for good
+            database_writer.after_commit(delete_files)
+            
+            logger.info(f"Garbage-collected {len(digests)} attachment blobs")
+            return len(digests)
+        
+        return database_writer.execute(write)
+
+
+def _blob_size(digest: str, attachment: Attachment) -> int:
+    """Get the size of a blob for its reference count row."""
+    size = blob_store.size(digest)
+    return size if size is not None else (attachment.size or 0)
+
+
+@event.listens_for(Attachment, "after_insert")
+def _acquire_attachment_blob(mapper, connection, attachment: Attachment) -> None:
+    """Count the reference of a new attachment to its blob."""
+    digest = parse_blob_key(attachment.storage_path)
+    if digest is not None:
+        BlobRepository.acquire(connection, digest, _blob_size(digest, attachment))
+
+
+@event.listens_for(Attachment, "after_update")
+def _move_attachment_blob(mapper, connection, attachment: Attachment) -> None:
+    """Move the reference of an attachment when its storage path changes."""
+    history = inspect(attachment).attrs.storage_path.history
+    if not history.has_changes():
+        return
+    
+    for storage_path in history.deleted:
+        digest = parse_blob_key(storage_path)
+        if digest is not None:
+            BlobRepository.release(connection, digest)
+    
+    for storage_path in history.added:
+        digest = parse_blob_key(storage_path)
+        if digest is not None:
+            BlobRepository.acquire(connection, digest, _blob_size(digest, attachment))
+
+
+@event.listens_for(Attachment, "after_delete")
+def _release_attachment_blob(mapper, connection, attachment: Attachment) -> None:
+    """Remove the reference of a deleted attachment to its blob."""
+    digest = parse_blob_key(attachment.storage_path)
+    if digest is not None:
+        BlobRepository.release(connection, digest)
+
+
+@event.listens_for(Message, "after_insert")
+def _count_conversation_message(mapper, connection, message: Message) -> None:
+    """Add a new message to the summary of its conversation."""
+    ConversationRepository.count_message(connection, message.conversation_id, message.timestamp, message.content)
+
+
+@event.listens_for(Message, "after_update")
+def _update_conversation_summary(mapper, connection, message: Message) -> None:
+    """Recompute the conversation summaries when a message is edited or moved."""
+    state = inspect(message).attrs
+    changed = [state[name].history for name in ("conversation_id", "timestamp", "content")]
+    if not any(history.has_changes() for history in changed):
+        return
+    
+    conversation_ids = {message.conversation_id, *state.conversation_id.history.deleted}
+    ConversationRepository.refresh_summaries(connection, [cid for cid in conversation_ids if cid is not None])
+
+
+@event.listens_for(Message, "after_delete")
+def _uncount_conversation_message(mapper, connection, message: Message) -> None:
+    """Remove a deleted message from the summary of its conversation."""
+    ConversationRepository.uncount_message(connection, message.conversation_id, message.timestamp)
+
+
 # Agent Repository for database operations related to agents, tools, and capabilities
 
 class AgentRepository:
@@ -606,7 +1452,7 @@ class AgentRepository:
         Returns:
             The created agent
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Agent:
             agent = Agent(
                 name=name,
                 type=agent_type,
@@ -617,13 +1463,11 @@ class AgentRepository:
                 user_id=user_id
             )
             session.add(agent)
-            session.commit()
+            session.flush()
             logger.info(f"Created agent {agent.id} with name {name}")
-            
-            # Detach the agent from the session by expunging it
-            session.expunge(agent)
-            
             return agent
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def get_agent(agent_id: int) -> Optional[Agent]:
@@ -730,7 +1574,7 @@ class AgentRepository:
         Returns:
             The updated agent, or None if not found
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Optional[Agent]:
             agent = session.query(Agent).filter(
                 Agent.id == agent_id,
                 Agent.is_deleted == False
@@ -752,13 +1596,11 @@ class AgentRepository:
                 if user_id is not None:
                     agent.user_id = user_id
                 
-                session.commit()
                 logger.info(f"Updated agent {agent_id}")
-                
-                # Detach the agent from the session by expunging it
-                session.expunge(agent)
             
             return agent
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def delete_agent(agent_id: int, hard_delete: bool = False) -> bool:
@@ -772,7 +1614,7 @@ class AgentRepository:
         Returns:
             True if the agent was deleted, False otherwise
         """
-        with get_db_session() as session:
+        def write(session: Session) -> bool:
             agent = session.query(Agent).filter(Agent.id == agent_id).first()
             
             if agent:
@@ -782,11 +1624,11 @@ class AgentRepository:
                 else:
                     agent.is_deleted = True
                     logger.info(f"Soft deleted agent {agent_id}")
-                
-                session.commit()
                 return True
             
             return False
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def create_tool(
@@ -813,7 +1655,7 @@ class AgentRepository:
         Returns:
             The created tool
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Tool:
             tool = Tool(
                 agent_id=agent_id,
                 name=name,
@@ -824,13 +1666,11 @@ class AgentRepository:
                 dependencies=dependencies
             )
             session.add(tool)
-            session.commit()
+            session.flush()
             logger.info(f"Created tool {tool.id} for agent {agent_id}")
-            
-            # Detach the tool from the session by expunging it
-            session.expunge(tool)
-            
             return tool
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def get_tools_for_agent(agent_id: int) -> List[Tool]:
@@ -872,20 +1712,18 @@ class AgentRepository:
         Returns:
             The created capability
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Capability:
             capability = Capability(
                 agent_id=agent_id,
                 name=name,
                 description=description
             )
             session.add(capability)
-            session.commit()
+            session.flush()
             logger.info(f"Created capability {capability.id} for agent {agent_id}")
-            
-            # Detach the capability from the session by expunging it
-            session.expunge(capability)
-            
             return capability
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def get_capabilities_for_agent(agent_id: int) -> List[Capability]:
@@ -1046,7 +1884,7 @@ class UserPreferenceRepository:
         Returns:
             The created user preference
         """
-        with get_db_session() as session:
+        def write(session: Session) -> UserPreference:
             user_preference = UserPreference(
                 user_id=user_id,
                 theme=theme,
@@ -1055,13 +1893,11 @@ class UserPreferenceRepository:
                 settings=settings or {}
             )
             session.add(user_preference)
-            session.commit()
+            session.flush()
             logger.info(f"Created user preference for user {user_id}")
-            
-            # Detach the user preference from the session by expunging it
-            session.expunge(user_preference)
-            
             return user_preference
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def get_user_preference(user_id: str) -> Optional[UserPreference]:
@@ -1106,7 +1942,7 @@ class UserPreferenceRepository:
         Returns:
             The updated user preference, or None if not found
         """
-        with get_db_session() as session:
+        def write(session: Session) -> Optional[UserPreference]:
             user_preference = session.query(UserPreference).filter(
                 UserPreference.user_id == user_id
             ).first()
@@ -1122,27 +1958,11 @@ class UserPreferenceRepository:
                     user_preference.settings = settings
                 
                 user_preference.updated_at = datetime.utcnow()
-                session.commit()
                 logger.info(f"Updated user preference for user {user_id}")
-                
-                # Create a copy of the user preference before detaching it
-                updated_preference = UserPreference(
-                    id=user_preference.id,
-                    user_id=user_preference.user_id,
-                    theme=user_preference.theme,
-                    language=user_preference.language,
-                    notifications=user_preference.notifications,
-                    settings=user_preference.settings,
-                    created_at=user_preference.created_at,
-                    updated_at=user_preference.updated_at
-                )
-                
-                # Detach the user preference from the session by expunging it
-                session.expunge(user_preference)
-                
-                return updated_preference
             
-            return None
+            return user_preference
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def delete_user_preference(user_id: str) -> bool:
@@ -1155,18 +1975,19 @@ class UserPreferenceRepository:
         Returns:
             True if the user preference was deleted, False otherwise
         """
-        with get_db_session() as session:
+        def write(session: Session) -> bool:
             user_preference = session.query(UserPreference).filter(
                 UserPreference.user_id == user_id
             ).first()
             
             if user_preference:
                 session.delete(user_preference)
-                session.commit()
                 logger.info(f"Deleted user preference for user {user_id}")
                 return True
             
             return False
+        
+        return database_writer.execute(write)
     
     @staticmethod
     def get_or_create_user_preference(
@@ -1205,10 +2026,111 @@ class UserPreferenceRepository:
 
 # Helper functions for converting between database models and API models
 
+def attachment_url(attachment_id: int) -> str:
+    """
+    Get the URL the content of an attachment is downloaded from.
+    
+    Args:
+        attachment_id: The ID of the attachment
+        
+    Returns:
+        The download URL
+    """
+    return f"/api/attachments/{attachment_id}"
+
+
+def _attachment_to_dict(attachment: Attachment, include_data: bool = False) -> Dict[str, Any]:
+    """
+    Convert an Attachment model to the dictionary embedded in a message.
+    
+    The content is downloaded from the attachment URL. Only callers that need
+    the bytes in the dictionary itself (e.g. formatting images for a vision
+    model) should ask for them with include_data.
+    
+    Args:
+        attachment: The Attachment model
+        include_data: Whether to include the base64-encoded content of images
+        
+    Returns:
+        A dictionary representation of the attachment
+    """
+    result = {
+        "id": attachment.id,
+        "type": attachment.type,
+        "filename": attachment.filename,
+        "contentType": attachment.content_type,
+        "size": attachment.size,
+        "url": attachment_url(attachment.id)
+    }
+    
+    if is_image(attachment.type):
+        result["thumbnailUrl"] = f"{attachment_url(attachment.id)}?variant=thumbnail"
+    
+    if include_data and attachment.type.startswith('image/'):
+        data = attachment.data
+        result["data"] = base64.b64encode(data).decode('ascii') if data else None
+    
+    return result
+
+
+def _build_message_dict(
+    message: Message,
+    agent_id: Optional[str],
+    logs: Iterable[LogEntry],
+    attachments: List[Attachment],
+    fields: Optional[FrozenSet[str]] = None
+) -> Dict[str, Any]:
+    """
+    Build the API dictionary for a message from already-loaded rows.
+    
+    Args:
+        message: The Message model
+        agent_id: The ID of the agent the conversation belongs to
+        logs: The log entries of the message, in order (may be a lazy iterator)
+        attachments: The attachments of the message
+        fields: Optional message fields to include; the columns of other
+            fields are not read, so they may be left unloaded
+        
+    Returns:
+        A dictionary representation of the message
+    """
+    result = {}
+    
+    # Fields that are always present
+    for name in ("id", "role", "content", "timestamp"):
+        if fields is None or name in fields:
+            result[name] = getattr(message, MESSAGE_COLUMN_FIELDS[name])
+    
+    if fields is None or "agentId" in fields:
+        result["agentId"] = agent_id
+    
+    # Fields that are only present when set
+    for name in ("userId", "status", "error", "clientMessageId", "customData"):
+        if fields is None or name in fields:
+            value = getattr(message, MESSAGE_COLUMN_FIELDS[name])
+            if value:
+                result[name] = value
+    
+    # Add logs if available
+    if fields is None or "logs" in fields:
+        log_entries = [log.log_entry for log in logs]
+        if log_entries:
+            result["logs"] = log_entries
+    
+    # Add attachments if available
+    if attachments and (fields is None or "attachments" in fields):
+        result["attachments"] = [_attachment_to_dict(attachment) for attachment in attachments]
+    
+    return result
+
+
 def message_to_dict(message: Message) -> Dict[str, Any]:
     """
     Convert a Message model to a dictionary for API responses.
     
+    This loads the logs and attachments of the message with separate queries,
+    so use messages_to_dicts when converting more than a handful of messages.
+    
     Args:
         message: The Message model
         
@@ -1229,52 +2151,89 @@ def message_to_dict(message: Message) -> Dict[str, Any]:
             if conversation:
                 agent_id = conversation.agent_id
     
-    result = {
-        "id": message.id,
-        "role": message.role,
-        "content": message.content,
-        "timestamp": message.timestamp,
-        "agentId": agent_id
-    }
-    
-    # Add user_id if available
-    if message.user_id:
-        result["userId"] = message.user_id
+    logs = MessageRepository.get_logs_for_message(message.id)
+    attachments = AttachmentRepository.get_attachments_for_message(message.id)
     
-    if message.status:
-        result["status"] = message.status
+    return _build_message_dict(message, agent_id, logs, attachments)
+
+
+def messages_to_dicts(
+    session: Session,
+    messages: List[Message],
+    agent_id: Optional[str] = None,
+    message_ids: Any = None,
+    fields: Optional[FrozenSet[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Convert a list of Message models to dictionaries in a fixed number of queries.
     
-    if message.error:
-        result["error"] = message.error
+    The logs and attachments of all messages are loaded with one grouped IN
+    query each instead of two queries per message, and only if they are among
+    the requested fields. Without fields the result is identical to calling
+    message_to_dict on every message.
     
-    if message.client_message_id:
-        result["clientMessageId"] = message.client_message_id
+    Args:
+        session: The database session to load related rows with
+        messages: The Message models to convert
+        agent_id: The ID of the agent, if all messages belong to one conversation
+        message_ids: Optional selectable of the message IDs (e.g. a subquery),
+            used instead of an explicit list of IDs for large result sets
+        fields: Optional message fields to include (see parse_message_fields);
+            load the messages with _message_load_options(fields), so the
+            columns of other fields are not read from the database
         
-    if message.custom_data:
-        result["customData"] = message.custom_data
+    Returns:
+        A list of message dictionaries in the order of the given messages
+    """
+    if not messages:
+        return []
     
-    # Add logs if available
-    logs = MessageRepository.get_logs_for_message(message.id)
-    if logs:
-        result["logs"] = [log.log_entry for log in logs]
+    if message_ids is None:
+        message_ids = [message.id for message in messages]
     
-    # Add attachments if available
-    attachments = AttachmentRepository.get_attachments_for_message(message.id)
-    if attachments:
-        result["attachments"] = [
-            {
-                "id": attachment.id,
-                "type": attachment.type,
-                "filename": attachment.filename,
-                "contentType": attachment.content_type,
-                "size": attachment.size,
-                "url": f"/api/attachments/{attachment.id}" if not attachment.data else None,
-                "data": base64.b64encode(attachment.data).decode('ascii') if attachment.data and attachment.type.startswith('image/') else None
-            }
-            for attachment in attachments
-        ]
+    def wanted(name: str) -> bool:
+        return fields is None or name in fields
     
-    return result
+    # Look up the agent of every conversation involved in one query
+    if agent_id is None and wanted("agentId"):
+        conversation_ids = {message.conversation_id for message in messages}
+        agent_ids = dict(
+            session.query(Conversation.id, Conversation.agent_id).filter(
+                Conversation.id.in_(conversation_ids)
+            ).all()
+        )
+    else:
+        agent_ids = {}
+    
+    # Load and group the log segments of all messages; they are decompressed
+    # while the messages are serialized
+    segments_by_message: Dict[str, List[MessageLogSegment]] = {}
+    if wanted("logs"):
+        segments = session.query(MessageLogSegment).options(undefer(MessageLogSegment.data)).filter(
+            MessageLogSegment.message_id.in_(message_ids)
+        ).order_by(MessageLogSegment.message_id, MessageLogSegment.id).all()
+        for segment in segments:
+            segments_by_message.setdefault(segment.message_id, []).append(segment)
+    
+    # Load and group the attachments of all messages
+    attachments_by_message: Dict[str, List[Attachment]] = {}
+    if wanted("attachments"):
+        attachments = session.query(Attachment).options(defer(Attachment.inline_data)).filter(
+            Attachment.message_id.in_(message_ids)
+        ).order_by(Attachment.id).all()
+        for attachment in attachments:
+            attachments_by_message.setdefault(attachment.message_id, []).append(attachment)
+    
+    return [
+        _build_message_dict(
+            message,
+            agent_id if agent_id is not None else agent_ids.get(message.conversation_id),
+            iter_log_entries(segments_by_message.get(message.id, [])),
+            attachments_by_message.get(message.id, []),
+            fields
+        )
+        for message in messages
+    ]
 
 
 def agent_to_dict(agent: Agent, include_tools: bool = False, include_capabilities: bool = False) -> Dict[str, Any]:
@@ -1362,32 +2321,40 @@ def user_preference_to_dict(user_preference: UserPreference) -> Dict[str, Any]:
     return result
 
 
-def conversation_to_dict(conversation: Conversation, include_messages: bool = False) -> Dict[str, Any]:
+def conversation_to_dict(
+    conversation: Conversation,
+    include_messages: bool = False,
+    fields: Optional[FrozenSet[str]] = None
+) -> Dict[str, Any]:
     """
     Convert a Conversation model to a dictionary for API responses.
     
     Args:
-        conversation: The Conversation model
+        conversation: The Conversation model, or a row with the columns of
+            the requested fields (see _conversation_columns)
         include_messages: Whether to include messages in the result
+        fields: Optional conversation fields to include (see parse_conversation_fields)
         
     Returns:
         A dictionary representation of the conversation
     """
-    result = {
-        "id": conversation.id,
-        "agentId": conversation.agent_id,
-        "title": conversation.title,
-        "createdAt": conversation.created_at.isoformat(),
-        "updatedAt": conversation.updated_at.isoformat(),
-        "isActive": conversation.is_active
-    }
-    
-    # Add user_id if available
-    if conversation.user_id:
-        result["userId"] = conversation.user_id
+    result = {}
+    for name, column in CONVERSATION_COLUMN_FIELDS.items():
+        # The columns of other fields are not read, so they may be left unselected
+        if fields is not None and name not in fields:
+            continue
+        
+        value = getattr(conversation, column)
+        if name in ("createdAt", "updatedAt", "archivedAt"):
+            value = value.isoformat() if value else None
+        elif name == "messageCount":
+            value = value or 0
+        elif name == "userId" and not value:
+            # Add user_id if available
+            continue
+        result[name] = value
     
     if include_messages:
-        messages = MessageRepository.get_messages_for_conversation(conversation.id)
-        result["messages"] = [message_to_dict(message) for message in messages]
+        result["messages"] = MessageRepository.get_message_dicts_for_conversation(conversation.id)
     
     return result
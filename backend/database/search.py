@@ -0,0 +1,278 @@
+"""
+Full-Text Search over Messages for MOSAIC
+
+This module indexes the content of messages in an SQLite FTS5 table and
+searches it. The index is an external-content table: it stores only the
+inverted index and reads the text from the messages table, keyed by the
+rowid of each message. Triggers on the messages table keep the index in
+sync with every insert, update and delete, in the same transaction.
+
+Search results are ranked by BM25 and paged by (score, rowid) cursors. The
+page is selected first, and snippets are computed only for the messages on
+the page.
+
+A full VACUUM can renumber the rowids of the messages table (it has no
+INTEGER PRIMARY KEY), so the index must be rebuilt after one with
+rebuild_search_index. Incremental vacuuming does not renumber rowids.
+"""
+
+import html
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .database import get_db_session
+from .repository import encode_cursor, decode_cursor
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.search")
+
+# Markers around the matched terms of a snippet; replaced with <mark> tags
+# after the rest of the snippet is HTML-escaped
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
+
+# Number of tokens in a snippet
+SNIPPET_TOKENS = 16
+
+CREATE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content,
+    content='messages',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+"""
+
+SEARCH_TRIGGERS = {
+    "messages_fts_insert": """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.rowid, new.content);
+        END
+    """,
+    "messages_fts_delete": """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+        END
+    """,
+    "messages_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (new.rowid, new.content);
+        END
+    """,
+}
+
+
+def create_search_table(engine: Engine) -> None:
+    """
+    Migration step that creates the full-text index of the messages.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+    """
+    with engine.begin() as connection:
+        connection.execute(text(CREATE_SEARCH_TABLE))
+
+
+def backfill_search_index(engine: Engine, batch_size: int = 5000) -> None:
+    """
+    Migration step that indexes the existing messages and installs the triggers.
+
+    The messages are indexed in batches of rowids, each in its own
+    transaction. The last batch and the triggers are committed together, so
+    every message inserted meanwhile is indexed exactly once. Edits and
+    deletes of messages already indexed by an earlier batch are not picked
+    up, so run this before the application serves requests (as init_db does)
+    or rebuild the index afterwards.
+
+    Args:
+        engine: The SQLAlchemy engine of the database
+        batch_size: The number of messages indexed per transaction
+    """
+    # Start from an empty index, so an interrupted backfill can be run again
+    with engine.begin() as connection:
+        for name in SEARCH_TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('delete-all')"))
+
+    last_rowid = 0
+    indexed = 0
+    while True:
+        with engine.begin() as connection:
+            last_rowid, count = _index_messages_after(connection, last_rowid, batch_size)
+
+            if count < batch_size:
+                # Nothing is left to index; install the triggers in the same transaction
+                for statement in SEARCH_TRIGGERS.values():
+                    connection.execute(text(statement))
+                indexed += count
+                break
+
+        indexed += count
+        logger.info(f"Indexed {indexed} messages for search")
+
+    logger.info(f"Indexed {indexed} messages for search and installed the triggers")
+
+
+def _index_messages_after(connection, last_rowid: int, batch_size: int) -> Tuple[int, int]:
+    """Index a batch of messages after a rowid, returning the last rowid and the count."""
+    rowids = [row[0] for row in connection.execute(
+        text("SELECT rowid FROM messages WHERE rowid > :last_rowid ORDER BY rowid LIMIT :limit"),
+        {"last_rowid": last_rowid, "limit": batch_size}
+    )]
+    if not rowids:
+        return last_rowid, 0
+
+    connection.execute(
+        text(
+            "INSERT INTO messages_fts (rowid, content) "
+            "SELECT rowid, content FROM messages WHERE rowid BETWEEN :first AND :last"
+        ),
+        {"first": rowids[0], "last": rowids[-1]}
+    )
+    return rowids[-1], len(rowids)
+
+
+def rebuild_search_index(connection) -> None:
+    """
+    Rebuild the full-text index from the messages table (e.g. after a VACUUM).
+
+    Args:
+        connection: The connection of the current transaction
+    """
+    connection.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"))
+
+
+def to_match_query(query: str) -> str:
+    """
+    Convert the text typed by a user to an FTS5 query.
+
+    Every word must match; words are quoted, so FTS5 operators and
+    punctuation in the text are searched for literally. A trailing * makes a
+    word match as a prefix.
+
+    Args:
+        query: The search text
+
+    Returns:
+        The FTS5 query
+
+    Raises:
+        ValueError: If the text has no words
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+
+    if not terms:
+        raise ValueError("The search query is empty")
+
+    return " ".join(terms)
+
+
+def _highlight(snippet: str) -> str:
+    """HTML-escape a snippet and mark its matched terms."""
+    return html.escape(snippet).replace(_MATCH_START, "<mark>").replace(_MATCH_END, "</mark>")
+
+
+def search_messages(
+    query: str,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    limit: int = 20,
+    after: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Search the content of messages, best matches first.
+
+    Args:
+        query: The search text (see to_match_query)
+        user_id: Optional Clerk user ID of the conversations to search
+        agent_id: Optional ID of the agent of the conversations to search
+        start: Optional earliest message timestamp (Unix milliseconds)
+        end: Optional latest message timestamp (Unix milliseconds)
+        limit: The maximum number of results to return
+        after: Optional cursor; return the results ranked after it
+
+    Returns:
+        A tuple of (results, whether more results exist). Each result has the
+        message, its conversation and agent, a snippet in which the matched
+        terms are wrapped in <mark> tags, its score and its cursor.
+
+    Raises:
+        ValueError: If the query is empty or the cursor is malformed
+    """
+    parameters: Dict[str, Any] = {"query": to_match_query(query), "limit": limit + 1}
+    filters = ["messages_fts MATCH :query"]
+
+    if user_id:
+        filters.append("conversations.user_id = :user_id")
+        parameters["user_id"] = user_id
+    if agent_id:
+        filters.append("conversations.agent_id = :agent_id")
+        parameters["agent_id"] = agent_id
+    if start is not None:
+        filters.append("messages.timestamp >= :start")
+        parameters["start"] = start
+    if end is not None:
+        filters.append("messages.timestamp <= :end")
+        parameters["end"] = end
+
+    # Lower BM25 scores are better matches
+    ranked = f"""
+        SELECT messages.rowid AS rowid, messages.id AS id, messages.conversation_id AS conversation_id,
+               conversations.agent_id AS agent_id, messages.role AS role, messages.timestamp AS timestamp,
+               bm25(messages_fts) AS score
+        FROM messages_fts
+        JOIN messages ON messages.rowid = messages_fts.rowid
+        JOIN conversations ON conversations.id = messages.conversation_id
+        WHERE {" AND ".join(filters)}
+    """
+    statement = f"SELECT * FROM ({ranked})"
+    if after:
+        parameters["after_score"], parameters["after_rowid"] = decode_cursor(after)
+        statement += (
+            " WHERE score > :after_score OR (score = :after_score AND rowid > :after_rowid)"
+        )
+    statement += " ORDER BY score, rowid LIMIT :limit"
+
+    with get_db_session() as session:
+        rows = session.execute(text(statement), parameters).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        # Build the snippets of the messages on the page only
+        snippets = {}
+        if rows:
+            rowids = ", ".join(str(int(row.rowid)) for row in rows)
+            snippets = dict(session.execute(
+                text(
+                    f"SELECT rowid, snippet(messages_fts, 0, '{_MATCH_START}', '{_MATCH_END}', '…', {SNIPPET_TOKENS}) "
+                    f"FROM messages_fts WHERE messages_fts MATCH :query AND rowid IN ({rowids})"
+                ),
+                {"query": parameters["query"]}
+            ).all())
+
+    results = [
+        {
+            "messageId": row.id,
+            "conversationId": row.conversation_id,
+            "agentId": row.agent_id,
+            "role": row.role,
+            "timestamp": row.timestamp,
+            "snippet": _highlight(snippets.get(row.rowid, "")),
+            "score": row.score,
+            "cursor": encode_cursor(row.score, row.rowid)
+        }
+        for row in rows
+    ]
+    return results, has_more
@@ -8,23 +8,48 @@ interact with the database.
 
 import logging
 import base64
+import uuid
+from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 
+from sqlalchemy import desc, insert, update
+from sqlalchemy.orm import Session, defer
+
 from .repository import (
     ConversationRepository,
     MessageRepository,
     AttachmentRepository,
     UserPreferenceRepository,
-    message_to_dict,
     conversation_to_dict,
-    user_preference_to_dict
+    user_preference_to_dict,
+    encode_cursor,
+    parse_message_fields,
+    parse_conversation_fields,
+    _build_message_dict,
+    _attachment_to_dict,
+    attachment_url,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE
 )
-from .models import Attachment
+from .models import Attachment, Conversation, Message, MessageLogSegment
+from .log_segments import build_segments, read_message_logs
 from .database import get_db_session
+from .writer import database_writer
+from .blob_store import parse_blob_key
+from .image_variants import is_image, ensure_variant
+from .search import search_messages
+from .uploads import PENDING_MESSAGE_PREFIX
+from .archive import conversation_archive, restore_conversation
 
 # Configure logging
 logger = logging.getLogger("mosaic.database.service")
 
+def _restore_if_archived(conversation: Conversation) -> None:
+    """Move the messages of an archived conversation back into the database before they are read."""
+    if conversation.archived_at is not None:
+        restore_conversation(conversation.id)
+
+
 class ChatService:
     """
     Service for managing chat conversations and messages.
@@ -54,17 +79,29 @@ class ChatService:
         return conversation.id, True
     
     @staticmethod
-    def get_conversation_messages(agent_id: str, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    def get_conversation_messages(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        fields: Optional[str] = None,
+        include: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Get all messages for the active conversation with an agent.
         
         Args:
             agent_id: The ID of the agent
             user_id: Optional user ID to filter by
+            fields: Optional comma-separated message fields to return
+            include: Optional comma-separated message fields to add (e.g. "logs")
             
         Returns:
             A list of message dictionaries
+            
+        Raises:
+            ValueError: If a field is unknown
         """
+        message_fields = parse_message_fields(fields, include)
+        
         # Get the active conversation
         conversation = ConversationRepository.get_active_conversation_for_agent(agent_id, user_id)
         
@@ -72,11 +109,61 @@ class ChatService:
             # No active conversation, return empty list
             return []
         
-        # Get messages for the conversation
-        messages = MessageRepository.get_messages_for_conversation(conversation.id)
+        _restore_if_archived(conversation)
         
-        # Convert to dictionaries
-        return [message_to_dict(message) for message in messages]
+        # Get messages for the conversation, with their logs and attachments batched
+        return MessageRepository.get_message_dicts_for_conversation(conversation.id, fields=message_fields)
+    
+    @staticmethod
+    def get_conversation_messages_page(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        fields: Optional[str] = None,
+        include: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a page of messages for the active conversation with an agent.
+        
+        Args:
+            agent_id: The ID of the agent
+            user_id: Optional user ID to filter by
+            limit: The maximum number of messages to return (defaults to 50)
+            before: Optional cursor; return the messages just before it
+            after: Optional cursor; return the messages just after it
+            fields: Optional comma-separated message fields to return
+            include: Optional comma-separated message fields to add (e.g. "logs")
+            
+        Returns:
+            A dictionary with the messages (oldest first), whether more messages
+            exist in the paging direction, and the cursors of the first and
+            last message for loading older (before) or newer (after) messages
+            
+        Raises:
+            ValueError: If a cursor is malformed or a field is unknown
+        """
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        message_fields = parse_message_fields(fields, include)
+        messages: List[Dict[str, Any]] = []
+        has_more = False
+        
+        # Get the active conversation
+        conversation = ConversationRepository.get_active_conversation_for_agent(agent_id, user_id)
+        
+        if conversation:
+            _restore_if_archived(conversation)
+            messages, has_more = MessageRepository.get_message_page_for_conversation(
+                conversation.id, limit=limit, before=before, after=after, fields=message_fields
+            )
+        
+        return {
+            "messages": messages,
+            "hasMore": has_more,
+            "beforeCursor": encode_cursor(messages[0]["timestamp"], messages[0]["id"]) if messages else None,
+            "afterCursor": encode_cursor(messages[-1]["timestamp"], messages[-1]["id"]) if messages else None
+        }
     
     @staticmethod
     def add_message(
@@ -88,11 +175,18 @@ class ChatService:
         error: Optional[str] = None,
         client_message_id: Optional[str] = None,
         message_id: Optional[str] = None,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        attachment_ids: Optional[List[int]] = None,
+        logs: Optional[List[Tuple[str, str, datetime]]] = None
     ) -> Dict[str, Any]:
         """
         Add a message to the active conversation with an agent.
         
+        This is the unit of work of a chat turn: resolving (or creating) the
+        conversation, inserting the message, linking its attachments, adding
+        logs and serializing the message all happen in one transaction. An
+        archived conversation is restored first, so its messages stay in order.
+        
         Args:
             agent_id: The ID of the agent
             role: The role of the message sender ("user" or "assistant")
@@ -103,28 +197,120 @@ class ChatService:
             client_message_id: Optional client-side message ID
             message_id: Optional message ID (defaults to a new UUID)
             user_id: Optional user ID to filter by
+            attachment_ids: Optional IDs of uploaded attachments to link to the
+                message; IDs of attachments that are not pending uploads of the
+                sender are dropped
+            logs: Optional (message_id, log_entry, timestamp) tuples to add in
+                the same transaction (e.g. the first log of the agent's reply)
             
         Returns:
             The created message as a dictionary
+            
+        Raises:
+            RuntimeError: If the active conversation is archived and cannot be restored
+        """
+        def write(session: Session) -> Optional[Dict[str, Any]]:
+            # Get or create the active conversation
+            query = session.query(Conversation).filter(
+                Conversation.agent_id == agent_id,
+                Conversation.is_active == True
+            )
+            if user_id:
+                query = query.filter(Conversation.user_id == user_id)
+            conversation = query.order_by(desc(Conversation.updated_at)).first()
+            
+            # An archived conversation is restored before a message is added
+            if conversation is not None and conversation.archived_at is not None:
+                return None
+            
+            if conversation is None:
+                conversation = Conversation(
+                    agent_id=agent_id,
+                    title=f"Conversation with {agent_id}",
+                    user_id=user_id
+                )
+                session.add(conversation)
+                session.flush()
+                logger.info(f"Created conversation {conversation.id} for agent {agent_id}")
+            
+            # Create the message
+            message = Message(
+                id=message_id or str(uuid.uuid4()),
+                conversation_id=conversation.id,
+                role=role,
+                content=content,
+                timestamp=timestamp or int(datetime.now().timestamp() * 1000),
+                status=status,
+                error=error,
+                client_message_id=client_message_id,
+                user_id=user_id if user_id is not None else conversation.user_id
+            )
+            session.add(message)
+            
+            # Link the attachments with one UPDATE; only uploads of the sender
+            # that no message references yet can be linked
+            if attachment_ids:
+                linked = session.execute(
+                    update(Attachment)
+                    .where(
+                        Attachment.id.in_(attachment_ids),
+                        Attachment.message_id.startswith(PENDING_MESSAGE_PREFIX, autoescape=True),
+                        Attachment.user_id.is_(None) if message.user_id is None else Attachment.user_id == message.user_id
+                    )
+                    .values(message_id=message.id)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if linked < len(attachment_ids):
+                    logger.warning(f"Dropped {len(attachment_ids) - linked} attachments that could not be linked to message {message.id}")
+            
+            if logs:
+                session.execute(insert(MessageLogSegment), build_segments(logs))
+            
+            # Serialize the message with its logs (including any written while
+            # the agent was running) and attachments
+            message_logs = read_message_logs(session, message.id)
+            attachments = session.query(Attachment).options(defer(Attachment.inline_data)).filter(
+                Attachment.message_id == message.id
+            ).all()
+            
+            logger.info(f"Created message {message.id} in conversation {conversation.id}")
+            return _build_message_dict(message, conversation.agent_id, message_logs, attachments)
+        
+        message_dict = database_writer.execute(write)
+        if message_dict is None:
+            # Restore the archived conversation and try once more
+            conversation = ConversationRepository.get_active_conversation_for_agent(agent_id, user_id)
+            if conversation is not None:
+                _restore_if_archived(conversation)
+            message_dict = database_writer.execute(write)
+        
+        if message_dict is None:
+            raise RuntimeError(f"Could not restore the archived conversation of agent {agent_id}")
+        
+        return message_dict
+    
+    @staticmethod
+    def get_message_logs(message_id: str, agent_id: Optional[str] = None) -> Optional[List[str]]:
         """
-        # Get or create the active conversation
-        conversation_id, created = ChatService.get_or_create_conversation(agent_id, user_id)
-        
-        # Create the message
-        message = MessageRepository.create_message(
-            conversation_id=conversation_id,
-            role=role,
-            content=content,
-            timestamp=timestamp,
-            status=status,
-            error=error,
-            client_message_id=client_message_id,
-            message_id=message_id,
-            user_id=user_id
-        )
+        Get the logs of a message, for loading them on demand.
         
-        # Convert to dictionary
-        return message_to_dict(message)
+        Args:
+            message_id: The ID of the message
+            agent_id: Optional ID of the agent the message's conversation must be with
+            
+        Returns:
+            The log entries in order, or None if the message does not exist
+            (or is not in a conversation with the agent)
+        """
+        with get_db_session() as session:
+            message_agent_id = session.query(Conversation.agent_id).join(
+                Message, Message.conversation_id == Conversation.id
+            ).filter(Message.id == message_id).first()
+        
+        if message_agent_id is None or (agent_id is not None and message_agent_id[0] != agent_id):
+            return None
+        
+        return [log.log_entry for log in MessageRepository.get_logs_for_message(message_id)]
     
     @staticmethod
     def add_log_to_message(message_id: str, log_entry: str) -> None:
@@ -137,6 +323,16 @@ class ChatService:
         """
         MessageRepository.add_log_to_message(message_id, log_entry)
     
+    @staticmethod
+    def add_logs_to_messages(logs: List[Tuple[str, str, datetime]]) -> None:
+        """
+        Add a batch of log entries, possibly for several messages, in one transaction.
+        
+        Args:
+            logs: A list of (message_id, log_entry, timestamp) tuples
+        """
+        MessageRepository.add_logs_to_messages(logs)
+    
     @staticmethod
     def clear_conversation(agent_id: str, user_id: Optional[str] = None) -> bool:
         """
@@ -183,6 +379,11 @@ class ChatService:
         if not conversation:
             return None
         
+        # The conversation is about to be used again
+        if conversation.archived_at is not None:
+            restore_conversation(conversation.id)
+            conversation = ConversationRepository.get_conversation(conversation_id)
+        
         # Convert to dictionary
         return conversation_to_dict(conversation)
     
@@ -197,25 +398,173 @@ class ChatService:
         Returns:
             True if the conversation was deleted, False otherwise
         """
-        return ConversationRepository.delete_conversation(conversation_id)
+        conversation = ConversationRepository.get_conversation(conversation_id)
+        
+        if not ConversationRepository.delete_conversation(conversation_id):
+            return False
+        
+        # Drop the archived messages of the conversation too
+        if conversation is not None and conversation.archive_path:
+            conversation_archive.remove(conversation.archive_path)
+        
+        return True
     
     @staticmethod
-    def get_conversation_history(agent_id: str, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    def get_conversation_history(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Get the conversation history for an agent.
         
         Args:
             agent_id: The ID of the agent
             user_id: Optional user ID to filter by
+            fields: Optional comma-separated conversation fields to return
             
         Returns:
             A list of conversation dictionaries
+            
+        Raises:
+            ValueError: If a field is unknown
         """
+        conversation_fields = parse_conversation_fields(fields)
+        
         # Get all conversations for the agent
-        conversations = ConversationRepository.get_conversations_for_agent(agent_id, user_id)
+        conversations = ConversationRepository.get_conversations_for_agent(agent_id, user_id, fields=conversation_fields)
         
         # Convert to dictionaries
-        return [conversation_to_dict(conversation) for conversation in conversations]
+        return [conversation_to_dict(conversation, fields=conversation_fields) for conversation in conversations]
+    
+    @staticmethod
+    def get_conversation_history_page(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a page of the conversation history for an agent.
+        
+        Args:
+            agent_id: The ID of the agent
+            user_id: Optional user ID to filter by
+            limit: The maximum number of conversations to return (defaults to 50)
+            before: Optional cursor; return conversations updated before it
+            after: Optional cursor; return conversations updated after it
+            fields: Optional comma-separated conversation fields to return
+            
+        Returns:
+            A dictionary with the conversations (newest first), whether more
+            conversations exist in the paging direction, and the cursors for
+            loading older (before) or newer (after) conversations
+            
+        Raises:
+            ValueError: If a cursor is malformed or a field is unknown
+        """
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        conversation_fields = parse_conversation_fields(fields)
+        
+        conversations, has_more = ConversationRepository.get_conversations_page_for_agent(
+            agent_id, user_id, limit=limit, before=before, after=after, fields=conversation_fields
+        )
+        
+        return {
+            "conversations": [conversation_to_dict(conversation, fields=conversation_fields) for conversation in conversations],
+            "hasMore": has_more,
+            "beforeCursor": encode_cursor(conversations[-1].updated_at, conversations[-1].id) if conversations else None,
+            "afterCursor": encode_cursor(conversations[0].updated_at, conversations[0].id) if conversations else None
+        }
+    
+    @staticmethod
+    def get_conversation_summaries_page(
+        agent_id: str,
+        user_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a page of conversation summaries for an agent, for conversation lists.
+        
+        Each summary has the message count, the time and a preview of the last
+        message, but no messages.
+        
+        Args:
+            agent_id: The ID of the agent
+            user_id: Optional user ID to filter by
+            limit: The maximum number of conversations to return (defaults to 50)
+            before: Optional cursor; return conversations updated before it
+            after: Optional cursor; return conversations updated after it
+            fields: Optional comma-separated conversation fields to return
+            
+        Returns:
+            A dictionary with the conversation summaries (newest first), whether
+            more conversations exist in the paging direction, and the cursors
+            for loading older (before) or newer (after) conversations
+            
+        Raises:
+            ValueError: If a cursor is malformed or a field is unknown
+        """
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        conversation_fields = parse_conversation_fields(fields)
+        
+        summaries, has_more = ConversationRepository.get_conversation_summaries_page_for_agent(
+            agent_id, user_id, limit=limit, before=before, after=after, fields=conversation_fields
+        )
+        
+        return {
+            "conversations": [conversation_to_dict(summary, fields=conversation_fields) for summary in summaries],
+            "hasMore": has_more,
+            "beforeCursor": encode_cursor(summaries[-1].updated_at, summaries[-1].id) if summaries else None,
+            "afterCursor": encode_cursor(summaries[0].updated_at, summaries[0].id) if summaries else None
+        }
+    
+    @staticmethod
+    def search_messages(
+        query: str,
+        user_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Search the messages of past conversations.
+        
+        Args:
+            query: The search text; every word must match, a trailing * matches a prefix
+            user_id: Optional user ID to filter by
+            agent_id: Optional agent ID to filter by
+            start: Optional earliest message timestamp (Unix milliseconds)
+            end: Optional latest message timestamp (Unix milliseconds)
+            limit: The maximum number of results to return (defaults to 50)
+            after: Optional cursor; return the results ranked after it
+            
+        Returns:
+            A dictionary with the results (best match first, each with a
+            highlighted snippet), whether more results exist, and the cursor
+            of the next page
+            
+        Raises:
+            ValueError: If the query is empty or the cursor is malformed
+        """
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        
+        results, has_more = search_messages(
+            query, user_id=user_id, agent_id=agent_id, start=start, end=end, limit=limit, after=after
+        )
+        
+        return {
+            "results": results,
+            "hasMore": has_more,
+            "nextCursor": results[-1]["cursor"] if results and has_more else None
+        }
     
     @staticmethod
     def get_conversation_with_messages(conversation_id: int) -> Optional[Dict[str, Any]]:
@@ -234,6 +583,10 @@ class ChatService:
         if not conversation:
             return None
         
+        if conversation.archived_at is not None:
+            restore_conversation(conversation_id)
+            conversation = ConversationRepository.get_conversation(conversation_id)
+        
         # Convert to dictionary with messages
         return conversation_to_dict(conversation, include_messages=True)
     
@@ -249,8 +602,8 @@ class ChatService:
         Returns:
             A list of message dictionaries in the format expected by the agent
         """
-        # Get messages for the active conversation
-        messages = ChatService.get_conversation_messages(agent_id, user_id)
+        # Get messages for the active conversation, without their logs
+        messages = ChatService.get_conversation_messages(agent_id, user_id, fields="role,content,attachments")
         
         # Convert to the format expected by the agent
         return [
@@ -311,7 +664,7 @@ class AttachmentService:
             "filename": attachment.filename,
             "contentType": attachment.content_type,
             "size": attachment.size,
-            "url": f"/api/attachments/{attachment.id}" if not attachment.data else None
+            "url": attachment_url(attachment.id)
         }
     
     @staticmethod
@@ -326,46 +679,69 @@ class AttachmentService:
         Returns:
             True if the attachment was updated, False otherwise
         """
+        def write(session: Session) -> bool:
+            attachment = session.query(Attachment).filter(Attachment.id == attachment_id).first()
+            if attachment:
+                attachment.message_id = message_id
+                logger.info(f"Updated message ID for attachment {attachment_id} to {message_id}")
+                return True
+            return False
+        
         try:
-            with get_db_session() as session:
-                attachment = session.query(Attachment).filter(Attachment.id == attachment_id).first()
-                if attachment:
-                    attachment.message_id = message_id
-                    session.commit()
-                    logger.info(f"Updated message ID for attachment {attachment_id} to {message_id}")
-                    return True
-                return False
+            return database_writer.execute(write)
         except Exception as e:
             logger.error(f"Error updating attachment message ID: {str(e)}")
             return False
     
     @staticmethod
-    def get_attachment(attachment_id: int) -> Optional[Dict[str, Any]]:
+    def get_attachment(
+        attachment_id: int,
+        include_data: bool = False,
+        variant: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Get an attachment by ID.
         
         Args:
             attachment_id: The ID of the attachment
+            include_data: Whether to include the base64-encoded content of
+                images (e.g. for formatting messages for a vision model)
+            variant: Optional image variant ("llm" or "thumbnail") to include
+                instead of the original image; its MIME type is returned as
+                "dataType"
             
         Returns:
             The attachment as a dictionary, or None if not found
         """
-        # Get the attachment
-        attachment = AttachmentRepository.get_attachment(attachment_id)
+        # Get the attachment, loading its content only if it is needed
+        if include_data and variant is None:
+            attachment = AttachmentRepository.get_attachment(attachment_id)
+        else:
+            attachment = AttachmentRepository.get_attachment_metadata(attachment_id)
         
         if not attachment:
             return None
         
-        # Convert to dictionary
-        return {
-            "id": attachment.id,
-            "type": attachment.type,
-            "filename": attachment.filename,
-            "contentType": attachment.content_type,
-            "size": attachment.size,
-            "url": f"/api/attachments/{attachment.id}" if not attachment.data else None,
-            "data": base64.b64encode(attachment.data).decode('ascii') if attachment.data and attachment.type.startswith('image/') else None
-        }
+        if not include_data or variant is None:
+            return _attachment_to_dict(attachment, include_data=include_data)
+        
+        result = _attachment_to_dict(attachment)
+        if is_image(attachment.type):
+            digest = parse_blob_key(attachment.storage_path)
+            found = ensure_variant(digest, variant) if digest is not None else None
+            
+            if found is not None:
+                path, result["dataType"] = found
+                with open(path, "rb") as f:
+                    data = f.read()
+            else:
+                # Fall back to the original image
+                data = AttachmentRepository.get_attachment(attachment_id).data
+                result["dataType"] = attachment.type
+            
+            result["data"] = base64.b64encode(data).decode('ascii') if data else None
+        
+        return result
 
 
 class UserPreferenceService:
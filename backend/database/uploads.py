@@ -0,0 +1,390 @@
+"""
+Resumable Attachment Uploads for MOSAIC
+
+This module receives attachment contents as a sequence of binary chunks
+instead of base64 inside a WebSocket message. Each upload has an ID and is
+written to a partial file in the blob store directory while its SHA-256
+digest is computed incrementally, so the memory used by an upload is bounded
+by the chunk size. A client whose connection drops asks for the current
+offset and continues from there.
+
+When all bytes have arrived, the partial file is renamed into the blob store
+(or dropped if the blob already exists) and an attachment is created for it.
+The attachment belongs to a placeholder message until the chat message that
+references its ID is stored (see ChatService.add_message).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.uploads")
+
+# Import the settings from the config
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+
+from .blob_store import blob_store, blob_key
+from .image_variants import is_image, generate_variants
+
+# Prefix of the placeholder message ID of uploaded attachments that no message
+# references yet (the upload ID follows; the whole ID fits messages.id)
+PENDING_MESSAGE_PREFIX = "upl-"
+
+
+class UploadError(Exception):
+    """Raised when an upload request does not match the state of the upload."""
+
+
+class UploadOffsetMismatch(UploadError):
+    """Raised when a chunk does not start at the current offset of the upload."""
+
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"Chunk starts at offset {received}, expected {expected}")
+        self.expected = expected
+        self.received = received
+
+
+@dataclass
+class Upload:
+    """The state of one upload."""
+    upload_id: str
+    filename: Optional[str]
+    content_type: Optional[str]
+    size: int
+    user_id: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    offset: int = 0
+
+    # Incremental digest of the bytes received so far (not persisted; rebuilt
+    # from the partial file after a restart)
+    hasher: Any = field(default=None, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    busy: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the upload to the dictionary returned by the API."""
+        return {
+            "uploadId": self.upload_id,
+            "filename": self.filename,
+            "contentType": self.content_type,
+            "size": self.size,
+            "offset": self.offset,
+            "chunkSize": settings.ATTACHMENT_UPLOAD_CHUNK_SIZE
+        }
+
+
+class UploadManager:
+    """
+    Manager of the uploads in progress.
+
+    The partial file and a small JSON file with the metadata of each upload
+    are kept in <blob store root>/.uploads, on the same file system as the
+    blobs, so a finished upload is moved into the blob store with a rename.
+    """
+
+    def __init__(self, ttl: float = 86400.0):
+        """
+        Initialize the upload manager.
+
+        Args:
+            ttl: Seconds without a chunk after which unfinished uploads are deleted
+        """
+        self.ttl = ttl
+        self._uploads: Dict[str, Upload] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        """The directory of the uploads in progress."""
+        return os.path.join(blob_store.root, ".uploads")
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.part")
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def create(
+        self,
+        size: int,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Upload:
+        """
+        Start an upload.
+
+        Args:
+            size: The total size of the content in bytes
+            filename: Optional filename
+            content_type: Optional MIME type
+            user_id: Optional Clerk user ID
+
+        Returns:
+            The new upload
+        """
+        if size < 0 or size > settings.ATTACHMENT_UPLOAD_MAX_SIZE:
+            raise UploadError(f"Upload size must be between 0 and {settings.ATTACHMENT_UPLOAD_MAX_SIZE} bytes")
+
+        self.cleanup_expired()
+
+        upload = Upload(
+            upload_id=uuid.uuid4().hex,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            user_id=user_id,
+            hasher=hashlib.sha256()
+        )
+
+        os.makedirs(self.directory, exist_ok=True)
+        open(self._part_path(upload.upload_id), "wb").close()
+        with open(self._meta_path(upload.upload_id), "w") as f:
+            json.dump({
+                "filename": filename,
+                "content_type": content_type,
+                "size": size,
+                "user_id": user_id,
+                "created_at": upload.created_at
+            }, f)
+
+        with self._lock:
+            self._uploads[upload.upload_id] = upload
+
+        logger.info(f"Started upload {upload.upload_id} of {filename} ({size} bytes)")
+        return upload
+
+    def get(self, upload_id: str) -> Optional[Upload]:
+        """
+        Get an upload, restoring it from disk if it was started before a restart.
+
+        Args:
+            upload_id: The ID of the upload
+
+        Returns:
+            The upload, or None if there is no such upload
+        """
+        if not upload_id.isalnum():
+            return None
+
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None:
+                return upload
+
+            try:
+                with open(self._meta_path(upload_id)) as f:
+                    meta = json.load(f)
+                offset = os.path.getsize(self._part_path(upload_id))
+            except (FileNotFoundError, ValueError):
+                return None
+
+            upload = Upload(
+                upload_id=upload_id,
+                filename=meta.get("filename"),
+                content_type=meta.get("content_type"),
+                size=meta["size"],
+                user_id=meta.get("user_id"),
+                created_at=meta.get("created_at", time.time()),
+                offset=offset
+            )
+            self._uploads[upload_id] = upload
+            return upload
+
+    def begin_chunk(self, upload: Upload, offset: int):
+        """
+        Open an upload for appending a chunk at an offset.
+
+        Only one chunk of an upload can be written at a time. Call end_chunk
+        when the chunk is written, even if writing it failed.
+
+        Args:
+            upload: The upload
+            offset: The offset the chunk starts at
+
+        Returns:
+            The partial file, positioned at the offset
+        """
+        with upload.lock:
+            if upload.busy:
+                raise UploadError(f"Upload {upload.upload_id} is already receiving a chunk")
+            if offset != upload.offset:
+                raise UploadOffsetMismatch(upload.offset, offset)
+            upload.busy = True
+
+        try:
+            if upload.hasher is None:
+                upload.hasher = self._rehash(upload)
+            # Drop any bytes past the offset left by a chunk that failed midway
+            file = open(self._part_path(upload.upload_id), "r+b")
+            file.seek(upload.offset)
+            file.truncate()
+            return file
+        except BaseException:
+            upload.busy = False
+            raise
+
+    def write(self, upload: Upload, file, data: bytes) -> None:
+        """
+        Append data to an upload opened with begin_chunk.
+
+        Args:
+            upload: The upload
+            file: The file returned by begin_chunk
+            data: The bytes to append
+        """
+        if upload.offset + len(data) > upload.size:
+            raise UploadError(f"Upload {upload.upload_id} exceeds its size of {upload.size} bytes")
+
+        file.write(data)
+        upload.hasher.update(data)
+        upload.offset += len(data)
+
+    def end_chunk(self, upload: Upload, file) -> None:
+        """
+        Finish writing a chunk.
+
+        Args:
+            upload: The upload
+            file: The file returned by begin_chunk
+        """
+        try:
+            file.close()
+        finally:
+            upload.busy = False
+
+    def complete(self, upload: Upload) -> Any:
+        """
+        Move a fully received upload into the blob store and create its attachment.
+
+        Args:
+            upload: The upload
+
+        Returns:
+            The created attachment
+        """
+        # Import here to avoid a circular import with the repository
+        from .repository import AttachmentRepository
+
+        with upload.lock:
+            if upload.busy:
+                raise UploadError(f"Upload {upload.upload_id} is still receiving a chunk")
+            if upload.offset != upload.size:
+                raise UploadError(f"Upload {upload.upload_id} has {upload.offset} of {upload.size} bytes")
+            upload.busy = True
+
+        try:
+            if upload.hasher is None:
+                upload.hasher = self._rehash(upload)
+            digest = upload.hasher.hexdigest()
+
+            part_path = self._part_path(upload.upload_id)
+            blob_store.put_file(part_path, digest)
+
+            if is_image(upload.content_type):
+                with open(blob_store.path(digest), "rb") as f:
+                    generate_variants(digest, f.read())
+
+            attachment = AttachmentRepository.create_attachment(
+                message_id=f"{PENDING_MESSAGE_PREFIX}{upload.upload_id}",
+                attachment_type=upload.content_type or "application/octet-stream",
+                filename=upload.filename,
+                content_type=upload.content_type,
+                size=upload.size,
+                storage_path=blob_key(digest),
+                user_id=upload.user_id
+            )
+        finally:
+            upload.busy = False
+
+        self._forget(upload.upload_id)
+        logger.info(f"Completed upload {upload.upload_id} as attachment {attachment.id}")
+        return attachment
+
+    def cancel(self, upload_id: str) -> bool:
+        """
+        Delete an upload in progress.
+
+        Args:
+            upload_id: The ID of the upload
+
+        Returns:
+            True if the upload was deleted, False if there was no such upload
+        """
+        if self.get(upload_id) is None:
+            return False
+        self._forget(upload_id)
+        return True
+
+    def cleanup_expired(self) -> int:
+        """
+        Delete the uploads that received no chunk within the TTL.
+
+        Returns:
+            The number of deleted uploads
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+
+        deadline = time.time() - self.ttl
+        expired = 0
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[:-len(".json")]
+
+            # The partial file is touched by every chunk
+            try:
+                last_activity = os.path.getmtime(self._part_path(upload_id))
+            except FileNotFoundError:
+                last_activity = 0
+
+            if last_activity < deadline:
+                self._forget(upload_id)
+                expired += 1
+
+        if expired:
+            logger.info(f"Deleted {expired} expired uploads")
+        return expired
+
+    def _rehash(self, upload: Upload):
+        """Rebuild the digest of the bytes received so far from the partial file."""
+        hasher = hashlib.sha256()
+        chunk_size = settings.ATTACHMENT_UPLOAD_CHUNK_SIZE
+        with open(self._part_path(upload.upload_id), "rb") as f:
+            remaining = upload.offset
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return hasher
+
+    def _forget(self, upload_id: str) -> None:
+        """Delete the files and the state of an upload."""
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+# Create the global upload manager
+upload_manager = UploadManager(ttl=settings.ATTACHMENT_UPLOAD_TTL)
@@ -0,0 +1,387 @@
+"""
+Single Writer for MOSAIC
+
+SQLite allows one writer at a time. When WebSocket turns, log inserts and
+attachment uploads each open their own write transaction, they queue on the
+database lock (and fail with "database is locked" once the busy timeout runs
+out), and every one of them pays for its own commit.
+
+This module serializes writes through one dedicated writer thread and one
+writer connection. Callers submit a write function; the writer runs queued
+writes back to back in a single transaction, flushes them together and
+commits them together. If the batch fails, it is retried with each write in
+its own SAVEPOINT, so a failing write does not affect the others. A batch
+is committed as soon as the queue is empty, after at most max_latency seconds
+of waiting for more writes, or when max_batch writes are collected.
+
+Readers keep using the regular connection pool and see each write as soon as
+its group commit returns.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session as SQLAlchemySession
+
+from . import database
+
+# Configure logging
+logger = logging.getLogger("mosaic.database.writer")
+
+# Import the settings from the config
+try:
+    # Try importing with the full package path (for local development)
+    from mosaic.backend.app.config import settings
+except ImportError:
+    # Fall back to relative import (for Docker environment)
+    from backend.app.config import settings
+
+
+class _WriteRequest:
+    """A queued write function and the future that receives its result."""
+
+    __slots__ = ("func", "future", "submitted_at")
+
+    def __init__(self, func: Callable[[SQLAlchemySession], Any]):
+        self.func = func
+        self.future: Future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+class DatabaseWriter:
+    """
+    Serializes write transactions through one connection with group commits.
+
+    Write functions receive the writer's session, add or change objects, and
+    may return a value (e.g. the created object, which stays loaded after the
+    commit). The flush and the commit are done by the writer; write functions
+    flush only when they need generated values such as primary keys.
+    """
+
+    def __init__(self, enabled: bool = True, max_batch: int = 200, max_latency: float = 0.002):
+        """
+        Initialize the database writer.
+
+        Args:
+            enabled: Whether to use the writer thread; when disabled, writes
+                run in their own transaction on the calling thread
+            max_batch: The maximum number of writes per group commit
+            max_latency: How long the writer waits for more writes before
+                committing a batch that is not full
+        """
+        self.enabled = enabled
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max(0.0, max_latency)
+
+        self._queue: "queue.Queue[Optional[_WriteRequest]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Set by shutdown; writes are refused until the writer is started again
+        self._closed = False
+
+        # The session of the batch being run (only set on the writer thread)
+        self._local = threading.local()
+
+        # Counters for reporting
+        self._writes = 0
+        self._failed = 0
+        self._batches = 0
+        self._largest_batch = 0
+        self._total_wait = 0.0
+
+    def _ensure_thread(self) -> None:
+        """Start the writer thread if needed (caller holds the lock)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="mosaic-db-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, func: Callable[[SQLAlchemySession], Any]) -> Future:
+        """
+        Queue a write function.
+
+        Args:
+            func: Function that performs the write with the given session
+
+        Returns:
+            A future that receives the function's result once it is committed
+
+        Raises:
+            RuntimeError: If the writer is shut down
+        """
+        request = _WriteRequest(func)
+
+        # Queued under the lock, so every accepted write is ahead of the stop signal
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Database writer is shut down")
+            self._ensure_thread()
+            self._queue.put(request)
+
+        return request.future
+
+    def execute(self, func: Callable[[SQLAlchemySession], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run a write function and wait until it is committed.
+
+        Args:
+            func: Function that performs the write with the given session
+            timeout: The maximum number of seconds to wait
+
+        Returns:
+            The result of the function
+        """
+        # A write issued from inside another write joins its transaction
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            result = func(session)
+            session.flush()
+            return result
+
+        if not self.enabled:
+            # Collect the after-commit callbacks, unless this write joins an outer one
+            outer = getattr(self._local, "callbacks", None)
+            callbacks = [] if outer is None else outer
+            self._local.callbacks = callbacks
+            try:
+                with database.get_db_session() as session:
+                    result = func(session)
+                    session.flush()
+                    session.expunge_all()
+            finally:
+                self._local.callbacks = outer
+
+            if outer is None:
+                self._run_callbacks(callbacks)
+            return result
+
+        return self.submit(func).result(timeout)
+
+    def after_commit(self, callback: Callable[[], Any]) -> None:
+        """
+        Run a function once the current write is committed.
+
+        Use this for side effects outside the database (such as deleting
+        files) that must not happen if the write is rolled back or retried.
+        The callbacks run on the writer thread before the next batch starts;
+        the callbacks of writes that fail are dropped.
+
+        Args:
+            callback: Function to call without arguments
+
+        Raises:
+            RuntimeError: If called outside of a write function
+        """
+        callbacks = getattr(self._local, "callbacks", None)
+        if callbacks is None:
+            raise RuntimeError("after_commit must be called from a write function")
+        callbacks.append(callback)
+
+    def _run_callbacks(self, callbacks: List[Callable[[], Any]]) -> None:
+        """Run the after-commit callbacks of committed writes."""
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in after-commit callback: {str(e)}")
+
+    async def run(self, func: Callable[[SQLAlchemySession], Any]) -> Any:
+        """
+        Run a write function from async code without blocking the event loop.
+
+        Args:
+            func: Function that performs the write with the given session
+
+        Returns:
+            The result of the function
+        """
+        if not self.enabled:
+            return await asyncio.to_thread(self.execute, func)
+        return await asyncio.wrap_future(self.submit(func))
+
+    def _collect_batch(self, first: _WriteRequest) -> List[Optional[_WriteRequest]]:
+        """Collect the writes of a group commit, starting with the first queued one."""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_latency
+
+        while len(batch) < self.max_batch:
+            try:
+                # Take what is already queued, then wait briefly for more
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            batch.append(request)
+            if request is None:
+                break
+
+        return batch
+
+    def _run(self) -> None:
+        """Writer thread main loop."""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            stopping = batch[-1] is None
+            requests = [request for request in batch if request is not None]
+
+            self._write_batch(requests)
+
+            if stopping:
+                return
+
+    def _apply(self, requests: List[_WriteRequest], isolated: bool) -> List[tuple]:
+        """
+        Run a batch of writes in one transaction and commit them together.
+
+        Args:
+            requests: The queued writes
+            isolated: Whether to run each write in its own SAVEPOINT, so a
+                failing write is rolled back without affecting the others
+
+        Returns:
+            A list of (request, result, error) tuples
+        """
+        results: List[tuple] = []
+        callbacks: List[Callable[[], Any]] = []
+        session = database.WriterSessionFactory()
+        self._local.session = session
+        self._local.callbacks = callbacks
+
+        try:
+            for request in requests:
+                if not isolated:
+                    results.append((request, request.func(session), None))
+                    continue
+
+                savepoint = session.begin_nested()
+                registered = len(callbacks)
+                try:
+                    result = request.func(session)
+                    session.flush()
+                    savepoint.commit()
+                    results.append((request, result, None))
+                except Exception as e:
+                    savepoint.rollback()
+                    del callbacks[registered:]
+                    results.append((request, None, e))
+
+            # Flush the whole batch at once (so inserts are sent as multi-row
+            # INSERTs) and commit it
+            session.commit()
+            session.expunge_all()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self._local.session = None
+            self._local.callbacks = None
+            session.close()
+
+        self._run_callbacks(callbacks)
+        return results
+
+    def _write_batch(self, requests: List[_WriteRequest]) -> None:
+        """
+        Commit a batch of writes, isolating the writes only if the batch fails.
+
+        Args:
+            requests: The queued writes
+        """
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        if not requests:
+            return
+
+        try:
+            results = self._apply(requests, isolated=False)
+        except Exception as e:
+            if len(requests) == 1:
+                results = [(requests[0], None, e)]
+            else:
+                # Find the failing writes by running each one in its own savepoint
+                try:
+                    results = self._apply(requests, isolated=True)
+                except Exception as e:
+                    # The group commit failed, so none of the writes took effect
+                    logger.error(f"Error committing {len(requests)} writes: {str(e)}")
+                    results = [(request, None, e) for request in requests]
+
+        now = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._largest_batch = max(self._largest_batch, len(results))
+            for request, _, error in results:
+                self._writes += 1
+                self._failed += error is not None
+                self._total_wait += now - request.submitted_at
+
+        for request, result, error in results:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+
+    def start(self) -> None:
+        """Accept writes again after a shutdown (the thread starts with the first write)."""
+        with self._lock:
+            self._closed = False
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Commit the queued writes and stop the writer thread.
+
+        Writes submitted afterwards are refused until start is called, so a
+        late write cannot restart the thread after the database is closed.
+
+        Args:
+            timeout: The maximum number of seconds to wait
+        """
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+            logger.info("Shut down database writer")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get database writer statistics.
+
+        Returns:
+            A dictionary containing database writer statistics
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "queued": self._queue.qsize(),
+                "writes": self._writes,
+                "failed": self._failed,
+                "batches": self._batches,
+                "avg_batch": round(self._writes / self._batches, 2) if self._batches else None,
+                "largest_batch": self._largest_batch,
+                "avg_wait_ms": round(self._total_wait / self._writes * 1000, 3) if self._writes else None
+            }
+
+
+# Create the global database writer
+database_writer = DatabaseWriter(
+    enabled=settings.DATABASE_WRITER_ENABLED,
+    max_batch=settings.DATABASE_WRITER_MAX_BATCH,
+    max_latency=settings.DATABASE_WRITER_MAX_LATENCY
+)
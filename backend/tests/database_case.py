@@ -0,0 +1,44 @@
+"""
+Base class for tests that run against a scratch database.
+
+Each test class gets its own SQLite file in a temporary directory. The
+application database is never touched: after the class the engines stay
+pointed at the removed scratch file until the next class configures its own.
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.writer import database_writer
+from backend.database.async_service import db_executor
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Test case with a scratch database per class."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the database at a scratch file."""
+        super().setUpClass()
+
+        # Start database threads whose sessions are bound to the scratch database
+        db_executor.shutdown()
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        database.configure_database(f"sqlite:///{os.path.join(cls.temp_dir.name, 'test.db')}")
+        database.init_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Release the scratch database and delete it."""
+        database_writer.shutdown()
+        db_executor.shutdown()
+        database.close_db_connection()
+        cls.temp_dir.cleanup()
+        super().tearDownClass()
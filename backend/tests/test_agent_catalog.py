@@ -0,0 +1,113 @@
+"""
+Test module for the agent catalog.
+
+This module tests serving precomputed agent metadata with strong ETags,
+conditional requests and rebuilding the catalog when the agents change.
+"""
+
+import unittest
+import sys
+import os
+import asyncio
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the agent catalog and the agent registry
+from backend.app.agent_catalog import AgentCatalog, etag_matches
+from backend.agents.base import agent_registry
+
+
+class TestAgentCatalog(unittest.TestCase):
+    """Test the agent catalog functionality."""
+
+    def setUp(self):
+        """Serve a catalog over a small set of agents."""
+        self.agents = {"calculator": "calc", "writer": "write"}
+        self.extracted = []
+        self.extracted_on_loop = False
+
+        def extract_metadata(agent_id, agent):
+            self.extracted.append(agent_id)
+            try:
+                asyncio.get_running_loop()
+                self.extracted_on_loop = True
+            except RuntimeError:
+                pass
+            return {"id": agent_id, "name": agent_id.capitalize(), "icon": "🤖"}
+
+        self.catalog = AgentCatalog(extract_metadata, lambda: self.agents)
+
+        app = FastAPI()
+
+        @app.get("/api/agents")
+        async def get_agents(request: Request):
+            return await self.catalog.list_response(request)
+
+        @app.get("/api/agents/{agent_id}")
+        async def get_agent(agent_id: str, request: Request):
+            response = await self.catalog.agent_response(request, agent_id)
+            if response is None:
+                raise HTTPException(status_code=404, detail="Agent not found")
+            return response
+
+        self.client = TestClient(app)
+
+    def test_list_and_conditional_request(self):
+        """Test that a matching If-None-Match returns 304 without recomputation."""
+        response = self.client.get("/api/agents")
+        etag = response.headers["etag"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([agent["id"] for agent in response.json()], ["calculator", "writer"])
+        self.assertEqual(response.json()[0]["icon"], "🤖")
+        self.assertFalse(etag.startswith("W/"))
+
+        response = self.client.get("/api/agents", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["etag"], etag)
+
+        # The metadata was extracted only once, off the event loop
+        self.assertEqual(self.extracted, ["calculator", "writer"])
+        self.assertFalse(self.extracted_on_loop)
+
+    def test_single_agent(self):
+        """Test serving the metadata of one agent."""
+        response = self.client.get("/api/agents/writer")
+        self.assertEqual(response.json()["name"], "Writer")
+
+        response = self.client.get("/api/agents/writer", headers={"If-None-Match": response.headers["etag"]})
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get("/api/agents/missing").status_code, 404)
+
+    def test_rebuilt_when_agents_change(self):
+        """Test that adding or registering agents changes the ETag."""
+        etag = self.client.get("/api/agents").headers["etag"]
+
+        self.agents["weather"] = "sunny"
+        response = self.client.get("/api/agents", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+        # A registry change invalidates the catalog too
+        builds = self.catalog.get_stats()["builds"]
+        agent_registry.version += 1
+        self.client.get("/api/agents")
+        self.assertEqual(self.catalog.get_stats()["builds"], builds + 1)
+
+    def test_etag_matching(self):
+        """Test If-None-Match parsing."""
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+        self.assertTrue(etag_matches("*", '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Test module for lazy, manifest-driven agent discovery.
+
+This module tests the static scan of agent modules, the cached manifest and
+its invalidation, and registering agents on first use.
+"""
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the agent discovery module
+from backend.app.agent_discovery import AgentManifest, LazyAgentMap, scan_agent_module
+from backend.agents.base import agent_registry
+
+# Agent module written to the scratch package
+GREETER_MODULE = '''
+"""Greeter agent used by the discovery tests."""
+
+import logging
+
+from backend.agents.base import BaseAgent, agent_registry
+
+LOADED = True
+
+
+class GreeterAgent(BaseAgent):
+    """Agent that greets people."""
+
+    def __init__(self, model, name: str = "greeter", icon: str = "👋"):
+        super().__init__(name=name, model=model, description="Greets people")
+
+    def _get_default_prompt(self) -> str:
+        return "You greet people."
+
+
+def register_greeter_agent(model) -> GreeterAgent:
+    """Create and register the greeter agent."""
+    agent = GreeterAgent(model=model)
+    agent_registry.register(agent)
+    return agent
+'''
+
+# Supervisor module written to the scratch package
+TEAM_MODULE = '''
+"""Supervisor used by the discovery tests."""
+
+
+def create_team_supervisor(model):
+    """Create a supervisor that orchestrates the greeter."""
+    from backend.agents.base import agent_registry
+    return {"members": [agent_registry.get("greeter").name]}
+'''
+
+
+class TestAgentManifest(unittest.TestCase):
+    """Test building and caching the agent manifest."""
+
+    def setUp(self):
+        """Create a scratch agents package on the import path."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.package = f"discovery_agents_{id(self)}"
+        root = os.path.join(self.temp_dir.name, self.package)
+
+        for directory in (root, os.path.join(root, "regular"), os.path.join(root, "supervisors")):
+            os.makedirs(directory)
+            open(os.path.join(directory, "__init__.py"), "w").close()
+
+        self.greeter_path = os.path.join(root, "regular", "greeter.py")
+        with open(self.greeter_path, "w") as f:
+            f.write(GREETER_MODULE)
+        with open(os.path.join(root, "supervisors", "team.py"), "w") as f:
+            f.write(TEAM_MODULE)
+
+        sys.path.insert(0, self.temp_dir.name)
+
+    def tearDown(self):
+        """Remove the scratch package."""
+        sys.path.remove(self.temp_dir.name)
+        for name in list(sys.modules):
+            if name.startswith(self.package):
+                del sys.modules[name]
+        agent_registry.agents.pop("greeter", None)
+        self.temp_dir.cleanup()
+
+    def test_scan_metadata(self):
+        """Test that the static scan finds the agent name, metadata and entry point."""
+        entry = scan_agent_module(GREETER_MODULE)
+        agent = entry["agents"][0]
+
+        self.assertEqual(agent["name"], "greeter")
+        self.assertEqual(agent["function"], "register_greeter_agent")
+        self.assertEqual(agent["icon"], "👋")
+        self.assertEqual(agent["description"], "Agent that greets people.")
+
+    def test_cache_reuse_and_invalidation(self):
+        """Test that unchanged files come from the cache and changed files are rescanned."""
+        manifest = AgentManifest(self.package)
+        self.assertEqual(set(manifest.build()), {"greeter", "team_supervisor"})
+        self.assertEqual(manifest.scanned, 2)
+
+        manifest.build()
+        self.assertEqual((manifest.scanned, manifest.reused), (0, 2))
+
+        # Touching a file without changing it is caught by the hash
+        os.utime(self.greeter_path, (time.time() + 10, time.time() + 10))
+        manifest.build()
+        self.assertEqual(manifest.scanned, 0)
+
+        with open(self.greeter_path, "a") as f:
+            f.write("\n\ndef register_farewell_agent(model):\n    return None\n")
+        entries = manifest.build()
+        self.assertEqual(manifest.scanned, 1)
+        self.assertIn("farewell", entries)
+
+    def test_lazy_registration(self):
+        """Test that agent modules are imported only when an agent is used."""
+        manifest = AgentManifest(self.package).build()
+        self.assertEqual(manifest["team_supervisor"]["dependencies"], ["greeter"])
+
+        agents = LazyAgentMap(manifest, model=None)
+        self.assertIn("greeter", agents)
+        self.assertEqual(len(agents), 2)
+        self.assertNotIn(f"{self.package}.regular.greeter", sys.modules)
+
+        # Loading the supervisor registers the agent it depends on first
+        supervisor = agents["team_supervisor"]
+        self.assertEqual(supervisor, {"members": ["greeter"]})
+        self.assertTrue(agents.is_loaded("greeter"))
+        self.assertIs(agents["greeter"], agent_registry.get("greeter"))
+
+        # Agents that fail to register are left out
+        self.assertIsNone(agents.get("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
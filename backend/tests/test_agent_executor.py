@@ -0,0 +1,216 @@
+"""
+Test module for the agent executor.
+
+This module tests the agent executor, including concurrency limits,
+queue-depth reporting and job timing.
+"""
+
+import unittest
+import sys
+import os
+import asyncio
+import contextvars
+import threading
+import time
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the agent executor
+from backend.app.agent_executor import AgentExecutor, AgentExecutorFullError, parse_agent_limits
+
+# Context variable used to check context propagation into worker threads
+request_marker = contextvars.ContextVar("request_marker", default=None)
+
+
+class ConcurrencyProbe:
+    """Blocking callable that records the maximum observed concurrency."""
+
+    def __init__(self, duration: float = 0.1):
+        self.duration = duration
+        self.current = 0
+        self.maximum = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, value=None):
+        with self.lock:
+            self.current += 1
+            self.maximum = max(self.maximum, self.current)
+        time.sleep(self.duration)
+        with self.lock:
+            self.current -= 1
+        return value
+
+
+class TestAgentExecutor(unittest.TestCase):
+    """Test the agent executor functionality."""
+
+    def setUp(self):
+        """Set up the test case."""
+        self.executor = AgentExecutor(max_workers=4, per_agent_limit=2, agent_limits={"slow_agent": 1})
+
+    def tearDown(self):
+        """Clean up after the test case."""
+        self.executor.shutdown(wait=True)
+
+    def run_async_test(self, coroutine):
+        """Helper method to run async tests."""
+        return asyncio.run(coroutine)
+
+    def test_parse_agent_limits(self):
+        """Test parsing per-agent limits from a settings string."""
+        limits = parse_agent_limits("research_supervisor=2, calculator=8,invalid,bad=x")
+        self.assertEqual(limits, {"research_supervisor": 2, "calculator": 8})
+
+    def test_returns_result(self):
+        """Test that a job returns the callable's result."""
+        result = self.run_async_test(self.executor.run("calculator", lambda x: x * 2, 21))
+        self.assertEqual(result, 42)
+
+    def test_per_agent_limit(self):
+        """Test that the per-agent limit is enforced."""
+        probe = ConcurrencyProbe()
+
+        async def run_jobs():
+            await asyncio.gather(*[self.executor.run("calculator", probe) for _ in range(6)])
+
+        self.run_async_test(run_jobs())
+        self.assertEqual(probe.maximum, 2)
+
+    def test_agent_limit_override(self):
+        """Test that a per-agent override is enforced."""
+        probe = ConcurrencyProbe()
+
+        async def run_jobs():
+            await asyncio.gather(*[self.executor.run("slow_agent", probe) for _ in range(3)])
+
+        self.run_async_test(run_jobs())
+        self.assertEqual(probe.maximum, 1)
+
+    def test_global_limit(self):
+        """Test that the global limit is enforced across agents."""
+        probe = ConcurrencyProbe()
+
+        async def run_jobs():
+            await asyncio.gather(*[
+                self.executor.run(f"agent_{i}", probe) for i in range(8)
+            ])
+
+        self.run_async_test(run_jobs())
+        self.assertEqual(probe.maximum, 4)
+
+    def test_event_loop_stays_responsive(self):
+        """Test that a long job does not block the event loop."""
+        async def run_jobs():
+            job = asyncio.create_task(self.executor.run("research_supervisor", time.sleep, 0.5))
+
+            # Measure how long a short sleep takes while the job is running
+            started = time.monotonic()
+            await asyncio.sleep(0.05)
+            elapsed = time.monotonic() - started
+
+            await job
+            return elapsed
+
+        elapsed = self.run_async_test(run_jobs())
+        self.assertLess(elapsed, 0.3)
+
+    def test_queue_depth_and_timing(self):
+        """Test queue-depth reporting and job timing."""
+        async def run_jobs():
+            jobs = [asyncio.create_task(self.executor.run("slow_agent", time.sleep, 0.1)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+
+            stats = self.executor.get_stats()
+            await asyncio.gather(*jobs)
+            return stats
+
+        stats = self.run_async_test(run_jobs())
+        self.assertEqual(stats["agents"]["slow_agent"]["running"], 1)
+        self.assertEqual(stats["agents"]["slow_agent"]["queued"], 2)
+        self.assertEqual(stats["queued"], 2)
+
+        # The last job waited for the two before it
+        recent = self.executor.get_recent_jobs()
+        self.assertEqual(len(recent), 3)
+        self.assertGreaterEqual(max(job["queue_time"] for job in recent), 0.15)
+        for job in recent:
+            self.assertEqual(job["status"], "completed")
+            self.assertGreaterEqual(job["run_time"], 0.09)
+
+        # Nothing is left active once the jobs finished
+        stats = self.executor.get_stats()
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["recent"]["count"], 3)
+
+    def test_queue_full(self):
+        """Test that jobs are rejected once the queue is full."""
+        executor = AgentExecutor(max_workers=1, per_agent_limit=1, max_queue=1)
+
+        async def run_jobs():
+            first = asyncio.create_task(executor.run("calculator", time.sleep, 0.2))
+            second = asyncio.create_task(executor.run("calculator", time.sleep, 0.01))
+            await asyncio.sleep(0.05)
+
+            with self.assertRaises(AgentExecutorFullError):
+                await executor.run("calculator", time.sleep, 0.01)
+
+            await asyncio.gather(first, second)
+
+        try:
+            self.run_async_test(run_jobs())
+        finally:
+            executor.shutdown(wait=True)
+
+    def test_error_is_recorded(self):
+        """Test that job errors are raised and recorded."""
+        def fail():
+            raise ValueError("Test failure")
+
+        with self.assertRaises(ValueError):
+            self.run_async_test(self.executor.run("calculator", fail))
+
+        job = self.executor.get_recent_jobs()[0]
+        self.assertEqual(job["status"], "error")
+        self.assertEqual(job["error"], "Test failure")
+
+    def test_context_propagation(self):
+        """Test that context variables follow the job into the worker thread."""
+        async def run_job():
+            request_marker.set("message-123")
+            return await self.executor.run("calculator", request_marker.get)
+
+        self.assertEqual(self.run_async_test(run_job()), "message-123")
+
+    def test_cancelled_job_keeps_slot(self):
+        """Test that a cancelled job holds its slot until its callable returns."""
+        release = threading.Event()
+        ran = []
+
+        async def run_jobs():
+            first = asyncio.ensure_future(self.executor.run("slow_agent", release.wait, 5))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            await asyncio.sleep(0.05)
+
+            # The callable is still running, so it is still counted
+            stats = self.executor.get_stats()
+            self.assertEqual(stats["running"], 1)
+
+            second = asyncio.ensure_future(self.executor.run("slow_agent", lambda: ran.append(time.time())))
+            await asyncio.sleep(0.1)
+            self.assertEqual(ran, [])
+
+            release.set()
+            await second
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+
+        self.run_async_test(run_jobs())
+        self.assertEqual(len(ran), 1)
+        self.assertEqual(self.executor.get_stats()["running"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Test module for agent streaming.
+
+This module tests the translation of LangGraph run events into
+WebSocket stream frames.
+"""
+
+import unittest
+import sys
+import os
+import asyncio
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, AIMessageChunk
+
+# Import the streaming module
+from backend.agents.base import BaseAgent
+from backend.app.agent_streaming import (
+    stream_agent_run,
+    extract_agent_response,
+    get_event_speaker,
+    get_chunk_text
+)
+
+
+class EchoAgent(BaseAgent):
+    """Minimal agent used to exercise streaming."""
+
+    def _get_default_prompt(self) -> str:
+        return "You are a test agent."
+
+
+class FakeSupervisor:
+    """Fake compiled graph that replays supervisor-style run events."""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def astream_events(self, state, version="v2"):
+        for event in self.events:
+            yield event
+
+
+class TestAgentStreaming(unittest.TestCase):
+    """Test the agent streaming functionality."""
+
+    def run_stream(self, agent_id, agent, state):
+        """Helper method to run a stream and collect the frames."""
+        frames = []
+
+        async def send(frame):
+            frames.append(frame)
+
+        result = asyncio.run(stream_agent_run(agent_id, agent, state, "message-1", send))
+        return result, frames
+
+    def test_streams_token_deltas(self):
+        """Test that token deltas are pushed before the final state is returned."""
+        model = GenericFakeChatModel(messages=iter([AIMessage(content="hello streaming world")]))
+        agent = EchoAgent(name="echo", model=model)
+
+        result, frames = self.run_stream("echo", agent, {"messages": [{"role": "user", "content": "hi"}]})
+
+        self.assertEqual(frames[0]["type"], "stream_start")
+        tokens = [frame for frame in frames if frame["type"] == "token"]
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual("".join(frame["delta"] for frame in tokens), "hello streaming world")
+        for frame in frames:
+            self.assertEqual(frame["messageId"], "message-1")
+
+        # The final state carries the complete response
+        self.assertEqual(extract_agent_response(result["messages"]), "hello streaming world")
+
+    def test_supervisor_events(self):
+        """Test that sub-agent tokens and tool events are attributed to the speaking agent."""
+        final_state = {"messages": [HumanMessage(content="research"), AIMessage(content="Done")]}
+        events = [
+            {
+                "event": "on_chat_model_stream",
+                "metadata": {"langgraph_checkpoint_ns": "supervisor:1"},
+                "data": {"chunk": AIMessageChunk(content="Delegating")},
+                "parent_ids": ["root"]
+            },
+            {
+                "event": "on_tool_start",
+                "name": "search_web",
+                "run_id": "tool-1",
+                "metadata": {"langgraph_checkpoint_ns": "web_search:2|tools:3"},
+                "data": {"input": {"query": "mosaic"}},
+                "parent_ids": ["root"]
+            },
+            {
+                "event": "on_tool_end",
+                "name": "search_web",
+                "run_id": "tool-1",
+                "metadata": {"langgraph_checkpoint_ns": "web_search:2|tools:3"},
+                "data": {"output": "x" * 5000},
+                "parent_ids": ["root"]
+            },
+            {
+                "event": "on_chat_model_stream",
+                "metadata": {"langgraph_checkpoint_ns": "web_search:2|agent:4"},
+                "data": {"chunk": AIMessageChunk(content="Found it")},
+                "parent_ids": ["root"]
+            },
+            {
+                "event": "on_chain_end",
+                "data": {"output": final_state},
+                "parent_ids": []
+            }
+        ]
+
+        result, frames = self.run_stream("research_supervisor", FakeSupervisor(events), {"messages": []})
+
+        types = [frame["type"] for frame in frames]
+        self.assertEqual(types, ["stream_start", "token", "tool_start", "tool_end", "token"])
+        self.assertEqual(frames[1]["agent"], "research_supervisor")
+        self.assertEqual(frames[2]["agent"], "web_search")
+        self.assertEqual(frames[2]["tool"], "search_web")
+        self.assertLessEqual(len(frames[3]["output"]), 2003)
+        self.assertEqual(frames[4]["agent"], "web_search")
+        self.assertEqual(result, final_state)
+
+    def test_get_event_speaker(self):
+        """Test speaker resolution from event metadata."""
+        self.assertEqual(get_event_speaker({"metadata": {"lc_agent_name": "literature"}}, "root"), "literature")
+        self.assertEqual(get_event_speaker({"metadata": {"langgraph_checkpoint_ns": "agent:1"}}, "root"), "root")
+        self.assertEqual(get_event_speaker({}, "root"), "root")
+
+    def test_get_chunk_text(self):
+        """Test extracting text from chunks with string and block content."""
+        self.assertEqual(get_chunk_text(AIMessageChunk(content="abc")), "abc")
+        self.assertEqual(get_chunk_text(AIMessageChunk(content=[{"type": "text", "text": "abc"}, {"type": "tool_use"}])), "abc")
+        self.assertEqual(get_chunk_text(None), "")
+
+    def test_extract_agent_response(self):
+        """Test extracting the final response from result messages."""
+        self.assertEqual(extract_agent_response([{"role": "user", "content": "q"}, {"role": "assistant", "content": "a"}]), "a")
+        self.assertEqual(extract_agent_response([HumanMessage(content="q")]), "No response from agent")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Test module for the agent warm-up.
+
+This module tests loading and compiling agents concurrently in the
+background and reporting their readiness.
+"""
+
+import unittest
+import sys
+import os
+import time
+import itertools
+import threading
+from collections.abc import Mapping
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+# Import the agent warm-up and the base agent
+from backend.app.agent_warmup import AgentWarmup
+from backend.agents.base import BaseAgent
+
+
+class EchoAgent(BaseAgent):
+    """Minimal agent used to exercise the warm-up."""
+
+    def _get_default_prompt(self) -> str:
+        return "You are a test agent."
+
+
+class SlowAgentMap(Mapping):
+    """Agent mapping whose lookups take a while, like a lazy import."""
+
+    def __init__(self, names, delay):
+        model = GenericFakeChatModel(messages=itertools.cycle([AIMessage(content="hi")]))
+        self.agents = {name: EchoAgent(name=name, model=model) for name in names}
+        self.delay = delay
+
+    def __getitem__(self, name):
+        time.sleep(self.delay)
+        if name == "broken":
+            raise KeyError(name)
+        return self.agents[name]
+
+    def __iter__(self):
+        return iter(list(self.agents) + ["broken"])
+
+    def __len__(self):
+        return len(self.agents) + 1
+
+
+class TestAgentWarmup(unittest.TestCase):
+    """Test the agent warm-up functionality."""
+
+    def test_agents_are_compiled_concurrently(self):
+        """Test that agents are loaded in parallel and their graphs are compiled."""
+        agents = SlowAgentMap(["a", "b", "c", "d"], delay=0.3)
+        warmup = AgentWarmup(max_concurrency=5)
+
+        start_time = time.perf_counter()
+        status = warmup.run(agents)
+        elapsed = time.perf_counter() - start_time
+
+        self.assertLess(elapsed, 1.0)
+        self.assertTrue(status["ready"])
+        for name in "abcd":
+            self.assertEqual(status["agents"][name]["status"], "ready")
+            self.assertGreaterEqual(status["agents"][name]["seconds"], 0.3)
+            self.assertIsNotNone(agents.agents[name].agent)
+
+        self.assertEqual(status["agents"]["broken"]["status"], "failed")
+
+    def test_background_readiness(self):
+        """Test that readiness is reported only after the background warm-up finishes."""
+        warmup = AgentWarmup(max_concurrency=2)
+        self.assertFalse(warmup.get_status()["started"])
+
+        thread = warmup.start(SlowAgentMap(["a", "b"], delay=0.2))
+        self.assertFalse(warmup.is_ready())
+        self.assertTrue(warmup.get_status()["started"])
+
+        thread.join(5)
+        self.assertTrue(warmup.is_ready())
+
+    def test_create_compiles_once(self):
+        """Test that concurrent create calls compile the graph only once."""
+        model = GenericFakeChatModel(messages=itertools.cycle([AIMessage(content="hi")]))
+        agent = EchoAgent(name="echo", model=model)
+
+        graphs = []
+        threads = [threading.Thread(target=lambda: graphs.append(agent.create())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(graph) for graph in graphs}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+Test module for the agent worker pool.
+
+This module tests running agents in worker processes, including streaming,
+log forwarding, worker recycling and recovery from crashed workers.
+"""
+
+import unittest
+import sys
+import os
+import asyncio
+import itertools
+import logging
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+# Import the worker pool and its dependencies
+from backend.agents.base import BaseAgent
+from backend.app.agent_worker_pool import AgentWorkerPool, AgentWorkerError, serialize_state, deserialize_state
+from backend.app.log_pipeline import log_pipeline, current_message_id
+from backend.database import database
+from backend.tests.database_case import DatabaseTestCase
+
+# Agent factory used by the worker processes in these tests
+TEST_AGENT_FACTORY = "backend.tests.test_agent_worker_pool:create_test_agents"
+
+
+class EchoAgent(BaseAgent):
+    """Minimal agent used to exercise the worker pool."""
+
+    def _get_default_prompt(self) -> str:
+        return "You are a test agent."
+
+
+class PidAgent:
+    """Agent that answers with the ID of the process it runs in."""
+
+    def invoke(self, state):
+        logging.getLogger("mosaic.agents.pid_agent").info(f"Running in {os.getpid()}")
+        return {"messages": state["messages"] + [AIMessage(content=str(os.getpid()))]}
+
+
+class CrashAgent:
+    """Agent that kills its worker process."""
+
+    def invoke(self, state):
+        os._exit(1)
+
+
+def create_test_agents():
+    """Create the agents available in the test worker processes."""
+    model = GenericFakeChatModel(messages=itertools.cycle([AIMessage(content="hello from worker")]))
+    return {
+        "echo": EchoAgent(name="echo", model=model),
+        "pid": PidAgent(),
+        "crash": CrashAgent()
+    }
+
+
+def run_pid_agent(pool):
+    """Helper function to run the pid agent and return the worker's process ID."""
+    result = asyncio.run(pool.invoke("pid", {"messages": [{"role": "user", "content": "pid?"}]}))
+    return int(result["messages"][-1].content)
+
+
+class TestAgentWorkerPool(DatabaseTestCase):
+    """Test the agent worker pool functionality."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a worker pool."""
+        super().setUpClass()
+
+        cls.pool = AgentWorkerPool(
+            processes=2,
+            max_jobs_per_worker=0,
+            agent_factory=TEST_AGENT_FACTORY,
+            heartbeat_interval=0.5,
+            heartbeat_timeout=30
+        )
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the worker pool."""
+        cls.pool.shutdown()
+        super().tearDownClass()
+
+    def test_state_serialization(self):
+        """Test that states with dict and LangChain messages survive serialization."""
+        state = {"messages": [{"role": "user", "content": "hi"}, AIMessage(content="hello")], "extra": 1}
+        restored = deserialize_state(serialize_state(state))
+
+        self.assertEqual(restored["messages"][0], {"role": "user", "content": "hi"})
+        self.assertIsInstance(restored["messages"][1], AIMessage)
+        self.assertEqual(restored["messages"][1].content, "hello")
+        self.assertEqual(restored["extra"], 1)
+
+    def test_invoke(self):
+        """Test invoking an agent in a worker process."""
+        result = asyncio.run(self.pool.invoke("echo", {"messages": [{"role": "user", "content": "hi"}]}))
+
+        self.assertEqual(result["messages"][-1].content, "hello from worker")
+        self.assertNotEqual(run_pid_agent(self.pool), os.getpid())
+
+    def test_stream(self):
+        """Test that stream frames are forwarded from the worker."""
+        frames = []
+
+        async def on_frame(frame):
+            frames.append(frame)
+
+        result = asyncio.run(self.pool.stream("echo", {"messages": [{"role": "user", "content": "hi"}]}, on_frame))
+
+        tokens = [frame["delta"] for frame in frames if frame["type"] == "token"]
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual("".join(tokens), "hello from worker")
+        self.assertEqual(result["messages"][-1].content, "hello from worker")
+
+    def test_unknown_agent(self):
+        """Test that a job for an unknown agent fails."""
+        with self.assertRaises(AgentWorkerError):
+            asyncio.run(self.pool.invoke("missing", {"messages": []}))
+
+    def test_logs_are_forwarded(self):
+        """Test that worker logs reach the log pipeline for the current message."""
+        async def run():
+            log_pipeline.register("worker-message")
+            token = current_message_id.set("worker-message")
+            try:
+                await self.pool.invoke("pid", {"messages": []})
+            finally:
+                current_message_id.reset(token)
+            return await log_pipeline.drain("worker-message")
+
+        logs = asyncio.run(run())
+        log_pipeline.unregister("worker-message")
+
+        self.assertEqual(len(logs), 1)
+        self.assertIn("mosaic.agents.pid_agent", logs[0])
+
+    def test_crash_recovery(self):
+        """Test that a crashed worker fails its job and is replaced."""
+        with self.assertRaises(AgentWorkerError):
+            asyncio.run(self.pool.invoke("crash", {"messages": []}))
+
+        # The pool keeps serving jobs
+        self.assertNotEqual(run_pid_agent(self.pool), os.getpid())
+        self.assertGreaterEqual(self.pool.get_stats()["restarted"], 1)
+
+
+class TestAgentWorkerRecycling(unittest.TestCase):
+    """Test recycling of worker processes."""
+
+    def test_recycle_after_max_jobs(self):
+        """Test that a worker is replaced after its maximum number of jobs."""
+        pool = AgentWorkerPool(processes=1, max_jobs_per_worker=2, agent_factory=TEST_AGENT_FACTORY, heartbeat_interval=0.5)
+        pool.start()
+
+        try:
+            pids = [run_pid_agent(pool) for _ in range(3)]
+        finally:
+            pool.shutdown()
+
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+        self.assertEqual(pool.get_stats()["recycled"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Test module for the async database services.
+
+This module tests that the async services mirror the sync services and run
+their database calls off the event loop thread.
+"""
+
+import unittest
+import sys
+import os
+import asyncio
+import contextvars
+import threading
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.service import ChatService
+from backend.database.async_service import AsyncChatService, AsyncUserPreferenceService, DatabaseExecutor
+from backend.benchmarks.message_serializer import seed_conversation
+from backend.tests.database_case import DatabaseTestCase
+
+# Context variable used to check that the caller's context reaches the database thread
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class TestAsyncServices(DatabaseTestCase):
+    """Test the async database services."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Seed a conversation."""
+        super().setUpClass()
+        seed_conversation(12)
+
+    def test_mirrors_sync_service(self):
+        """Test that the async services return what the sync services return."""
+        async def run():
+            messages = await AsyncChatService.get_conversation_messages("benchmark")
+            page = await AsyncChatService.get_conversation_messages_page("benchmark", limit=5)
+            history = await AsyncChatService.get_conversation_history("benchmark")
+            preference = await AsyncUserPreferenceService.get_user_preference("missing-user")
+            return messages, page, history, preference
+
+        messages, page, history, preference = asyncio.run(run())
+
+        self.assertEqual(messages, ChatService.get_conversation_messages("benchmark"))
+        self.assertEqual(page["messages"], messages[-5:])
+        self.assertEqual(history, ChatService.get_conversation_history("benchmark"))
+        self.assertIsNone(preference)
+        self.assertEqual(AsyncChatService.add_message.__name__, "add_message")
+
+    def test_runs_off_the_event_loop(self):
+        """Test that database calls run on database threads with the caller's context."""
+        executor = DatabaseExecutor(max_workers=2)
+        loop_thread = threading.get_ident()
+
+        def where():
+            return threading.get_ident(), threading.current_thread().name, request_id.get()
+
+        async def run():
+            request_id.set("request-1")
+            return await asyncio.gather(*[executor.run(where) for _ in range(4)])
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            executor.shutdown()
+
+        for thread_id, thread_name, context_value in results:
+            self.assertNotEqual(thread_id, loop_thread)
+            self.assertTrue(thread_name.startswith("mosaic-db"))
+            self.assertEqual(context_value, "request-1")
+
+        stats = executor.get_stats()
+        self.assertEqual(stats["completed"], 4)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_errors_propagate(self):
+        """Test that database errors are raised to the awaiting caller."""
+        executor = DatabaseExecutor(max_workers=1)
+
+        def fail():
+            raise ValueError("bad cursor")
+
+        try:
+            with self.assertRaises(ValueError):
+                asyncio.run(executor.run(fail))
+        finally:
+            executor.shutdown()
+
+        self.assertEqual(executor.get_stats()["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Test module for the attachment download endpoint.
+
+This module tests streaming attachment contents from the blob store and the
+database with byte ranges, ETags and cache headers.
+"""
+
+import unittest
+import sys
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules and the attachment API
+from backend.app.config import settings
+from backend.app.attachment_api import router, parse_range, CACHE_CONTROL
+from backend.database import database
+from backend.database.models import Attachment
+from backend.database.blob_store import blob_store, parse_blob_key
+from backend.database.repository import AttachmentRepository, ConversationRepository, MessageRepository
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestParseRange(unittest.TestCase):
+    """Test parsing Range headers."""
+
+    def test_ranges(self):
+        """Test single, open-ended and suffix ranges."""
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+
+    def test_ignored_ranges(self):
+        """Test that missing, malformed and multiple ranges serve the whole content."""
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range("items=0-9", 100))
+        self.assertIsNone(parse_range("bytes=0-9,20-29", 100))
+        self.assertIsNone(parse_range("bytes=abc", 100))
+        self.assertIsNone(parse_range("bytes=9-0", 100))
+
+    def test_unsatisfiable_range(self):
+        """Test that a range starting past the end is rejected."""
+        with self.assertRaises(ValueError):
+            parse_range("bytes=100-", 100)
+
+
+class TestAttachmentDownload(DatabaseTestCase):
+    """Test the attachment download endpoint."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the blob store at a scratch directory."""
+        super().setUpClass()
+        cls.blob_root = blob_store.root
+        blob_store.root = os.path.join(cls.temp_dir.name, "blobs")
+        cls.chunk_size = settings.ATTACHMENT_STREAM_CHUNK_SIZE
+        settings.ATTACHMENT_STREAM_CHUNK_SIZE = 7
+
+        app = FastAPI()
+        app.include_router(router)
+        cls.client = TestClient(app)
+
+        conversation = ConversationRepository.create_conversation("download")
+        cls.message_id = MessageRepository.create_message(conversation.id, "user", "Files").id
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the blob store."""
+        settings.ATTACHMENT_STREAM_CHUNK_SIZE = cls.chunk_size
+        blob_store.root = cls.blob_root
+        super().tearDownClass()
+
+    def test_blob_content(self):
+        """Test that blob-stored content is streamed with cache headers and ranges."""
+        content = bytes(range(100))
+        attachment = AttachmentRepository.create_attachment(
+            self.message_id, "image/png", filename="photo one.png", content_type="image/png", data=content
+        )
+        url = f"/api/attachments/{attachment.id}"
+
+        response = self.client.get(url)
+        etag = response.headers["etag"]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, content)
+        self.assertEqual(etag, f'"{parse_blob_key(attachment.storage_path)}"')
+        self.assertEqual(response.headers["cache-control"], CACHE_CONTROL)
+        self.assertEqual(response.headers["content-type"], "image/png")
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+        self.assertIn("photo%20one.png", response.headers["content-disposition"])
+
+        response = self.client.get(url, headers={"Range": "bytes=10-29"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, content[10:30])
+        self.assertEqual(response.headers["content-range"], "bytes 10-29/100")
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(url, headers={"Range": "bytes=100-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], "bytes */100")
+
+        # An outdated If-Range validator gets the whole content
+        response = self.client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, content)
+
+    def test_inline_content(self):
+        """Test that content stored in the database is served the same way."""
+        with database.get_db_session() as session:
+            attachment = Attachment(message_id=self.message_id, type="text/plain", inline_data=b"legacy inline content")
+            session.add(attachment)
+            session.commit()
+            attachment_id = attachment.id
+
+        response = self.client.get(f"/api/attachments/{attachment_id}", headers={"Range": "bytes=-7"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"content")
+
+    def test_missing_attachment(self):
+        """Test that unknown attachments return 404."""
+        self.assertEqual(self.client.get("/api/attachments/999999").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Test module for binary attachment uploads.
+
+This module tests resumable chunked uploads into the blob store, one-shot
+multipart uploads and linking uploaded attachments to chat messages.
+"""
+
+import unittest
+import sys
+import os
+import hashlib
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules and the attachment API
+from backend.app.config import settings
+from backend.app.attachment_api import router
+from backend.database.blob_store import blob_store, parse_blob_key
+from backend.database.uploads import UploadManager, UploadOffsetMismatch, upload_manager, PENDING_MESSAGE_PREFIX
+from backend.database.repository import AttachmentRepository
+from backend.database.service import ChatService
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestAttachmentUpload(DatabaseTestCase):
+    """Test uploading attachments as binary chunks."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the blob store at a scratch directory."""
+        super().setUpClass()
+        cls.blob_root = blob_store.root
+        blob_store.root = os.path.join(cls.temp_dir.name, "blobs")
+
+        app = FastAPI()
+        app.include_router(router)
+        cls.client = TestClient(app)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the blob store."""
+        blob_store.root = cls.blob_root
+        super().tearDownClass()
+
+    def upload_chunks(self, manager, upload, chunks):
+        """Write chunks to an upload one at a time."""
+        for chunk in chunks:
+            file = manager.begin_chunk(upload, upload.offset)
+            try:
+                manager.write(upload, file, chunk)
+            finally:
+                manager.end_chunk(upload, file)
+
+    def test_resumed_after_restart(self):
+        """Test that an upload continues from its offset in a new manager."""
+        content = os.urandom(10000)
+        upload = upload_manager.create(len(content), filename="data.bin", content_type="application/octet-stream")
+        self.upload_chunks(upload_manager, upload, [content[:4000]])
+
+        # A chunk that does not start at the current offset is rejected
+        with self.assertRaises(UploadOffsetMismatch) as context:
+            upload_manager.begin_chunk(upload, 0)
+        self.assertEqual(context.exception.expected, 4000)
+
+        # A new manager (e.g. after a restart) rebuilds the upload from disk
+        restarted = UploadManager()
+        resumed = restarted.get(upload.upload_id)
+        self.assertEqual(resumed.offset, 4000)
+        self.upload_chunks(restarted, resumed, [content[4000:7000], content[7000:]])
+
+        attachment = restarted.complete(resumed)
+        digest = parse_blob_key(attachment.storage_path)
+        self.assertEqual(digest, hashlib.sha256(content).hexdigest())
+        self.assertEqual(blob_store.read(digest), content)
+        self.assertEqual(attachment.message_id, f"{PENDING_MESSAGE_PREFIX}{upload.upload_id}")
+        self.assertLessEqual(len(attachment.message_id), 36)
+
+        # The partial and metadata files are gone
+        self.assertEqual(os.listdir(restarted.directory), [])
+        self.assertIsNone(restarted.get(upload.upload_id))
+
+    def test_chunked_upload_api(self):
+        """Test the chunked upload endpoints and linking the attachment to a message."""
+        content = b"hello, chunked world"
+        response = self.client.post("/api/attachments/uploads", json={
+            "size": len(content), "filename": "hello.txt", "contentType": "text/plain"
+        })
+        upload_id = response.json()["uploadId"]
+
+        response = self.client.put(
+            f"/api/attachments/uploads/{upload_id}", content=content[:5], headers={"Upload-Offset": "0"}
+        )
+        self.assertEqual(response.json()["offset"], 5)
+
+        response = self.client.put(
+            f"/api/attachments/uploads/{upload_id}", content=content[5:], headers={"Upload-Offset": "0"}
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.headers["upload-offset"], "5")
+
+        self.assertEqual(self.client.post(f"/api/attachments/uploads/{upload_id}/complete").status_code, 409)
+
+        self.client.put(f"/api/attachments/uploads/{upload_id}", content=content[5:], headers={"Upload-Offset": "5"})
+        attachment = self.client.post(f"/api/attachments/uploads/{upload_id}/complete").json()
+        self.assertEqual(attachment["filename"], "hello.txt")
+        self.assertEqual(self.client.get(attachment["url"]).content, content)
+
+        message = ChatService.add_message(
+            agent_id="uploads", role="user", content="See attached", attachment_ids=[attachment["id"]]
+        )
+        self.assertEqual([item["id"] for item in message["attachments"]], [attachment["id"]])
+
+    def test_multipart_upload(self):
+        """Test uploading a file in one multipart request."""
+        content = os.urandom(3 * 1024)
+        response = self.client.post(
+            "/api/attachments",
+            files={"file": ("blob.bin", content, "application/octet-stream")},
+            data={"userId": "user-1"}
+        )
+        attachment = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(attachment["size"], len(content))
+        self.assertEqual(self.client.get(attachment["url"]).content, content)
+
+    def test_claiming_attachment_of_another_user(self):
+        """Test that a message cannot take over another user's attachment by its ID."""
+        def upload(user_id):
+            return self.client.post(
+                "/api/attachments",
+                files={"file": ("private.txt", b"private " + user_id.encode(), "text/plain")},
+                data={"userId": user_id}
+            ).json()
+
+        attachment = upload("owner")
+        stolen = ChatService.add_message(
+            agent_id="uploads", role="user", content="Mine now", user_id="intruder", attachment_ids=[attachment["id"]]
+        )
+        self.assertNotIn("attachments", stolen)
+
+        message = ChatService.add_message(
+            agent_id="uploads", role="user", content="Mine", user_id="owner", attachment_ids=[attachment["id"]]
+        )
+        self.assertEqual([item["id"] for item in message["attachments"]], [attachment["id"]])
+
+        # Once linked, not even its owner can move it to another message
+        again = ChatService.add_message(
+            agent_id="uploads", role="user", content="Again", user_id="owner", attachment_ids=[attachment["id"]]
+        )
+        self.assertNotIn("attachments", again)
+        self.assertEqual(AttachmentRepository.get_attachment(attachment["id"]).message_id, message["id"])
+
+    def test_oversized_upload_rejected(self):
+        """Test that uploads larger than the limit are refused."""
+        response = self.client.post("/api/attachments/uploads", json={
+            "size": settings.ATTACHMENT_UPLOAD_MAX_SIZE + 1, "filename": "huge.bin"
+        })
+        self.assertEqual(response.status_code, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
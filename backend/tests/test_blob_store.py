@@ -0,0 +1,149 @@
+"""
+Test module for the attachment blob store.
+
+This module tests storing attachment contents outside the database with
+content addressing, reference counting and garbage collection, and moving
+existing contents out of the database.
+"""
+
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.models import Attachment, Blob
+from backend.database.blob_store import blob_store, parse_blob_key
+from backend.database.repository import AttachmentRepository, BlobRepository, ConversationRepository, MessageRepository
+from backend.database.service import ChatService, AttachmentService
+from backend.database.writer import database_writer
+from backend.database.migrations.move_attachment_blobs import move_attachment_blobs
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestBlobStore(DatabaseTestCase):
+    """Test the attachment blob store."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the blob store at a scratch directory."""
+        super().setUpClass()
+        cls.blob_root = blob_store.root
+        blob_store.root = os.path.join(cls.temp_dir.name, "blobs")
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the blob store."""
+        blob_store.root = cls.blob_root
+        super().tearDownClass()
+
+    def get_ref_count(self, digest):
+        """Get the reference count of a blob, or None if it has no row."""
+        with database.get_db_session() as session:
+            blob = session.get(Blob, digest)
+            return blob.ref_count if blob else None
+
+    def create_message(self, agent_id):
+        """Create a conversation with one message and return the IDs."""
+        conversation = ConversationRepository.create_conversation(agent_id)
+        message = MessageRepository.create_message(conversation.id, "user", "Here is a file")
+        return conversation.id, message.id
+
+    def test_deduplicated_content(self):
+        """Test that identical uploads share one blob file."""
+        _, message_id = self.create_message("dedupe")
+        first = AttachmentRepository.create_attachment(message_id, "text/plain", filename="a.txt", data=b"same content")
+        second = AttachmentRepository.create_attachment(message_id, "text/plain", filename="b.txt", data=b"same content")
+
+        digest = parse_blob_key(first.storage_path)
+        self.assertEqual(first.storage_path, second.storage_path)
+        self.assertEqual(self.get_ref_count(digest), 2)
+
+        # The content is read from the blob store, not from the database
+        attachment = AttachmentRepository.get_attachment(first.id)
+        self.assertIsNone(attachment.inline_data)
+        self.assertEqual(attachment.data, b"same content")
+
+        # No temporary files are left behind
+        directory = os.path.dirname(blob_store.path(digest))
+        self.assertEqual(os.listdir(directory), [digest])
+
+    def test_garbage_collected_with_last_conversation(self):
+        """Test that deleting conversations deletes the blobs no one else refers to."""
+        conversation_1, message_1 = self.create_message("gc-1")
+        conversation_2, message_2 = self.create_message("gc-2")
+        shared = AttachmentRepository.create_attachment(message_1, "image/png", data=b"shared image")
+        AttachmentRepository.create_attachment(message_2, "image/png", data=b"shared image")
+        own = AttachmentRepository.create_attachment(message_1, "text/plain", data=b"only in the first")
+
+        shared_digest = parse_blob_key(shared.storage_path)
+        own_digest = parse_blob_key(own.storage_path)
+
+        ConversationRepository.delete_conversation(conversation_1)
+        self.assertTrue(blob_store.exists(shared_digest))
+        self.assertEqual(self.get_ref_count(shared_digest), 1)
+        self.assertFalse(blob_store.exists(own_digest))
+        self.assertIsNone(self.get_ref_count(own_digest))
+
+        ConversationRepository.delete_conversation(conversation_2)
+        self.assertFalse(blob_store.exists(shared_digest))
+        self.assertIsNone(self.get_ref_count(shared_digest))
+
+    def test_garbage_collection_rolled_back(self):
+        """Test that blob files are kept when the garbage collection is rolled back."""
+        conversation_id, message_id = self.create_message("gc-rollback")
+        attachment = AttachmentRepository.create_attachment(message_id, "text/plain", data=b"kept on rollback")
+        digest = parse_blob_key(attachment.storage_path)
+        database_writer.execute(lambda session: BlobRepository.release(session.connection(), digest))
+
+        def collect_and_fail(session):
+            BlobRepository.collect_garbage()
+            raise ValueError("Rolled back")
+
+        with self.assertRaises(ValueError):
+            database_writer.execute(collect_and_fail)
+        self.assertTrue(blob_store.exists(digest))
+        self.assertEqual(self.get_ref_count(digest), 0)
+
+        self.assertEqual(BlobRepository.collect_garbage(), 1)
+        self.assertFalse(blob_store.exists(digest))
+
+    def test_message_serialization(self):
+        """Test that messages list blob-stored attachments by URL and inline them on request."""
+        message = ChatService.add_message(agent_id="serialize", role="user", content="Look")
+        created = AttachmentRepository.create_attachment(message["id"], "image/png", filename="a.png", data=b"\x89PNG")
+
+        attachment = ChatService.get_conversation_messages("serialize")[0]["attachments"][0]
+        self.assertNotIn("data", attachment)
+        self.assertEqual(attachment["url"], f"/api/attachments/{created.id}")
+
+        attachment = AttachmentService.get_attachment(created.id, include_data=True)
+        self.assertEqual(attachment["data"], "iVBORw==")
+
+    def test_migration_moves_inline_contents(self):
+        """Test that the migration moves inline contents to the blob store in batches."""
+        _, message_id = self.create_message("migrate")
+        with database.get_db_session() as session:
+            for i in range(5):
+                session.add(Attachment(message_id=message_id, type="text/plain", data=f"legacy {i % 2}".encode()))
+
+        self.assertEqual(move_attachment_blobs(batch_size=2), 5)
+
+        with database.get_db_session() as session:
+            attachments = session.query(Attachment).filter(Attachment.message_id == message_id).all()
+            self.assertTrue(all(attachment.inline_data is None for attachment in attachments))
+            self.assertEqual(
+                sorted(attachment.data for attachment in attachments),
+                [b"legacy 0"] * 3 + [b"legacy 1"] * 2
+            )
+            digests = {parse_blob_key(attachment.storage_path) for attachment in attachments}
+
+        self.assertEqual(sorted(self.get_ref_count(digest) for digest in digests), [2, 3])
+        self.assertEqual(move_attachment_blobs(batch_size=2), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Test module for the unit of work of a chat turn.
+
+This module tests that adding a message resolves the conversation, inserts
+the message, links its attachments, adds logs and serializes the message in
+a single transaction.
+"""
+
+import unittest
+import sys
+import os
+from datetime import datetime
+
+from sqlalchemy import event
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.repository import AttachmentRepository
+from backend.database.service import ChatService
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestChatTurn(DatabaseTestCase):
+    """Test the unit of work of a chat turn."""
+
+    def count_commits(self, func):
+        """Run a function and count the transactions committed on either engine."""
+        commits = []
+
+        def on_commit(connection):
+            commits.append(connection)
+
+        engines = (database.get_engine(), database.get_writer_engine())
+        for engine in engines:
+            event.listen(engine, "commit", on_commit)
+        try:
+            result = func()
+        finally:
+            for engine in engines:
+                event.remove(engine, "commit", on_commit)
+
+        return result, len(commits)
+
+    def test_user_turn_is_one_transaction(self):
+        """Test that a user message with attachments and a log is written in one transaction."""
+        attachment = AttachmentRepository.create_attachment(
+            message_id="upl-notes", attachment_type="file", filename="notes.txt",
+            content_type="text/plain", size=5, storage_path="/tmp/notes.txt", user_id="user-1"
+        )
+
+        message, commits = self.count_commits(lambda: ChatService.add_message(
+            agent_id="turns",
+            role="user",
+            content="Hello",
+            status="sent",
+            message_id="user-message",
+            user_id="user-1",
+            attachment_ids=[attachment.id],
+            logs=[("agent-message", "Starting processing", datetime.utcnow())]
+        ))
+
+        self.assertEqual(commits, 1)
+        self.assertEqual(message["id"], "user-message")
+        self.assertEqual(message["agentId"], "turns")
+        self.assertEqual(message["userId"], "user-1")
+        self.assertEqual([item["filename"] for item in message["attachments"]], ["notes.txt"])
+        self.assertNotIn("logs", message)
+
+        # The message is in the active conversation and the log waits for the reply
+        self.assertEqual(ChatService.get_conversation_messages("turns", "user-1"), [message])
+
+        reply, commits = self.count_commits(lambda: ChatService.add_message(
+            agent_id="turns", role="assistant", content="Hi", message_id="agent-message", user_id="user-1"
+        ))
+        self.assertEqual(commits, 1)
+        self.assertEqual(reply["logs"], ["Starting processing"])
+
+    def test_matches_message_serialization(self):
+        """Test that the returned message matches the message listing."""
+        message = ChatService.add_message(agent_id="listing", role="user", content="First")
+        reply = ChatService.add_message(agent_id="listing", role="assistant", content="Second", status="sent")
+
+        self.assertEqual(ChatService.get_conversation_messages("listing"), [message, reply])
+
+
+if __name__ == "__main__":
+    unittest.main()
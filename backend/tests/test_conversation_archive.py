@@ -0,0 +1,308 @@
+"""
+Test module for the conversation archive.
+
+This module tests moving inactive conversations to compressed archive files
+and back: stubs keep their summaries, messages, logs and attachments are
+restored when the conversation is read, policies pick the conversations per
+agent and user, archive files are compacted, and the freed pages are returned
+with incremental vacuuming.
+"""
+
+import unittest
+import sys
+import os
+import threading
+import zipfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules and the archiver
+from backend.app.conversation_archiver import ConversationArchiver, parse_archive_policies
+from backend.database import database
+from backend.database.archive import conversation_archive, incremental_vacuum
+from backend.database.migrations.runner import enable_incremental_vacuum, run_migrations
+from backend.database.models import Attachment, Base, Blob, Conversation, Message
+from backend.database.blob_store import blob_store
+from backend.database.purge import purge_user_conversations
+from backend.database.repository import AttachmentRepository, ConversationRepository, MessageRepository
+from backend.database.search import search_messages
+from backend.database.service import ChatService
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestConversationArchive(DatabaseTestCase):
+    """Test archiving and restoring conversations."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the blob store and the archive at scratch directories."""
+        super().setUpClass()
+        cls.blob_root = blob_store.root
+        blob_store.root = os.path.join(cls.temp_dir.name, "blobs")
+        cls.archive_root = conversation_archive.root
+        conversation_archive.root = os.path.join(cls.temp_dir.name, "archives")
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the blob store and archive."""
+        blob_store.root = cls.blob_root
+        conversation_archive.root = cls.archive_root
+        super().tearDownClass()
+
+    def create_conversation(self, agent_id, user_id, messages=3):
+        """Create a conversation with messages and logs."""
+        conversation = ConversationRepository.create_conversation(agent_id, f"Chat with {agent_id}", user_id=user_id)
+        for turn in range(messages):
+            message = MessageRepository.create_message(
+                conversation.id, "user", f"Archivable message {turn} for {agent_id}", user_id=user_id
+            )
+            MessageRepository.add_log_to_message(message.id, f"Log {turn}")
+        return conversation.id, message.id
+
+    def later(self, days):
+        """The UTC time a number of days from now."""
+        return datetime.utcnow() + timedelta(days=days)
+
+    def test_archive_and_restore(self):
+        """Test that an archived conversation keeps its summary and is restored when read."""
+        conversation_id, message_id = self.create_conversation("archive-agent", "archive-user")
+        blob_content = os.urandom(5000)
+        AttachmentRepository.create_attachment(message_id, "image/png", filename="photo.png", data=blob_content)
+        inline_content = os.urandom(300000)
+        with database.get_db_session() as session:
+            session.add(Attachment(message_id=message_id, type="text/plain", filename="notes.txt", inline_data=inline_content))
+            session.commit()
+
+        before = ChatService.get_conversation_with_messages(conversation_id)
+        with database.get_db_session() as session:
+            attachment_ids = {attachment.filename: attachment.id for attachment in session.query(Attachment).all()}
+        archiver = ConversationArchiver(agent_days={"archive-agent": 30}, pause=0)
+
+        # Conversations are archived only once untouched for long enough
+        self.assertEqual(archiver.run_once(self.later(29))["archived"], 0)
+        result = archiver.run_once(self.later(31))
+        self.assertEqual(result["archived"], 1)
+        self.assertGreater(result["vacuumed_pages"], 0)
+
+        # The stub keeps its summary while the rows are gone
+        stub = ChatService.get_conversation_history("archive-agent", "archive-user")[0]
+        self.assertIsNotNone(stub["archivedAt"])
+        self.assertEqual(stub["messageCount"], 3)
+        self.assertEqual(stub["lastMessagePreview"], before["lastMessagePreview"])
+        self.assertEqual(stub["updatedAt"], before["updatedAt"])
+        with database.get_db_session() as session:
+            self.assertEqual(session.query(Message).filter(Message.conversation_id == conversation_id).count(), 0)
+            self.assertEqual(session.query(Attachment).count(), 0)
+            self.assertEqual(session.query(Blob).count(), 0)
+        self.assertEqual(search_messages("archivable", user_id="archive-user")[0], [])
+
+        paths = conversation_archive.user_files("archive-user")
+        self.assertEqual([os.path.basename(path) for path in paths], [f"{datetime.utcnow():%Y-%m}.zip"])
+        with zipfile.ZipFile(paths[0]) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+
+        # Reading the conversation restores it
+        after = ChatService.get_conversation_with_messages(conversation_id)
+        self.assertIsNone(after["archivedAt"])
+        self.assertEqual(after["updatedAt"], before["updatedAt"])
+        self.assertEqual(
+            [(m["id"], m["content"], m["timestamp"], m["logs"]) for m in after["messages"]],
+            [(m["id"], m["content"], m["timestamp"], m["logs"]) for m in before["messages"]]
+        )
+        with database.get_db_session() as session:
+            contents = {attachment.filename: attachment.data for attachment in session.query(Attachment).all()}
+            restored_ids = {attachment.filename: attachment.id for attachment in session.query(Attachment).all()}
+            self.assertEqual([blob.ref_count for blob in session.query(Blob).all()], [1])
+        self.assertEqual(contents, {"photo.png": blob_content, "notes.txt": inline_content})
+        self.assertEqual(restored_ids, attachment_ids)
+        self.assertEqual(len(search_messages("archivable", user_id="archive-user")[0]), 3)
+
+        # The emptied archive file is deleted
+        self.assertEqual(conversation_archive.user_files("archive-user"), [])
+
+    def test_add_message_restores(self):
+        """Test that adding a message to an archived conversation restores it first."""
+        conversation_id, _ = self.create_conversation("reply-agent", "reply-user", messages=2)
+        archiver = ConversationArchiver(agent_days={"reply-agent": 1}, pause=0)
+        self.assertEqual(archiver.run_once(self.later(2))["archived"], 1)
+
+        message = ChatService.add_message("reply-agent", "user", "Back again", user_id="reply-user")
+        conversation = ConversationRepository.get_conversation(conversation_id)
+        self.assertIsNone(conversation.archived_at)
+        self.assertIsNone(conversation.archive_path)
+
+        messages = ChatService.get_conversation_with_messages(conversation_id)["messages"]
+        self.assertEqual(
+            [m["content"] for m in messages],
+            ["Archivable message 0 for reply-agent", "Archivable message 1 for reply-agent", "Back again"]
+        )
+        self.assertEqual(messages[-1]["id"], message["id"])
+
+    def test_add_message_unrestorable(self):
+        """Test that adding a message fails if the archived conversation cannot be restored."""
+        conversation_id, _ = self.create_conversation("broken-agent", "broken-user", messages=1)
+        with database.get_db_session() as session:
+            session.query(Conversation).filter(Conversation.id == conversation_id).update(
+                {"archived_at": datetime.utcnow(), "archive_path": None}
+            )
+            session.commit()
+
+        with self.assertRaises(RuntimeError):
+            ChatService.add_message("broken-agent", "user", "Hello?", user_id="broken-user")
+
+    def test_policies(self):
+        """Test that user policies override agent policies, which override the default."""
+        research, _ = self.create_conversation("policy-research", "policy-user", messages=1)
+        other, _ = self.create_conversation("policy-other", "policy-user", messages=1)
+        kept, _ = self.create_conversation("policy-research", "policy-keep", messages=1)
+
+        agent_days, user_days = parse_archive_policies(
+            '{"agents": {"policy-research": 10}, "users": {"policy-keep": 0}}'
+        )
+        archiver = ConversationArchiver(after_days=30, agent_days=agent_days, user_days=user_days, pause=0)
+
+        def archived():
+            return {
+                conversation_id
+                for conversation_id in (research, other, kept)
+                if ConversationRepository.get_conversation(conversation_id).archived_at is not None
+            }
+
+        archiver.run_once(self.later(11))
+        self.assertEqual(archived(), {research})
+        archiver.run_once(self.later(365))
+        self.assertEqual(archived(), {research, other})
+
+        with self.assertRaises(ValueError):
+            parse_archive_policies('{"agents": {"policy-research": "soon"}}')
+
+    def test_disabled(self):
+        """Test that without a policy the archiver neither compacts nor vacuums."""
+        self.create_conversation("disabled-agent", "disabled-user", messages=1)
+        archiver = ConversationArchiver(pause=0)
+
+        with patch.object(conversation_archive, "compact") as compact, \
+                patch("backend.app.conversation_archiver.incremental_vacuum") as vacuum:
+            result = archiver.run_once(self.later(365))
+
+        self.assertEqual(result, {"archived": 0, "compacted_files": 0, "vacuumed_pages": 0})
+        compact.assert_not_called()
+        vacuum.assert_not_called()
+
+    def test_delete_archived(self):
+        """Test that deleting or purging archived conversations deletes their archive entries."""
+        first, _ = self.create_conversation("delete-agent", "delete-user", messages=2)
+        second, _ = self.create_conversation("delete-agent", "delete-user", messages=2)
+        archiver = ConversationArchiver(agent_days={"delete-agent": 1}, pause=0)
+        self.assertEqual(archiver.run_once(self.later(2))["archived"], 2)
+
+        def archived_ids():
+            paths = conversation_archive.user_files("delete-user")
+            self.assertEqual(len(paths), 1)
+            with zipfile.ZipFile(paths[0]) as zip_file:
+                return {name.split("-", 1)[0] for name in zip_file.namelist()}
+
+        # Both conversations share an archive file; deleting one leaves its
+        # entry until the file is compacted, which keeps the other
+        self.assertTrue(ChatService.delete_conversation(first))
+        self.assertEqual(archived_ids(), {str(first), str(second)})
+        self.assertEqual(archiver.run_once(self.later(2))["compacted_files"], 1)
+        self.assertEqual(archived_ids(), {str(second)})
+        self.assertEqual(conversation_archive.compact("delete-user"), 0)
+
+        progress = purge_user_conversations("delete-user", pause=0)
+        self.assertEqual(progress.conversations, 1)
+        self.assertEqual(conversation_archive.user_files("delete-user"), [])
+
+    def test_locks_per_file(self):
+        """Test that restoring waits only for the archive file of the conversation."""
+        first, _ = self.create_conversation("lock-agent", "lock-first", messages=1)
+        second, _ = self.create_conversation("lock-agent", "lock-second", messages=1)
+        archiver = ConversationArchiver(agent_days={"lock-agent": 1}, pause=0)
+        self.assertEqual(archiver.run_once(self.later(2))["archived"], 2)
+
+        # Another thread holds the file of the first user, e.g. while archiving to it
+        file_name = ConversationRepository.get_conversation(first).archive_path.split("#")[0]
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with conversation_archive.lock(file_name):
+                held.set()
+                release.wait(10)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        try:
+            held.wait(10)
+            restorer = threading.Thread(target=ChatService.get_conversation_with_messages, args=(second,))
+            restorer.start()
+            restorer.join(5)
+            self.assertFalse(restorer.is_alive())
+            self.assertIsNone(ConversationRepository.get_conversation(second).archived_at)
+        finally:
+            release.set()
+            thread.join()
+
+    def test_restore_with_taken_id(self):
+        """Test that a restored attachment whose ID was reused since the archival gets a new one."""
+        conversation_id, message_id = self.create_conversation("reuse-agent", "reuse-user", messages=1)
+        attachment = AttachmentRepository.create_attachment(message_id, "text/plain", filename="old.txt", data=b"old")
+        archiver = ConversationArchiver(agent_days={"reuse-agent": 1}, pause=0)
+        self.assertEqual(archiver.run_once(self.later(2))["archived"], 1)
+
+        # SQLite hands out the highest free ID again
+        _, other_message_id = self.create_conversation("reuse-other", "reuse-user", messages=1)
+        with database.get_db_session() as session:
+            session.add(Attachment(
+                id=attachment.id, message_id=other_message_id, type="text/plain", filename="new.txt", inline_data=b"new"
+            ))
+            session.commit()
+
+        ChatService.get_conversation_with_messages(conversation_id)
+        with database.get_db_session() as session:
+            rows = session.query(Attachment).filter(Attachment.filename.in_(["old.txt", "new.txt"])).all()
+            ids = {row.filename: row.id for row in rows}
+        self.assertEqual(ids["new.txt"], attachment.id)
+        self.assertNotEqual(ids["old.txt"], attachment.id)
+
+    def test_incremental_vacuum_enabled(self):
+        """Test that new databases are created with incremental vacuuming."""
+        with database.get_db_session() as session:
+            self.assertEqual(session.execute(text("PRAGMA auto_vacuum")).scalar(), 2)
+
+    def test_enable_incremental_vacuum(self):
+        """Test that existing databases are switched by hand, not by the migrations."""
+        engine = create_engine(f"sqlite:///{os.path.join(self.temp_dir.name, 'existing.db')}")
+        try:
+            Base.metadata.create_all(engine)
+            run_migrations(engine)
+
+            def auto_vacuum():
+                with engine.connect() as connection:
+                    return connection.execute(text("PRAGMA auto_vacuum")).scalar()
+
+            self.assertEqual(auto_vacuum(), 0)
+
+            # Vacuuming does nothing until the database is switched
+            with Session(engine) as session:
+                session.execute(text("CREATE TABLE filler (data BLOB)"))
+                session.execute(text("INSERT INTO filler VALUES (zeroblob(100000))"))
+                session.execute(text("DROP TABLE filler"))
+                self.assertGreater(session.execute(text("PRAGMA freelist_count")).scalar(), 0)
+                self.assertEqual(incremental_vacuum(session, 1000), 0)
+
+            self.assertTrue(enable_incremental_vacuum(engine))
+            self.assertEqual(auto_vacuum(), 2)
+            self.assertFalse(enable_incremental_vacuum(engine))
+        finally:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Test module for conversation summaries.
+
+This module tests that the message count and the last message stored with
+each conversation follow the messages as they are inserted, edited and
+deleted, and the summary listing used for conversation lists.
+"""
+
+import unittest
+import sys
+import os
+
+from sqlalchemy import text
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.models import Conversation, Message, CONVERSATION_PREVIEW_LENGTH
+from backend.database.repository import ConversationRepository, MessageRepository
+from backend.database.service import ChatService
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestConversationSummaries(DatabaseTestCase):
+    """Test the denormalized conversation summaries."""
+
+    def summary(self, conversation_id):
+        """Get the stored summary of a conversation."""
+        conversation = ConversationRepository.get_conversation(conversation_id)
+        return conversation.message_count, conversation.last_message_at, conversation.last_message_preview
+
+    def test_summary_follows_inserts(self):
+        """Test that inserted messages are counted and the latest one is kept."""
+        conversation = ConversationRepository.create_conversation("summaries-insert")
+        self.assertEqual(self.summary(conversation.id), (0, None, None))
+
+        MessageRepository.create_message(conversation.id, "user", "First", timestamp=1000)
+        MessageRepository.create_message(conversation.id, "assistant", "x" * 500, timestamp=3000)
+        # A message with an older timestamp does not replace the last message
+        MessageRepository.create_message(conversation.id, "user", "Late", timestamp=2000)
+
+        self.assertEqual(self.summary(conversation.id), (3, 3000, "x" * CONVERSATION_PREVIEW_LENGTH))
+
+        # Inserting the message of a chat turn updates the summary in the same transaction
+        message = ChatService.add_message("summaries-turn", "user", "Hello", timestamp=4000)
+        result = ChatService.get_conversation_history("summaries-turn")
+        self.assertEqual(result[0]["messageCount"], 1)
+        self.assertEqual(result[0]["lastMessageAt"], message["timestamp"])
+        self.assertEqual(result[0]["lastMessagePreview"], "Hello")
+
+    def test_summary_follows_edits_and_deletes(self):
+        """Test that editing or deleting messages recomputes the summary."""
+        conversation = ConversationRepository.create_conversation("summaries-delete")
+        first = MessageRepository.create_message(conversation.id, "user", "First", timestamp=1000)
+        last = MessageRepository.create_message(conversation.id, "assistant", "Second", timestamp=2000)
+
+        with database.get_db_session() as session:
+            session.get(Message, last.id).content = "Edited"
+        self.assertEqual(self.summary(conversation.id), (2, 2000, "Edited"))
+
+        with database.get_db_session() as session:
+            session.delete(session.get(Message, last.id))
+        self.assertEqual(self.summary(conversation.id), (1, 1000, "First"))
+
+        with database.get_db_session() as session:
+            session.delete(session.get(Message, first.id))
+        self.assertEqual(self.summary(conversation.id), (0, None, None))
+
+        # Deleting a conversation cascades through its messages
+        MessageRepository.create_message(conversation.id, "user", "Again", timestamp=3000)
+        self.assertTrue(ConversationRepository.delete_conversation(conversation.id))
+        self.assertIsNone(ConversationRepository.get_conversation(conversation.id))
+
+    def test_refresh_summaries(self):
+        """Test recomputing summaries after rows were changed without the ORM."""
+        conversation = ConversationRepository.create_conversation("summaries-refresh")
+        MessageRepository.create_message(conversation.id, "user", "Kept", timestamp=1000)
+
+        with database.get_engine().begin() as connection:
+            connection.execute(
+                text("UPDATE conversations SET message_count = 0, last_message_at = NULL WHERE id = :id"),
+                {"id": conversation.id}
+            )
+            ConversationRepository.refresh_summaries(connection, [conversation.id])
+
+        self.assertEqual(self.summary(conversation.id), (1, 1000, "Kept"))
+
+    def test_summaries_page(self):
+        """Test listing conversation summaries newest first without messages."""
+        for index in range(3):
+            conversation = ConversationRepository.create_conversation("summaries-page", user_id="user-1")
+            MessageRepository.create_message(conversation.id, "user", f"Message {index}")
+        ConversationRepository.create_conversation("summaries-page", user_id="user-2")
+
+        page = ChatService.get_conversation_summaries_page("summaries-page", "user-1", limit=2)
+        self.assertTrue(page["hasMore"])
+        self.assertEqual([item["lastMessagePreview"] for item in page["conversations"]], ["Message 2", "Message 1"])
+        self.assertNotIn("messages", page["conversations"][0])
+        self.assertEqual(page["conversations"][0]["messageCount"], 1)
+
+        page = ChatService.get_conversation_summaries_page(
+            "summaries-page", "user-1", limit=2, before=page["beforeCursor"]
+        )
+        self.assertFalse(page["hasMore"])
+        self.assertEqual([item["lastMessagePreview"] for item in page["conversations"]], ["Message 0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
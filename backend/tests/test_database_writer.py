@@ -0,0 +1,151 @@
+"""
+Test module for the single database writer.
+
+This module tests that concurrent writes are committed in groups through the
+writer connection, that a failing write does not affect the others in its
+group, and that the SQLite PRAGMAs are applied to new connections.
+"""
+
+import unittest
+import sys
+import os
+import threading
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.app.config import settings
+from backend.database import database
+from backend.database.models import Message
+from backend.database.repository import AgentRepository, ConversationRepository, MessageRepository, UserPreferenceRepository
+from backend.database.writer import DatabaseWriter, database_writer
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestDatabaseWriter(DatabaseTestCase):
+    """Test the single database writer."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a conversation."""
+        super().setUpClass()
+        cls.conversation = ConversationRepository.create_conversation("writer", user_id="user-1")
+
+    def setUp(self):
+        """Create a writer that collects writes for long enough to group them."""
+        self.writer = DatabaseWriter(max_batch=50, max_latency=0.05)
+
+    def tearDown(self):
+        """Stop the writer thread."""
+        self.writer.shutdown()
+
+    def test_group_commit(self):
+        """Test that concurrent writes are committed in fewer transactions."""
+        def write(i):
+            return lambda session: session.add(Message(
+                id=f"group-{i}", conversation_id=self.conversation.id, role="user", content=f"Message {i}", timestamp=i
+            ))
+
+        threads = [threading.Thread(target=self.writer.execute, args=(write(i),)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with database.get_db_session() as session:
+            count = session.query(Message).filter(Message.id.like("group-%")).count()
+
+        stats = self.writer.get_stats()
+        self.assertEqual(count, 20)
+        self.assertEqual(stats["writes"], 20)
+        self.assertLess(stats["batches"], 20)
+        self.assertEqual(stats["failed"], 0)
+
+    def test_failing_write_is_isolated(self):
+        """Test that a failing write is rolled back without the rest of its group."""
+        def insert(message_id):
+            return lambda session: session.add(Message(
+                id=message_id, conversation_id=self.conversation.id, role="user", content="Hello", timestamp=1
+            ))
+
+        def fail(session):
+            insert("isolated-bad")(session)
+            raise ValueError("bad write")
+
+        futures = [
+            self.writer.submit(insert("isolated-1")),
+            self.writer.submit(fail),
+            self.writer.submit(insert("isolated-2"))
+        ]
+
+        self.assertIsNone(futures[0].result(5))
+        with self.assertRaises(ValueError):
+            futures[1].result(5)
+        self.assertIsNone(futures[2].result(5))
+
+        with database.get_db_session() as session:
+            ids = {message.id for message in session.query(Message).filter(Message.id.like("isolated-%"))}
+        self.assertEqual(ids, {"isolated-1", "isolated-2"})
+
+    def test_repository_writes(self):
+        """Test that repository writes return detached, loaded objects."""
+        message = MessageRepository.create_message(self.conversation.id, "assistant", "Hi there")
+
+        self.assertEqual(message.user_id, "user-1")
+        self.assertEqual(message.role, "assistant")
+        self.assertEqual(MessageRepository.get_message(message.id).content, "Hi there")
+
+        # The same write works without the writer thread
+        database_writer.enabled = False
+        try:
+            message = MessageRepository.create_message(self.conversation.id, "user", "Direct")
+        finally:
+            database_writer.enabled = True
+        self.assertEqual(message.user_id, "user-1")
+
+    def test_updates_and_deletes_use_the_writer(self):
+        """Test that updates and deletes of conversations, agents and preferences go through the writer."""
+        with patch.object(database_writer, "submit", wraps=database_writer.submit) as submit:
+            conversation = ConversationRepository.create_conversation("writer", user_id="user-2")
+            self.assertEqual(ConversationRepository.update_conversation_title(conversation.id, "Renamed").title, "Renamed")
+            self.assertFalse(ConversationRepository.deactivate_conversation(conversation.id).is_active)
+            self.assertTrue(ConversationRepository.activate_conversation(conversation.id, "writer", "user-2").is_active)
+            self.assertTrue(ConversationRepository.delete_conversation(conversation.id))
+            self.assertIsNone(ConversationRepository.get_conversation(conversation.id))
+
+            agent = AgentRepository.create_agent("writer-agent", "Utility", "Writes", "Prompt")
+            self.assertEqual(AgentRepository.update_agent(agent.id, description="Edited").description, "Edited")
+            self.assertTrue(AgentRepository.delete_agent(agent.id))
+
+            preference = UserPreferenceRepository.create_user_preference("user-2")
+            self.assertEqual(UserPreferenceRepository.update_user_preference("user-2", theme="dark").theme, "dark")
+            self.assertTrue(UserPreferenceRepository.delete_user_preference(preference.user_id))
+
+        self.assertEqual(submit.call_count, 11)
+
+    def test_shutdown_refuses_writes(self):
+        """Test that a writer refuses writes after shutdown instead of restarting."""
+        self.assertEqual(self.writer.execute(lambda session: 1), 1)
+        self.writer.shutdown()
+
+        with self.assertRaises(RuntimeError):
+            self.writer.submit(lambda session: None)
+        self.assertIsNone(self.writer._thread)
+
+        self.writer.start()
+        self.assertEqual(self.writer.execute(lambda session: 42), 42)
+
+    def test_sqlite_pragmas(self):
+        """Test that new connections use WAL and the configured busy timeout."""
+        for engine in (database.get_engine(), database.get_writer_engine()):
+            with engine.connect() as connection:
+                self.assertEqual(connection.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+                self.assertEqual(connection.execute(text("PRAGMA busy_timeout")).scalar(), settings.SQLITE_BUSY_TIMEOUT)
+
+
+if __name__ == "__main__":
+    unittest.main()
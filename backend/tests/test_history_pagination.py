@@ -0,0 +1,121 @@
+"""
+Test module for keyset-paginated message and conversation history.
+
+This module tests walking the message and conversation history with
+before/after cursors, and that the pages are served by the composite indexes.
+"""
+
+import unittest
+import sys
+import os
+import datetime
+
+from sqlalchemy import text
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.models import Conversation
+from backend.database.service import ChatService
+from backend.benchmarks.message_serializer import seed_conversation
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestHistoryPagination(DatabaseTestCase):
+    """Test keyset pagination of the chat history."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Seed the history."""
+        super().setUpClass()
+
+        # The seeded conversation is the active conversation for the agent
+        cls.conversation_id = seed_conversation(23)
+
+        # Add conversations sharing an updated_at to exercise the ID tie-breaker
+        with database.get_db_session() as session:
+            updated_at = datetime.datetime(2024, 1, 1)
+            for i in range(6):
+                session.add(Conversation(
+                    agent_id="benchmark",
+                    title=f"Old {i}",
+                    is_active=False,
+                    created_at=updated_at,
+                    updated_at=updated_at
+                ))
+
+    def test_latest_page(self):
+        """Test that the first page holds the most recent messages in order."""
+        page = ChatService.get_conversation_messages_page("benchmark", limit=5)
+
+        contents = [message["content"] for message in page["messages"]]
+        self.assertEqual(contents, [f"Message {i}" for i in range(18, 23)])
+        self.assertTrue(page["hasMore"])
+
+    def test_scroll_back_and_forward(self):
+        """Test walking the whole history back with before and forward with after."""
+        everything = ChatService.get_conversation_messages("benchmark")
+
+        collected = []
+        page = ChatService.get_conversation_messages_page("benchmark", limit=5)
+        while True:
+            collected = page["messages"] + collected
+            if not page["hasMore"]:
+                break
+            page = ChatService.get_conversation_messages_page("benchmark", limit=5, before=page["beforeCursor"])
+
+        self.assertEqual(collected, everything)
+
+        # Walk forward again from the oldest page
+        forward = list(page["messages"])
+        while True:
+            page = ChatService.get_conversation_messages_page("benchmark", limit=5, after=page["afterCursor"])
+            forward += page["messages"]
+            if not page["hasMore"]:
+                break
+
+        self.assertEqual(forward, everything)
+
+    def test_conversation_pages(self):
+        """Test paging through conversations newest first."""
+        everything = ChatService.get_conversation_history("benchmark")
+        ids = []
+
+        page = ChatService.get_conversation_history_page("benchmark", limit=2)
+        ids += [conversation["id"] for conversation in page["conversations"]]
+        while page["hasMore"]:
+            page = ChatService.get_conversation_history_page("benchmark", limit=2, before=page["beforeCursor"])
+            ids += [conversation["id"] for conversation in page["conversations"]]
+
+        self.assertEqual(len(ids), len(everything))
+        self.assertEqual(len(set(ids)), len(ids))
+
+        # Newer conversations are reachable from the last page with after
+        newer = ChatService.get_conversation_history_page("benchmark", limit=2, after=page["afterCursor"])
+        self.assertEqual([conversation["id"] for conversation in newer["conversations"]], ids[-3:-1])
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        with self.assertRaises(ValueError):
+            ChatService.get_conversation_messages_page("benchmark", before="not-a-cursor")
+
+    def test_pages_use_indexes(self):
+        """Test that the page queries are served by the composite indexes."""
+        with database.get_engine().connect() as connection:
+            plan = connection.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM messages WHERE conversation_id = 1 "
+                "AND (timestamp < 5 OR (timestamp = 5 AND id < 'x')) ORDER BY timestamp DESC, id DESC LIMIT 51"
+            )).fetchall()
+            self.assertIn("ix_messages_conversation_timestamp_id", " ".join(str(row) for row in plan))
+
+            plan = connection.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM conversations WHERE agent_id = 'a' "
+                "ORDER BY updated_at DESC, id DESC LIMIT 51"
+            )).fetchall()
+            self.assertIn("ix_conversations_agent_updated_id", " ".join(str(row) for row in plan))
+
+
+if __name__ == "__main__":
+    unittest.main()
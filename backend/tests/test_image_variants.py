@@ -0,0 +1,103 @@
+"""
+Test module for image attachment variants.
+
+This module tests generating downscaled, recompressed variants of uploaded
+images, storing them next to the original blob and serving them to the
+attachment service.
+"""
+
+import unittest
+import sys
+import os
+import io
+import base64
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.app.config import settings
+from backend.database.blob_store import blob_store, parse_blob_key
+from backend.database.image_variants import Image, find_variant, ensure_variant
+from backend.database.repository import AttachmentRepository, ConversationRepository, MessageRepository
+from backend.database.service import AttachmentService
+from backend.tests.database_case import DatabaseTestCase
+
+
+def make_image(size, mode="RGB"):
+    """Encode a solid image of the given size as PNG."""
+    output = io.BytesIO()
+    Image.new(mode, size, "red").save(output, format="PNG")
+    return output.getvalue()
+
+
+@unittest.skipIf(Image is None, "Pillow is not installed")
+class TestImageVariants(DatabaseTestCase):
+    """Test the image variant pipeline."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the blob store at a scratch directory."""
+        super().setUpClass()
+        cls.blob_root = blob_store.root
+        blob_store.root = os.path.join(cls.temp_dir.name, "blobs")
+
+        conversation = ConversationRepository.create_conversation("variants")
+        cls.message_id = MessageRepository.create_message(conversation.id, "user", "Photos").id
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the blob store."""
+        blob_store.root = cls.blob_root
+        super().tearDownClass()
+
+    def test_variants_generated_on_upload(self):
+        """Test that uploading an image stores size-capped variants next to it."""
+        attachment = AttachmentRepository.create_attachment(
+            self.message_id, "image/png", filename="large.png", data=make_image((3000, 1500))
+        )
+        digest = parse_blob_key(attachment.storage_path)
+
+        for name, max_size in (("llm", settings.IMAGE_VARIANT_LLM_MAX_SIZE),
+                               ("thumbnail", settings.IMAGE_VARIANT_THUMBNAIL_MAX_SIZE)):
+            path, content_type = find_variant(digest, name)
+            self.assertEqual(content_type, "image/jpeg")
+            self.assertEqual(os.path.dirname(path), os.path.dirname(blob_store.path(digest)))
+            with Image.open(path) as image:
+                self.assertEqual(image.size, (max_size, max_size // 2))
+
+        # Deleting the blob deletes its variants
+        blob_store.delete(digest)
+        self.assertIsNone(find_variant(digest, "llm"))
+        self.assertIsNone(find_variant(digest, "thumbnail"))
+
+    def test_transparent_image_kept_as_png(self):
+        """Test that images with transparency are not flattened to JPEG."""
+        digest = blob_store.put(make_image((64, 64), mode="RGBA"))
+        path, content_type = ensure_variant(digest, "thumbnail")
+        self.assertEqual(content_type, "image/png")
+        self.assertTrue(path.endswith(".thumbnail.png"))
+
+    def test_undecodable_image(self):
+        """Test that content Pillow cannot decode has no variants."""
+        digest = blob_store.put(b"not really an image")
+        self.assertIsNone(ensure_variant(digest, "llm"))
+
+    def test_service_returns_llm_variant(self):
+        """Test that the attachment service inlines the variant with its type."""
+        attachment = AttachmentRepository.create_attachment(
+            self.message_id, "image/png", filename="photo.png", data=make_image((2048, 2048))
+        )
+
+        result = AttachmentService.get_attachment(attachment.id, include_data=True, variant="llm")
+        self.assertEqual(result["dataType"], "image/jpeg")
+        with Image.open(io.BytesIO(base64.b64decode(result["data"]))) as image:
+            self.assertEqual(image.size, (settings.IMAGE_VARIANT_LLM_MAX_SIZE, settings.IMAGE_VARIANT_LLM_MAX_SIZE))
+
+        result = AttachmentService.get_attachment(attachment.id)
+        self.assertEqual(result["thumbnailUrl"], f"/api/attachments/{attachment.id}?variant=thumbnail")
+        self.assertNotIn("data", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Test module for the log pipeline.
+
+This module tests buffering, group commits, coalesced log frames and the
+drain barrier of the log pipeline.
+"""
+
+import unittest
+import sys
+import os
+import asyncio
+import logging
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the log pipeline and the database modules
+from backend.app.log_pipeline import LogPipeline, LogRouter
+from backend.app.agent_executor import AgentExecutor
+from backend.database import database
+from backend.database.repository import MessageRepository
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestLogPipeline(DatabaseTestCase):
+    """Test the log pipeline functionality."""
+
+    def setUp(self):
+        """Set up the test case."""
+        self.pipeline = LogPipeline(max_buffer=1000, batch_size=50, flush_interval=0.05)
+
+    def tearDown(self):
+        """Clean up after the test case."""
+        self.pipeline.shutdown()
+
+    def test_group_commit(self):
+        """Test that many records are written with a few commits."""
+        commits = []
+
+        def on_commit(connection):
+            commits.append(connection)
+
+        event.listen(database.get_engine(), "commit", on_commit)
+        try:
+            for i in range(120):
+                self.pipeline.submit("message-group", f"log {i}")
+            self.assertTrue(self.pipeline.flush(timeout=5))
+        finally:
+            event.remove(database.get_engine(), "commit", on_commit)
+
+        logs = MessageRepository.get_logs_for_message("message-group")
+        self.assertEqual([log.log_entry for log in logs], [f"log {i}" for i in range(120)])
+        self.assertLessEqual(len(commits), 5)
+
+    def test_coalesced_frames_and_drain(self):
+        """Test that logs are sent as coalesced frames before drain returns."""
+        frames = []
+
+        async def send(frame):
+            frames.append(frame)
+
+        async def run():
+            self.pipeline.register("message-frames", send, asyncio.get_running_loop())
+            for i in range(30):
+                self.pipeline.submit("message-frames", f"log {i}")
+            return await self.pipeline.drain("message-frames")
+
+        logs = asyncio.run(run())
+
+        self.assertEqual(logs, [f"log {i}" for i in range(30)])
+        self.assertLess(len(frames), 30)
+        self.assertEqual([log for frame in frames for log in frame["logs"]], logs)
+        for frame in frames:
+            self.assertEqual(frame["type"], "log_update")
+            self.assertEqual(frame["messageId"], "message-frames")
+            self.assertEqual(frame["log"], frame["logs"][-1])
+
+    def test_unregistered_logs_are_persisted(self):
+        """Test that logs without a sink are still written."""
+        self.pipeline.submit("message-nosink", "persisted")
+        self.assertTrue(self.pipeline.flush(timeout=5))
+
+        logs = MessageRepository.get_logs_for_message("message-nosink")
+        self.assertEqual([log.log_entry for log in logs], ["persisted"])
+
+    def test_bounded_buffer(self):
+        """Test that records are dropped while the buffer is full."""
+        pipeline = LogPipeline(max_buffer=5, batch_size=100, flush_interval=0.05)
+
+        # Hold the flusher so the buffer fills up
+        with patch.object(pipeline, "_write_batch") as write_batch, pipeline._condition:
+            accepted = [pipeline.submit("message-bounded", f"log {i}") for i in range(8)]
+            write_batch.assert_not_called()
+
+        pipeline.shutdown()
+        self.assertEqual(accepted, [True] * 5 + [False] * 3)
+        self.assertEqual(pipeline.get_stats()["dropped"], 3)
+
+
+class TestLogRouter(DatabaseTestCase):
+    """Test routing logs by the message in the current context."""
+
+    def setUp(self):
+        """Set up the test case."""
+        self.pipeline = LogPipeline(flush_interval=0.01)
+        self.router = LogRouter(self.pipeline)
+        self.router.install("mosaic.agents.test_router")
+        logging.getLogger("mosaic.agents.test_router").setLevel(logging.INFO)
+        self.executor = AgentExecutor(max_workers=4, per_agent_limit=4)
+
+    def tearDown(self):
+        """Clean up after the test case."""
+        logging.getLogger("mosaic.agents.test_router").removeHandler(self.router)
+        self.executor.shutdown(wait=True)
+        self.pipeline.shutdown()
+
+    def test_concurrent_sessions_are_isolated(self):
+        """Test that concurrent runs in executor threads only capture their own logs."""
+        web_search_logger = logging.getLogger("mosaic.agents.test_router.web_search")
+        literature_logger = logging.getLogger("mosaic.agents.test_router.literature")
+
+        def agent_run(name):
+            for i in range(20):
+                web_search_logger.info(f"{name} search {i}")
+                literature_logger.info(f"{name} paper {i}")
+
+        async def session(message_id):
+            self.pipeline.register(message_id)
+            token = self.router.begin(message_id)
+            try:
+                await self.executor.run("research_supervisor", agent_run, message_id)
+            finally:
+                self.router.end(token)
+            return await self.pipeline.drain(message_id)
+
+        async def run():
+            return await asyncio.gather(session("session-a"), session("session-b"))
+
+        logs_a, logs_b = asyncio.run(run())
+
+        self.assertEqual(len(logs_a), 40)
+        self.assertEqual(len(logs_b), 40)
+        self.assertTrue(all("session-a" in log for log in logs_a))
+        self.assertTrue(all("session-b" in log for log in logs_b))
+
+    def test_logs_outside_a_session_are_ignored(self):
+        """Test that records are not captured without an active message."""
+        logging.getLogger("mosaic.agents.test_router").info("no session")
+        self.assertEqual(self.pipeline.get_stats()["submitted"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
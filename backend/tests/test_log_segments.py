@@ -0,0 +1,144 @@
+"""
+Test module for compressed message log segments.
+
+This module tests encoding and lazily decoding log segments, writing the logs
+of a batch as one segment per message, compacting and pruning old segments,
+and moving the rows of the legacy message_logs table into segments.
+"""
+
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.app.log_retention import LogRetention
+from backend.database import database
+from backend.database.log_segments import encode_segment, iter_segment, migrate_legacy_logs
+from backend.database.models import MessageLog, MessageLogSegment
+from backend.database.repository import ConversationRepository, MessageRepository
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestLogSegments(DatabaseTestCase):
+    """Test storing message logs as compressed segments."""
+
+    def create_message(self, content="Hello"):
+        """Create a message to attach logs to."""
+        conversation = ConversationRepository.create_conversation("log-segments")
+        return MessageRepository.create_message(conversation.id, "assistant", content)
+
+    def segments(self, message_id):
+        """Get the segments of a message."""
+        with database.get_db_session() as session:
+            segments = session.query(MessageLogSegment).filter(
+                MessageLogSegment.message_id == message_id
+            ).order_by(MessageLogSegment.id).all()
+            return [(segment.entry_count, segment.compacted) for segment in segments]
+
+    def test_encode_and_decode(self):
+        """Test that entries survive a round trip and large segments decode in chunks."""
+        start = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        entries = [(start + timedelta(seconds=i), f"Step {i}: ünïcode ✓ " + "x" * (i % 50)) for i in range(5000)]
+
+        data, raw_size = encode_segment(entries)
+        self.assertLess(len(data), raw_size / 5)
+
+        decoded = list(iter_segment(data))
+        self.assertEqual([(entry.timestamp, entry.log_entry) for entry in decoded], entries)
+
+        # Only the first chunk is decompressed to read the first entry
+        self.assertEqual(next(iter_segment(data)).log_entry, entries[0][1])
+
+        with self.assertRaises(ValueError):
+            list(iter_segment(data[:len(data) // 2]))
+        with self.assertRaises(ValueError):
+            list(iter_segment(data, codec="lz4"))
+
+    def test_batches_become_segments(self):
+        """Test that each batch writes one segment per message and reads keep the order."""
+        first = self.create_message()
+        second = self.create_message()
+        now = datetime.utcnow()
+
+        MessageRepository.add_logs_to_messages([
+            (first.id, "first 0", now),
+            (second.id, "second 0", now),
+            (first.id, "first 1", now),
+        ])
+        MessageRepository.add_log_to_message(first.id, "first 2")
+
+        self.assertEqual(self.segments(first.id), [(2, False), (1, False)])
+        self.assertEqual(
+            [log.log_entry for log in MessageRepository.get_logs_for_message(first.id)],
+            ["first 0", "first 1", "first 2"]
+        )
+
+        dicts = MessageRepository.get_message_dicts_for_conversation(first.conversation_id)
+        self.assertEqual(dicts[0]["logs"], ["first 0", "first 1", "first 2"])
+
+        # Deleting the message deletes its segments
+        ConversationRepository.delete_conversation(first.conversation_id)
+        self.assertEqual(self.segments(first.id), [])
+
+    def test_compact_and_prune(self):
+        """Test that retention merges old segments and deletes expired ones."""
+        old = self.create_message()
+        recent = self.create_message()
+        long_ago = datetime.utcnow() - timedelta(days=30)
+
+        for i in range(3):
+            MessageRepository.add_logs_to_messages([(old.id, f"old {i}", long_ago + timedelta(seconds=i))])
+            MessageRepository.add_logs_to_messages([(recent.id, f"recent {i}", datetime.utcnow())])
+
+        retention = LogRetention(compact_after_days=1, retention_days=0, batch_size=1, pause=0)
+
+        # Nothing is old enough to compact yet
+        self.assertEqual(retention.run_once()["compacted"], 0)
+
+        # A week later both messages are compacted into one segment each
+        result = retention.run_once(now=datetime.utcnow() + timedelta(days=7))
+        self.assertGreaterEqual(result["compacted"], 2)
+        self.assertEqual(self.segments(old.id), [(3, True)])
+        self.assertEqual(
+            [log.log_entry for log in MessageRepository.get_logs_for_message(old.id)],
+            ["old 0", "old 1", "old 2"]
+        )
+
+        # Logs older than the retention period are deleted
+        retention.retention_days = 7
+        self.assertGreaterEqual(retention.run_once()["pruned"], 1)
+        self.assertEqual(MessageRepository.get_logs_for_message(old.id), [])
+        self.assertEqual(len(MessageRepository.get_logs_for_message(recent.id)), 3)
+        self.assertEqual(retention.get_stats()["runs"], 3)
+
+    def test_migrate_legacy_logs(self):
+        """Test that rows of the legacy table are moved to segments in batches."""
+        messages = [self.create_message() for _ in range(3)]
+        start = datetime(2024, 1, 1)
+        with database.get_engine().begin() as connection:
+            connection.execute(insert(MessageLog), [
+                {"message_id": message.id, "log_entry": f"legacy {i}", "timestamp": start + timedelta(minutes=i)}
+                for message in messages
+                for i in reversed(range(4))
+            ])
+
+        migrate_legacy_logs(database.get_engine(), batch_size=2)
+
+        with database.get_engine().connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT COUNT(*) FROM message_logs")).scalar(), 0)
+
+        for message in messages:
+            self.assertEqual(self.segments(message.id), [(4, True)])
+            logs = MessageRepository.get_logs_for_message(message.id)
+            self.assertEqual([log.log_entry for log in logs], [f"legacy {i}" for i in range(4)])
+            self.assertEqual(logs[0].timestamp, start)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Test module for full-text search over messages.
+
+This module tests keeping the FTS5 index in sync with the messages, filling
+it for existing messages, and searching it with filters, ranking, snippets
+and cursors.
+"""
+
+import unittest
+import sys
+import os
+
+from sqlalchemy import text
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.models import Message
+from backend.database.repository import ConversationRepository, MessageRepository
+from backend.database.search import backfill_search_index, search_messages, to_match_query
+from backend.database.service import ChatService
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestMessageSearch(DatabaseTestCase):
+    """Test searching the content of messages."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Seed messages of two users and agents."""
+        super().setUpClass()
+
+        weather = ConversationRepository.create_conversation("weather", user_id="alice")
+        MessageRepository.create_message(weather.id, "user", "Will it rain in Paris tomorrow?", timestamp=1000)
+        MessageRepository.create_message(
+            weather.id, "assistant", "Rain is likely in Paris, bring an umbrella <b>today</b>", timestamp=2000
+        )
+        MessageRepository.create_message(weather.id, "user", "What about the café near the river?", timestamp=3000)
+
+        research = ConversationRepository.create_conversation("research", user_id="alice")
+        MessageRepository.create_message(research.id, "user", "Summarize papers about rain forests", timestamp=4000)
+
+        other = ConversationRepository.create_conversation("weather", user_id="bob")
+        MessageRepository.create_message(other.id, "user", "Rain rain rain", timestamp=5000)
+
+    def test_filters(self):
+        """Test filtering results by user, agent and time."""
+        results, _ = search_messages("rain", user_id="alice")
+        self.assertEqual(len(results), 3)
+
+        results, _ = search_messages("rain", user_id="alice", agent_id="weather")
+        self.assertEqual({result["timestamp"] for result in results}, {1000, 2000})
+
+        results, _ = search_messages("rain", start=1500, end=4000)
+        self.assertEqual({result["timestamp"] for result in results}, {2000, 4000})
+
+        # Diacritics are ignored and a trailing * matches a prefix
+        results, _ = search_messages("cafe riv*")
+        self.assertEqual([result["timestamp"] for result in results], [3000])
+
+    def test_snippets_and_ranking(self):
+        """Test that snippets are escaped and highlighted and the best match comes first."""
+        results, _ = search_messages("umbrella")
+        self.assertEqual(len(results), 1)
+        self.assertIn("<mark>umbrella</mark>", results[0]["snippet"])
+        self.assertIn("&lt;b&gt;today&lt;/b&gt;", results[0]["snippet"])
+        self.assertEqual(results[0]["agentId"], "weather")
+
+        results, _ = search_messages("rain")
+        self.assertEqual(results[0]["timestamp"], 5000)
+        self.assertEqual(results, sorted(results, key=lambda result: result["score"]))
+
+    def test_pagination(self):
+        """Test walking all results with cursors."""
+        first = ChatService.search_messages("rain", limit=3)
+        self.assertTrue(first["hasMore"])
+        second = ChatService.search_messages("rain", limit=3, after=first["nextCursor"])
+        self.assertFalse(second["hasMore"])
+        self.assertIsNone(second["nextCursor"])
+
+        ids = [result["messageId"] for page in (first, second) for result in page["results"]]
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_operators_searched_literally(self):
+        """Test that FTS5 syntax in the text does not break the query."""
+        self.assertEqual(to_match_query('rain AND "paris'), '"rain" "AND" """paris"')
+        results, _ = search_messages('paris" OR (rain')
+        self.assertEqual(results, [])
+        with self.assertRaises(ValueError):
+            to_match_query("  * ")
+
+    def test_index_follows_edits_and_deletes(self):
+        """Test that the triggers update the index with the messages."""
+        conversation = ConversationRepository.create_conversation("edits", user_id="carol")
+        message = MessageRepository.create_message(conversation.id, "user", "An unusual zeppelin")
+        self.assertEqual(len(search_messages("zeppelin")[0]), 1)
+
+        with database.get_db_session() as session:
+            session.get(Message, message.id).content = "An unusual blimp"
+        self.assertEqual(search_messages("zeppelin")[0], [])
+        self.assertEqual(len(search_messages("blimp")[0]), 1)
+
+        ConversationRepository.delete_conversation(conversation.id)
+        self.assertEqual(search_messages("blimp")[0], [])
+
+    def test_backfill(self):
+        """Test that existing messages are indexed in batches and the triggers are reinstalled."""
+        engine = database.get_engine()
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('delete-all')"))
+        self.assertEqual(search_messages("rain")[0], [])
+
+        backfill_search_index(engine, batch_size=2)
+        self.assertEqual(len(search_messages("rain")[0]), 4)
+
+        conversation = ConversationRepository.create_conversation("backfill")
+        MessageRepository.create_message(conversation.id, "user", "Indexed by the trigger")
+        self.assertEqual(len(search_messages("trigger")[0]), 1)
+
+        with engine.connect() as connection:
+            connection.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('integrity-check')"))
+
+
+if __name__ == "__main__":
+    unittest.main()
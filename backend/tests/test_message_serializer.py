@@ -0,0 +1,149 @@
+"""
+Test module for the batched message serializer.
+
+This module tests that the batched serializer produces the same dictionaries
+as message_to_dict while using a fixed number of queries.
+"""
+
+import unittest
+import sys
+import os
+
+from sqlalchemy import event
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.repository import (
+    MessageRepository, message_to_dict, messages_to_dicts, parse_message_fields, parse_conversation_fields
+)
+from backend.database.service import ChatService
+from backend.benchmarks.message_serializer import count_queries, seed_conversation
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestMessageSerializer(DatabaseTestCase):
+    """Test the batched message serializer."""
+
+    def serialize_per_message(self, conversation_id):
+        """Helper method to serialize a conversation one message at a time."""
+        messages = MessageRepository.get_messages_for_conversation(conversation_id)
+        return [message_to_dict(message) for message in messages]
+
+    def test_identical_dicts(self):
+        """Test that the batched serializer matches message_to_dict."""
+        conversation_id = seed_conversation(25)
+
+        expected = self.serialize_per_message(conversation_id)
+        actual = MessageRepository.get_message_dicts_for_conversation(conversation_id)
+
+        self.assertEqual(actual, expected)
+        self.assertTrue(any("logs" in message for message in actual))
+        self.assertTrue(any("attachments" in message for message in actual))
+
+    def test_constant_query_count(self):
+        """Test that the query count does not grow with the conversation."""
+        counts = []
+        for size in (10, 100):
+            conversation_id = seed_conversation(size)
+            with count_queries(database.get_engine()) as counter:
+                messages = MessageRepository.get_message_dicts_for_conversation(conversation_id)
+            self.assertEqual(len(messages), size)
+            counts.append(counter[0])
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_messages_to_dicts_subset(self):
+        """Test serializing a subset of messages with an explicit ID list."""
+        conversation_id = seed_conversation(12)
+        expected = self.serialize_per_message(conversation_id)[5:10]
+
+        with database.get_db_session() as session:
+            messages = MessageRepository.get_messages_for_conversation(conversation_id)[5:10]
+            actual = messages_to_dicts(session, messages)
+
+        self.assertEqual(actual, expected)
+        self.assertEqual(messages_to_dicts(None, []), [])
+
+
+    def test_field_projection(self):
+        """Test that projected messages skip the columns and relations that were not requested."""
+        conversation_id = seed_conversation(20)
+        full = MessageRepository.get_message_dicts_for_conversation(conversation_id)
+
+        fields = parse_message_fields("id,role,content")
+        with count_queries(database.get_engine()) as counter:
+            projected = MessageRepository.get_message_dicts_for_conversation(conversation_id, fields=fields)
+
+        # Only the conversation and the messages are queried
+        self.assertEqual(counter[0], 2)
+        self.assertEqual(
+            projected,
+            [{key: message[key] for key in ("id", "role", "content", "timestamp")} for message in full]
+        )
+
+        # include adds relations to the column fields
+        fields = parse_message_fields(include="attachments")
+        projected = MessageRepository.get_message_dicts_for_conversation(conversation_id, fields=fields)
+        self.assertEqual(projected, [{key: value for key, value in message.items() if key != "logs"} for message in full])
+
+        page, _ = MessageRepository.get_message_page_for_conversation(
+            conversation_id, limit=5, fields=parse_message_fields("content", "logs")
+        )
+        self.assertEqual(page, [{key: message[key] for key in message if key in ("id", "content", "timestamp", "logs")} for message in full[-5:]])
+
+        with self.assertRaises(ValueError):
+            parse_message_fields("id,secret")
+        with self.assertRaises(ValueError):
+            parse_conversation_fields("messages")
+        self.assertIsNone(parse_message_fields())
+
+    def test_projection_selects_only_requested_columns(self):
+        """Test that field projections are pushed into the SELECT statements."""
+        conversation_id = seed_conversation(3)
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = database.get_engine()
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            MessageRepository.get_message_dicts_for_conversation(conversation_id, fields=parse_message_fields("role"))
+            page = ChatService.get_conversation_summaries_page("benchmark", fields="title")
+            history = ChatService.get_conversation_history("benchmark", fields="title,messageCount")
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        self.assertEqual(set(page["conversations"][0]), {"id", "title"})
+        self.assertEqual(set(history[0]), {"id", "title", "messageCount"})
+
+        message_select = next(statement for statement in statements if "FROM messages" in statement)
+        self.assertIn("messages.role", message_select)
+        self.assertNotIn("messages.content", message_select)
+        self.assertNotIn("messages.custom_data", message_select)
+
+        conversation_selects = [statement for statement in statements if "FROM conversations" in statement]
+        self.assertEqual(len(conversation_selects), 3)
+        for statement in conversation_selects[1:]:
+            self.assertIn("conversations.title", statement)
+            self.assertNotIn("conversations.last_message_preview", statement)
+            self.assertNotIn("conversations.created_at", statement)
+
+    def test_message_logs_on_demand(self):
+        """Test loading the logs of a single message."""
+        conversation_id = seed_conversation(2)
+        message = MessageRepository.get_message_dicts_for_conversation(conversation_id)[1]
+
+        self.assertEqual(ChatService.get_message_logs(message["id"]), message["logs"])
+        self.assertIsNone(ChatService.get_message_logs("missing-message"))
+
+        # The message must be in a conversation with the requested agent
+        self.assertEqual(ChatService.get_message_logs(message["id"], "benchmark"), message["logs"])
+        self.assertIsNone(ChatService.get_message_logs(message["id"], "other-agent"))
+
+
+if __name__ == "__main__":
+    unittest.main()
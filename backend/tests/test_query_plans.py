@@ -0,0 +1,172 @@
+"""
+Test module for the query plans of the hot chat queries.
+
+This module records the SELECT statements the repositories run for listing
+conversations, messages, logs and attachments, and checks with EXPLAIN QUERY
+PLAN that SQLite finds their rows through an index instead of scanning the
+tables. It also tests the migration runner.
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import event, text
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.migrations.runner import MIGRATIONS, Migration, create_index, get_applied_versions, run_migrations
+from backend.database.repository import (
+    AttachmentRepository,
+    ConversationRepository,
+    MessageRepository,
+    encode_cursor
+)
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestQueryPlans(DatabaseTestCase):
+    """Test that the hot repository queries use indexes."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Seed a few conversations."""
+        super().setUpClass()
+
+        for index in range(3):
+            conversation = ConversationRepository.create_conversation("plans", user_id=f"user-{index}")
+            for number in range(5):
+                message = MessageRepository.create_message(conversation.id, "user", f"Message {number}")
+                MessageRepository.add_log_to_message(message.id, "Processed")
+        cls.conversation_id = conversation.id
+        cls.message_id = message.id
+
+    @contextmanager
+    def recorded_selects(self):
+        """Record the SELECT statements run on the read engine."""
+        statements = []
+
+        def record(connection, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append((statement, parameters))
+
+        engine = database.get_engine()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    def query_plans(self, statements):
+        """Get the EXPLAIN QUERY PLAN details of recorded statements."""
+        plans = []
+        with database.get_engine().connect() as connection:
+            for statement, parameters in statements:
+                rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                plans.append((statement, [row[-1] for row in rows]))
+        return plans
+
+    def assertUsesIndexes(self, call):
+        """
+        Assert that every query run by a call finds its rows through an index.
+
+        Queries for a single key must also read the rows from the index in
+        order, without a temporary B-tree for ORDER BY; the rows of several
+        keys (IN) are merged from one index lookup per key, which needs a sort.
+
+        Args:
+            call: The function running the queries
+        """
+        with self.recorded_selects() as statements:
+            call()
+        self.assertTrue(statements)
+
+        for statement, details in self.query_plans(statements):
+            for detail in details:
+                if detail.startswith("SCAN"):
+                    self.fail(f"Full scan ({detail}) in query:\n{statement}")
+                if " IN (" not in statement:
+                    self.assertNotIn("TEMP B-TREE", detail, f"Sort in query:\n{statement}")
+
+    def test_conversation_queries(self):
+        """Test the queries that look up and list an agent's conversations."""
+        self.assertUsesIndexes(lambda: ConversationRepository.get_active_conversation_for_agent("plans", "user-1"))
+        self.assertUsesIndexes(lambda: ConversationRepository.get_conversations_page_for_agent("plans", limit=2))
+        self.assertUsesIndexes(
+            lambda: ConversationRepository.get_conversation_summaries_page_for_agent("plans", "user-1", limit=2)
+        )
+
+        conversations, _ = ConversationRepository.get_conversations_page_for_agent("plans", limit=1)
+        cursor = encode_cursor(conversations[0].updated_at.isoformat(), conversations[0].id)
+        self.assertUsesIndexes(
+            lambda: ConversationRepository.get_conversations_page_for_agent("plans", limit=2, before=cursor)
+        )
+
+    def test_message_queries(self):
+        """Test the queries that list a conversation's messages with their logs and attachments."""
+        self.assertUsesIndexes(lambda: MessageRepository.get_messages_for_conversation(self.conversation_id))
+        self.assertUsesIndexes(lambda: MessageRepository.get_message_page_for_conversation(self.conversation_id, limit=2))
+        self.assertUsesIndexes(lambda: MessageRepository.get_message_dicts_for_conversation(self.conversation_id))
+
+    def test_log_and_attachment_queries(self):
+        """Test the queries that load the logs and attachments of one message."""
+        self.assertUsesIndexes(lambda: MessageRepository.get_logs_for_message(self.message_id))
+        self.assertUsesIndexes(lambda: AttachmentRepository.get_attachments_for_message(self.message_id))
+
+
+class TestMigrationRunner(unittest.TestCase):
+    """Test applying versioned migrations."""
+
+    def setUp(self):
+        """Create an empty scratch database."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.engine = database._create_engine(f"sqlite:///{os.path.join(self.temp_dir.name, 'test.db')}")
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name VARCHAR(50))"))
+
+    def tearDown(self):
+        """Delete the scratch database."""
+        self.engine.dispose()
+        self.temp_dir.cleanup()
+
+    def test_migrations_applied_once(self):
+        """Test that migrations run in order of version and are recorded."""
+        migrations = [
+            Migration(2, "second", [create_index("ix_items_name_id", "items", ["name", "id"])]),
+            Migration(1, "first", [create_index("ix_items_name", "items", ["name"])]),
+        ]
+
+        self.assertEqual(run_migrations(self.engine, migrations), [1, 2])
+        self.assertEqual(sorted(get_applied_versions(self.engine)), [1, 2])
+        self.assertEqual(run_migrations(self.engine, migrations), [])
+
+        with self.engine.connect() as connection:
+            indexes = {row[1] for row in connection.execute(text("PRAGMA index_list(items)"))}
+        self.assertEqual(indexes, {"ix_items_name", "ix_items_name_id"})
+
+    def test_interrupted_migration_rerun(self):
+        """Test that a migration failing midway is applied again from the start."""
+        def fail(engine):
+            raise RuntimeError("interrupted")
+
+        migration = Migration(1, "indexes", [create_index("ix_items_name", "items", ["name"]), fail])
+        with self.assertRaises(RuntimeError):
+            run_migrations(self.engine, [migration])
+        self.assertEqual(get_applied_versions(self.engine), {})
+
+        migration = Migration(1, "indexes", [create_index("ix_items_name", "items", ["name"])])
+        self.assertEqual(run_migrations(self.engine, [migration]), [1])
+
+    def test_versions_unique(self):
+        """Test that the migration versions are unique and increasing."""
+        versions = [migration.version for migration in MIGRATIONS]
+        self.assertEqual(versions, sorted(set(versions)))
+
+
+if __name__ == "__main__":
+    unittest.main()
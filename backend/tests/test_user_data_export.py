@@ -0,0 +1,169 @@
+"""
+Test module for the user data export.
+
+This module tests streaming the data of a user as a ZIP archive with NDJSON
+files and attachment contents, and writing it with a background export job.
+"""
+
+import unittest
+import sys
+import os
+import io
+import json
+import time
+import zipfile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules and the user data API
+from backend.app.database import get_db
+from backend.app.export_jobs import export_jobs
+from backend.app.user_data_api import get_user_data_api_router
+from backend.database import database
+from backend.database.models import Attachment
+from backend.database.blob_store import blob_store
+from backend.database.export import ExportProgress, iter_user_export
+from backend.database.repository import AttachmentRepository, ConversationRepository, MessageRepository
+from backend.database.user_repository import UserRepository
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestUserDataExport(DatabaseTestCase):
+    """Test exporting the data of a user."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the blob store and the exports at scratch directories."""
+        super().setUpClass()
+        cls.blob_root = blob_store.root
+        blob_store.root = os.path.join(cls.temp_dir.name, "blobs")
+        cls.export_dir = export_jobs.directory
+        export_jobs.directory = os.path.join(cls.temp_dir.name, "exports")
+
+        def get_test_db():
+            session = database.SessionFactory()
+            try:
+                yield session
+            finally:
+                session.close()
+
+        app = FastAPI()
+        app.include_router(get_user_data_api_router())
+        app.dependency_overrides[get_db] = get_test_db
+        cls.client = TestClient(app)
+
+        with database.get_db_session() as session:
+            UserRepository(session).create_user("user-export", email="export@example.com", first_name="Ada")
+
+        cls.conversation_ids = []
+        for index in range(3):
+            conversation = ConversationRepository.create_conversation("export", f"Chat {index}", user_id="user-export")
+            cls.conversation_ids.append(conversation.id)
+            for turn in range(4):
+                message = MessageRepository.create_message(conversation.id, "user", f"Message {index}.{turn}", user_id="user-export")
+            MessageRepository.add_log_to_message(message.id, f"Log of chat {index}")
+
+        cls.blob_content = os.urandom(200000)
+        cls.blob_attachment = AttachmentRepository.create_attachment(
+            message.id, "image/png", filename="photo.png", content_type="image/png", data=cls.blob_content
+        )
+        with database.get_db_session() as session:
+            attachment = Attachment(message_id=message.id, type="text/plain", filename="../notes.txt", inline_data=b"inline notes")
+            session.add(attachment)
+            session.commit()
+            cls.inline_attachment_id = attachment.id
+
+        # Data of another user is not exported
+        other = ConversationRepository.create_conversation("export", "Other", user_id="user-other")
+        MessageRepository.create_message(other.id, "user", "Not mine", user_id="user-other")
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the blob store and export directory."""
+        blob_store.root = cls.blob_root
+        export_jobs.directory = cls.export_dir
+        super().tearDownClass()
+
+    def read_ndjson(self, zip_file, name):
+        """Read the rows of an NDJSON file of an archive."""
+        return [json.loads(line) for line in zip_file.read(name).decode("utf-8").splitlines()]
+
+    def check_archive(self, data):
+        """Check the contents of an export archive."""
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(json.loads(zip_file.read("user.json"))["email"], "export@example.com")
+            self.assertIn("README.md", zip_file.namelist())
+
+            conversations = self.read_ndjson(zip_file, "conversations.ndjson")
+            self.assertEqual(sorted(row["id"] for row in conversations), self.conversation_ids)
+
+            messages = self.read_ndjson(zip_file, "messages.ndjson")
+            self.assertEqual(len(messages), 12)
+            self.assertNotIn("Not mine", [row["content"] for row in messages])
+            self.assertEqual(messages[3]["logs"], ["Log of chat 0"])
+            self.assertEqual(messages[0]["conversationId"], self.conversation_ids[0])
+
+            attachments = {row["id"]: row for row in self.read_ndjson(zip_file, "attachments.ndjson")}
+            blob_path = attachments[self.blob_attachment.id]["path"]
+            inline_path = attachments[self.inline_attachment_id]["path"]
+            self.assertEqual(zip_file.read(blob_path), self.blob_content)
+            self.assertEqual(zip_file.getinfo(blob_path).compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(inline_path, f"attachments/{self.inline_attachment_id}/notes.txt")
+            self.assertEqual(zip_file.read(inline_path), b"inline notes")
+
+            self.assertEqual(self.read_ndjson(zip_file, "agents.ndjson"), [])
+
+    def test_iter_user_export(self):
+        """Test that the archive is produced in chunks while progress is reported."""
+        progress = ExportProgress()
+        chunks = list(iter_user_export({"email": "export@example.com"}, "user-export", progress))
+
+        self.assertGreater(len(chunks), 3)
+        self.check_archive(b"".join(chunks))
+        self.assertEqual(progress.phase, "completed")
+        self.assertEqual(progress.total_messages, 12)
+        self.assertEqual(progress.messages, 12)
+        self.assertEqual(progress.attachments, 2)
+        self.assertEqual(progress.bytes_written, sum(len(chunk) for chunk in chunks))
+
+    def test_streamed_export(self):
+        """Test that the export endpoint streams the archive."""
+        response = self.client.get("/api/user-data/export", params={"user_id": "user-export"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/zip")
+        self.check_archive(response.content)
+
+        self.assertEqual(self.client.get("/api/user-data/export", params={"user_id": "nobody"}).status_code, 404)
+
+    def test_export_job(self):
+        """Test that an export job writes the archive, reports progress and is downloaded."""
+        response = self.client.post("/api/user-data/export/jobs", params={"user_id": "user-export"})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["jobId"]
+
+        deadline = time.time() + 30
+        while True:
+            job = self.client.get(f"/api/user-data/export/jobs/{job_id}", params={"user_id": "user-export"}).json()
+            if job["status"] in ("completed", "failed") or time.time() > deadline:
+                break
+            time.sleep(0.05)
+
+        self.assertEqual(job["status"], "completed", job["error"])
+        self.assertEqual(job["progress"]["messages"], 12)
+
+        response = self.client.get(job["downloadUrl"])
+        self.assertEqual(response.status_code, 200)
+        self.check_archive(response.content)
+
+        # Jobs are only visible to their user
+        response = self.client.get(f"/api/user-data/export/jobs/{job_id}", params={"user_id": "user-other"})
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
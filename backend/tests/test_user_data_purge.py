@@ -0,0 +1,116 @@
+"""
+Test module for the bulk purge of user data.
+
+This module tests deleting the conversations of a user in batches with
+set-based statements: children before parents, blob references released,
+conversation summaries and the search index kept right, and the data of
+other users left alone.
+"""
+
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import the modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# Import the database modules
+from backend.database import database
+from backend.database.models import Blob, Conversation, Message, MessageLogSegment
+from backend.database.blob_store import blob_store
+from backend.database.purge import delete_message_batch, purge_user_conversations
+from backend.database.repository import AttachmentRepository, ConversationRepository, MessageRepository
+from backend.database.search import search_messages
+from backend.database.writer import database_writer
+from backend.tests.database_case import DatabaseTestCase
+
+
+class TestUserDataPurge(DatabaseTestCase):
+    """Test purging the conversations of a user."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Point the blob store at a scratch directory."""
+        super().setUpClass()
+        cls.blob_root = blob_store.root
+        blob_store.root = os.path.join(cls.temp_dir.name, "blobs")
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the blob store."""
+        blob_store.root = cls.blob_root
+        super().tearDownClass()
+
+    def create_data(self, user_id, conversations=3, messages=4):
+        """Create conversations of a user with messages, logs and attachments."""
+        for index in range(conversations):
+            conversation = ConversationRepository.create_conversation("purge", f"Chat {index}", user_id=user_id)
+            for turn in range(messages):
+                message = MessageRepository.create_message(
+                    conversation.id, "user", f"Purgeable message {index}.{turn} of {user_id}", user_id=user_id
+                )
+                MessageRepository.add_log_to_message(message.id, f"Log {turn}")
+            AttachmentRepository.create_attachment(message.id, "text/plain", filename="notes.txt", data=b"shared")
+
+    def count(self, model, *filters):
+        """Count the rows of a model."""
+        with database.get_db_session() as session:
+            return session.query(model).filter(*filters).count()
+
+    def test_purge_in_batches(self):
+        """Test that all data of the user is deleted in bounded batches, children first."""
+        self.create_data("purge-user")
+        self.create_data("purge-other")
+        batches = []
+
+        progress = purge_user_conversations(
+            "purge-user", batch_size=5, pause=0, on_progress=lambda p: batches.append(p.messages)
+        )
+
+        self.assertEqual(progress.conversations, 3)
+        self.assertEqual(progress.messages, 12)
+        self.assertEqual(progress.logs, 12)
+        self.assertEqual(progress.attachments, 3)
+        self.assertEqual(batches[:3], [5, 10, 12])
+        self.assertEqual(progress.batches, 4)
+
+        # Nothing of the user is left, while the other user keeps everything
+        self.assertEqual(self.count(Conversation, Conversation.user_id == "purge-user"), 0)
+        self.assertEqual(self.count(Message, Message.user_id == "purge-user"), 0)
+        self.assertEqual(self.count(Conversation, Conversation.user_id == "purge-other"), 3)
+        self.assertEqual(self.count(Message, Message.user_id == "purge-other"), 12)
+        self.assertEqual(search_messages("purgeable", user_id="purge-user")[0], [])
+        self.assertEqual(len(search_messages("purgeable", user_id="purge-other", limit=50)[0]), 12)
+
+        # The blob is still used by the other user
+        self.assertEqual(progress.blobs, 0)
+        with database.get_db_session() as session:
+            self.assertEqual([blob.ref_count for blob in session.query(Blob).all()], [3])
+
+        # Purging the other user deletes the blob too
+        progress = purge_user_conversations("purge-other", batch_size=100, pause=0)
+        self.assertEqual(progress.batches, 2)
+        self.assertEqual(progress.blobs, 1)
+        self.assertEqual(self.count(Blob), 0)
+        self.assertEqual(self.count(MessageLogSegment), 0)
+
+    def test_summaries_between_batches(self):
+        """Test that conversations left after a batch have the right summaries."""
+        conversation = ConversationRepository.create_conversation("purge", "Partial", user_id="purge-partial")
+        for turn in range(4):
+            MessageRepository.create_message(conversation.id, "user", f"Turn {turn}", timestamp=1000 + turn)
+
+        counts = database_writer.execute(lambda session: delete_message_batch(session, "purge-partial", 3))
+        self.assertEqual(counts["messages"], 3)
+
+        conversation = ConversationRepository.get_conversation(conversation.id)
+        self.assertEqual(conversation.message_count, 1)
+        remaining = MessageRepository.get_message_dicts_for_conversation(conversation.id)
+        self.assertEqual(conversation.last_message_preview, remaining[0]["content"])
+
+        purge_user_conversations("purge-partial", pause=0)
+        self.assertIsNone(ConversationRepository.get_conversation(conversation.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -138,6 +138,11 @@ export function ConversationHistory({ agentId, onConversationSelect }: Conversat
   
   // Get a preview of the conversation content
   const getConversationPreview = (conversation: Conversation) => {
+    if (conversation.lastMessagePreview) {
+      return conversation.lastMessagePreview.length > 50
+        ? `${conversation.lastMessagePreview.substring(0, 50)}...`
+        : conversation.lastMessagePreview
+    }
     if (conversation.messages && conversation.messages.length > 0) {
       // Get the last message
       const lastMessage = conversation.messages[conversation.messages.length - 1]
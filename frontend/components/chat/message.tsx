@@ -120,7 +120,7 @@ export function Message({ message, isLastMessage = false }: MessageProps) {
                     />
                   ) : attachment.url ? (
                     <img 
-                      src={attachment.url} 
+                      src={attachment.thumbnailUrl || attachment.url} 
                       alt={attachment.filename}
                       className="max-h-64 object-contain"
                     />
@@ -77,3 +77,61 @@ export const xetoApi = {
   saveXeto: (data: XetoSaveRequest) => 
     api.post<XetoResponse>('/apps/pdf-ingestion/save-xeto', data),
 };
+
+// Attachment uploads
+export interface UploadState {
+  uploadId: string;
+  filename?: string;
+  contentType?: string;
+  size: number;
+  offset: number;
+  chunkSize: number;
+}
+
+// API endpoints for resumable binary attachment uploads
+export const attachmentsApi = {
+  createUpload: (file: File, userId?: string) =>
+    api.post<UploadState>('/api/attachments/uploads', {
+      size: file.size,
+      filename: file.name,
+      contentType: file.type,
+      userId,
+    }),
+
+  getUpload: (uploadId: string) =>
+    api.get<UploadState>(`/api/attachments/uploads/${uploadId}`),
+
+  uploadChunk: (uploadId: string, offset: number, chunk: Blob) =>
+    api.put<UploadState>(`/api/attachments/uploads/${uploadId}`, chunk, {
+      headers: {
+        'Content-Type': 'application/octet-stream',
+        'Upload-Offset': String(offset),
+      },
+    }),
+
+  completeUpload: (uploadId: string) =>
+    api.post(`/api/attachments/uploads/${uploadId}/complete`),
+
+  // Upload a file in chunks, resuming from the server's offset after a failed chunk
+  uploadFile: async (file: File, userId?: string, maxRetries = 3) => {
+    const { data: upload } = await attachmentsApi.createUpload(file, userId);
+    let offset = upload.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+      try {
+        const chunk = file.slice(offset, offset + upload.chunkSize);
+        const { data } = await attachmentsApi.uploadChunk(upload.uploadId, offset, chunk);
+        offset = data.offset;
+        retries = 0;
+      } catch (error) {
+        if (++retries > maxRetries) throw error;
+        const { data } = await attachmentsApi.getUpload(upload.uploadId);
+        offset = data.offset;
+      }
+    }
+
+    const { data: attachment } = await attachmentsApi.completeUpload(upload.uploadId);
+    return attachment;
+  },
+};
@@ -312,6 +312,7 @@ export function WebSocketProvider({ children }: WebSocketProviderProps) {
               dispatchEvent({ 
                 type: "log_update", 
                 log: data.log,
+                logs: data.logs,
                 messageId: data.messageId
               })
             } else if (data.type === "pong") {
@@ -4,7 +4,7 @@ import { useState, useEffect, useCallback } from "react"
 import { v4 as uuidv4 } from "uuid"
 import { useUser } from "@clerk/nextjs"
 import { Message, Attachment } from "../types"
-import { chatApi } from "../api"
+import { chatApi, attachmentsApi } from "../api"
 import { mockMessages } from "../mock-data"
 import { useWebSocket, ConnectionState } from "../contexts/websocket-context"
 import { useAgentContext } from "../contexts/agent-context"
@@ -143,13 +143,16 @@ export function useChat(agentId?: string) {
       } else if (event.type === "log_update" && event.messageId) {
         console.log("Received log update:", event.log, "for message:", event.messageId)
         
-        // Add log to the appropriate message
+        // Log updates are coalesced, so a frame may carry several logs
+        const newLogs = event.logs ?? [event.log]
+        
+        // Add logs to the appropriate message
         setMessages(prev => 
           prev.map(msg => 
             msg.id === event.messageId
               ? { 
                   ...msg, 
-                  logs: [...(msg.logs || []), event.log] 
+                  logs: [...(msg.logs || []), ...newLogs] 
                 }
               : msg
           )
@@ -185,11 +188,20 @@ export function useChat(agentId?: string) {
     }
   }, [connectionState, error, isInitialized])
 
-  // Process files and convert to base64
+  // Upload files as binary and reference them by attachment ID, falling
+  // back to base64 inside the message if the upload fails
   const processFiles = async (files: File[]): Promise<Attachment[]> => {
     const attachments: Attachment[] = []
     
     for (const file of files) {
+      try {
+        const uploaded = await attachmentsApi.uploadFile(file, user?.id)
+        attachments.push({ ...uploaded, uploaded: true })
+        continue
+      } catch (error) {
+        console.error("Error uploading file, sending it inline:", error)
+      }
+      
       // Create a new attachment
       const attachment: Attachment = {
         id: Date.now() + Math.floor(Math.random() * 1000), // Temporary ID
@@ -199,7 +211,7 @@ export function useChat(agentId?: string) {
         size: file.size,
       }
       
-      // Convert file to base64 for all file types
+      // Convert file to base64
       try {
         const base64 = await readFileAsBase64(file)
         attachment.data = base64
@@ -35,6 +35,8 @@ export interface Attachment {
   contentType: string
   size: number
   url?: string
+  thumbnailUrl?: string // Downscaled variant of image attachments
+  uploaded?: boolean // Uploaded through /api/attachments; sent by ID
   data?: string // Base64 encoded data for small attachments
 }
 
@@ -47,6 +49,9 @@ export interface Conversation {
   updatedAt: string
   isActive: boolean
   userId?: string
+  messageCount?: number
+  lastMessageAt?: number | null
+  lastMessagePreview?: string | null
   messages?: Message[]
 }
 
@@ -75,5 +80,5 @@ export type WebSocketEvent =
   | { type: "disconnect", reason?: string }
   | { type: "message", message: Message }
   | { type: "typing", agentId: string }
-  | { type: "log_update", log: string, messageId: string }
+  | { type: "log_update", log: string, logs?: string[], messageId: string }
   | { type: "error", error: string }
@@ -29,6 +29,8 @@ export interface Attachment {
   contentType: string;
   size: number;
   url?: string;
+  thumbnailUrl?: string; // Downscaled variant of image attachments
+  uploaded?: boolean; // Uploaded through /api/attachments; sent by ID
   data?: string; // Base64 encoded data for small attachments
 }
 
@@ -41,6 +43,9 @@ export interface Conversation {
   updatedAt: string;
   isActive: boolean;
   userId?: string;
+  messageCount?: number;
+  lastMessageAt?: number | null;
+  lastMessagePreview?: string | null;
   messages?: Message[];
 }
 
@@ -71,7 +76,11 @@ export type WebSocketEvent =
   | { type: "disconnect"; reason?: string }
   | { type: "message"; message: Message }
   | { type: "typing"; agentId: string }
-  | { type: "log_update"; log: string; messageId: string }
+  | { type: "log_update"; log: string; logs?: string[]; messageId: string }
+  | { type: "stream_start"; messageId: string; agent: string }
+  | { type: "token"; messageId: string; agent: string; delta: string }
+  | { type: "tool_start"; messageId: string; agent: string; tool: string; runId: string; input: string }
+  | { type: "tool_end"; messageId: string; agent: string; tool: string; runId: string; output: string }
   | { type: "error"; error: string };
 
 // View-specific event types
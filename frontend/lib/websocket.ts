@@ -84,6 +84,7 @@ export class WebSocketService {
           this.dispatchEvent({ 
             type: "log_update", 
             log: data.log,
+            logs: data.logs,
             messageId: data.messageId
           })
         }